@@ -1,38 +1,69 @@
 import csv
+import hashlib
 import os
+import tempfile
+import time
 from io import StringIO, BytesIO
 from urllib.parse import urlencode
 
 from dotenv import load_dotenv
-import unicodedata
 import warnings
 from collections import Counter, defaultdict
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from functools import wraps
 from typing import List
 
-import requests
-from flask import Flask, Response, flash, jsonify, redirect, render_template, request, url_for
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from flask import Flask, Response, current_app, flash, g, stream_with_context, jsonify, redirect, render_template, request, send_file, url_for
 
+from services.admissao import Orcamento, Rejeitada, controle_admissao_do_ambiente
+from services.agrupamento import CacheCoordenadas, MapaSemana, ler_limites
+from services.busca import IndiceBusca
 from services.cache import (
-    deduplicate_records,
+    chave_registro,
     load_cache,
     load_history,
+    load_summary,
+    mesclar_e_persistir,
     save_cache,
     save_history,
-    update_memory_and_persist,
+    save_summary,
 )
+from services.cache_paginas import BackendDisco, PaginaEmCache, cache_paginas_do_ambiente, chave_pagina
+from services.coalescencia import Coalescedor, coalescedor_sincronizacao
+from services.cubo import Celula, CuboConcluidas
+from services.criticos import (
+    agrupar_criticos_por_base,
+    mesclar_digestos,
+    ordenar_digesto,
+)
+from services.dados import RepositorioDados
+from services.derivados import RegistroDerivados
 from services.dropbox_client import (
-    DropboxSettings,
-    TokenCache,
+    SharedTokenCache,
     download_file,
     get_access_token,
+    settings_from_env,
+)
+from services.equipes import (
+    ALLOWED_EQUIPES,
+    BASE_PREFIXES,
+    normalizar_codigo_equipe,
+)
+from services.esquema import ESQUEMA_CONCLUIDAS, tipar_registros
+from services.eventos import BarramentoEventos, formatar_sse
+from services.ingestao import (
+    bases_e_equipes,
+    evento_dados,
+    marca_arquivos,
+    preparar_carregados,
+    processar_workbook,
 )
-from services.equipes import filtrar_registros_por_equipes, normalizar_codigo_equipe
-from services.excel_loader import carregar_concluidas_do_arquivo, carregar_registros_do_arquivo
+from services.instrumentacao import cronometrado, medir, metricas
+from services.normalizacao import estatisticas_caches, normalizar_texto
+from services.notificacoes import ENVIADA_RECENTEMENTE, FilaNotificacoes
+from services.perfilador import CABECALHO_TOKEN, perfilador_do_ambiente
+from services.retencao import ArquivoHistorico, inicio_janela, meses_quentes_do_ambiente
+from services.tarefas import ExecutorTarefas
 from utils.dates import filtrar_por_mes_e_semana, gerar_intervalo_datas, obter_mes_semana_atual
 
 warnings.filterwarnings(
@@ -43,39 +74,65 @@ warnings.filterwarnings(
 )
 
 load_dotenv()
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'supersecretkey-mapa-2024')
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 
 
-@app.template_filter('brl')
 def format_currency_brl(valor: float | int | str | None) -> str:
     numero = _parse_decimal(valor)
     return f"R$ {numero:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
 
 
-@app.template_filter('data_curta')
-def format_date_short(valor: str | datetime | None) -> str:
+def format_date_short(valor: str | date | None) -> str:
     return formatar_data_curta(valor)
 
-CACHE_FILE_PATH = os.path.join(app.config['UPLOAD_FOLDER'], 'programacao_cache.json')
-HISTORY_FILE_PATH = os.path.join(app.config['UPLOAD_FOLDER'], 'programacao_historico.json')
-CONCLUIDAS_FILE_PATH = os.path.join(app.config['UPLOAD_FOLDER'], 'concluidas_cache.json')
-PENDENTES_WEBHOOK_URL = os.environ.get('PENDENTES_WEBHOOK_URL', '').strip()
 
-ALLOWED_EQUIPES: List[str] = [
-    'MA-BCB-O001M', 'MA-BCB-O002M', 'MA-BCB-O003M', 'MA-BCB-O004M',
-    'MA-BCB-O005M', 'MA-BCB-O006M', 'MA-BCB-T001M', 'MA-ITM-O001M',
-    'MA-ITM-O002M', 'MA-ITM-O003M', 'MA-ITM-O004M', 'MA-STI-T001M',
-    'MA-STI-O001M', 'MA-STI-O002M', 'MA-STI-O003M', 'MA-STI-O004M'
-]
+def formatar_celula(valor: object) -> object:
+    """Exibição de campos tipados: nulos viram '-' e datas ``dd/mm/aaaa``."""
+    if valor is None:
+        return '-'
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    return valor
+
+CACHE_FILE_PATH = os.path.join(UPLOAD_FOLDER, 'programacao_cache.json')
+HISTORY_FILE_PATH = os.path.join(UPLOAD_FOLDER, 'programacao_historico.json')
+CONCLUIDAS_FILE_PATH = os.path.join(UPLOAD_FOLDER, 'concluidas_cache.json')
+SYNC_SUMMARY_FILE_PATH = os.path.join(UPLOAD_FOLDER, 'ultima_sincronizacao.json')
+COORDENADAS = CacheCoordenadas(os.path.join(UPLOAD_FOLDER, 'coordenadas_locais.json'))
+PERFILADOR = perfilador_do_ambiente(os.path.join(UPLOAD_FOLDER, 'perfis'))
+CACHE_PAGINAS = cache_paginas_do_ambiente(os.path.join(UPLOAD_FOLDER, 'cache_paginas'))
+COALESCEDOR = Coalescedor(os.path.join(UPLOAD_FOLDER, 'travas'))
+SINCRONIZACAO = coalescedor_sincronizacao(os.path.join(UPLOAD_FOLDER, 'travas'))
+# Rotas pesadas têm vagas próprias (somadas entre os workers): o que sobra das
+# threads fica para /mapa, /api/localizacoes_atual e demais leituras.
+ADMISSAO = controle_admissao_do_ambiente(
+    {
+        'exportar_concluidas_pdf': Orcamento(simultaneas=2, fila=2, espera=10, tentar_em=15),
+        'importar_excel': Orcamento(simultaneas=1, fila=1, espera=10, tentar_em=30),
+        'atualizar_programacao': Orcamento(simultaneas=2, fila=0, tentar_em=30),
+    },
+    os.path.join(UPLOAD_FOLDER, 'travas'),
+)
+TAREFAS = ExecutorTarefas(os.path.join(UPLOAD_FOLDER, 'tarefas'))
+EVENTOS = BarramentoEventos(os.path.join(UPLOAD_FOLDER, 'eventos.jsonl'))
+EVENTOS_ATIVOS = os.environ.get('EVENTOS_ATIVOS', '1').strip() != '0'
+# Cada conexão SSE ocupa uma thread do worker: a duração é limitada (o
+# navegador reconecta sozinho) e o teto de assinantes por processo fica abaixo
+# das threads do worker (GUNICORN_THREADS, o mesmo valor passado no Procfile),
+# para sempre sobrarem threads às outras rotas. Com uma thread só não há SSE.
+WORKER_THREADS = max(1, int(os.environ.get('GUNICORN_THREADS', '8') or 8))
+EVENTOS_DURACAO_S = float(os.environ.get('EVENTOS_DURACAO_S', '30') or 30)
+EVENTOS_MAX_ASSINANTES = min(
+    int(os.environ.get('EVENTOS_MAX_ASSINANTES', str(WORKER_THREADS // 2)) or 0),
+    WORKER_THREADS - 1,
+)
+IMPORTACOES_DIR = os.path.join(UPLOAD_FOLDER, 'importacoes')
+UPLOAD_MAX_BYTES = int(float(os.environ.get('UPLOAD_MAX_MB', '50') or 50) * 1024 * 1024)
+PENDENTES_WEBHOOK_URL = os.environ.get('PENDENTES_WEBHOOK_URL', '').strip()
+# Com o webhook configurado, avisa sozinho quando uma sincronização muda as pendências.
+PENDENTES_NOTIFICAR_AUTOMATICO = os.environ.get('PENDENTES_NOTIFICAR_AUTOMATICO', '0').strip() == '1'
+NOTIFICACOES = FilaNotificacoes(os.path.join(UPLOAD_FOLDER, 'notificacoes'))
 
-BASE_PREFIXES = {
-    'BCB': 'MA-BCB',
-    'ITM': 'MA-ITM',
-    'STI': 'MA-STI'
-}
 BASE_OPTIONS = list(BASE_PREFIXES.keys())
 
 MESES_PT = [
@@ -83,7 +140,6 @@ MESES_PT = [
     'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
 ]
 
-CRITICAL_STATUSES = {'SEM PEP', 'ABER/LOG', 'SEM STATUS'}
 
 
 def _parse_decimal(valor: float | int | str | None) -> float:
@@ -124,8 +180,8 @@ def _pendencia_do_registro(obra: dict, valor_atual: float, andamento_atual: floa
     }
 
 
-def _extrair_data_texto(valor: str | datetime | None) -> str:
-    if isinstance(valor, datetime):
+def _extrair_data_texto(valor: str | date | None) -> str:
+    if isinstance(valor, date):
         return valor.strftime('%d/%m/%Y')
     if valor is None:
         return ''
@@ -137,7 +193,11 @@ def _extrair_data_texto(valor: str | datetime | None) -> str:
     return base
 
 
-def _parse_data_generica(valor: str | datetime | None) -> datetime | None:
+def _parse_data_generica(valor: str | date | None) -> datetime | None:
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
     base = _extrair_data_texto(valor)
     if not base:
         return None
@@ -150,7 +210,7 @@ def _parse_data_generica(valor: str | datetime | None) -> datetime | None:
     return None
 
 
-def formatar_data_curta(valor: str | datetime | None) -> str:
+def formatar_data_curta(valor: str | date | None) -> str:
     data = _parse_data_generica(valor)
     if data:
         return data.strftime('%d/%m/%Y')
@@ -164,6 +224,19 @@ def _obter_cache_timestamp(path: str) -> datetime | None:
     return None
 
 
+ARQUIVOS_DADOS = (CACHE_FILE_PATH, HISTORY_FILE_PATH, CONCLUIDAS_FILE_PATH)
+
+
+def _marca_arquivos() -> str:
+    """Marca dos dados persistidos (mtimes dos caches), igual em todos os workers."""
+    return marca_arquivos(ARQUIVOS_DADOS)
+
+
+def _ultima_sincronizacao() -> datetime | None:
+    carimbos = [_obter_cache_timestamp(caminho) for caminho in (SYNC_SUMMARY_FILE_PATH, *ARQUIVOS_DADOS)]
+    return max((carimbo for carimbo in carimbos if carimbo), default=None)
+
+
 def _formata_timestamp_legivel(data: datetime | None) -> str:
     if not data:
         return ''
@@ -184,92 +257,165 @@ def _listar_pendencias(registros: List[dict]) -> List[dict]:
 
 
 def _contar_pendencias_globais() -> int:
-    return len(_listar_pendencias(db_concluidas or []))
+    return len(derivados.obter('pendencias'))
 
 
-def _normalize_dropbox_path(path: str | None) -> str | None:
-    if not path:
-        return None
-    valor = path.strip()
-    if not valor:
-        return None
-    return valor if valor.startswith('/') else f'/{valor}'
+def _mensagem_pendencias(pendentes: List[dict], titulo: str) -> str:
+    texto_linhas = [f"{item['base']} - {item['obra']} ({item['motivo']})" for item in pendentes[:15]]
+    if len(pendentes) > 15:
+        texto_linhas.append(f"... e {len(pendentes) - 15} registros extras")
+    return f'**{titulo}**\n' + '\n'.join(texto_linhas)
 
 
-DEFAULT_CONTROLE_PATH = '/Controle - Obras.xlsx'
+def _assinatura_pendencias(pendentes: List[dict]) -> frozenset:
+    return frozenset((item['base'], item['obra'], item['motivo']) for item in pendentes)
 
-controle_path_env = _normalize_dropbox_path(os.environ.get('DROPBOX_CONTROLE_PATH'))
-controle_path = controle_path_env or DEFAULT_CONTROLE_PATH
 
-DROPBOX_SETTINGS = DropboxSettings(
-    controle_path=controle_path,
-    access_token=os.environ.get('DROPBOX_ACCESS_TOKEN'),
-    refresh_token=os.environ.get('DROPBOX_REFRESH_TOKEN'),
-    app_key=os.environ.get('DROPBOX_APP_KEY'),
-    app_secret=os.environ.get('DROPBOX_APP_SECRET')
+def _enfileirar_notificacao(conteudo: str, origem: str) -> str:
+    # A thread de envio nasce no processo que enfileira (workers vêm de fork).
+    NOTIFICACOES.iniciar()
+    _, situacao = NOTIFICACOES.enfileirar(PENDENTES_WEBHOOK_URL, conteudo, origem)
+    return situacao
+
+
+def _notificar_mudanca_pendencias(anteriores: frozenset) -> None:
+    pendentes = derivados.obter('pendencias')
+    atuais = _assinatura_pendencias(pendentes)
+    if atuais == anteriores:
+        return
+    novas, resolvidas = len(atuais - anteriores), len(anteriores - atuais)
+    if pendentes:
+        titulo = f'Pendências do painel Concluídas mudaram ({novas} novas, {resolvidas} resolvidas)'
+    else:
+        titulo = f'Nenhuma pendência no painel Concluídas ({resolvidas} resolvidas)'
+    try:
+        _enfileirar_notificacao(_mensagem_pendencias(pendentes, titulo), 'sincronizacao')
+    except OSError as exc:
+        print(f'[AVISO] Falha ao enfileirar notificação de pendências: {exc}')
+
+
+DROPBOX_SETTINGS = settings_from_env()
+DROPBOX_TOKEN_CACHE = SharedTokenCache(
+    path=os.environ.get('DROPBOX_TOKEN_CACHE_PATH') or os.path.join(UPLOAD_FOLDER, 'dropbox_token.json')
 )
-DROPBOX_TOKEN_CACHE = TokenCache()
 
-db_projetos: List[dict] = []
-db_concluidas: List[dict] = []
 
-cache_inicial = load_cache(CACHE_FILE_PATH)
-historico_inicial = load_history(HISTORY_FILE_PATH)
-if cache_inicial or historico_inicial:
-    registros_iniciais = filtrar_registros_por_equipes(historico_inicial + cache_inicial, ALLOWED_EQUIPES)
-    db_projetos = deduplicate_records(registros_iniciais)
+def _carregar_dados_iniciais() -> tuple[List[dict], List[dict]]:
+    projetos: List[dict] = []
+    cache_inicial = load_cache(CACHE_FILE_PATH)
+    historico_inicial = load_history(HISTORY_FILE_PATH)
+    if cache_inicial or historico_inicial:
+        projetos = preparar_carregados(historico_inicial + cache_inicial)
+    concluidas = tipar_registros(load_cache(CONCLUIDAS_FILE_PATH), ESQUEMA_CONCLUIDAS)
+    return projetos, concluidas
 
-concluidas_inicial = load_cache(CONCLUIDAS_FILE_PATH)
-if concluidas_inicial:
-    db_concluidas = concluidas_inicial
 
+dados = RepositorioDados(_carregar_dados_iniciais, _marca_arquivos)
+derivados = RegistroDerivados(dados)
+ARQUIVO_HISTORICO = ArquivoHistorico(
+    os.path.join(UPLOAD_FOLDER, 'arquivo'),
+    max_segmentos=int(os.environ.get('HISTORICO_SEGMENTOS_LRU', '4') or 4),
+    preparar=preparar_carregados,
+)
 
-def normalizar_texto(texto: str | None) -> str:
-    if not texto:
-        return ''
-    return ''.join(
-        c for c in unicodedata.normalize('NFD', str(texto))
-        if unicodedata.category(c) != 'Mn'
-    ).upper().strip()
 
-def _definir_condicoes_basicas(registros: List[dict]) -> None:
-    for registro in registros:
-        condicao = str(registro.get('condicao') or registro.get('status') or '').strip()
-        registro['condicao'] = condicao if condicao else '-'
+def _periodo_com_arquivo(mes_sel: str, semana_sel: str, base: str | None = None) -> tuple[List[dict], list]:
+    """Registros e fragmentos do período, juntando os meses arquivados (antes) aos em memória."""
+    segmentos = ARQUIVO_HISTORICO.segmentos_do_mes(mes_sel)
+    if base is None:
+        registros = [r for segmento in segmentos for r in segmento.do_periodo(mes_sel, semana_sel)]
+        registros.extend(filtrar_por_mes_e_semana(dados.projetos, mes_sel, semana_sel))
+        fragmentos = [f for segmento in segmentos for f in segmento.fragmentos.values()]
+        return registros, fragmentos + list(dados.fragmentos().values())
+    fragmentos = [segmento.fragmentos[base] for segmento in segmentos if base in segmento.fragmentos]
+    fragmentos.append(dados.fragmento(base))
+    registros = [r for fragmento in fragmentos for r in fragmento.do_periodo(mes_sel, semana_sel)]
+    return registros, fragmentos
 
 
-def _parse_data_segura(data_str: str) -> datetime | None:
-    return _parse_data_generica(data_str)
+@derivados.registrar('pendencias')
+def _pendencias_derivadas(repositorio: RepositorioDados) -> List[dict]:
+    return _listar_pendencias(repositorio.concluidas or [])
 
 
-def _agrupar_status_criticos(registros: List[dict]) -> List[dict]:
-    agregados: dict[str, dict] = {}
-    for registro in registros:
-        condicao = str(registro.get('condicao') or '-').strip().upper()
-        if condicao not in CRITICAL_STATUSES:
-            continue
-        pep = str(registro.get('pep') or '').strip()
-        nota = str(registro.get('nota') or '').strip()
-        chave = pep if pep and pep != '-' else nota
-        if not chave:
-            chave = f"REGISTRO-{registro.get('id', len(agregados) + 1)}"
-        data_str = str(registro.get('data') or '').strip()
-        data_obj = _parse_data_segura(data_str) or datetime.max
-        existente = agregados.get(chave)
-        if not existente or data_obj < existente['data_ord']:
-            agregados[chave] = {
-                'pep': pep or '-',
-                'nota': nota or '-',
-                'data': data_str or '-',
-                'data_ord': data_obj,
-                'condicao': condicao,
-                'local': registro.get('local') or '-',
-                'equipe': registro.get('equipe') or '-'
-            }
-    ordenados = sorted(agregados.values(), key=lambda item: item['data_ord'])
-    for item in ordenados:
-        item.pop('data_ord', None)
-    return ordenados
+INDICE_BUSCA = IndiceBusca()
+
+
+@derivados.registrar('indice_busca')
+def _indice_busca(repositorio: RepositorioDados) -> tuple:
+    # O índice é o mesmo objeto entre versões: só recebe a diferença. Os meses
+    # arquivados entram junto, lidos uma vez por versão do indice.json; deles
+    # vale o segmento, não uma cópia ainda em memória de antes da compactação.
+    versao_arquivo = ARQUIVO_HISTORICO.versao()
+    INDICE_BUSCA.atualizar(
+        ARQUIVO_HISTORICO.registros_arquivados() + ARQUIVO_HISTORICO.fora_do_arquivo(repositorio.projetos)
+    )
+    return versao_arquivo, INDICE_BUSCA
+
+
+def _indice_busca_atual() -> IndiceBusca:
+    versao_arquivo, indice = derivados.obter('indice_busca')
+    if versao_arquivo != ARQUIVO_HISTORICO.versao():
+        # Outro processo compactou o histórico sem os dados deste mudarem.
+        derivados.invalidar('indice_busca')
+        versao_arquivo, indice = derivados.obter('indice_busca')
+    return indice
+
+
+@derivados.registrar('mapa_semana')
+def _mapa_semana(repositorio: RepositorioDados) -> MapaSemana:
+    mes_sel, semana_sel = obter_mes_semana_atual()
+    return MapaSemana.montar(filtrar_por_mes_e_semana(repositorio.projetos, mes_sel, semana_sel), mes_sel, semana_sel, COORDENADAS)
+
+
+def _mapa_da_semana_atual() -> MapaSemana:
+    mapa_semana = derivados.obter('mapa_semana')
+    # A semana vira sem que os dados mudem: aí o agregado é refeito.
+    if (mapa_semana.mes, mapa_semana.semana) != obter_mes_semana_atual():
+        derivados.invalidar('mapa_semana')
+        mapa_semana = derivados.obter('mapa_semana')
+    return mapa_semana
+
+
+def _chave_cubo(obra: dict) -> tuple:
+    data_ref = _parse_data_generica(obra.get('conc')) or _parse_data_generica(obra.get('inic'))
+    return (
+        str(obra.get('base') or '').strip(),
+        str(obra.get('status') or '').strip(),
+        _semana_str_to_int(obra.get('inic_sem')),
+        _semana_str_to_int(obra.get('conc_sem')),
+        data_ref.strftime('%Y-%m') if data_ref else None,
+    )
+
+
+@derivados.registrar('cubo_concluidas')
+def _cubo_concluidas(repositorio: RepositorioDados) -> CuboConcluidas:
+    cubo = CuboConcluidas()
+    for obra in repositorio.concluidas or []:
+        valor_atual = _parse_decimal(obra.get('valor'))
+        andamento_atual = _parse_decimal(obra.get('andamento'))
+        inicio = _parse_data_generica(obra.get('inic'))
+        fim = _parse_data_generica(obra.get('conc'))
+        cubo.adicionar(
+            _chave_cubo(obra),
+            valor_atual + andamento_atual,
+            andamento_atual,
+            (fim - inicio).days + 1 if inicio and fim else None,
+            _pendencia_do_registro(obra, valor_atual, andamento_atual),
+        )
+    return cubo
+
+
+def _criticos_por_base(fragmentos, mes_sel: str, semana_sel: str) -> List[dict]:
+    """Resumo crítico já ordenado e agrupado por base, a partir dos fragmentos."""
+    digesto = mesclar_digestos(fragmento.digesto_criticos(mes_sel, semana_sel) for fragmento in fragmentos)
+    return agrupar_criticos_por_base(ordenar_digesto(digesto))
+
+
+def _aquecer_digestos_criticos() -> None:
+    mes_sel, semana_sel = obter_mes_semana_atual()
+    for fragmento in dados.fragmentos().values():
+        fragmento.digesto_criticos(mes_sel, semana_sel)
 
 
 def _semana_str_to_int(valor: str | None) -> int | None:
@@ -279,8 +425,8 @@ def _semana_str_to_int(valor: str | None) -> int | None:
     return int(digitos) if digitos else None
 
 
-def _obras_concluidas_por_mes(mes_sel: str) -> List[dict]:
-    registros = db_concluidas or []
+def _obras_concluidas_por_mes(mes_sel: str, base: str = '') -> List[dict]:
+    registros = (dados.concluidas_da_base(base) if base else dados.concluidas) or []
     concluidas: List[dict] = []
     for linha in registros:
         data_ref = linha.get('conc') or linha.get('inic')
@@ -347,6 +493,11 @@ def _filtrar_obras_por_filtros(obras: List[dict], filtros: dict) -> List[dict]:
 
 
 def _gerar_pdf_concluidas(obras: List[dict], metricas: dict) -> bytes:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=48, bottomMargin=36)
     styles = getSampleStyleSheet()
@@ -371,18 +522,18 @@ def _gerar_pdf_concluidas(obras: List[dict], metricas: dict) -> bytes:
     dados_tabela = [cabecalho]
     for obra in obras:
         dados_tabela.append([
-            obra.get('base', ''),
-            obra.get('obra', ''),
-            obra.get('status', ''),
-            obra.get('qtd_prog', ''),
-            obra.get('inic', ''),
-            obra.get('conc', ''),
-            obra.get('inic_sem', ''),
-            obra.get('conc_sem', ''),
-            obra.get('prog', ''),
+            formatar_celula(obra.get('base')),
+            formatar_celula(obra.get('obra')),
+            formatar_celula(obra.get('status')),
+            formatar_celula(obra.get('qtd_prog')),
+            formatar_data_curta(obra.get('inic')),
+            formatar_data_curta(obra.get('conc')),
+            formatar_celula(obra.get('inic_sem')),
+            formatar_celula(obra.get('conc_sem')),
+            formatar_celula(obra.get('prog')),
             format_currency_brl(obra.get('andamento')),
             format_currency_brl(obra.get('valor')),
-            obra.get('vizita', '')
+            formatar_data_curta(obra.get('vizita'))
         ])
 
     tabela = Table(dados_tabela, repeatRows=1)
@@ -401,7 +552,85 @@ def _gerar_pdf_concluidas(obras: List[dict], metricas: dict) -> bytes:
     return buffer.read()
 
 
-def _metricas_concluidas(obras: List[dict]) -> dict:
+def _fatia_do_cubo(filtros: dict) -> list | None:
+    """Células do cubo que respondem aos filtros, ou ``None`` se eles não cabem nas dimensões.
+
+    As datas só cabem quando cobrem meses inteiros (início no dia 1, fim no
+    último dia do mês).
+    """
+    inicio = _parse_data_generica(filtros.get('inicio'))
+    fim = _parse_data_generica(filtros.get('fim'))
+    if (inicio and inicio.day != 1) or (fim and (fim + timedelta(days=1)).day != 1):
+        return None
+    meses = None
+    if inicio or fim:
+        meses = (inicio.strftime('%Y-%m') if inicio else None, fim.strftime('%Y-%m') if fim else None)
+    return list(derivados.obter('cubo_concluidas').fatiar(
+        base=filtros.get('base', ''),
+        status=filtros.get('status', ''),
+        inic_sem=_semana_str_to_int(filtros.get('semana_inicio')),
+        conc_sem=_semana_str_to_int(filtros.get('semana_fim')),
+        meses=meses,
+    ))
+
+
+def _metricas_do_cubo(celulas: list) -> dict:
+    geral = Celula()
+    for _, celula in celulas:
+        geral.somar(celula)
+    total = geral.total
+    por_base = CuboConcluidas.agrupar(celulas, lambda chave: chave[0] or 'Sem base')
+    por_status = CuboConcluidas.agrupar(celulas, lambda chave: chave[1] or '-')
+    # Mesmos desempates do Counter linha a linha: ordem da primeira ocorrência.
+    ordem_bases = CuboConcluidas.ordem_das_linhas(por_base)
+    bases_mais_comuns = sorted(ordem_bases, key=lambda base: por_base[base].total, reverse=True)
+    status_mais_comuns = sorted(
+        CuboConcluidas.ordem_das_linhas(por_status), key=lambda nome: por_status[nome].total, reverse=True
+    )
+    total_valor = geral.valor
+
+    return {
+        'total': total,
+        'media_dias': geral.media_dias,
+        'maior_duracao': geral.duracao_max if geral.duracao_n else 0,
+        'base_top': (bases_mais_comuns[0], por_base[bases_mais_comuns[0]].total) if bases_mais_comuns else ('-', 0),
+        'bases': [
+            {
+                'nome': base,
+                'quantidade': por_base[base].total,
+                'percentual': round((por_base[base].total / total) * 100, 1) if total else 0
+            }
+            for base in bases_mais_comuns
+        ],
+        'status': [
+            {
+                'nome': nome,
+                'quantidade': por_status[nome].total,
+                'percentual': round((por_status[nome].total / total) * 100, 1) if total else 0
+            }
+            for nome in status_mais_comuns
+        ],
+        'bases_valor': [
+            {
+                'nome': base,
+                'valor': por_base[base].valor,
+                'percentual': round((por_base[base].valor / total_valor) * 100, 1) if total_valor else 0
+            }
+            for base in sorted(ordem_bases, key=lambda base: por_base[base].valor, reverse=True)
+        ],
+        'total_valor': round(total_valor, 2),
+        'total_andamento': round(geral.andamento, 2),
+        'faltantes': [pendencia for _, pendencia in sorted(geral.pendencias, key=lambda par: par[0])]
+    }
+
+
+def _metricas_concluidas(obras: List[dict], filtros: dict | None = None) -> dict:
+    """Métricas do painel; com ``filtros`` alinhados às dimensões, vêm do cubo em vez das linhas."""
+    if filtros is not None:
+        celulas = _fatia_do_cubo(filtros)
+        metricas.incrementar('mapa_cubo_consultas_total', resultado='cubo' if celulas is not None else 'linhas')
+        if celulas is not None:
+            return _metricas_do_cubo(celulas)
     total = len(obras)
     base_counter: Counter[str] = Counter()
     status_counter: Counter[str] = Counter()
@@ -475,98 +704,201 @@ def _metricas_concluidas(obras: List[dict]) -> dict:
     }
 
 
-def identificar_base_por_equipe(equipe: str | None) -> str:
-    codigo = normalizar_codigo_equipe(equipe)
-    for base, prefixo in BASE_PREFIXES.items():
-        if prefixo in codigo:
-            return base
-    return ''
-
-
-def status_programado(status: str | None) -> bool:
-    return normalizar_texto(status).startswith('PROGRAMAD')
-
-
 def _carregar_controle_obras() -> tuple[List[dict], List[dict]]:
     caminho = DROPBOX_SETTINGS.controle_path
     if not caminho:
         raise RuntimeError('Defina DROPBOX_CONTROLE_PATH com o caminho do Controle - Obras no Dropbox.')
     token = get_access_token(DROPBOX_SETTINGS, DROPBOX_TOKEN_CACHE)
-    conteudo = download_file(caminho, token)
-    conteudo.seek(0)
-    registros = carregar_registros_do_arquivo(conteudo)
+    with medir('download'):
+        conteudo = download_file(caminho, token, DROPBOX_SETTINGS.content_url)
     conteudo.seek(0)
-    concluidas = carregar_concluidas_do_arquivo(conteudo)
-    return registros, concluidas
+    return processar_workbook(conteudo)
+
+
+def _aplicar_sincronizacao(registros_filtrados: List[dict], concluidas: List[dict] | None, origem: str) -> dict:
+    """Mescla o lote com o snapshot persistido e aplica só o delta em memória."""
+    resumo = {
+        'origem': origem,
+        'quando': datetime.now().isoformat(timespec='seconds'),
+        'recebidos': len(registros_filtrados),
+        'adicionados': 0,
+        'modificados': 0,
+        'removidos': 0,
+        'concluidas_alteradas': False
+    }
+    bases, equipes = set(), set()
+    # Meses já arquivados são imutáveis: o que vier deles na planilha é ignorado.
+    registros_filtrados = ARQUIVO_HISTORICO.fora_do_arquivo(registros_filtrados)
+    pendencias_anteriores = None
+    if registros_filtrados:
+        resultado = mesclar_e_persistir(registros_filtrados, CACHE_FILE_PATH, HISTORY_FILE_PATH)
+        delta = resultado.delta
+        dados.aplicar_delta(delta.adicionados, delta.modificados, delta.removidos, chave_registro)
+        resumo.update(delta.resumo())
+        bases, equipes = bases_e_equipes((delta.adicionados, delta.modificados, delta.removidos))
+    if concluidas is not None and concluidas != dados.concluidas:
+        if PENDENTES_NOTIFICAR_AUTOMATICO and PENDENTES_WEBHOOK_URL:
+            pendencias_anteriores = _assinatura_pendencias(derivados.obter('pendencias'))
+        dados.substituir(concluidas=concluidas)
+        save_cache(CONCLUIDAS_FILE_PATH, concluidas)
+        resumo['concluidas_alteradas'] = True
+    derivados.aquecer()
+    _aquecer_digestos_criticos()
+    resumo['versao'] = dados.versao
+    resumo['registros'] = len(dados.projetos)
+    save_summary(SYNC_SUMMARY_FILE_PATH, resumo)
+    # Memória e arquivos agora coincidem: os outros workers que carregarem
+    # estes arquivos compartilham as mesmas páginas em cache.
+    dados.definir_marca(_marca_arquivos())
+    if bases or resumo['concluidas_alteradas']:
+        _publicar_alteracao(resumo, bases, equipes)
+    if pendencias_anteriores is not None:
+        _notificar_mudanca_pendencias(pendencias_anteriores)
+    return resumo
+
+
+def _publicar_alteracao(resumo: dict, bases: set, equipes: set) -> None:
+    if not EVENTOS_ATIVOS:
+        return
+    try:
+        EVENTOS.publicar('dados', evento_dados(resumo, bases, equipes, dados.marca, dados.versao))
+    except OSError as exc:
+        print(f'[AVISO] Falha ao publicar evento de sincronização: {exc}')
+
 
+def _recarregar_apos_evento(_evento_id: str, evento: dict) -> None:
+    """Outro worker sincronizou: relê os arquivos para não servir dados antigos."""
+    if evento.get('tipo') not in ('dados', 'compactacao') or evento.get('pid') == os.getpid() or not dados.carregado:
+        return
+    if evento.get('marca') == dados.marca:
+        return
+    dados.recarregar()
+    derivados.aquecer()
+    _aquecer_digestos_criticos()
 
+
+@PERFILADOR.perfilado('sincronizacao')
+@cronometrado('sincronizacao')
 def sincronizar_programacao_dropbox():
-    global db_projetos, db_concluidas
     erros = []
     try:
-        registros_total, concluidas_total = _carregar_controle_obras()
+        registros_filtrados, concluidas_total = _carregar_controle_obras()
     except Exception as exc:  # noqa: BLE001
         erros.append(f'Controle - Obras: {exc}')
-        registros_total = []
+        registros_filtrados = []
         concluidas_total = []
 
-    registros_filtrados = filtrar_registros_por_equipes(registros_total, ALLOWED_EQUIPES)
-    _definir_condicoes_basicas(registros_filtrados)
+    # Se o download falhou, as concluídas atuais são mantidas em vez de zeradas.
+    concluidas = None if erros else (concluidas_total or [])
+    resumo = _aplicar_sincronizacao(registros_filtrados, concluidas, 'dropbox')
     if registros_filtrados:
-        db_projetos = update_memory_and_persist(registros_filtrados, CACHE_FILE_PATH, HISTORY_FILE_PATH)
-        mensagem = f"Atualização concluída! {len(db_projetos)} registros sincronizados."
+        mensagem = (
+            f"Atualização concluída! {resumo['registros']} registros sincronizados "
+            f"({resumo['adicionados']} novos, {resumo['modificados']} alterados, {resumo['removidos']} removidos)."
+        )
         sucesso = True
     else:
         mensagem = 'Nenhum registro das equipes selecionadas foi sincronizado.'
         sucesso = False
 
-    db_concluidas = concluidas_total or []
-    save_cache(db_concluidas, CONCLUIDAS_FILE_PATH)
-
     if erros:
         print('[AVISO] Ocorreram erros ao sincronizar com o Dropbox:', erros)
         mensagem += ' ' + '; '.join(erros)
 
+    metricas.incrementar('mapa_sincronizacoes_total', resultado='sucesso' if sucesso else 'falha')
+    metricas.log(
+        'sincronizacao',
+        sucesso=sucesso,
+        registros=len(registros_filtrados),
+        concluidas=len(concluidas or []),
+        erros=len(erros),
+        versao=dados.versao,
+        **{chave: resumo[chave] for chave in ('adicionados', 'modificados', 'removidos')}
+    )
+
     return {
         'sucesso': sucesso,
         'mensagem': mensagem,
         'erros': erros,
-        'registros': db_projetos
+        'registros': dados.projetos,
+        'delta': resumo
     }
 
 
-def _aplicar_condicoes_cache_iniciais():
-    if db_projetos:
-        _definir_condicoes_basicas(db_projetos)
+def _sincronizacao_de_outro_processo() -> dict:
+    """Outro worker acabou de sincronizar: basta recarregar os arquivos que ele gravou."""
+    dados.recarregar()
+    derivados.aquecer()
+    _aquecer_digestos_criticos()
+    resumo = load_summary(SYNC_SUMMARY_FILE_PATH) or {}
+    return {
+        'sucesso': True,
+        'mensagem': (
+            'Uma sincronização já estava em andamento; '
+            f"{len(dados.projetos)} registros recarregados do resultado dela."
+        ),
+        'erros': [],
+        'registros': dados.projetos,
+        'delta': resumo,
+    }
 
 
-_aplicar_condicoes_cache_iniciais()
+def sincronizar_uma_vez() -> dict:
+    """Sincronização com coalescência: cliques simultâneos compartilham a mesma execução."""
+    return SINCRONIZACAO.executar(
+        'sincronizacao',
+        sincronizar_programacao_dropbox,
+        entre_processos=True,
+        apos_espera=_sincronizacao_de_outro_processo,
+        sucesso=lambda resultado: resultado.get('sucesso', False),
+    )
 
 
-@app.context_processor
 def inject_global_counts():
     return {
         'pendencias_alerta': _contar_pendencias_globais()
     }
 
 
-@app.route('/')
+def inject_ultimo_evento():
+    return {'ultimo_evento': EVENTOS.ultimo_id() if EVENTOS_ATIVOS and EVENTOS_MAX_ASSINANTES > 0 else None}
+
+
+def eventos():
+    """Stream SSE das alterações de dados (``event: dados``), retomável pelo Last-Event-ID."""
+    if not EVENTOS_ATIVOS or EVENTOS_MAX_ASSINANTES <= 0:
+        return Response(status=204)
+    if EVENTOS.assinantes >= EVENTOS_MAX_ASSINANTES:
+        return Response('Muitas conexões de eventos abertas.', status=503, headers={'Retry-After': '30'})
+    desde = request.headers.get('Last-Event-ID') or request.args.get('desde')
+
+    def _gerar():
+        yield 'retry: 3000\n\n'
+        for item in EVENTOS.assinar(desde, duracao=EVENTOS_DURACAO_S):
+            yield ': ping\n\n' if item is None else formatar_sse(*item)
+
+    return Response(
+        stream_with_context(_gerar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 def inicio():
     return render_template('inicio.html')
 
 
-@app.route('/programacao_geral')
 def programacao_geral():
-    exibicao = db_projetos if db_projetos else []
+    exibicao = dados.projetos if dados.projetos else []
     return render_template('programacao_geral.html', projetos=exibicao)
 
 
-@app.route('/concluidas')
 def concluidas():
     filtros = _coletar_filtros(request.args)
     todas_obras = _obras_concluidas_por_mes('')
-    obras = _filtrar_obras_por_filtros(todas_obras, filtros)
-    metricas = _metricas_concluidas(obras)
+    obras_base = _obras_concluidas_por_mes('', filtros['base']) if filtros['base'] else todas_obras
+    obras = _filtrar_obras_por_filtros(obras_base, filtros)
+    metricas = _metricas_concluidas(obras, filtros)
     bases_opcoes = sorted({(obra.get('base') or '').strip() for obra in todas_obras if (obra.get('base') or '').strip()})
     status_opcoes = sorted({(obra.get('status') or '').strip() for obra in todas_obras if (obra.get('status') or '').strip()})
     semanas_conjunto = set()
@@ -604,16 +936,64 @@ def concluidas():
     )
 
 
-@app.route('/concluidas/export')
+def api_tendencias_concluidas():
+    """Série por mês (``por=mes``) ou por semana de conclusão dentro do mês (padrão), do cubo."""
+    por_mes = request.args.get('por', 'semana') == 'mes'
+    celulas = derivados.obter('cubo_concluidas').fatiar(
+        base=(request.args.get('base') or '').strip(),
+        status=(request.args.get('status') or '').strip(),
+    )
+    celulas = [(chave, celula) for chave, celula in celulas if chave[4] and (por_mes or chave[3])]
+    grupos = CuboConcluidas.agrupar(celulas, (lambda chave: (chave[4],)) if por_mes else (lambda chave: (chave[4], chave[3])))
+    serie = []
+    anterior: Celula | None = None
+    for periodo in sorted(grupos):
+        celula = grupos[periodo]
+        ponto = {
+            'mes': periodo[0],
+            'total': celula.total,
+            'valor': round(celula.valor, 2),
+            'andamento': round(celula.andamento, 2),
+            'media_dias': celula.media_dias,
+            'maior_duracao': celula.duracao_max,
+            'variacao_total': round((celula.total / anterior.total - 1) * 100, 1) if anterior and anterior.total else None,
+            'variacao_valor': round((celula.valor / anterior.valor - 1) * 100, 1) if anterior and anterior.valor else None,
+        }
+        if not por_mes:
+            ponto['semana'] = periodo[1]
+        serie.append(ponto)
+        anterior = celula
+    return jsonify({'por': 'mes' if por_mes else 'semana', 'versao_dados': dados.versao, 'serie': serie})
+
+
+def api_busca():
+    """Busca PEP/NOTA (prefixo) e LOCAL/OBS (palavra) na programação e em todo o histórico, arquivado inclusive."""
+    consulta = (request.args.get('q') or '').strip()
+    if not consulta:
+        return jsonify({'success': False, 'message': 'Informe o termo de busca em q.'}), 400
+    try:
+        pagina = int(request.args.get('pagina', 1))
+        por_pagina = int(request.args.get('por_pagina', 50))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'pagina e por_pagina devem ser números inteiros.'}), 400
+    try:
+        resultado = _indice_busca_atual().buscar(
+            consulta, (request.args.get('campo') or '').strip().lower(), pagina, por_pagina
+        )
+    except ValueError as exc:
+        return jsonify({'success': False, 'message': str(exc)}), 400
+    return jsonify({**resultado.como_dict(), 'versao_dados': dados.versao})
+
+
 def exportar_concluidas():
     filtros = _coletar_filtros(request.args)
-    obras = _filtrar_obras_por_filtros(_obras_concluidas_por_mes(''), filtros)
+    obras = _filtrar_obras_por_filtros(_obras_concluidas_por_mes('', filtros['base']), filtros)
     campos = ['base', 'obra', 'status', 'qtd_prog', 'inic', 'conc', 'inic_sem', 'conc_sem', 'prog', 'andamento', 'valor', 'vizita']
     buffer = StringIO()
     writer = csv.DictWriter(buffer, fieldnames=campos)
     writer.writeheader()
     for obra in obras:
-        linha = {campo: obra.get(campo, '') for campo in campos}
+        linha = {campo: formatar_celula(obra.get(campo)) for campo in campos}
         writer.writerow(linha)
     buffer.seek(0)
     nome_arquivo = f"concluidas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
@@ -624,12 +1004,29 @@ def exportar_concluidas():
     )
 
 
-@app.route('/concluidas/export/pdf')
+def limitar_rota(rota: str):
+    """Segura uma vaga de ``ADMISSAO`` durante a view; sem vaga, ``Rejeitada`` vira 429/503."""
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with ADMISSAO.admitir(rota):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def _pdf_concluidas(filtros: dict) -> bytes:
+    obras = _filtrar_obras_por_filtros(_obras_concluidas_por_mes('', filtros['base']), filtros)
+    return _gerar_pdf_concluidas(obras, _metricas_concluidas(obras, filtros))
+
+
+@limitar_rota('exportar_concluidas_pdf')
 def exportar_concluidas_pdf():
     filtros = _coletar_filtros(request.args)
-    obras = _filtrar_obras_por_filtros(_obras_concluidas_por_mes(''), filtros)
-    metricas = _metricas_concluidas(obras)
-    pdf_bytes = _gerar_pdf_concluidas(obras, metricas)
+    dados.garantir_carregado()
+    # Exportações iguais e simultâneas (ex.: início de turno) geram um PDF só.
+    chave = chave_pagina(request.path, filtros.items(), dados.marca)
+    pdf_bytes = COALESCEDOR.executar(f'pdf:{chave}', lambda: _pdf_concluidas(filtros))
     nome_arquivo = f"concluidas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     return Response(
         pdf_bytes,
@@ -638,67 +1035,160 @@ def exportar_concluidas_pdf():
     )
 
 
-@app.route('/concluidas/notificar', methods=['POST'])
 def notificar_pendencias():
-    pendentes = _listar_pendencias(db_concluidas or [])
+    pendentes = derivados.obter('pendencias')
     if not pendentes:
         return jsonify({'success': False, 'message': 'Nenhum registro pendente encontrado.'}), 200
     if not PENDENTES_WEBHOOK_URL:
         return jsonify({'success': False, 'message': 'Configuração PENDENTES_WEBHOOK_URL ausente.'}), 400
-    texto_linhas = [f"{item['base']} - {item['obra']} ({item['motivo']})" for item in pendentes[:15]]
-    if len(pendentes) > 15:
-        texto_linhas.append(f"... e {len(pendentes) - 15} registros extras")
-    payload = {
-        'content': '**Pendências detectadas no painel Concluídas**\n' + '\n'.join(texto_linhas)
-    }
+    # O envio (com novas tentativas) fica com a fila: o webhook lento não segura o worker.
+    conteudo = _mensagem_pendencias(pendentes, 'Pendências detectadas no painel Concluídas')
+    try:
+        situacao = _enfileirar_notificacao(conteudo, 'manual')
+    except OSError as exc:
+        return jsonify({'success': False, 'message': f'Falha ao enfileirar notificação: {exc}'}), 500
+    if situacao == ENVIADA_RECENTEMENTE:
+        mensagem = 'Notificação idêntica enviada há pouco; nada a reenviar.'
+    else:
+        mensagem = 'Notificação enfileirada para envio.'
+    return jsonify({'success': True, 'situacao': situacao, 'message': mensagem}), 202
+
+
+def _salvar_upload(arquivo) -> tuple[str, str]:
+    """Copia o upload em blocos para um arquivo temporário, calculando o hash do conteúdo."""
+    os.makedirs(IMPORTACOES_DIR, exist_ok=True)
+    descritor, caminho = tempfile.mkstemp(dir=IMPORTACOES_DIR, suffix='.xlsx')
+    resumo = hashlib.sha256()
+    total = 0
+    try:
+        with os.fdopen(descritor, 'wb') as destino:
+            while True:
+                bloco = arquivo.stream.read(1024 * 1024)
+                if not bloco:
+                    break
+                total += len(bloco)
+                if total > UPLOAD_MAX_BYTES:
+                    raise ValueError(f'O arquivo passa do limite de {UPLOAD_MAX_BYTES // (1024 * 1024)} MB.')
+                resumo.update(bloco)
+                destino.write(bloco)
+    except BaseException:
+        os.remove(caminho)
+        raise
+    return caminho, resumo.hexdigest()
+
+
+def _processar_upload(tarefa, caminho: str, conteudo_hash: str) -> dict:
     try:
-        resposta = requests.post(PENDENTES_WEBHOOK_URL, json=payload, timeout=10)
-        resposta.raise_for_status()
-    except requests.RequestException as exc:
-        return jsonify({'success': False, 'message': f'Falha ao enviar notificação: {exc}'}), 500
-    return jsonify({'success': True, 'message': 'Notificação enviada com sucesso.'}), 200
+        registros_filtrados, concluidas_total = processar_workbook(caminho, tarefa.progresso)
+        if not registros_filtrados:
+            raise ValueError('Nenhuma das equipes permitidas foi encontrada no arquivo Excel enviado.')
 
+        def _aplicar() -> tuple[dict, str]:
+            resumo = _aplicar_sincronizacao(registros_filtrados, concluidas_total or [], 'upload')
+            return resumo, _marca_arquivos()
 
-@app.route('/importar_excel', methods=['POST'])
+        # A mescla lê e regrava os caches: na mesma trava das sincronizações
+        # (e das outras importações, em qualquer worker), com chave própria
+        # para nunca aproveitar o resultado de outra execução.
+        resumo, marca = SINCRONIZACAO.executar(f'upload:{conteudo_hash}', _aplicar, entre_processos=True)
+    except ValueError:
+        dados.substituir(projetos=[], concluidas=[])
+        raise
+    finally:
+        os.remove(caminho)
+    return {
+        'mensagem': (
+            f"Sucesso! {resumo['registros']} registros importados das equipes selecionadas "
+            f"({resumo['adicionados']} novos, {resumo['modificados']} alterados, {resumo['removidos']} removidos)."
+        ),
+        'resumo': resumo,
+        # Reenviar o arquivo só é ignorado enquanto os dados forem os desta importação.
+        'marca': marca,
+    }
+
+
+def _importacao_vigente(status: dict) -> bool:
+    return (status.get('resultado') or {}).get('marca') == _marca_arquivos()
+
+
+def _resposta_importacao(mensagem: str, status: dict | None = None, codigo: int = 202):
+    if request.accept_mimetypes.best == 'application/json':
+        corpo = {'success': status is not None, 'message': mensagem}
+        if status is not None:
+            corpo['tarefa'] = status
+            corpo['status_url'] = url_for('status_importacao', tarefa_id=status['id'])
+        return jsonify(corpo), codigo
+    flash(mensagem)
+    return redirect(url_for('programacao_geral'))
+
+
+@limitar_rota('importar_excel')
 def importar_excel():
-    global db_projetos, db_concluidas
+    """Recebe a planilha e agenda o processamento; o andamento sai em ``/api/importacoes/<id>``.
+
+    A admissão limita só o recebimento do arquivo; o processamento corre em
+    ``TAREFAS`` e grava os dados dentro da trava de ``SINCRONIZACAO``.
+    """
     if 'file' not in request.files:
-        flash('Nenhum arquivo enviado')
-        return redirect(url_for('programacao_geral'))
+        return _resposta_importacao('Nenhum arquivo enviado', codigo=400)
 
     file = request.files['file']
     if file.filename == '' or not file.filename.endswith(('.xlsx', '.xls')):
-        flash('Selecione um arquivo Excel válido (.xlsx)')
-        return redirect(url_for('programacao_geral'))
+        return _resposta_importacao('Selecione um arquivo Excel válido (.xlsx)', codigo=400)
 
     try:
-        file.stream.seek(0)
-        registros = carregar_registros_do_arquivo(file)
-        file.stream.seek(0)
-        concluidas_total = carregar_concluidas_do_arquivo(file)
-        registros_filtrados = filtrar_registros_por_equipes(registros, ALLOWED_EQUIPES)
-        if not registros_filtrados:
-            raise ValueError('Nenhuma das equipes permitidas foi encontrada no arquivo Excel enviado.')
-        _definir_condicoes_basicas(registros_filtrados)
-        db_projetos = update_memory_and_persist(registros_filtrados, CACHE_FILE_PATH, HISTORY_FILE_PATH)
-        db_concluidas = concluidas_total or []
-        save_cache(db_concluidas, CONCLUIDAS_FILE_PATH)
-        flash(f'Sucesso! {len(db_projetos)} registros importados das equipes selecionadas.')
+        caminho, conteudo_hash = _salvar_upload(file)
     except ValueError as ve:
-        flash(str(ve))
-        db_projetos = []
-        db_concluidas = []
-    except Exception as exc:
-        import traceback
-        print('[ERRO] Falha ao importar Excel:', exc)
-        traceback.print_exc()
-        flash(f'Erro ao processar: {exc}')
-    return redirect(url_for('programacao_geral'))
+        return _resposta_importacao(str(ve), codigo=413)
+
+    # O id vem do conteúdo: o mesmo arquivo enviado de novo reaproveita a tarefa.
+    tarefa_id = f'importacao-{conteudo_hash[:32]}'
+    status, nova = TAREFAS.submeter(
+        tarefa_id,
+        'importacao_excel',
+        lambda tarefa: _processar_upload(tarefa, caminho, conteudo_hash),
+        vigente=_importacao_vigente,
+        arquivo=file.filename,
+        hash=conteudo_hash,
+    )
+    if not nova:
+        os.remove(caminho)
+        return _resposta_importacao(
+            f"Este arquivo já foi enviado (tarefa {tarefa_id}, {status.get('status')}); importação ignorada.",
+            dict(status, duplicada=True),
+            codigo=200,
+        )
+    return _resposta_importacao(f'Arquivo recebido; importação em andamento (tarefa {tarefa_id}).', status)
+
+
+def status_importacao(tarefa_id: str):
+    status = TAREFAS.status(tarefa_id)
+    if status is None:
+        return jsonify({'success': False, 'message': 'Tarefa não encontrada.'}), 404
+    return jsonify(status)
+
+
+def api_resumo_sincronizacao():
+    resumo = load_summary(SYNC_SUMMARY_FILE_PATH)
+    return jsonify({
+        'versao_dados': dados.versao,
+        'registros_em_memoria': dados.tamanhos(),
+        'ultima_sincronizacao': resumo or None
+    })
 
 
-@app.route('/atualizar_programacao', methods=['POST'])
+def api_arquivo_historico():
+    """Meses arquivados e seus resumos, sem decodificar nenhum segmento."""
+    indice = ARQUIVO_HISTORICO.indice()
+    return jsonify({
+        'inicio_janela': inicio_janela(meses_quentes_do_ambiente()),
+        'meses': {mes: {'registros': meta['resumo']['registros'], 'resumo': meta['resumo']} for mes, meta in sorted(indice.items())},
+    })
+
+
+@limitar_rota('atualizar_programacao')
 def atualizar_programacao():
-    resultado = sincronizar_programacao_dropbox()
+    resultado = sincronizar_uma_vez()
     flash(resultado['mensagem'])
     return redirect(url_for('programacao_geral'))
 
@@ -730,7 +1220,6 @@ def _datas_colunas(datas_exibicao: List[str]):
 
 
 
-@app.route('/mapa')
 def mapa():
     base_selecionada = request.args.get('base', '')
     mes_sel = request.args.get('mes', '')
@@ -743,18 +1232,17 @@ def mapa():
         if nome in base_norm:
             prefixo_alvo = pref
 
-    projetos_base = []
-    for projeto in db_projetos:
-        equipe = normalizar_codigo_equipe(projeto.get('equipe'))
-        if not base_norm or (prefixo_alvo and prefixo_alvo in equipe):
-            projeto['equipe'] = equipe
-            projeto['data'] = str(projeto.get('data', '')).strip()
-            projetos_base.append(projeto)
+    if not base_norm:
+        projetos_filtrados, fragmentos = _periodo_com_arquivo(mes_sel, semana_sel)
+    elif prefixo_alvo:
+        projetos_filtrados, fragmentos = _periodo_com_arquivo(mes_sel, semana_sel, prefixo_alvo)
+    else:
+        projetos_filtrados = []
+        fragmentos = []
 
-    projetos_filtrados = filtrar_por_mes_e_semana(projetos_base, mes_sel, semana_sel)
     datas_exibicao = gerar_intervalo_datas(projetos_filtrados, base_norm)
     equipes_finais = _equipes_ordenadas([p for p in projetos_filtrados if p.get('data') in datas_exibicao])
-    criticos_por_pep = _agrupar_status_criticos(projetos_filtrados)
+    criticos_por_base = _criticos_por_base(fragmentos, mes_sel, semana_sel)
 
     return render_template(
         'mapa.html',
@@ -764,15 +1252,14 @@ def mapa():
         base_ativa=base_selecionada,
         mes_sel=mes_sel,
         semana_sel=semana_sel,
-        criticos_por_pep=criticos_por_pep
+        criticos_por_base=criticos_por_base
     )
 
 
-@app.route('/semanal')
 def semanal():
     mes_sel = request.args.get('mes', '')
     semana_sel = request.args.get('semana', '')
-    projetos_filtrados = filtrar_por_mes_e_semana(db_projetos, mes_sel, semana_sel)
+    projetos_filtrados, _ = _periodo_com_arquivo(mes_sel, semana_sel)
     datas_exibicao = gerar_intervalo_datas(projetos_filtrados)
     equipes_finais = _equipes_ordenadas(projetos_filtrados)
 
@@ -789,18 +1276,15 @@ def semanal():
 
 def _projetos_semana_atual():
     mes_sel, semana_sel = obter_mes_semana_atual()
-    projetos_semana = filtrar_por_mes_e_semana(db_projetos, mes_sel, semana_sel)
+    projetos_semana = filtrar_por_mes_e_semana(dados.projetos, mes_sel, semana_sel)
     return projetos_semana, mes_sel, semana_sel
 
 
-@app.route('/localizacao_atual')
 def localizacao_atual():
     projetos_semana, mes_sel, semana_sel = _projetos_semana_atual()
     agrupados = defaultdict(list)
     for projeto in projetos_semana:
-        equipe = normalizar_codigo_equipe(projeto.get('equipe'))
-        projeto['equipe'] = equipe
-        agrupados[equipe].append(projeto)
+        agrupados[projeto['equipe']].append(projeto)
 
     cards = []
     for equipe in ALLOWED_EQUIPES:
@@ -827,7 +1311,6 @@ def localizacao_atual():
     )
 
 
-@app.route('/localizacao_mapa')
 def localizacao_mapa():
     _, mes_sel, semana_sel = _projetos_semana_atual()
     return render_template(
@@ -839,56 +1322,326 @@ def localizacao_mapa():
     )
 
 
-@app.route('/api/localizacoes_atual')
+def _filtros_mapa(args) -> tuple[str, str, str]:
+    base = (args.get('base') or '').strip().upper()
+    if base not in BASE_PREFIXES:
+        base = ''
+    equipe = (args.get('equipe') or '').strip()
+    return base, normalizar_codigo_equipe(equipe) if equipe else '', (args.get('data') or '').strip()
+
+
 def api_localizacoes_atual():
-    projetos_semana, _, _ = _projetos_semana_atual()
-    base_filter = request.args.get('base', '').strip().upper()
-    if base_filter and base_filter not in BASE_PREFIXES:
-        base_filter = ''
-    equipe_param = request.args.get('equipe', '').strip()
-    equipe_filter = normalizar_codigo_equipe(equipe_param) if equipe_param else ''
-    agrupados = defaultdict(list)
-    for projeto in projetos_semana:
-        if not status_programado(projeto.get('status')):
-            continue
-        equipe = normalizar_codigo_equipe(projeto.get('equipe'))
-        if not equipe:
-            continue
-        if equipe_filter and equipe != equipe_filter:
-            continue
-        base_atual = identificar_base_por_equipe(equipe)
-        if base_filter and base_atual != base_filter:
-            continue
-        local = (projeto.get('local') or '-').strip()
-        if not local or local == '-':
-            continue
-        agrupados[local].append({
-            'equipe': equipe,
-            'data': projeto.get('data'),
-            'status': projeto.get('status'),
-            'periodo': projeto.get('periodo'),
-            'base': base_atual
-        })
-    payload = [
-        {
-            'local': local,
-            'projetos': registros
-        }
-        for local, registros in agrupados.items()
-    ]
+    """Sem ``zoom``, todos os locais com seus projetos; com ``zoom`` (e ``bbox``), agrupamentos da grade."""
+    if 'zoom' in request.args:
+        return _api_agrupamentos()
+    base, equipe, data = _filtros_mapa(request.args)
+    payload = []
+    for local, item in _mapa_da_semana_atual().locais.items():
+        projetos = item.filtrados(base, equipe, data)
+        if projetos:
+            payload.append({'local': local, 'projetos': projetos})
     return jsonify(payload)
 
 
-@app.route('/limpar_dados')
+def _api_agrupamentos():
+    try:
+        zoom = int(request.args.get('zoom', ''))
+        limites = ler_limites(request.args.get('bbox'))
+    except ValueError as exc:
+        return jsonify({'success': False, 'message': f'Parâmetros do mapa inválidos: {exc}'}), 400
+    base, equipe, data = _filtros_mapa(request.args)
+    mapa_semana = _mapa_da_semana_atual()
+    with medir('agrupamento_mapa'):
+        payload = mapa_semana.consultar(zoom, limites, base, equipe, data)
+    payload['datas'] = mapa_semana.datas()
+    payload['versao_dados'] = dados.versao
+    return jsonify(payload)
+
+
+def api_localizacao_detalhe():
+    """Projetos de um único local (carregados só quando o marcador é aberto)."""
+    local = (request.args.get('local') or '').strip()
+    base, equipe, data = _filtros_mapa(request.args)
+    detalhe = _mapa_da_semana_atual().detalhe(local, base, equipe, data) if local else None
+    if detalhe is None:
+        return jsonify({'success': False, 'message': 'Local não encontrado na semana atual.'}), 404
+    return jsonify(detalhe)
+
+
+def api_definir_coordenadas():
+    """Coordenadas geocodificadas pelo navegador, compartilhadas com os outros usuários."""
+    corpo = request.get_json(silent=True) or {}
+    try:
+        entrada = COORDENADAS.definir(corpo.get('local') or '', corpo.get('lat'), corpo.get('lon'), corpo.get('rotulo') or '')
+    except (TypeError, ValueError) as exc:
+        return jsonify({'success': False, 'message': str(exc) or 'Coordenadas inválidas.'}), 400
+    return jsonify({'success': True, **entrada})
+
+
 def limpar_dados():
-    global db_projetos
-    db_projetos = []
+    dados.substituir(projetos=[])
     save_cache(CACHE_FILE_PATH, [])
     save_history(HISTORY_FILE_PATH, [])
     flash('A tabela foi limpa com sucesso!')
     return redirect(url_for('programacao_geral'))
 
 
+def metrics():
+    return Response(metricas.renderizar_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _autorizado_admin() -> bool:
+    return PERFILADOR.token_valido(request.headers.get(CABECALHO_TOKEN) or request.args.get('token'))
+
+
+def admin_perfis():
+    if not _autorizado_admin():
+        return jsonify({'success': False, 'message': 'Acesso negado.'}), 403
+    return jsonify({
+        'ativo': PERFILADOR.ativo,
+        'limiar_ms': PERFILADOR.limiar_ms,
+        'perfis': PERFILADOR.listar()
+    })
+
+
+def admin_perfil_download(nome_arquivo: str):
+    if not _autorizado_admin():
+        return jsonify({'success': False, 'message': 'Acesso negado.'}), 403
+    caminho = PERFILADOR.caminho_arquivo(nome_arquivo)
+    if not caminho:
+        return jsonify({'success': False, 'message': 'Perfil não encontrado.'}), 404
+    return send_file(caminho, as_attachment=True, download_name=nome_arquivo)
+
+
+def _iniciar_perfil():
+    if PERFILADOR.deve_perfilar(request.headers.get(CABECALHO_TOKEN)):
+        g.sessao_perfil = PERFILADOR.iniciar(f'{request.method} {request.path}')
+
+
+def _finalizar_perfil(_erro=None):
+    PERFILADOR.finalizar(g.pop('sessao_perfil', None))
+
+
+def _iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
+
+
+def _registrar_latencia(resposta):
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is None:
+        return resposta
+    duracao = time.perf_counter() - inicio
+    rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+    metricas.observar('mapa_http_requisicao_duracao_segundos', duracao, rota=rota, metodo=request.method)
+    metricas.incrementar('mapa_http_requisicoes_total', rota=rota, metodo=request.method, status=resposta.status_code)
+    metricas.log(
+        'requisicao',
+        rota=rota,
+        metodo=request.method,
+        status=resposta.status_code,
+        duracao_ms=round(duracao * 1000, 3)
+    )
+    return resposta
+
+
+def _coletar_metricas_dados():
+    for conjunto, total in dados.tamanhos().items():
+        yield 'mapa_registros', {'conjunto': conjunto}, total
+    yield 'mapa_versao_dados', {}, dados.versao
+    yield 'mapa_dados_atualizados_em_segundos', {}, dados.atualizado_em
+    arquivos = {
+        'programacao_cache': CACHE_FILE_PATH,
+        'programacao_historico': HISTORY_FILE_PATH,
+        'concluidas_cache': CONCLUIDAS_FILE_PATH,
+    }
+    for nome, caminho in arquivos.items():
+        if os.path.exists(caminho):
+            yield 'mapa_cache_arquivo_bytes', {'arquivo': nome}, os.path.getsize(caminho)
+    for nome, info in estatisticas_caches().items():
+        yield 'mapa_normalizacao_cache_itens', {'cache': nome}, info['currsize']
+    for situacao, total in NOTIFICACOES.resumo().items():
+        yield 'mapa_notificacoes_fila', {'situacao': situacao}, total
+
+
+metricas.descrever('mapa_http_requisicao_duracao_segundos', 'histogram', 'Latência das requisições HTTP por rota.')
+metricas.descrever('mapa_http_requisicoes_total', 'counter', 'Requisições HTTP atendidas por rota e status.')
+metricas.descrever('mapa_sincronizacoes_total', 'counter', 'Sincronizações executadas por resultado.')
+metricas.descrever('mapa_registros', 'gauge', 'Registros em memória por conjunto.')
+metricas.descrever('mapa_versao_dados', 'gauge', 'Versão atual dos dados em memória.')
+metricas.descrever('mapa_coalescencia_total', 'counter', 'Chamadas coalescidas por papel (lider, seguidor, espera_processo).')
+metricas.descrever('mapa_cache_paginas_total', 'counter', 'Páginas servidas do cache (acerto) ou renderizadas (falta).')
+metricas.descrever('mapa_cubo_consultas_total', 'counter', 'Métricas de concluídas respondidas pelo cubo ou pelas linhas.')
+metricas.descrever('mapa_notificacoes_total', 'counter', 'Notificações de webhook por resultado (enfileirada, enviada, falha...).')
+metricas.descrever('mapa_notificacoes_fila', 'gauge', 'Notificações aguardando envio ou desistidas.')
+metricas.descrever('mapa_admissao_executando', 'gauge', 'Requisições de rotas pesadas em execução neste processo.')
+metricas.descrever('mapa_admissao_fila', 'gauge', 'Requisições de rotas pesadas esperando vaga neste processo.')
+metricas.descrever('mapa_admissao_rejeicoes_total', 'counter', 'Requisições recusadas por rota e motivo (fila_cheia, tempo_esgotado).')
+metricas.descrever('mapa_admissao_espera_segundos', 'histogram', 'Tempo na fila até conseguir vaga de execução.')
+metricas.registrar_coletor(_coletar_metricas_dados)
+
+
+def _aceita_gzip() -> bool:
+    return 'gzip' in (request.headers.get('Accept-Encoding') or '').lower()
+
+
+def _resposta_em_cache(pagina: PaginaEmCache) -> Response:
+    if pagina.etag in request.if_none_match:
+        resposta = Response(status=304)
+    elif (
+        not request.if_none_match
+        and request.if_modified_since is not None
+        and int(pagina.ultima_modificacao) <= request.if_modified_since.timestamp()
+    ):
+        resposta = Response(status=304)
+    elif pagina.corpo_gzip is not None and _aceita_gzip():
+        resposta = Response(pagina.corpo_gzip, mimetype=pagina.mimetype)
+        resposta.headers['Content-Encoding'] = 'gzip'
+    else:
+        resposta = Response(pagina.corpo, mimetype=pagina.mimetype)
+    resposta.set_etag(pagina.etag)
+    resposta.last_modified = datetime.fromtimestamp(int(pagina.ultima_modificacao))
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.vary.add('Accept-Encoding')
+    return resposta
+
+
+def pagina_em_cache(*extras):
+    """Guarda a página renderizada por rota, parâmetros e marca dos dados.
+
+    ``extras`` são funções cujo resultado também entra na chave (ex.: a semana
+    atual em ``/localizacao_atual``). Requisições perfiladas passam direto.
+    """
+    def decorador(view):
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            if CACHE_PAGINAS is None or request.method != 'GET' or getattr(g, 'sessao_perfil', None):
+                return view(*args, **kwargs)
+            dados.garantir_carregado()
+            chave = chave_pagina(
+                request.path,
+                request.args.items(multi=True),
+                dados.marca,
+                *(extra() for extra in extras),
+            )
+            pagina = CACHE_PAGINAS.obter(chave)
+            if pagina is not None:
+                metricas.incrementar('mapa_cache_paginas_total', resultado='acerto')
+            else:
+                nao_guardada = []
+
+                def _renderizar():
+                    # Quem esperou outro worker encontra a página já gravada no disco.
+                    existente = CACHE_PAGINAS.obter(chave)
+                    if existente is not None:
+                        return existente
+                    resposta = view(*args, **kwargs)
+                    if not isinstance(resposta, Response):
+                        resposta = current_app.make_response(resposta)
+                    if resposta.status_code != 200 or resposta.direct_passthrough:
+                        nao_guardada.append(resposta)
+                        return None
+                    sincronizado = _ultima_sincronizacao()
+                    nova = PaginaEmCache(
+                        corpo=resposta.get_data(),
+                        mimetype=resposta.mimetype,
+                        etag=chave[:32],
+                        ultima_modificacao=(sincronizado.timestamp() if sincronizado else dados.atualizado_em),
+                    )
+                    if _aceita_gzip():
+                        nova = nova.com_gzip()
+                    CACHE_PAGINAS.guardar(chave, nova)
+                    metricas.incrementar('mapa_cache_paginas_total', resultado='falta')
+                    return nova
+
+                pagina = COALESCEDOR.executar(
+                    f'pagina:{chave}', _renderizar, entre_processos=isinstance(CACHE_PAGINAS, BackendDisco)
+                )
+                if pagina is None:
+                    # Resposta que não vai para o cache (erro, redirecionamento, stream):
+                    # só a requisição que renderizou pode usá-la.
+                    return nao_guardada[0] if nao_guardada else view(*args, **kwargs)
+            if pagina.corpo_gzip is None and _aceita_gzip():
+                # A compressão acontece uma vez; a variante fica junto da página.
+                pagina = pagina.com_gzip()
+                CACHE_PAGINAS.guardar(chave, pagina)
+            return _resposta_em_cache(pagina)
+        return envolvida
+    return decorador
+
+
+def _resposta_rejeitada(erro: Rejeitada):
+    mensagem = 'Muitas execuções simultâneas desta operação; tente novamente em instantes.'
+    cabecalhos = {'Retry-After': str(erro.tentar_em)}
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'success': False, 'message': mensagem, 'motivo': erro.motivo}), erro.status, cabecalhos
+    return Response(mensagem, status=erro.status, headers=cabecalhos, mimetype='text/plain')
+
+
+def _registrar_instrumentacao(aplicacao: Flask) -> None:
+    aplicacao.before_request(_iniciar_perfil)
+    aplicacao.teardown_request(_finalizar_perfil)
+    if not (metricas.ativo or metricas.log_estruturado):
+        return
+    aplicacao.before_request(_iniciar_cronometro)
+    aplicacao.after_request(_registrar_latencia)
+
+
+def _registrar_rotas(aplicacao: Flask) -> None:
+    aplicacao.add_url_rule('/', view_func=inicio)
+    aplicacao.add_url_rule('/programacao_geral', view_func=programacao_geral)
+    aplicacao.add_url_rule('/concluidas', view_func=pagina_em_cache()(concluidas))
+    aplicacao.add_url_rule('/concluidas/export', view_func=exportar_concluidas)
+    aplicacao.add_url_rule('/api/concluidas/tendencias', view_func=api_tendencias_concluidas)
+    aplicacao.add_url_rule('/concluidas/export/pdf', view_func=exportar_concluidas_pdf)
+    aplicacao.add_url_rule('/concluidas/notificar', view_func=notificar_pendencias, methods=['POST'])
+    aplicacao.add_url_rule('/importar_excel', view_func=importar_excel, methods=['POST'])
+    aplicacao.add_url_rule('/api/importacoes/<tarefa_id>', view_func=status_importacao)
+    aplicacao.add_url_rule('/atualizar_programacao', view_func=atualizar_programacao, methods=['POST'])
+    aplicacao.add_url_rule('/api/sincronizacao/resumo', view_func=api_resumo_sincronizacao)
+    aplicacao.add_url_rule('/api/historico/arquivo', view_func=api_arquivo_historico)
+    aplicacao.add_url_rule('/api/busca', view_func=api_busca)
+    aplicacao.add_url_rule('/mapa', view_func=pagina_em_cache()(mapa))
+    aplicacao.add_url_rule('/semanal', view_func=pagina_em_cache()(semanal))
+    aplicacao.add_url_rule('/localizacao_atual', view_func=pagina_em_cache(obter_mes_semana_atual)(localizacao_atual))
+    aplicacao.add_url_rule('/localizacao_mapa', view_func=localizacao_mapa)
+    aplicacao.add_url_rule('/api/localizacoes_atual', view_func=api_localizacoes_atual)
+    aplicacao.add_url_rule('/api/localizacoes_atual/detalhe', view_func=api_localizacao_detalhe)
+    aplicacao.add_url_rule('/api/localizacoes/coordenadas', view_func=api_definir_coordenadas, methods=['POST'])
+    aplicacao.add_url_rule('/limpar_dados', view_func=limpar_dados)
+    aplicacao.add_url_rule('/metrics', view_func=metrics)
+    aplicacao.add_url_rule('/events', view_func=eventos)
+    aplicacao.add_url_rule('/admin/perfis', view_func=admin_perfis)
+    aplicacao.add_url_rule('/admin/perfis/<path:nome_arquivo>', view_func=admin_perfil_download)
+
+
+def create_app() -> Flask:
+    aplicacao = Flask(__name__)
+    aplicacao.secret_key = os.environ.get('SECRET_KEY', 'supersecretkey-mapa-2024')
+    aplicacao.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    # Corta corpos muito maiores que o limite antes mesmo de ler o formulário.
+    aplicacao.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 1024 * 1024
+    os.makedirs(aplicacao.config['UPLOAD_FOLDER'], exist_ok=True)
+    aplicacao.add_template_filter(format_currency_brl, 'brl')
+    aplicacao.add_template_filter(format_date_short, 'data_curta')
+    aplicacao.add_template_filter(formatar_celula, 'exibir')
+    aplicacao.context_processor(inject_global_counts)
+    aplicacao.context_processor(inject_ultimo_evento)
+    _registrar_instrumentacao(aplicacao)
+    _registrar_rotas(aplicacao)
+    aplicacao.register_error_handler(Rejeitada, _resposta_rejeitada)
+    if EVENTOS_ATIVOS:
+        EVENTOS.ao_receber(_recarregar_apos_evento)
+    if PENDENTES_WEBHOOK_URL:
+        # Retoma o que ficou na fila (ex.: reinício com o webhook fora do ar).
+        NOTIFICACOES.iniciar()
+    if os.environ.get('CARREGAR_DADOS_EM_SEGUNDO_PLANO', '').strip() == '1':
+        dados.carregar_em_segundo_plano()
+    return aplicacao
+
+
+app = create_app()
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
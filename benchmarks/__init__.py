@@ -0,0 +1 @@
+"""Benchmarks e geradores de dados sintéticos do sistema MAPA."""
@@ -0,0 +1,65 @@
+"""Benchmark de inicialização: tempo de ``import app`` medido com ``-X importtime``.
+
+Uso: ``python -m benchmarks.bench_inicializacao [--repeticoes N]``
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ('pandas', 'numpy', 'openpyxl', 'reportlab')
+
+
+def medir_importacao(modulo: str = 'app') -> Dict[str, object]:
+    """Importa ``modulo`` num processo novo e devolve o tempo cumulativo (ms) e os módulos mais caros."""
+    codigo = (
+        f'import sys, {modulo}; '
+        f'print(",".join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))'
+    )
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    tempos: List[tuple[int, int, str]] = []
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        _, valores = linha.split(':', 1)
+        proprio, cumulativo, nome = (parte.strip() for parte in valores.split('|'))
+        tempos.append((int(proprio), int(cumulativo), nome))
+    total_us = next((cumulativo for _, cumulativo, nome in tempos if nome == modulo), 0)
+    mais_caros = sorted(tempos, key=lambda item: item[1], reverse=True)[:10]
+    return {
+        'cumulativo_ms': total_us / 1000,
+        'pesados_importados': [m for m in processo.stdout.strip().split(',') if m],
+        'mais_caros': [{'modulo': nome, 'cumulativo_ms': cumulativo / 1000} for _, cumulativo, nome in mais_caros],
+    }
+
+
+def executar(repeticoes: int = 5) -> dict:
+    medicoes = [medir_importacao() for _ in range(repeticoes)]
+    tempos = [m['cumulativo_ms'] for m in medicoes]
+    return {
+        'repeticoes': repeticoes,
+        'import_app_ms_mediana': round(statistics.median(tempos), 1),
+        'import_app_ms_min': round(min(tempos), 1),
+        'pesados_importados': medicoes[-1]['pesados_importados'],
+        'mais_caros': medicoes[-1]['mais_caros'],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(executar(args.repeticoes), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Micro-benchmark da camada de normalização memoizada.
+
+Uso: ``python -m benchmarks.bench_normalizacao [--registros N]``
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import timeit
+
+from services import normalizacao
+from services.equipes import ALLOWED_EQUIPES
+
+STATUS_AMOSTRA = ('PROGRAMADO', 'Programada', 'SEM PEP', 'ABER/LOG', 'Concluído', 'SI EXECUÇÃO', '-')
+LOCAIS_AMOSTRA = ('Bacabal', 'Itapecuru Mirim', 'Santa Inês', 'São Luís Gonzaga', 'Lago Verde', 'Vitória do Mearim')
+
+
+def _amostra(total: int, semente: int = 42) -> list[tuple[str, str, str]]:
+    aleatorio = random.Random(semente)
+    variantes = [eq for eq in ALLOWED_EQUIPES] + [eq.lower().replace('-O', '-0') for eq in ALLOWED_EQUIPES]
+    return [
+        (aleatorio.choice(variantes), aleatorio.choice(STATUS_AMOSTRA), aleatorio.choice(LOCAIS_AMOSTRA))
+        for _ in range(total)
+    ]
+
+
+def _rodada_bruta(amostra):
+    for equipe, status, local in amostra:
+        normalizacao._normalizar_codigo_equipe_bruto(equipe)
+        normalizacao._normalizar_texto_bruto(status).startswith('PROGRAMAD')
+        normalizacao._normalizar_texto_bruto(local)
+
+
+def _rodada_memoizada(amostra):
+    for equipe, status, local in amostra:
+        normalizacao.normalizar_codigo_equipe(equipe)
+        normalizacao.status_programado(status)
+        normalizacao.normalizar_texto(local)
+
+
+def executar(registros: int = 100_000, repeticoes: int = 5) -> dict:
+    amostra = _amostra(registros)
+    normalizacao.limpar_caches()
+    normalizacao.precomputar_tabela_equipes(ALLOWED_EQUIPES)
+    bruto = min(timeit.repeat(lambda: _rodada_bruta(amostra), number=1, repeat=repeticoes))
+    memo = min(timeit.repeat(lambda: _rodada_memoizada(amostra), number=1, repeat=repeticoes))
+    return {
+        'registros': registros,
+        'bruto_s': round(bruto, 6),
+        'memoizado_s': round(memo, 6),
+        'aceleracao': round(bruto / memo, 2) if memo else None,
+        'caches': normalizacao.estatisticas_caches(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--registros', type=int, default=100_000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(executar(args.registros, args.repeticoes), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark da etapa de persistência da sincronização sobre um histórico grande.
+
+Compara a partição por data em laço Python com o caminho vetorizado (pandas)
+e mede ``update_memory_and_persist``/``mesclar_e_persistir`` de ponta a ponta.
+
+Uso: ``python -m benchmarks.bench_persistencia [--historico 500000] [--lote 20000]``
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import timeit
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from benchmarks.geradores import gerar_caches_json, gerar_registros_programacao
+from services import cache
+from services.equipes import ALLOWED_EQUIPES, filtrar_registros_por_equipes
+
+
+@contextmanager
+def _sem_vetorizacao():
+    anterior = cache.LIMIAR_VETORIZADO
+    cache.LIMIAR_VETORIZADO = float('inf')
+    try:
+        yield
+    finally:
+        cache.LIMIAR_VETORIZADO = anterior
+
+
+def _medir(funcao, repeticoes: int) -> float:
+    return round(min(timeit.repeat(funcao, number=1, repeat=repeticoes)), 6)
+
+
+def executar(historico: int = 500_000, lote: int = 20_000, repeticoes: int = 3) -> dict:
+    diretorio = tempfile.mkdtemp(prefix='mapa-bench-persistencia-')
+    try:
+        caminhos = gerar_caches_json(diretorio, historico=historico, recentes=2_000, concluidas=0)
+        originais = {}
+        for chave in ('cache', 'historico'):
+            with open(caminhos[chave], 'rb') as handler:
+                originais[chave] = handler.read()
+        historico_lido = cache.load_history(caminhos['historico'])
+        inicio = date.today() - timedelta(days=30)
+        novos = filtrar_registros_por_equipes(
+            gerar_registros_programacao(lote, semente=99, inicio=inicio, dias=37), ALLOWED_EQUIPES
+        )
+
+        def _restaurar():
+            for chave, conteudo in originais.items():
+                with open(caminhos[chave], 'wb') as handler:
+                    handler.write(conteudo)
+
+        def _persistir():
+            _restaurar()
+            cache.update_memory_and_persist([dict(r) for r in novos], caminhos['cache'], caminhos['historico'])
+
+        def _mesclar():
+            _restaurar()
+            cache.mesclar_e_persistir([dict(r) for r in novos], caminhos['cache'], caminhos['historico'])
+
+        with _sem_vetorizacao():
+            particao_python = _medir(lambda: cache.partition_records_by_date(historico_lido), repeticoes)
+            persistir_python = _medir(_persistir, repeticoes)
+        particao_vetorizada = _medir(lambda: cache.partition_records_by_date(historico_lido), repeticoes)
+        persistir_vetorizado = _medir(_persistir, repeticoes)
+        return {
+            'historico': len(historico_lido),
+            'lote': len(novos),
+            'particao_python_s': particao_python,
+            'particao_vetorizada_s': particao_vetorizada,
+            'particao_aceleracao': round(particao_python / particao_vetorizada, 2) if particao_vetorizada else None,
+            'dedup_s': _medir(lambda: cache.deduplicate_records(historico_lido + novos), repeticoes),
+            'update_memory_and_persist_python_s': persistir_python,
+            'update_memory_and_persist_s': persistir_vetorizado,
+            'mesclar_e_persistir_s': _medir(_mesclar, repeticoes),
+        }
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--historico', type=int, default=500_000)
+    parser.add_argument('--lote', type=int, default=20_000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(executar(args.historico, args.lote, args.repeticoes), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
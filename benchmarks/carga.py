@@ -0,0 +1,499 @@
+"""Teste de carga (e de resistência, com ``--duracao`` longa) contra o app sob gunicorn.
+
+Sobe o app com gunicorn local (workers e threads configuráveis) num
+diretório de uploads temporário semeado com caches sintéticos, ligado a um
+Dropbox falso que serve o "Controle - Obras.xlsx". Usuários virtuais
+repetem uma mistura de acessos reais (``/mapa`` por base/mês/semana, polling
+de ``/api/localizacoes_atual``, filtros e exportações de ``/concluidas``) e
+uma thread à parte chama ``/atualizar_programacao`` periodicamente,
+alternando entre duas planilhas para que cada sincronização traga mudanças.
+
+Uso::
+
+    python -m benchmarks.carga --workers 4 --threads 4 --usuarios 32 --duracao 120
+    python -m benchmarks.carga --escala media --duracao 1800 --saida soak.json
+
+Sai um JSON com p50/p95/p99 e vazão por operação e no total, as recusas do
+controle de admissão (429/503, contadas à parte dos erros) e o pico de RSS
+(``VmHWM``) de cada worker.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Dict, List, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmarks.executar import ESCALAS, _commit_atual  # noqa: E402
+
+CAMINHO_CONTROLE = '/Controle - Obras.xlsx'
+TOKEN_FALSO = 'token-carga'
+# Peso de cada operação na mistura dos usuários virtuais.
+MISTURA: Dict[str, int] = {
+    'mapa': 30,
+    'localizacoes_polling': 35,
+    'concluidas_filtros': 25,
+    'concluidas_export_csv': 7,
+    'concluidas_export_pdf': 3,
+}
+RECUSAS = (429, 503)
+# /mapa usa os nomes das bases, como os botões da página. "TODAS" (base vazia)
+# fica de fora: com o histórico sintético, mês/semana casam também com o ano
+# anterior e a grade passa de 300 colunas (páginas de centenas de MB).
+BASES_MAPA = ('BACABAL', 'ITAPECURU', 'SANTA INES')
+BASES = ('', 'BCB', 'ITM', 'STI')
+STATUS_CONCLUIDAS = ('', 'LIB/ATEC', 'ENERGIZADA', 'FISCALIZADA')
+
+
+@dataclass
+class Configuracao:
+    workers: int = 2
+    threads: int = 4
+    usuarios: int = 16
+    duracao: float = 60.0
+    aquecimento: float = 5.0
+    pausa: float = 0.2
+    intervalo_sincronizacao: float = 30.0
+    escala: str = 'pequena'
+    semente: int = 1
+    parametros: Dict[str, int] = field(default_factory=dict)
+
+
+class Medicoes:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.duracoes: Dict[str, List[float]] = {}
+        self.erros: Dict[str, int] = {}
+        self.recusas: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.exemplos_erro: List[str] = []
+
+    def registrar(self, operacao: str, segundos: float, status: int | None, erro: str = '', tamanho: int = 0) -> None:
+        with self._lock:
+            self.bytes[operacao] = self.bytes.get(operacao, 0) + tamanho
+            if status in RECUSAS:
+                self.recusas[operacao] = self.recusas.get(operacao, 0) + 1
+                return
+            if status is None or status >= 400:
+                self.erros[operacao] = self.erros.get(operacao, 0) + 1
+                if len(self.exemplos_erro) < 10:
+                    self.exemplos_erro.append(f'{operacao}: {erro or status}')
+                return
+            self.duracoes.setdefault(operacao, []).append(segundos)
+
+
+def percentil(valores: List[float], fracao: float) -> float:
+    """Percentil por interpolação linear (como ``numpy.percentile``)."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    posicao = (len(ordenados) - 1) * fracao
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def resumir(duracoes: List[float], segundos: float, erros: int = 0, recusas: int = 0, tamanho: int = 0) -> dict:
+    respostas = len(duracoes) + erros + recusas
+    return {
+        'requisicoes': len(duracoes),
+        'erros': erros,
+        'recusas': recusas,
+        'vazao_rps': round(len(duracoes) / segundos, 2) if segundos else 0.0,
+        'kb_medio': round(tamanho / respostas / 1024, 1) if respostas else 0.0,
+        'p50_ms': round(percentil(duracoes, 0.50) * 1000, 2),
+        'p95_ms': round(percentil(duracoes, 0.95) * 1000, 2),
+        'p99_ms': round(percentil(duracoes, 0.99) * 1000, 2),
+        'max_ms': round(max(duracoes, default=0.0) * 1000, 2),
+    }
+
+
+def _porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _semear(diretorio: str, parametros: Dict[str, int], semente: int) -> List[bytes]:
+    """Caches JSON em ``diretorio`` e duas versões da planilha para as sincronizações."""
+    from benchmarks.geradores import gerar_caches_json, gerar_workbook
+
+    gerar_caches_json(
+        diretorio,
+        historico=parametros['historico'],
+        recentes=parametros['registros'],
+        concluidas=parametros['concluidas'],
+        semente=semente,
+    )
+    return [
+        gerar_workbook(
+            linhas=parametros['linhas_excel'],
+            abas=parametros['abas'],
+            linhas_concluidas=parametros['concluidas'],
+            semente=semente + variante,
+        ).getvalue()
+        for variante in (0, 1)
+    ]
+
+
+class Servidor:
+    """gunicorn com o app, rodando num grupo de processos próprio."""
+
+    def __init__(self, config: Configuracao, uploads: str, dropbox_url: str, log: str) -> None:
+        self.porta = _porta_livre()
+        comando = [
+            sys.executable, '-m', 'gunicorn',
+            '--workers', str(config.workers),
+            '--threads', str(config.threads),
+            '--bind', f'127.0.0.1:{self.porta}',
+            '--timeout', '120',
+            '--chdir', RAIZ,
+            'app:app',
+        ]
+        ambiente = dict(
+            os.environ,
+            UPLOAD_FOLDER=uploads,
+            GUNICORN_THREADS=str(config.threads),
+            DROPBOX_CONTENT_URL=dropbox_url,
+            DROPBOX_ACCESS_TOKEN=TOKEN_FALSO,
+            DROPBOX_CONTROLE_PATH=CAMINHO_CONTROLE,
+            # Vazias de propósito: o .env do projeto não pode apontar para o Dropbox real.
+            DROPBOX_REFRESH_TOKEN='',
+            DROPBOX_APP_KEY='',
+            DROPBOX_APP_SECRET='',
+            PENDENTES_WEBHOOK_URL='',
+            PERFIL_ATIVO='0',
+        )
+        self._log = open(log, 'wb')
+        self.processo = subprocess.Popen(
+            comando, cwd=RAIZ, env=ambiente, stdout=self._log, stderr=subprocess.STDOUT, start_new_session=True
+        )
+
+    def url(self, caminho: str = '') -> str:
+        return f'http://127.0.0.1:{self.porta}{caminho}'
+
+    def aguardar(self, limite: float = 120.0) -> None:
+        import requests
+
+        fim = time.monotonic() + limite
+        while time.monotonic() < fim:
+            if self.processo.poll() is not None:
+                raise RuntimeError(f'gunicorn terminou com código {self.processo.returncode}')
+            try:
+                if requests.get(self.url('/api/sincronizacao/resumo'), timeout=5).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('gunicorn não respondeu a tempo')
+
+    def workers(self) -> List[int]:
+        return _filhos(self.processo.pid)
+
+    def parar(self) -> None:
+        if self.processo.poll() is None:
+            self.processo.send_signal(signal.SIGTERM)
+            try:
+                self.processo.wait(30)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.processo.pid, signal.SIGKILL)
+                self.processo.wait()
+        self._log.close()
+
+
+def _filhos(pid: int) -> List[int]:
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r', encoding='ascii') as handler:
+            return [int(filho) for filho in handler.read().split()]
+    except OSError:
+        return []
+
+
+def _memoria_kb(pid: int) -> Tuple[int, int] | None:
+    """``(VmRSS, VmHWM)`` em kB, ou ``None`` se o processo sumiu (ou fora do Linux)."""
+    valores = {}
+    try:
+        with open(f'/proc/{pid}/status', 'r', encoding='ascii') as handler:
+            for linha in handler:
+                if linha.startswith(('VmRSS:', 'VmHWM:')):
+                    chave, valor = linha.split(':', 1)
+                    valores[chave] = int(valor.split()[0])
+    except OSError:
+        return None
+    if len(valores) != 2:
+        return None
+    return valores['VmRSS'], valores['VmHWM']
+
+
+class MonitorMemoria:
+    """Amostra a memória dos workers (os reciclados pelo gunicorn também contam)."""
+
+    def __init__(self, servidor: Servidor, intervalo: float = 0.5) -> None:
+        self.servidor = servidor
+        self.intervalo = intervalo
+        self.picos_kb: Dict[int, int] = {}
+        self.atuais_kb: Dict[int, int] = {}
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def _amostrar(self) -> None:
+        for pid in self.servidor.workers():
+            memoria = _memoria_kb(pid)
+            if memoria is None:
+                continue
+            self.atuais_kb[pid] = memoria[0]
+            self.picos_kb[pid] = max(self.picos_kb.get(pid, 0), memoria[1])
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            self._amostrar()
+
+    def __enter__(self) -> 'MonitorMemoria':
+        self._amostrar()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._parar.set()
+        self._thread.join()
+        self._amostrar()
+
+    def resumo(self) -> dict:
+        return {
+            'por_worker': {
+                str(pid): {'pico_rss_mb': round(pico / 1024, 1), 'rss_final_mb': round(self.atuais_kb.get(pid, 0) / 1024, 1)}
+                for pid, pico in sorted(self.picos_kb.items())
+            },
+            'pico_rss_mb_max': round(max(self.picos_kb.values(), default=0) / 1024, 1),
+        }
+
+
+def _operacoes(aleatorio: random.Random) -> Dict[str, Callable[[], Tuple[str, str]]]:
+    """Operação -> gerador de ``(método, caminho)`` com argumentos sorteados."""
+    from urllib.parse import urlencode
+
+    from utils.dates import obter_mes_semana_atual
+
+    mes_atual, semana_atual = obter_mes_semana_atual()
+
+    def _mapa():
+        semana = aleatorio.choice((semana_atual, str(max(1, int(semana_atual) - 1))))
+        argumentos = {'base': aleatorio.choice(BASES_MAPA), 'mes': mes_atual, 'semana': semana}
+        return 'GET', f'/mapa?{urlencode(argumentos)}'
+
+    def _localizacoes():
+        if aleatorio.random() < 0.5:
+            return 'GET', '/api/localizacoes_atual'
+        zoom = aleatorio.choice((6, 8, 10, 12))
+        return 'GET', f'/api/localizacoes_atual?zoom={zoom}&bbox=-46.5,-5.5,-43.5,-2.5'
+
+    def _filtros_concluidas():
+        argumentos = {'base': aleatorio.choice(BASES), 'status': aleatorio.choice(STATUS_CONCLUIDAS)}
+        if aleatorio.random() < 0.4:
+            hoje = date.today()
+            argumentos.update(inicio=date(hoje.year, max(1, hoje.month - 2), 1).isoformat(), fim=hoje.isoformat())
+        return {chave: valor for chave, valor in argumentos.items() if valor}
+
+    return {
+        'mapa': _mapa,
+        'localizacoes_polling': _localizacoes,
+        'concluidas_filtros': lambda: ('GET', f'/concluidas?{urlencode(_filtros_concluidas())}'),
+        'concluidas_export_csv': lambda: ('GET', f'/concluidas/export?{urlencode(_filtros_concluidas())}'),
+        'concluidas_export_pdf': lambda: ('GET', f'/concluidas/export/pdf?{urlencode(_filtros_concluidas())}'),
+    }
+
+
+def _requisitar(sessao, medicoes: Medicoes, operacao: str, metodo: str, url: str, **kwargs) -> None:
+    import requests
+
+    inicio = time.perf_counter()
+    try:
+        # O corpo é lido inteiro (o tempo inclui a transferência), mas descartado aos pedaços.
+        with sessao.request(metodo, url, timeout=120, allow_redirects=False, stream=True, **kwargs) as resposta:
+            tamanho = sum(len(pedaco) for pedaco in resposta.iter_content(64 * 1024))
+        medicoes.registrar(operacao, time.perf_counter() - inicio, resposta.status_code, tamanho=tamanho)
+    except requests.RequestException as exc:
+        medicoes.registrar(operacao, time.perf_counter() - inicio, None, type(exc).__name__)
+
+
+def _usuario(servidor: Servidor, config: Configuracao, indice: int, ate: float, medicoes: Medicoes, inicio_medicao: float) -> None:
+    import requests
+
+    aleatorio = random.Random(config.semente * 1000 + indice)
+    operacoes = _operacoes(aleatorio)
+    nomes, pesos = list(MISTURA), list(MISTURA.values())
+    descartadas = Medicoes()
+    with requests.Session() as sessao:
+        while time.monotonic() < ate:
+            operacao = aleatorio.choices(nomes, pesos)[0]
+            metodo, caminho = operacoes[operacao]()
+            # Durante o aquecimento as medições vão para o descarte.
+            destino = medicoes if time.monotonic() >= inicio_medicao else descartadas
+            _requisitar(sessao, destino, operacao, metodo, servidor.url(caminho))
+            if config.pausa:
+                time.sleep(aleatorio.uniform(0, 2 * config.pausa))
+
+
+def _sincronizador(servidor: Servidor, dropbox, planilhas: List[bytes], config: Configuracao, ate: float,
+                   medicoes: Medicoes, parar: threading.Event) -> int:
+    import requests
+
+    enviadas = 0
+    with requests.Session() as sessao:
+        while not parar.wait(config.intervalo_sincronizacao) and time.monotonic() < ate:
+            enviadas += 1
+            dropbox.publicar(CAMINHO_CONTROLE, planilhas[enviadas % len(planilhas)])
+            _requisitar(
+                sessao, medicoes, 'atualizar_programacao', 'POST', servidor.url('/atualizar_programacao'),
+                headers={'Accept': 'application/json'},
+            )
+    return enviadas
+
+
+def executar(config: Configuracao) -> dict:
+    from benchmarks.servidores_falsos import DropboxFalso
+
+    parametros = config.parametros or ESCALAS[config.escala]
+    diretorio = tempfile.mkdtemp(prefix='mapa-carga-')
+    uploads = os.path.join(diretorio, 'uploads')
+    medicoes = Medicoes()
+    inicio_semeadura = time.perf_counter()
+    planilhas = _semear(uploads, parametros, config.semente)
+    semeadura_s = time.perf_counter() - inicio_semeadura
+    servidor = None
+    try:
+        with DropboxFalso() as dropbox:
+            dropbox.publicar(CAMINHO_CONTROLE, planilhas[0])
+            servidor = Servidor(config, uploads, dropbox.url('/2'), os.path.join(diretorio, 'gunicorn.log'))
+            inicio_subida = time.perf_counter()
+            servidor.aguardar()
+            subida_s = time.perf_counter() - inicio_subida
+            with MonitorMemoria(servidor) as memoria:
+                agora = time.monotonic()
+                inicio_medicao = agora + config.aquecimento
+                ate = inicio_medicao + config.duracao
+                parar = threading.Event()
+                sincronizacoes: List[int] = []
+                sincronizador = threading.Thread(
+                    target=lambda: sincronizacoes.append(
+                        _sincronizador(servidor, dropbox, planilhas, config, ate, medicoes, parar)
+                    ),
+                    daemon=True,
+                )
+                usuarios = [
+                    threading.Thread(
+                        target=_usuario, args=(servidor, config, indice, ate, medicoes, inicio_medicao), daemon=True
+                    )
+                    for indice in range(config.usuarios)
+                ]
+                if config.intervalo_sincronizacao > 0:
+                    sincronizador.start()
+                for usuario in usuarios:
+                    usuario.start()
+                for usuario in usuarios:
+                    usuario.join()
+                parar.set()
+                if config.intervalo_sincronizacao > 0:
+                    sincronizador.join()
+            memoria_resumo = memoria.resumo()
+    finally:
+        if servidor is not None:
+            servidor.parar()
+        log = os.path.join(diretorio, 'gunicorn.log')
+        cauda = ''
+        if os.path.exists(log):
+            with open(log, 'r', encoding='utf-8', errors='replace') as handler:
+                cauda = ''.join(handler.readlines()[-20:])
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    todas = [valor for valores in medicoes.duracoes.values() for valor in valores]
+    operacoes = {
+        nome: resumir(
+            medicoes.duracoes.get(nome, []), config.duracao, medicoes.erros.get(nome, 0),
+            medicoes.recusas.get(nome, 0), medicoes.bytes.get(nome, 0),
+        )
+        for nome in sorted(set(medicoes.duracoes) | set(medicoes.erros) | set(medicoes.recusas))
+    }
+    resultado = {
+        'commit': _commit_atual(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'configuracao': {
+            'workers': config.workers,
+            'threads': config.threads,
+            'usuarios': config.usuarios,
+            'duracao_s': config.duracao,
+            'aquecimento_s': config.aquecimento,
+            'pausa_s': config.pausa,
+            'intervalo_sincronizacao_s': config.intervalo_sincronizacao,
+            'mistura': MISTURA,
+        },
+        'escala': config.escala if not config.parametros else 'personalizada',
+        'parametros': parametros,
+        'preparo': {'semeadura_s': round(semeadura_s, 2), 'subida_gunicorn_s': round(subida_s, 2)},
+        'total': resumir(
+            todas, config.duracao, sum(medicoes.erros.values()), sum(medicoes.recusas.values()), sum(medicoes.bytes.values())
+        ),
+        'operacoes': operacoes,
+        'sincronizacoes': sincronizacoes[0] if sincronizacoes else 0,
+        'memoria': memoria_resumo,
+        'exemplos_erro': medicoes.exemplos_erro,
+    }
+    if medicoes.erros:
+        resultado['log_gunicorn'] = cauda
+    return resultado
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Teste de carga do sistema MAPA sob gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--usuarios', type=int, default=16, help='usuários virtuais simultâneos')
+    parser.add_argument('--duracao', type=float, default=60.0, help='segundos medidos (longa = teste de resistência)')
+    parser.add_argument('--aquecimento', type=float, default=5.0, help='segundos iniciais descartados')
+    parser.add_argument('--pausa', type=float, default=0.2, help='pausa média entre requisições de um usuário')
+    parser.add_argument('--intervalo-sincronizacao', type=float, default=30.0, help='0 desliga /atualizar_programacao')
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='pequena')
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--saida', help='arquivo JSON de saída (padrão: stdout)')
+    args = parser.parse_args(argv)
+
+    resultado = executar(Configuracao(
+        workers=args.workers,
+        threads=args.threads,
+        usuarios=args.usuarios,
+        duracao=args.duracao,
+        aquecimento=args.aquecimento,
+        pausa=args.pausa,
+        intervalo_sincronizacao=args.intervalo_sincronizacao,
+        escala=args.escala,
+        semente=args.semente,
+    ))
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as handler:
+            handler.write(texto)
+    else:
+        print(texto)
+    return 1 if resultado['total']['erros'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
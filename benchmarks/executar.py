@@ -0,0 +1,391 @@
+"""Suíte de benchmarks com saída JSON comparável entre commits.
+
+Uso::
+
+    python -m benchmarks.executar --escala media --saida bench_output.json
+    python -m benchmarks.executar --comparar bench_anterior.json --saida bench_output.json
+    python -m benchmarks.executar --filtro rota_ --escala pequena
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+ESCALAS: Dict[str, Dict[str, int]] = {
+    'pequena': {'linhas_excel': 500, 'abas': 2, 'concluidas': 200, 'registros': 5_000, 'historico': 5_000},
+    'media': {'linhas_excel': 5_000, 'abas': 4, 'concluidas': 2_000, 'registros': 50_000, 'historico': 50_000},
+    'grande': {'linhas_excel': 30_000, 'abas': 8, 'concluidas': 10_000, 'registros': 200_000, 'historico': 500_000},
+}
+
+BENCHMARKS: Dict[str, Callable[['Contexto'], Callable[[], object]]] = {}
+
+
+def benchmark(nome: str):
+    """Registra uma fábrica que recebe o contexto e devolve a função medida."""
+    def decorador(fabrica):
+        BENCHMARKS[nome] = fabrica
+        return fabrica
+    return decorador
+
+
+class Contexto:
+    def __init__(self, escala: Dict[str, int], diretorio: str) -> None:
+        self.escala = escala
+        self.diretorio = diretorio
+        self._cache: Dict[str, object] = {}
+
+    def memo(self, chave: str, fabrica: Callable[[], object]):
+        if chave not in self._cache:
+            self._cache[chave] = fabrica()
+        return self._cache[chave]
+
+    def workbook(self) -> bytes:
+        from benchmarks.geradores import gerar_workbook
+
+        return self.memo('workbook', lambda: gerar_workbook(
+            linhas=self.escala['linhas_excel'],
+            abas=self.escala['abas'],
+            linhas_concluidas=self.escala['concluidas'],
+        ).getvalue())
+
+    def registros(self) -> List[dict]:
+        from benchmarks.geradores import gerar_registros_programacao
+        from services.equipes import ALLOWED_EQUIPES, filtrar_registros_por_equipes
+        from services.normalizacao import normalizar_registros
+
+        def _gerar():
+            brutos = gerar_registros_programacao(self.escala['registros'])
+            return normalizar_registros(filtrar_registros_por_equipes(brutos, ALLOWED_EQUIPES))
+        return self.memo('registros', _gerar)
+
+    def concluidas(self) -> List[dict]:
+        from benchmarks.geradores import gerar_concluidas
+
+        return self.memo('concluidas', lambda: gerar_concluidas(self.escala['concluidas']))
+
+    def cliente(self):
+        def _cliente():
+            import app as modulo
+            from services.ingestao import definir_condicoes_basicas
+
+            projetos = [dict(registro) for registro in self.registros()]
+            definir_condicoes_basicas(projetos)
+            modulo.dados.substituir(projetos=projetos, concluidas=[dict(r) for r in self.concluidas()])
+            # As rotas medem a renderização; o cache de páginas tem benchmark próprio.
+            modulo.CACHE_PAGINAS = None
+            return modulo.app.test_client()
+        return self.memo('cliente', _cliente)
+
+
+def cronometrar(funcao: Callable[[], object], repeticoes: int, aquecimento: int = 1) -> Dict[str, float]:
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        'repeticoes': repeticoes,
+        'min_s': round(min(tempos), 6),
+        'mediana_s': round(statistics.median(tempos), 6),
+        'media_s': round(statistics.fmean(tempos), 6),
+        'max_s': round(max(tempos), 6),
+    }
+
+
+@benchmark('carregar_registros_do_arquivo')
+def _bench_carregar_registros(ctx: Contexto):
+    from io import BytesIO
+
+    from services.excel_loader import carregar_registros_do_arquivo
+
+    conteudo = ctx.workbook()
+    return lambda: carregar_registros_do_arquivo(BytesIO(conteudo))
+
+
+@benchmark('carregar_concluidas_do_arquivo')
+def _bench_carregar_concluidas(ctx: Contexto):
+    from io import BytesIO
+
+    from services.excel_loader import carregar_concluidas_do_arquivo
+
+    conteudo = ctx.workbook()
+    return lambda: carregar_concluidas_do_arquivo(BytesIO(conteudo))
+
+
+@benchmark('update_memory_and_persist')
+def _bench_update_memory_and_persist(ctx: Contexto):
+    from benchmarks.geradores import gerar_caches_json
+    from services.cache import update_memory_and_persist
+
+    destino = os.path.join(ctx.diretorio, 'persistencia')
+    caminhos = gerar_caches_json(destino, historico=ctx.escala['historico'], recentes=2_000, concluidas=10)
+    with open(caminhos['historico'], 'rb') as handler:
+        historico_original = handler.read()
+    novos = [dict(registro) for registro in ctx.registros()]
+
+    def _executar():
+        with open(caminhos['historico'], 'wb') as handler:
+            handler.write(historico_original)
+        return update_memory_and_persist(novos, caminhos['cache'], caminhos['historico'])
+    return _executar
+
+
+@benchmark('mesclar_e_persistir')
+def _bench_mesclar_e_persistir(ctx: Contexto):
+    from benchmarks.geradores import gerar_caches_json
+    from services.cache import mesclar_e_persistir
+
+    destino = os.path.join(ctx.diretorio, 'mescla')
+    caminhos = gerar_caches_json(destino, historico=ctx.escala['historico'], recentes=2_000, concluidas=10)
+    originais = {}
+    for chave in ('cache', 'historico'):
+        with open(caminhos[chave], 'rb') as handler:
+            originais[chave] = handler.read()
+    novos = [dict(registro) for registro in ctx.registros()]
+
+    def _executar():
+        for chave, conteudo in originais.items():
+            with open(caminhos[chave], 'wb') as handler:
+                handler.write(conteudo)
+        return mesclar_e_persistir([dict(r) for r in novos], caminhos['cache'], caminhos['historico'])
+    return _executar
+
+
+@benchmark('filtrar_por_mes_e_semana')
+def _bench_filtrar_por_mes_e_semana(ctx: Contexto):
+    from utils.dates import filtrar_por_mes_e_semana, obter_mes_semana_atual
+
+    registros = ctx.registros()
+    mes, semana = obter_mes_semana_atual()
+    return lambda: filtrar_por_mes_e_semana(registros, mes, semana)
+
+
+@benchmark('metricas_concluidas')
+def _bench_metricas_concluidas(ctx: Contexto):
+    from app import _metricas_concluidas
+
+    obras = ctx.concluidas()
+    return lambda: _metricas_concluidas(obras)
+
+
+def _registros_busca(ctx: Contexto) -> List[dict]:
+    """Registros com impressão digital, no tamanho do histórico (500 mil na escala grande)."""
+    from benchmarks.geradores import gerar_registros_programacao
+    from services.cache import anotar_impressoes
+
+    return ctx.memo('registros_busca', lambda: anotar_impressoes(gerar_registros_programacao(ctx.escala['historico'])))
+
+
+def _indice_busca(ctx: Contexto):
+    from services.busca import IndiceBusca
+
+    def _montar():
+        indice = IndiceBusca()
+        indice.atualizar(_registros_busca(ctx))
+        return indice
+    return ctx.memo('indice_busca', _montar)
+
+
+@benchmark('busca_construcao')
+def _bench_busca_construcao(ctx: Contexto):
+    from services.busca import IndiceBusca
+
+    registros = _registros_busca(ctx)
+    return lambda: IndiceBusca().atualizar(registros)
+
+
+@benchmark('busca_atualizacao_mil')
+def _bench_busca_atualizacao(ctx: Contexto):
+    from services.cache import anotar_impressoes
+
+    indice = _indice_busca(ctx)
+    registros = _registros_busca(ctx)
+    alterados = anotar_impressoes([dict(r, obs='ALTERADO') for r in registros[:1000]])
+    versoes = [alterados + registros[1000:], list(registros)]
+    estado = {'rodada': 0}
+
+    def _executar():
+        # Alterna entre as duas versões: cada rodada troca mil registros.
+        estado['rodada'] += 1
+        return indice.atualizar(versoes[estado['rodada'] % 2])
+    return _executar
+
+
+@benchmark('busca_consulta_seletiva')
+def _bench_busca_seletiva(ctx: Contexto):
+    indice = _indice_busca(ctx)
+    pep = next(r['pep'] for r in _registros_busca(ctx) if r['pep'] != '-')
+    return lambda: indice.buscar(pep[:7])
+
+
+@benchmark('busca_consulta_ampla')
+def _bench_busca_ampla(ctx: Contexto):
+    indice = _indice_busca(ctx)
+    return lambda: indice.buscar('santa')
+
+
+@benchmark('normalizacao_memoizada')
+def _bench_normalizacao(ctx: Contexto):
+    from benchmarks.bench_normalizacao import _amostra, _rodada_memoizada
+
+    amostra = _amostra(ctx.escala['registros'])
+    return lambda: _rodada_memoizada(amostra)
+
+
+@benchmark('importacao_app')
+def _bench_importacao_app(ctx: Contexto):
+    from benchmarks.bench_inicializacao import medir_importacao
+
+    return lambda: medir_importacao('app')
+
+
+ROTAS = {
+    'rota_mapa': '/mapa',
+    'rota_mapa_base_semana': '/mapa?base=BACABAL&mes={mes}&semana={semana}',
+    'rota_semanal': '/semanal?mes={mes}&semana={semana}',
+    'rota_concluidas': '/concluidas',
+    'rota_concluidas_filtro': '/concluidas?base=BCB&status=LIB/ATEC',
+    'rota_localizacao_atual': '/localizacao_atual',
+    'rota_api_localizacoes_atual': '/api/localizacoes_atual',
+}
+
+
+def _fabrica_rota(modelo_url: str):
+    def fabrica(ctx: Contexto):
+        from utils.dates import obter_mes_semana_atual
+
+        mes, semana = obter_mes_semana_atual()
+        url = modelo_url.format(mes=mes, semana=semana)
+        cliente = ctx.cliente()
+
+        def _executar():
+            resposta = cliente.get(url)
+            if resposta.status_code != 200:
+                raise RuntimeError(f'{url} respondeu {resposta.status_code}')
+            return resposta.data
+        return _executar
+    return fabrica
+
+
+for _nome, _modelo in ROTAS.items():
+    benchmark(_nome)(_fabrica_rota(_modelo))
+
+
+@benchmark('rota_mapa_em_cache')
+def _bench_rota_mapa_em_cache(ctx: Contexto):
+    import app as modulo
+    from services.cache_paginas import BackendMemoria
+
+    cliente = ctx.cliente()
+    backend = BackendMemoria()
+
+    def _executar():
+        anterior, modulo.CACHE_PAGINAS = modulo.CACHE_PAGINAS, backend
+        try:
+            resposta = cliente.get('/mapa', headers={'Accept-Encoding': 'gzip'})
+        finally:
+            modulo.CACHE_PAGINAS = anterior
+        if resposta.status_code != 200:
+            raise RuntimeError(f'/mapa respondeu {resposta.status_code}')
+        return resposta.data
+    return _executar
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:  # noqa: BLE001
+        return ''
+
+
+def executar(escala: str | Dict[str, int] = 'pequena', repeticoes: int = 5, filtro: str = '') -> dict:
+    parametros = ESCALAS[escala] if isinstance(escala, str) else dict(escala)
+    diretorio = tempfile.mkdtemp(prefix='mapa-bench-')
+    ctx = Contexto(parametros, diretorio)
+    resultados: Dict[str, dict] = {}
+    try:
+        for nome, fabrica in BENCHMARKS.items():
+            if filtro and filtro not in nome:
+                continue
+            try:
+                funcao = fabrica(ctx)
+                resultados[nome] = cronometrar(funcao, repeticoes)
+            except Exception as exc:  # noqa: BLE001
+                resultados[nome] = {'erro': str(exc)}
+            print(f'[BENCH] {nome}: {resultados[nome]}', file=sys.stderr)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+    return {
+        'commit': _commit_atual(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'escala': escala if isinstance(escala, str) else 'personalizada',
+        'parametros': parametros,
+        'resultados': resultados,
+    }
+
+
+def comparar(atual: dict, anterior: dict, tolerancia: float = 0.10) -> Dict[str, dict]:
+    """Razão atual/anterior da mediana; acima de ``1 + tolerancia`` é regressão."""
+    comparacao: Dict[str, dict] = {}
+    for nome, resultado in atual.get('resultados', {}).items():
+        base = anterior.get('resultados', {}).get(nome)
+        if not base or 'mediana_s' not in base or 'mediana_s' not in resultado:
+            continue
+        razao = resultado['mediana_s'] / base['mediana_s'] if base['mediana_s'] else float('inf')
+        comparacao[nome] = {
+            'anterior_s': base['mediana_s'],
+            'atual_s': resultado['mediana_s'],
+            'razao': round(razao, 3),
+            'regressao': razao > 1 + tolerancia,
+        }
+    return comparacao
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks do sistema MAPA')
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='pequena')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--filtro', default='', help='executa só benchmarks cujo nome contém este texto')
+    parser.add_argument('--saida', help='arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.escala, args.repeticoes, args.filtro)
+    codigo_saida = 0
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as handler:
+            resultado['comparacao'] = comparar(resultado, json.load(handler), args.tolerancia)
+        if any(item['regressao'] for item in resultado['comparacao'].values()):
+            codigo_saida = 1
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as handler:
+            handler.write(texto)
+    else:
+        print(texto)
+    return codigo_saida
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Geradores de dados sintéticos: planilhas "Controle - Obras.xlsx" e caches JSON."""
+from __future__ import annotations
+
+import json
+import os
+import random
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from typing import List
+
+from services.equipes import ALLOWED_EQUIPES
+
+STATUS_PROGRAMACAO = (
+    'PROGRAMADO', 'PROGRAMADO', 'PROGRAMADO', 'SEM PEP', 'ABER/LOG', 'SEM STATUS',
+    'CONCLUÍDO', 'SI EXECUÇÃO', 'LIB/ATEC', 'CANCELADO'
+)
+STATUS_CONCLUIDAS = ('LIB/ATEC', 'SEM PEP', 'ENERGIZADA', 'FISCALIZADA', 'ABER/LOG', 'PENDENTE MEDIÇÃO')
+PERIODOS = ('MANHÃ', 'TARDE', 'INTEGRAL')
+TIPOS = ('MANUTENÇÃO', 'OBRA', 'LIGAÇÃO NOVA', 'EXTENSÃO DE REDE')
+LOCAIS = (
+    'BACABAL', 'LAGO VERDE', 'VITÓRIA DO MEARIM', 'SÃO LUÍS GONZAGA', 'OLHO D\'ÁGUA DAS CUNHÃS',
+    'ITAPECURU MIRIM', 'SANTA RITA', 'ANAJATUBA', 'CANTANHEDE', 'MIRANDA DO NORTE',
+    'SANTA INÊS', 'PINDARÉ-MIRIM', 'BOM JARDIM', 'ZÉ DOCA', 'IGARAPÉ DO MEIO', 'PIO XII'
+)
+BASES = {'BCB': 'BACABAL', 'ITM': 'ITAPECURU MIRIM', 'STI': 'SANTA INES'}
+
+CABECALHO_PROGRAMACAO = (
+    'DATA', 'PERÍODO', 'TIPO', 'EQUIPE', 'BASE', 'OBRA', 'ENCARREGADO', 'SUPERVISOR',
+    'PEP', 'NOTA', 'LOCAL', 'STATUS', 'CONDIÇÃO', 'OBSERVAÇÃO'
+)
+CABECALHO_CONCLUIDAS = (
+    'BASE', 'OBRA', 'STATUS', 'QTD PROG', 'INIC', 'CONC', 'INIC SEM', 'CONC SEM',
+    'PROG', 'AND', 'VALOR', 'VIZITA'
+)
+
+
+def _variante_equipe(aleatorio: random.Random, equipe: str) -> str:
+    """Reproduz as grafias inconsistentes encontradas nas planilhas reais."""
+    sorteio = aleatorio.random()
+    if sorteio < 0.1:
+        return equipe.replace('-O', '-0', 1)
+    if sorteio < 0.15:
+        return equipe.lower()
+    if sorteio < 0.2:
+        return equipe.replace('-', ' - ', 1)
+    return equipe
+
+
+def _valor_monetario(aleatorio: random.Random):
+    sorteio = aleatorio.random()
+    if sorteio < 0.1:
+        return '-'
+    valor = round(aleatorio.uniform(500, 250_000), 2)
+    if sorteio < 0.4:
+        return f'{valor:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+    return valor
+
+
+def gerar_registros_programacao(
+    total: int,
+    semente: int = 42,
+    inicio: date | None = None,
+    dias: int = 120,
+    equipes_extras: int = 0,
+) -> List[dict]:
+    """Registros no formato devolvido por ``carregar_registros_do_arquivo``."""
+    aleatorio = random.Random(semente)
+    inicio = inicio or (date.today() - timedelta(days=dias - 14))
+    equipes = list(ALLOWED_EQUIPES) + [f'MA-XYZ-O{indice:03d}M' for indice in range(equipes_extras)]
+    registros = []
+    for indice in range(total):
+        dia = inicio + timedelta(days=aleatorio.randrange(dias))
+        equipe = aleatorio.choice(equipes)
+        status = aleatorio.choice(STATUS_PROGRAMACAO)
+        registros.append({
+            'id': indice + 1,
+            'data': dia.strftime('%d/%m/%Y'),
+            'periodo': aleatorio.choice(PERIODOS),
+            'tipo': aleatorio.choice(TIPOS),
+            'equipe': _variante_equipe(aleatorio, equipe),
+            'base': BASES.get(equipe[3:6], '-'),
+            'obra': f'OB-{aleatorio.randrange(10_000, 99_999)}',
+            'encarregado': f'ENCARREGADO {aleatorio.randrange(1, 40)}',
+            'supervisor': f'SUPERVISOR {aleatorio.randrange(1, 8)}',
+            'pep': f'MA-{aleatorio.randrange(1000, 9999)}-{aleatorio.randrange(100, 999)}' if aleatorio.random() > 0.2 else '-',
+            'nota': str(aleatorio.randrange(100_000_000, 999_999_999)),
+            'local': aleatorio.choice(LOCAIS),
+            'status': status,
+            'condicao': status if aleatorio.random() > 0.5 else '-',
+            'obs': aleatorio.choice(('-', 'AGUARDANDO MATERIAL', 'CHUVA', 'CLIENTE AUSENTE', 'OK')),
+        })
+    return registros
+
+
+def gerar_concluidas(total: int, semente: int = 7, inicio: date | None = None, dias: int = 120) -> List[dict]:
+    """Registros no formato devolvido por ``carregar_concluidas_do_arquivo``."""
+    aleatorio = random.Random(semente)
+    inicio = inicio or (date.today() - timedelta(days=dias))
+    registros = []
+    for indice in range(total):
+        dia_inicio = inicio + timedelta(days=aleatorio.randrange(dias))
+        dia_fim = dia_inicio + timedelta(days=aleatorio.randrange(0, 20))
+        registros.append({
+            'base': aleatorio.choice(tuple(BASES)),
+            'obra': f'MA-{indice + 1:06d}',
+            'status': aleatorio.choice(STATUS_CONCLUIDAS),
+            'qtd_prog': aleatorio.randrange(1, 6),
+            'inic': dia_inicio.strftime('%d/%m/%Y'),
+            'conc': dia_fim.strftime('%d/%m/%Y') if aleatorio.random() > 0.05 else '-',
+            'inic_sem': f'SEM {(dia_inicio.day - 1) // 7 + 1}',
+            'conc_sem': f'SEM {(dia_fim.day - 1) // 7 + 1}',
+            'prog': aleatorio.randrange(0, 5),
+            'andamento': _valor_monetario(aleatorio),
+            'valor': _valor_monetario(aleatorio),
+            'vizita': (dia_inicio - timedelta(days=3)).strftime('%d/%m/%Y') if aleatorio.random() > 0.3 else '-',
+        })
+    return registros
+
+
+def _data_celula(texto: str):
+    try:
+        return datetime.strptime(texto, '%d/%m/%Y')
+    except ValueError:
+        return texto
+
+
+def gerar_workbook(
+    destino: str | BytesIO | None = None,
+    linhas: int = 1000,
+    abas: int = 4,
+    deslocamento_cabecalho: int = 2,
+    abas_auxiliares: int = 2,
+    linhas_concluidas: int = 200,
+    semente: int = 42,
+) -> BytesIO | str:
+    """Gera um "Controle - Obras.xlsx" realista.
+
+    As ``linhas`` de programação são distribuídas entre ``abas`` abas, cada uma
+    com ``deslocamento_cabecalho`` linhas de título antes do cabeçalho. Inclui
+    abas auxiliares (sem as colunas obrigatórias) e a aba CONCLUÍDAS.
+    """
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    registros = gerar_registros_programacao(linhas, semente=semente)
+    por_aba = max(1, -(-linhas // max(abas, 1)))
+    for indice in range(max(abas, 1)):
+        planilha = livro.create_sheet(f'SEMANA {indice + 1}')
+        if deslocamento_cabecalho:
+            planilha.append(['PLANILHA DE PROGRAMAÇÃO', f'SEMANA {indice + 1}'])
+            for _ in range(deslocamento_cabecalho - 1):
+                planilha.append([])
+        planilha.append(list(CABECALHO_PROGRAMACAO))
+        for registro in registros[indice * por_aba:(indice + 1) * por_aba]:
+            planilha.append([
+                _data_celula(registro['data']), registro['periodo'], registro['tipo'], registro['equipe'],
+                registro['base'], registro['obra'], registro['encarregado'], registro['supervisor'],
+                registro['pep'], registro['nota'], registro['local'], registro['status'],
+                registro['condicao'], registro['obs'],
+            ])
+    for indice in range(abas_auxiliares):
+        auxiliar = livro.create_sheet(f'AUX {indice + 1}')
+        auxiliar.append(['AUX', 'R$ PROGRAMACAO'])
+        for equipe in ALLOWED_EQUIPES:
+            auxiliar.append([equipe, round(random.Random(indice).uniform(1000, 9000), 2)])
+    if linhas_concluidas:
+        concluidas = livro.create_sheet('CONCLUÍDAS')
+        concluidas.append(['BASE', 'RELATÓRIO DE OBRAS CONCLUÍDAS'])
+        concluidas.append(list(CABECALHO_CONCLUIDAS))
+        for registro in gerar_concluidas(linhas_concluidas, semente=semente + 1):
+            concluidas.append([
+                registro['base'], registro['obra'], registro['status'], registro['qtd_prog'],
+                _data_celula(registro['inic']), _data_celula(registro['conc']), registro['inic_sem'],
+                registro['conc_sem'], registro['prog'], registro['andamento'], registro['valor'],
+                _data_celula(registro['vizita']),
+            ])
+    saida = destino if destino is not None else BytesIO()
+    livro.save(saida)
+    if isinstance(saida, BytesIO):
+        saida.seek(0)
+    return saida
+
+
+def gerar_caches_json(
+    diretorio: str,
+    historico: int = 10_000,
+    recentes: int = 2_000,
+    concluidas: int = 1_000,
+    semente: int = 11,
+) -> dict:
+    """Grava ``programacao_cache.json``, ``programacao_historico.json`` e ``concluidas_cache.json``."""
+    from services.cache import partition_records_by_date
+    from services.equipes import filtrar_registros_por_equipes
+
+    os.makedirs(diretorio, exist_ok=True)
+    hoje = date.today()
+    antigos = gerar_registros_programacao(historico, semente=semente, inicio=hoje - timedelta(days=400), dias=390)
+    novos = gerar_registros_programacao(recentes, semente=semente + 1, inicio=hoje - timedelta(days=6), dias=14)
+    antigos = filtrar_registros_por_equipes(antigos, ALLOWED_EQUIPES)
+    novos = filtrar_registros_por_equipes(novos, ALLOWED_EQUIPES)
+    lista_historico, _ = partition_records_by_date(antigos)
+    _, lista_recentes = partition_records_by_date(novos)
+    caminhos = {
+        'cache': os.path.join(diretorio, 'programacao_cache.json'),
+        'historico': os.path.join(diretorio, 'programacao_historico.json'),
+        'concluidas': os.path.join(diretorio, 'concluidas_cache.json'),
+    }
+    conteudos = {
+        'cache': lista_recentes,
+        'historico': lista_historico,
+        'concluidas': gerar_concluidas(concluidas, semente=semente + 2),
+    }
+    for chave, caminho in caminhos.items():
+        with open(caminho, 'w', encoding='utf-8') as handler:
+            json.dump(conteudos[chave], handler, ensure_ascii=False)
+    return caminhos
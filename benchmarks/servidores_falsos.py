@@ -0,0 +1,195 @@
+"""Servidores HTTP locais que imitam serviços externos em testes e benchmarks.
+
+Cada servidor roda numa thread em ``127.0.0.1`` com porta livre e guarda as
+requisições recebidas em ``requisicoes``. Use como context manager::
+
+    with OAuthFalso() as oauth:
+        settings.token_url = oauth.url('/oauth2/token')
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs
+
+
+class ServidorFalso:
+    def __init__(self) -> None:
+        self.requisicoes: List[Tuple[str, str, bytes]] = []
+        self._lock = threading.Lock()
+        servidor = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):  # noqa: N802 - nome exigido pelo http.server
+                tamanho = int(self.headers.get('Content-Length') or 0)
+                corpo = self.rfile.read(tamanho) if tamanho else b''
+                with servidor._lock:
+                    servidor.requisicoes.append((self.path, self.headers.get('Authorization') or '', corpo))
+                status, resposta, *extras = servidor.responder(self.path, dict(self.headers), corpo)
+                dados = json.dumps(resposta).encode('utf-8') if not isinstance(resposta, bytes) else resposta
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                for nome, valor in (extras[0] if extras else {}).items():
+                    self.send_header(nome, valor)
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._http.daemon_threads = True
+        self._thread = threading.Thread(target=self._http.serve_forever, daemon=True)
+
+    def responder(self, caminho: str, cabecalhos: dict, corpo: bytes):
+        """``(status, corpo)`` ou ``(status, corpo, cabeçalhos extras)``."""
+        return 404, {'error': 'not_found'}
+
+    def url(self, caminho: str = '') -> str:
+        host, porta = self._http.server_address[:2]
+        return f'http://{host}:{porta}{caminho}'
+
+    def total(self, caminho: str | None = None) -> int:
+        with self._lock:
+            return sum(1 for requisicao in self.requisicoes if caminho is None or requisicao[0] == caminho)
+
+    def __enter__(self) -> 'ServidorFalso':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._http.shutdown()
+        self._http.server_close()
+
+
+class OAuthFalso(ServidorFalso):
+    """``/oauth2/token`` com ``grant_type=refresh_token``; cada renovação gera um token novo."""
+
+    def __init__(self, expires_in: int = 14_400, atraso: float = 0.0) -> None:
+        super().__init__()
+        self.expires_in = expires_in
+        self.atraso = atraso
+        self.emitidos = 0
+
+    def responder(self, caminho, cabecalhos, corpo):
+        if caminho != '/oauth2/token':
+            return 404, {'error': 'not_found'}
+        formulario = parse_qs(corpo.decode('utf-8'))
+        if formulario.get('grant_type') != ['refresh_token'] or not formulario.get('refresh_token'):
+            return 400, {'error': 'invalid_grant'}
+        time.sleep(self.atraso)
+        with self._lock:
+            self.emitidos += 1
+            token = f'token-{self.emitidos}'
+        return 200, {'access_token': token, 'token_type': 'bearer', 'expires_in': self.expires_in}
+
+
+class DropboxFalso(ServidorFalso):
+    """``list_folder/get_latest_cursor``, ``list_folder/continue``, ``list_folder/longpoll`` e ``files/download``.
+
+    ``alterar(caminho)`` simula o upload de um arquivo; o longpoll fica preso
+    até alguma alteração na pasta do cursor ou até ``timeout`` (limitado a
+    ``longpoll_max`` para os testes não esperarem). ``backoff`` é devolvido em
+    toda resposta do longpoll quando definido. ``arquivos`` (caminho ->
+    bytes) é o que ``files/download`` serve. ``expirar_cursores(vezes)`` faz
+    as próximas chamadas com cursor responderem 409 ``reset``.
+    """
+
+    def __init__(self, longpoll_max: float = 1.0, backoff: int = 0) -> None:
+        super().__init__()
+        self.longpoll_max = longpoll_max
+        self.backoff = backoff
+        self.alteracoes: List[Tuple[str, dict]] = []
+        self.arquivos: Dict[str, bytes] = {}
+        self.cursores_recusados = 0
+        self._mudou = threading.Condition(self._lock)
+
+    def alterar(self, caminho: str, tag: str = 'file') -> None:
+        pasta = caminho.lower().rsplit('/', 1)[0]
+        entrada = {'.tag': tag, 'name': caminho.rsplit('/', 1)[1], 'path_lower': caminho.lower(), 'path_display': caminho}
+        with self._mudou:
+            self.alteracoes.append((pasta, entrada))
+            self._mudou.notify_all()
+
+    def publicar(self, caminho: str, conteudo: bytes) -> None:
+        """Troca o conteúdo servido por ``files/download`` (sem gerar alteração no longpoll)."""
+        with self._lock:
+            self.arquivos[caminho.lower()] = conteudo
+
+    def expirar_cursores(self, vezes: int = 1) -> None:
+        with self._lock:
+            self.cursores_recusados += vezes
+
+    def _recusar_cursor(self) -> bool:
+        with self._lock:
+            if not self.cursores_recusados:
+                return False
+            self.cursores_recusados -= 1
+            return True
+
+    def _pendentes(self, cursor: str) -> List[dict]:
+        pasta, posicao = cursor.rsplit('|', 1)
+        return [entrada for alvo, entrada in self.alteracoes[int(posicao):] if alvo == pasta]
+
+    def responder(self, caminho, cabecalhos, corpo):
+        payload = json.loads(corpo or b'{}')
+        if caminho in ('/2/files/list_folder/longpoll', '/2/files/list_folder/continue') and self._recusar_cursor():
+            return 409, {'error_summary': 'reset/', 'error': {'.tag': 'reset'}}
+        if caminho == '/2/files/list_folder/longpoll':
+            fim = time.monotonic() + min(float(payload.get('timeout', 30)), self.longpoll_max)
+            with self._mudou:
+                while not self._pendentes(payload['cursor']) and time.monotonic() < fim:
+                    self._mudou.wait(fim - time.monotonic())
+                resposta = {'changes': bool(self._pendentes(payload['cursor']))}
+            if self.backoff:
+                resposta['backoff'] = self.backoff
+            return 200, resposta
+        if not cabecalhos.get('Authorization', '').startswith('Bearer '):
+            return 401, {'error': 'invalid_access_token'}
+        if caminho == '/2/files/download':
+            argumento = json.loads(cabecalhos.get('Dropbox-API-Arg') or '{}')
+            with self._lock:
+                conteudo = self.arquivos.get(str(argumento.get('path', '')).lower())
+            if conteudo is None:
+                return 409, {'error_summary': 'path/not_found/'}
+            return 200, conteudo
+        if caminho == '/2/files/list_folder/get_latest_cursor':
+            with self._lock:
+                return 200, {'cursor': f"{payload['path'].lower()}|{len(self.alteracoes)}"}
+        if caminho == '/2/files/list_folder/continue':
+            with self._lock:
+                entradas = self._pendentes(payload['cursor'])
+                pasta = payload['cursor'].rsplit('|', 1)[0]
+                return 200, {'entries': entradas, 'cursor': f'{pasta}|{len(self.alteracoes)}', 'has_more': False}
+        return 404, {'error': 'not_found'}
+
+
+class WebhookFalso(ServidorFalso):
+    """Webhook no estilo Discord/Slack: guarda o ``content`` de cada POST aceito.
+
+    ``falhar(status, retry_after)`` enfileira respostas de erro devolvidas
+    antes das próximas aceitas; ``atraso`` segura cada resposta (webhook lento).
+    """
+
+    def __init__(self, atraso: float = 0.0) -> None:
+        super().__init__()
+        self.atraso = atraso
+        self.mensagens: List[str] = []
+        self._falhas: List[Tuple[int, str]] = []
+
+    def falhar(self, status: int = 500, retry_after: str = '', vezes: int = 1) -> None:
+        with self._lock:
+            self._falhas.extend([(status, retry_after)] * vezes)
+
+    def responder(self, caminho, cabecalhos, corpo):
+        time.sleep(self.atraso)
+        with self._lock:
+            if self._falhas:
+                status, retry_after = self._falhas.pop(0)
+                return status, {'message': 'erro simulado'}, {'Retry-After': retry_after} if retry_after else {}
+            self.mensagens.append(json.loads(corpo or b'{}').get('content', ''))
+        return 204, b''
@@ -0,0 +1,52 @@
+"""Compacta o histórico: meses fora da janela quente viram segmentos em ``uploads/arquivo``.
+
+Roda com a mesma trava da sincronização e, ao terminar, publica um evento
+para os workers web recarregarem o histórico (agora menor).
+"""
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from services.cache import load_history, save_history
+from services.coalescencia import coalescedor_sincronizacao
+from services.eventos import BarramentoEventos
+from services.ingestao import ArquivosDados, marca_arquivos, preparar_carregados
+from services.retencao import ArquivoHistorico, meses_quentes_do_ambiente
+
+DESTINO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+
+
+def compactar(destino: str, meses_quentes: int) -> dict:
+    arquivos = ArquivosDados.no_diretorio(destino)
+    arquivo = ArquivoHistorico(os.path.join(destino, 'arquivo'), preparar=preparar_carregados)
+    historico = load_history(arquivos.historico)
+    quentes, relatorio = arquivo.compactar(historico, meses_quentes)
+    if len(quentes) != len(historico):
+        save_history(arquivos.historico, quentes)
+        if os.environ.get('EVENTOS_ATIVOS', '1').strip() != '0':
+            eventos = BarramentoEventos(os.path.join(destino, 'eventos.jsonl'))
+            eventos.publicar('compactacao', {'marca': marca_arquivos(arquivos.dados), **relatorio})
+    return relatorio
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--destino', default=DESTINO_PADRAO, help='diretório de dados servido pelo app (padrão: uploads/)')
+    parser.add_argument('--meses', type=int, default=meses_quentes_do_ambiente(), help='meses mantidos em memória, contando o atual')
+    args = parser.parse_args(argv)
+    coalescedor = coalescedor_sincronizacao(os.path.join(args.destino, 'travas'))
+    # Mesma trava (serializa com as sincronizações), mas chave própria: quem
+    # esperou por uma compactação ainda precisa sincronizar de verdade.
+    relatorio = coalescedor.executar(
+        'compactacao', lambda: compactar(args.destino, args.meses), entre_processos=True
+    )
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
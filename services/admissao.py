@@ -0,0 +1,211 @@
+"""Controle de admissão: limite de execuções simultâneas por rota pesada.
+
+Cada rota tem um orçamento de vagas de execução e de vagas na fila. A
+requisição que acha uma vaga de execução livre segue; senão espera numa vaga
+da fila por até ``espera`` segundos. Sem vaga na fila ela é recusada na hora
+(429) e, se a espera acabar, também (503); as duas recusas trazem
+``Retry-After``. Assim exportações, importações e sincronizações nunca
+ocupam todas as threads dos workers e as rotas de leitura seguem atendendo.
+
+Com um diretório de travas as vagas são arquivos travados com ``flock``
+(valem para todos os workers e somem com o processo que morrer); sem ele,
+ou fora do Linux, as vagas são contadas só dentro do processo.
+"""
+from __future__ import annotations
+
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+
+from services.instrumentacao import metricas
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+INTERVALO_ESPERA = 0.05
+
+FILA_CHEIA = 'fila_cheia'
+TEMPO_ESGOTADO = 'tempo_esgotado'
+
+
+class Rejeitada(Exception):
+    """A rota está no limite; ``status`` e ``tentar_em`` viram a resposta HTTP."""
+
+    def __init__(self, rota: str, motivo: str, tentar_em: int) -> None:
+        super().__init__(f'Rota {rota} no limite de execuções simultâneas ({motivo}).')
+        self.rota = rota
+        self.motivo = motivo
+        self.tentar_em = tentar_em
+        self.status = 429 if motivo == FILA_CHEIA else 503
+
+
+@dataclass(frozen=True)
+class Orcamento:
+    simultaneas: int
+    fila: int = 0
+    espera: float = 0.0
+    tentar_em: int = 0
+
+    @property
+    def retry_after(self) -> int:
+        return self.tentar_em or max(1, math.ceil(self.espera))
+
+
+class _VagasProcesso:
+    def __init__(self, total: int) -> None:
+        self._livres = list(range(total))
+        self._lock = threading.Lock()
+
+    def tentar(self) -> object | None:
+        with self._lock:
+            return self._livres.pop() if self._livres else None
+
+    def liberar(self, vaga: object) -> None:
+        with self._lock:
+            self._livres.append(vaga)
+
+
+class _VagasArquivo:
+    """Uma vaga por arquivo; ``flock`` vale entre processos e entre descritores do mesmo processo."""
+
+    def __init__(self, diretorio: str, prefixo: str, total: int) -> None:
+        self._caminhos = [os.path.join(diretorio, f'{prefixo}-{indice:02d}.lock') for indice in range(total)]
+        self._diretorio = diretorio
+
+    def tentar(self) -> object | None:
+        if not self._caminhos:
+            return None
+        os.makedirs(self._diretorio, exist_ok=True)
+        # Começa num arquivo ao acaso para não disputar sempre a primeira vaga.
+        inicio = random.randrange(len(self._caminhos))
+        for caminho in self._caminhos[inicio:] + self._caminhos[:inicio]:
+            handler = open(caminho, 'a+')
+            try:
+                fcntl.flock(handler, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handler.close()
+                continue
+            return handler
+        return None
+
+    def liberar(self, vaga: object) -> None:
+        vaga.close()
+
+
+class _Rota:
+    def __init__(self, nome: str, orcamento: Orcamento, diretorio: str | None) -> None:
+        self.nome = nome
+        self.orcamento = orcamento
+        if diretorio and fcntl is not None:
+            self.execucao = _VagasArquivo(diretorio, f'admissao-{nome}-exec', orcamento.simultaneas)
+            self.fila = _VagasArquivo(diretorio, f'admissao-{nome}-fila', orcamento.fila)
+        else:
+            self.execucao = _VagasProcesso(orcamento.simultaneas)
+            self.fila = _VagasProcesso(orcamento.fila)
+        self.executando = 0
+        self.esperando = 0
+        self._lock = threading.Lock()
+
+    def _contar(self, executando: int = 0, esperando: int = 0) -> None:
+        with self._lock:
+            self.executando += executando
+            self.esperando += esperando
+            metricas.definir('mapa_admissao_executando', self.executando, rota=self.nome)
+            metricas.definir('mapa_admissao_fila', self.esperando, rota=self.nome)
+
+    def _recusar(self, motivo: str) -> Rejeitada:
+        metricas.incrementar('mapa_admissao_rejeicoes_total', rota=self.nome, motivo=motivo)
+        return Rejeitada(self.nome, motivo, self.orcamento.retry_after)
+
+    def _aguardar_vaga(self) -> object:
+        lugar = self.fila.tentar()
+        if lugar is None:
+            raise self._recusar(FILA_CHEIA)
+        self._contar(esperando=1)
+        inicio = time.monotonic()
+        try:
+            while True:
+                vaga = self.execucao.tentar()
+                if vaga is not None:
+                    metricas.observar('mapa_admissao_espera_segundos', time.monotonic() - inicio, rota=self.nome)
+                    return vaga
+                restante = self.orcamento.espera - (time.monotonic() - inicio)
+                if restante <= 0:
+                    raise self._recusar(TEMPO_ESGOTADO)
+                time.sleep(min(INTERVALO_ESPERA, restante))
+        finally:
+            self.fila.liberar(lugar)
+            self._contar(esperando=-1)
+
+    @contextmanager
+    def admitir(self) -> Iterator[None]:
+        vaga = self.execucao.tentar()
+        if vaga is None:
+            vaga = self._aguardar_vaga()
+        self._contar(executando=1)
+        try:
+            yield
+        finally:
+            self.execucao.liberar(vaga)
+            self._contar(executando=-1)
+
+
+class ControleAdmissao:
+    def __init__(self, orcamentos: Dict[str, Orcamento], diretorio_travas: str | None = None, ativo: bool = True) -> None:
+        self.ativo = ativo
+        self._rotas = {nome: _Rota(nome, orcamento, diretorio_travas) for nome, orcamento in orcamentos.items()}
+
+    @contextmanager
+    def admitir(self, rota: str) -> Iterator[None]:
+        """Segura uma vaga de execução de ``rota``; levanta ``Rejeitada`` se não houver."""
+        limite = self._rotas.get(rota)
+        if not self.ativo or limite is None:
+            yield
+            return
+        with limite.admitir():
+            yield
+
+    def resumo(self) -> Dict[str, dict]:
+        """Ocupação vista por este processo (as vagas de arquivo são de todos)."""
+        return {
+            nome: {
+                'simultaneas': limite.orcamento.simultaneas,
+                'fila': limite.orcamento.fila,
+                'executando': limite.executando,
+                'esperando': limite.esperando,
+            }
+            for nome, limite in self._rotas.items()
+        }
+
+
+def _ler_orcamento(nome: str, padrao: Orcamento) -> Orcamento:
+    texto = os.environ.get(f'ADMISSAO_{nome.upper()}', '').strip()
+    if not texto:
+        return padrao
+    try:
+        partes: List[str] = [parte.strip() for parte in texto.split(',')]
+        simultaneas = int(partes[0])
+        fila = int(partes[1]) if len(partes) > 1 and partes[1] else padrao.fila
+        espera = float(partes[2]) if len(partes) > 2 and partes[2] else padrao.espera
+        if simultaneas < 1 or fila < 0 or espera < 0:
+            raise ValueError(texto)
+    except ValueError:
+        print(f"[AVISO] ADMISSAO_{nome.upper()}={texto!r} inválido (use simultaneas,fila,espera); mantendo o padrão.")
+        return padrao
+    return Orcamento(simultaneas, fila, espera, padrao.tentar_em)
+
+
+def controle_admissao_do_ambiente(padroes: Dict[str, Orcamento], diretorio_travas: str | None) -> ControleAdmissao:
+    """``ADMISSAO_<ROTA>=simultaneas,fila,espera`` ajusta cada rota; ``ADMISSAO_ATIVA=0`` desliga tudo."""
+    return ControleAdmissao(
+        {nome: _ler_orcamento(nome, padrao) for nome, padrao in padroes.items()},
+        diretorio_travas,
+        ativo=os.environ.get('ADMISSAO_ATIVA', '1').strip() != '0',
+    )
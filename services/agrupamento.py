@@ -0,0 +1,315 @@
+"""Agrupamento dos locais da semana em grade (por zoom) para o mapa de localização.
+
+As coordenadas de cada local ficam num JSON compartilhado entre os workers
+(``CacheCoordenadas``), preenchido pelo navegador à medida que geocodifica
+locais ainda sem coordenadas. ``MapaSemana`` é montado uma vez por versão
+dos dados com os projetos programados da semana, agregados por local; os
+agrupamentos de cada zoom (células de 1/``DIVISOES_POR_TILE`` de um tile
+Web Mercator) são calculados sob demanda e memorizados por filtro, zoom e
+versão das coordenadas. Uma consulta só percorre os agrupamentos do zoom
+pedido e devolve os que tocam a área visível.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.normalizacao import normalizar_texto
+
+ZOOM_MAXIMO = 18
+# 4 células por tile de 256 px: agrupamentos de ~64 px na tela.
+DIVISOES_POR_TILE = 4
+MAX_GRADES = 64
+LATITUDE_MAXIMA = 85.05112878
+
+Limites = Tuple[float, float, float, float]  # (oeste, sul, leste, norte)
+
+
+def chave_local(local: str | None) -> str:
+    return ' '.join(normalizar_texto(local).split())
+
+
+def _mercator(lat: float, lon: float) -> Tuple[float, float]:
+    """Posição normalizada (0..1) no plano Web Mercator."""
+    lat = max(-LATITUDE_MAXIMA, min(LATITUDE_MAXIMA, lat))
+    seno = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + seno) / (1 - seno)) / (4 * math.pi)
+    return x, y
+
+
+def _gravar_json_atomico(caminho: str, dados: dict) -> None:
+    diretorio = os.path.dirname(caminho) or '.'
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    with os.fdopen(descritor, 'w', encoding='utf-8') as handler:
+        json.dump(dados, handler, ensure_ascii=False, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+class CacheCoordenadas:
+    """Local normalizado -> ``{lat, lon, rotulo}``, relido quando outro processo grava."""
+
+    def __init__(self, caminho: str) -> None:
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._coordenadas: Dict[str, dict] = {}
+        self._versao_arquivo: Tuple[int, int] | None = None
+
+    def _estado_arquivo(self) -> Tuple[int, int] | None:
+        try:
+            estado = os.stat(self.caminho)
+        except OSError:
+            return None
+        return estado.st_mtime_ns, estado.st_size
+
+    def _atualizar(self) -> None:
+        versao = self._estado_arquivo()
+        if versao == self._versao_arquivo:
+            return
+        coordenadas: Dict[str, dict] = {}
+        if versao is not None:
+            try:
+                with open(self.caminho, 'r', encoding='utf-8') as handler:
+                    lidas = json.load(handler)
+                coordenadas = lidas if isinstance(lidas, dict) else {}
+            except (OSError, ValueError) as exc:
+                print(f'[AVISO] Falha ao ler {self.caminho}: {exc}')
+        self._coordenadas = coordenadas
+        self._versao_arquivo = versao
+
+    def todas(self) -> Dict[str, dict]:
+        with self._lock:
+            self._atualizar()
+            return self._coordenadas
+
+    @property
+    def versao(self) -> Tuple[int, int] | None:
+        with self._lock:
+            self._atualizar()
+            return self._versao_arquivo
+
+    def obter(self, local: str) -> dict | None:
+        return self.todas().get(chave_local(local))
+
+    def definir(self, local: str, lat: float, lon: float, rotulo: str = '') -> dict:
+        lat, lon = float(lat), float(lon)
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError('Coordenadas fora do intervalo válido.')
+        chave = chave_local(local)
+        if not chave or chave == '-':
+            raise ValueError('Informe o local.')
+        entrada = {'lat': round(lat, 6), 'lon': round(lon, 6), 'rotulo': str(rotulo or '')[:200]}
+        with self._lock:
+            self._atualizar()
+            if self._coordenadas.get(chave) == entrada:
+                return entrada
+            coordenadas = dict(self._coordenadas)
+            coordenadas[chave] = entrada
+            _gravar_json_atomico(self.caminho, coordenadas)
+            self._coordenadas = coordenadas
+            self._versao_arquivo = self._estado_arquivo()
+        return entrada
+
+
+@dataclass
+class LocalSemana:
+    """Um local da semana com os projetos programados nele (já resumidos)."""
+
+    local: str
+    projetos: List[dict] = field(default_factory=list)
+
+    def filtrados(self, base: str = '', equipe: str = '', data: str = '') -> List[dict]:
+        return [
+            projeto for projeto in self.projetos
+            if (not base or projeto['base'] == base)
+            and (not equipe or projeto['equipe'] == equipe)
+            and (not data or projeto['data'] == data)
+        ]
+
+
+@dataclass
+class Agrupamento:
+    chave: str
+    lat: float = 0.0
+    lon: float = 0.0
+    locais: List[str] = field(default_factory=list)
+    projetos: int = 0
+    equipes: Counter = field(default_factory=Counter)
+    status: Counter = field(default_factory=Counter)
+    limites: List[float] = field(default_factory=lambda: [180.0, 90.0, -180.0, -90.0])
+
+    def adicionar(self, local: str, lat: float, lon: float, projetos: List[dict]) -> None:
+        self.locais.append(local)
+        self.projetos += len(projetos)
+        for projeto in projetos:
+            self.equipes[projeto['equipe']] += 1
+            self.status[projeto['status'] or '-'] += 1
+        self.limites = [
+            min(self.limites[0], lon), min(self.limites[1], lat),
+            max(self.limites[2], lon), max(self.limites[3], lat),
+        ]
+        # Centro ponderado pela quantidade de projetos de cada local.
+        peso = len(projetos) / self.projetos
+        self.lat += (lat - self.lat) * peso
+        self.lon += (lon - self.lon) * peso
+
+    def toca(self, limites: Limites | None) -> bool:
+        if limites is None:
+            return True
+        oeste, sul, leste, norte = limites
+        return not (
+            self.limites[2] < oeste or self.limites[0] > leste
+            or self.limites[3] < sul or self.limites[1] > norte
+        )
+
+    def como_dict(self) -> dict:
+        unico = len(self.locais) == 1
+        return {
+            'chave': self.chave,
+            'lat': round(self.lat, 6),
+            'lon': round(self.lon, 6),
+            'local': self.locais[0] if unico else None,
+            'locais': len(self.locais),
+            'projetos': self.projetos,
+            'equipes': dict(self.equipes.most_common()),
+            'status': dict(self.status.most_common()),
+            'limites': [round(valor, 6) for valor in self.limites],
+        }
+
+
+@dataclass
+class Grade:
+    agrupamentos: List[Agrupamento]
+    sem_coordenadas: List[str]
+    equipes: int
+
+
+class MapaSemana:
+    """Projetos programados da semana por local, com grades de agrupamento por zoom."""
+
+    def __init__(self, mes: str, semana: str, locais: Dict[str, LocalSemana], coordenadas: CacheCoordenadas) -> None:
+        self.mes = mes
+        self.semana = semana
+        self.locais = locais
+        self.coordenadas = coordenadas
+        self._lock = threading.Lock()
+        self._grades: OrderedDict[tuple, Grade] = OrderedDict()
+
+    @classmethod
+    def montar(cls, projetos: Iterable[dict], mes: str, semana: str, coordenadas: CacheCoordenadas) -> 'MapaSemana':
+        locais: Dict[str, LocalSemana] = {}
+        for projeto in projetos:
+            if not projeto['_programado'] or not projeto['equipe']:
+                continue
+            local = (projeto.get('local') or '-').strip()
+            if not local or local == '-':
+                continue
+            item = locais.get(local)
+            if item is None:
+                item = locais[local] = LocalSemana(local)
+            item.projetos.append({
+                'equipe': projeto['equipe'],
+                'data': projeto.get('data'),
+                'status': projeto.get('status'),
+                'periodo': projeto.get('periodo'),
+                'base': projeto['_base'],
+            })
+        return cls(mes, semana, locais, coordenadas)
+
+    def datas(self) -> List[str]:
+        datas = {projeto['data'] for item in self.locais.values() for projeto in item.projetos if projeto['data']}
+        return sorted(datas, key=lambda texto: str(texto).split('/')[::-1])
+
+    def detalhe(self, local: str, base: str = '', equipe: str = '', data: str = '') -> dict | None:
+        item = self.locais.get(local)
+        if item is None:
+            chave = chave_local(local)
+            item = next((candidato for nome, candidato in self.locais.items() if chave_local(nome) == chave), None)
+        if item is None:
+            return None
+        coordenadas = self.coordenadas.obter(item.local)
+        return {
+            'local': item.local,
+            'lat': coordenadas['lat'] if coordenadas else None,
+            'lon': coordenadas['lon'] if coordenadas else None,
+            'projetos': item.filtrados(base, equipe, data),
+        }
+
+    def grade(self, zoom: int, base: str = '', equipe: str = '', data: str = '') -> Grade:
+        zoom = max(0, min(ZOOM_MAXIMO, int(zoom)))
+        chave = (zoom, base, equipe, data, self.coordenadas.versao)
+        with self._lock:
+            grade = self._grades.get(chave)
+            if grade is not None:
+                self._grades.move_to_end(chave)
+                return grade
+        grade = self._montar_grade(zoom, base, equipe, data)
+        with self._lock:
+            self._grades[chave] = grade
+            while len(self._grades) > MAX_GRADES:
+                self._grades.popitem(last=False)
+        return grade
+
+    def _montar_grade(self, zoom: int, base: str, equipe: str, data: str) -> Grade:
+        coordenadas = self.coordenadas.todas()
+        celulas = DIVISOES_POR_TILE * (2 ** zoom)
+        agrupamentos: Dict[Tuple[int, int], Agrupamento] = {}
+        sem_coordenadas: List[str] = []
+        equipes = set()
+        for local, item in self.locais.items():
+            projetos = item.filtrados(base, equipe, data)
+            if not projetos:
+                continue
+            equipes.update(projeto['equipe'] for projeto in projetos)
+            ponto = coordenadas.get(chave_local(local))
+            if ponto is None:
+                sem_coordenadas.append(local)
+                continue
+            x, y = _mercator(ponto['lat'], ponto['lon'])
+            celula = (min(int(x * celulas), celulas - 1), min(int(y * celulas), celulas - 1))
+            agrupamento = agrupamentos.get(celula)
+            if agrupamento is None:
+                agrupamento = agrupamentos[celula] = Agrupamento(f'{zoom}/{celula[0]}/{celula[1]}')
+            agrupamento.adicionar(local, ponto['lat'], ponto['lon'], projetos)
+        return Grade(list(agrupamentos.values()), sorted(sem_coordenadas), len(equipes))
+
+    def consultar(
+        self,
+        zoom: int,
+        limites: Optional[Limites] = None,
+        base: str = '',
+        equipe: str = '',
+        data: str = '',
+    ) -> dict:
+        grade = self.grade(zoom, base, equipe, data)
+        visiveis = [agrupamento.como_dict() for agrupamento in grade.agrupamentos if agrupamento.toca(limites)]
+        return {
+            'zoom': max(0, min(ZOOM_MAXIMO, int(zoom))),
+            'agrupamentos': visiveis,
+            'locais_total': sum(len(agrupamento.locais) for agrupamento in grade.agrupamentos) + len(grade.sem_coordenadas),
+            'equipes_total': grade.equipes,
+            'sem_coordenadas': grade.sem_coordenadas,
+        }
+
+
+def ler_limites(texto: str | None) -> Limites | None:
+    """``bbox=oeste,sul,leste,norte`` (graus, como ``map.getBounds().toBBoxString()``)."""
+    if not texto:
+        return None
+    partes = [float(parte) for parte in texto.split(',')]
+    if len(partes) != 4 or not all(math.isfinite(parte) for parte in partes):
+        raise ValueError('bbox deve ter quatro números: oeste,sul,leste,norte.')
+    oeste, sul, leste, norte = partes
+    if sul > norte:
+        raise ValueError('bbox com sul maior que norte.')
+    if leste - oeste >= 360 or oeste > leste:
+        # Visão que dá a volta no mundo (ou cruza o antimeridiano): só a latitude restringe.
+        return (-180.0, sul, 180.0, norte)
+    return (oeste, sul, leste, norte)
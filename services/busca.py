@@ -0,0 +1,307 @@
+"""Índice invertido em memória para buscar PEP, NOTA, LOCAL e OBS na programação.
+
+Os textos passam pela mesma normalização de ``normalizar_texto`` (sem
+acentos, maiúsculas). PEP e NOTA casam por prefixo, ignorando pontuação
+(``MA1234`` acha ``MA-1234-567``); LOCAL e OBS casam por palavra inteira.
+Cada termo da consulta (separado por espaço) precisa casar em algum campo.
+
+O índice é atualizado por diferença: um registro é identificado pela
+impressão digital do conteúdo (``_impressao``, ver ``services.cache``), de
+modo que, depois de uma sincronização ou de uma recarga vinda de outro
+worker, só os registros novos ou alterados são reindexados.
+
+Metas com 500 mil registros (``python -m benchmarks.executar --escala grande
+--filtro busca_``): construção completa abaixo de 10 s, atualização com mil
+registros alterados abaixo de 500 ms (quase tudo é a varredura da lista),
+consulta seletiva (PEP/NOTA com 4+ caracteres) abaixo de 10 ms e primeira
+página de um termo amplo de LOCAL/OBS abaixo de 100 ms.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from services.cache import CAMPO_IMPRESSAO
+from services.fragmentos import base_do_registro
+from services.normalizacao import normalizar_texto
+
+CAMPOS_PREFIXO = ('pep', 'nota')
+CAMPOS_PALAVRA = ('local', 'obs')
+CAMPOS = CAMPOS_PREFIXO + CAMPOS_PALAVRA
+POR_PAGINA_MAXIMO = 200
+# Valores novos ou removidos de PEP/NOTA acumulados antes de reordenar a lista de prefixos.
+LIMIAR_REMONTAGEM = 2_000
+
+_PALAVRA = re.compile(r'[A-Z0-9]+')
+_VAZIOS = frozenset({'', '-'})
+
+
+def palavras(texto: str | None) -> List[str]:
+    return _PALAVRA.findall(normalizar_texto(texto))
+
+
+def _compacto(texto: object) -> str:
+    texto = str(texto) if texto else ''
+    # PEP e NOTA são quase únicos: em ASCII a normalização é só ``upper`` e
+    # passar por ``normalizar_texto`` apenas esvaziaria o cache LRU dele.
+    return ''.join(_PALAVRA.findall(texto.upper() if texto.isascii() else normalizar_texto(texto)))
+
+
+@lru_cache(maxsize=4096)
+def _ordem_data(texto: object) -> int:
+    """``AAAAMMDD`` da data ``dd/mm/aaaa`` (0 se não der para ler), para ordenar sem strptime."""
+    partes = str(texto or '').strip().split('/')
+    if len(partes) != 3 or not all(parte.isdigit() for parte in partes):
+        return 0
+    return int(partes[2]) * 10_000 + int(partes[1]) * 100 + int(partes[0])
+
+
+def _chave_documento(registro: dict) -> object:
+    # Sem impressão (ex.: dados montados em teste), vale a identidade do objeto.
+    return registro.get(CAMPO_IMPRESSAO) or id(registro)
+
+
+@dataclass
+class ResultadoBusca:
+    consulta: str
+    campo: str
+    total: int
+    pagina: int
+    por_pagina: int
+    registros: List[dict] = field(default_factory=list)
+
+    @property
+    def paginas(self) -> int:
+        return (self.total + self.por_pagina - 1) // self.por_pagina
+
+    def como_dict(self) -> dict:
+        return {
+            'consulta': self.consulta,
+            'campo': self.campo or None,
+            'total': self.total,
+            'pagina': self.pagina,
+            'por_pagina': self.por_pagina,
+            'paginas': self.paginas,
+            'resultados': [resumo_do_registro(registro) for registro in self.registros],
+        }
+
+
+def resumo_do_registro(registro: dict) -> dict:
+    return {
+        'data': registro.get('data'),
+        'equipe': registro.get('equipe'),
+        'base': base_do_registro(registro) or None,
+        'status': registro.get('status'),
+        'condicao': registro.get('condicao'),
+        'pep': registro.get('pep'),
+        'nota': registro.get('nota'),
+        'local': registro.get('local'),
+        'obs': registro.get('obs'),
+        'periodo': registro.get('periodo'),
+    }
+
+
+class _Prefixos:
+    """Valores distintos de PEP ou NOTA para busca por prefixo.
+
+    Uma lista ordenada (bisect) mais um conjunto pequeno dos valores novos
+    desde a última ordenação; valores removidos continuam na lista até a
+    próxima remontagem e são descartados na consulta.
+    """
+
+    def __init__(self) -> None:
+        self.ordenados: List[str] = []
+        self.recentes: Set[str] = set()
+        self.obsoletos = 0
+
+    def adicionar(self, valor: str) -> None:
+        self.recentes.add(valor)
+
+    def remover(self, valor: str) -> None:
+        if valor in self.recentes:
+            self.recentes.discard(valor)
+        else:
+            self.obsoletos += 1
+
+    def compactar(self, valores: Iterable[str]) -> None:
+        if len(self.recentes) + self.obsoletos > LIMIAR_REMONTAGEM:
+            self.ordenados = sorted(valores)
+            self.recentes = set()
+            self.obsoletos = 0
+
+    def com_prefixo(self, prefixo: str) -> Iterator[str]:
+        lista = self.ordenados
+        posicao = bisect.bisect_left(lista, prefixo)
+        while posicao < len(lista) and lista[posicao].startswith(prefixo):
+            yield lista[posicao]
+            posicao += 1
+        for valor in self.recentes:
+            if valor.startswith(prefixo):
+                yield valor
+
+
+class IndiceBusca:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._proximo = 0
+        self._documentos: Dict[object, int] = {}
+        self._registros: Dict[int, dict] = {}
+        self._ordem: Dict[int, Tuple[int, int]] = {}
+        # campo -> valor normalizado (compacto em PEP/NOTA) -> documentos.
+        self._valores: Dict[str, Dict[str, Set[int]]] = {campo: {} for campo in CAMPOS}
+        self._prefixos: Dict[str, _Prefixos] = {campo: _Prefixos() for campo in CAMPOS_PREFIXO}
+        # LOCAL/OBS: palavra -> valores que a contêm.
+        self._palavras: Dict[str, Dict[str, Set[str]]] = {campo: {} for campo in CAMPOS_PALAVRA}
+        self._origem: List[dict] | None = None
+
+    def __len__(self) -> int:
+        return len(self._registros)
+
+    def atualizar(self, registros: List[dict]) -> dict:
+        """Deixa o índice igual a ``registros``, reindexando só o que mudou."""
+        with self._lock:
+            if registros is self._origem:
+                return {'adicionados': 0, 'removidos': 0}
+            documentos = self._documentos
+            atuais = self._registros
+            vistos: Set[int] = set()
+            novos: List[dict] = []
+            for registro in registros:
+                documento = documentos.get(registro.get(CAMPO_IMPRESSAO) or id(registro))
+                if documento is None:
+                    novos.append(registro)
+                elif documento not in vistos:
+                    vistos.add(documento)
+                    # Mesmo conteúdo, objeto possivelmente novo (recarga): só troca a referência.
+                    atuais[documento] = registro
+            removidos = [documento for documento in atuais if documento not in vistos] if len(vistos) < len(atuais) else []
+            for documento in removidos:
+                self._remover(documento)
+            for registro in novos:
+                self._adicionar(registro)
+            for campo, prefixos in self._prefixos.items():
+                prefixos.compactar(self._valores[campo])
+            self._origem = registros
+            return {'adicionados': len(novos), 'removidos': len(removidos)}
+
+    @staticmethod
+    def _termos(registro: dict) -> List[Tuple[str, str]]:
+        termos = []
+        for campo in CAMPOS_PREFIXO:
+            valor = _compacto(registro.get(campo))
+            if valor:
+                termos.append((campo, valor))
+        for campo in CAMPOS_PALAVRA:
+            valor = normalizar_texto(registro.get(campo))
+            if valor not in _VAZIOS:
+                termos.append((campo, valor))
+        return termos
+
+    def _adicionar(self, registro: dict) -> None:
+        chave = _chave_documento(registro)
+        if chave in self._documentos:
+            return
+        documento = self._proximo
+        self._proximo += 1
+        self._documentos[chave] = documento
+        self._registros[documento] = registro
+        self._ordem[documento] = (-_ordem_data(registro.get('data')), documento)
+        for campo, valor in self._termos(registro):
+            valores = self._valores[campo]
+            documentos = valores.get(valor)
+            if documentos is None:
+                documentos = valores[valor] = set()
+                if campo in self._prefixos:
+                    self._prefixos[campo].adicionar(valor)
+                else:
+                    for palavra in _PALAVRA.findall(valor):
+                        self._palavras[campo].setdefault(palavra, set()).add(valor)
+            documentos.add(documento)
+
+    def _remover(self, documento: int) -> None:
+        registro = self._registros.pop(documento)
+        del self._ordem[documento]
+        self._documentos.pop(_chave_documento(registro), None)
+        for campo, valor in self._termos(registro):
+            documentos = self._valores[campo].get(valor)
+            if documentos is None:
+                continue
+            documentos.discard(documento)
+            if documentos:
+                continue
+            del self._valores[campo][valor]
+            if campo in self._prefixos:
+                self._prefixos[campo].remover(valor)
+            else:
+                for palavra in _PALAVRA.findall(valor):
+                    contem = self._palavras[campo].get(palavra)
+                    if contem is not None:
+                        contem.discard(valor)
+                        if not contem:
+                            del self._palavras[campo][palavra]
+
+    def _por_prefixo(self, campo: str, prefixo: str) -> Set[int]:
+        valores = self._valores[campo]
+        encontrados: Set[int] = set()
+        for valor in self._prefixos[campo].com_prefixo(prefixo):
+            # Valores removidos ficam na lista ordenada até a próxima remontagem.
+            encontrados.update(valores.get(valor, ()))
+        return encontrados
+
+    def _por_palavra(self, campo: str, palavra: str) -> Set[int]:
+        valores = self._valores[campo]
+        encontrados: Set[int] = set()
+        for valor in self._palavras[campo].get(palavra, ()):
+            encontrados |= valores[valor]
+        return encontrados
+
+    def _casar_termo(self, termo: str, campos: Tuple[str, ...]) -> Set[int]:
+        partes = palavras(termo)
+        if not partes:
+            return set()
+        encontrados: Set[int] = set()
+        compacto = ''.join(partes)
+        for campo in campos:
+            if campo in CAMPOS_PREFIXO:
+                encontrados |= self._por_prefixo(campo, compacto)
+        campos_palavra = [campo for campo in campos if campo in CAMPOS_PALAVRA]
+        if campos_palavra:
+            # Um termo com pontuação ("D'AGUA") vira várias palavras: todas precisam estar lá.
+            em_todas: Set[int] | None = None
+            for parte in partes:
+                casados: Set[int] = set()
+                for campo in campos_palavra:
+                    casados |= self._por_palavra(campo, parte)
+                em_todas = casados if em_todas is None else em_todas & casados
+            encontrados |= em_todas or set()
+        return encontrados
+
+    def buscar(self, consulta: str, campo: str = '', pagina: int = 1, por_pagina: int = 50) -> ResultadoBusca:
+        """Registros que casam com todos os termos, do mais recente para o mais antigo."""
+        if campo and campo not in CAMPOS:
+            raise ValueError(f"Campo de busca inválido: {campo!r} (use {', '.join(CAMPOS)}).")
+        pagina = max(pagina, 1)
+        por_pagina = min(max(por_pagina, 1), POR_PAGINA_MAXIMO)
+        campos = (campo,) if campo else CAMPOS
+        termos = consulta.split()
+        with self._lock:
+            encontrados: Set[int] | None = None
+            # Termos mais longos costumam ser mais seletivos: começam a interseção.
+            for termo in sorted(termos, key=len, reverse=True):
+                casados = self._casar_termo(termo, campos)
+                encontrados = casados if encontrados is None else encontrados & casados
+                if not encontrados:
+                    break
+            encontrados = encontrados or set()
+            fim = pagina * por_pagina
+            if fim * 4 < len(encontrados):
+                ordenados = heapq.nsmallest(fim, encontrados, key=self._ordem.__getitem__)
+            else:
+                ordenados = sorted(encontrados, key=self._ordem.__getitem__)
+            registros = [self._registros[documento] for documento in ordenados[fim - por_pagina:fim]]
+        return ResultadoBusca(consulta, campo, len(encontrados), pagina, por_pagina, registros)
@@ -1,16 +1,29 @@
 """Serviços de cache e histórico em JSON."""
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+import hashlib
 import json
+from operator import itemgetter
 import os
-from typing import Iterable, List, Sequence
+from typing import Callable, Dict, Iterable, List, Sequence
+
+from services.instrumentacao import medir
 
 Record = dict
 
 DEFAULT_KEY_FIELDS: Sequence[str] = (
     'data', 'equipe', 'pep', 'nota', 'local', 'periodo'
 )
+# Campos fora da impressão digital: ``id`` é só a posição da linha na aba e os
+# campos com prefixo ``_`` são derivados na ingestão.
+CAMPOS_FORA_DA_IMPRESSAO = frozenset({'id'})
+CAMPO_IMPRESSAO = '_impressao'
+# Acima deste tamanho a partição por data usa pandas; abaixo, o custo de montar
+# a Series supera o ganho.
+LIMIAR_VETORIZADO = 20_000
+FORMATO_DATA = '%d/%m/%Y'
 
 def _read_list(path: str) -> List[Record]:
     if not os.path.exists(path):
@@ -23,10 +36,19 @@ def _read_list(path: str) -> List[Record]:
         print(f'[AVISO] Falha ao ler {path}: {exc}')
         return []
 
+def _json_padrao(valor):
+    """Datas tipadas (ex.: concluídas) vão para o JSON em ISO 8601."""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f'Objeto do tipo {type(valor).__name__} não é serializável em JSON')
+
 def _write_list(path: str, registros: Iterable[Record]) -> None:
     try:
+        # json.dumps usa o codificador em C; json.dump direto no arquivo cai no
+        # codificador em Python puro, que domina o tempo com históricos grandes.
+        conteudo = json.dumps(list(registros), ensure_ascii=False, default=_json_padrao)
         with open(path, 'w', encoding='utf-8') as handler:
-            json.dump(list(registros), handler, ensure_ascii=False)
+            handler.write(conteudo)
     except Exception as exc:
         print(f'[AVISO] Falha ao salvar {path}: {exc}')
 
@@ -42,32 +64,85 @@ def load_history(path: str) -> List[Record]:
 def save_history(path: str, registros: Iterable[Record]) -> None:
     _write_list(path, registros)
 
+def load_summary(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as handler:
+            data = json.load(handler)
+            return data if isinstance(data, dict) else {}
+    except Exception as exc:
+        print(f'[AVISO] Falha ao ler {path}: {exc}')
+        return {}
+
+def save_summary(path: str, resumo: dict) -> None:
+    try:
+        with open(path, 'w', encoding='utf-8') as handler:
+            json.dump(resumo, handler, ensure_ascii=False, default=_json_padrao)
+    except Exception as exc:
+        print(f'[AVISO] Falha ao salvar {path}: {exc}')
+
+def _data_registro(registro: Record):
+    try:
+        return datetime.strptime(str(registro.get('data', '')).strip(), FORMATO_DATA).date()
+    except Exception:
+        return None
+
+def _mascara_antigos(registros: List[Record], limite) -> List[bool]:
+    """Compara as datas com ``limite`` de uma vez; o que o pandas não entender volta ao strptime."""
+    import pandas as pd
+
+    textos = pd.Series([str(registro.get('data', '')).strip() for registro in registros], dtype=object)
+    datas = pd.to_datetime(textos, format=FORMATO_DATA, errors='coerce')
+    # 'now' e 'today' são aceitos pelo pandas mesmo com formato explícito; o strptime recusa.
+    datas = datas.mask(textos.isin(('now', 'today')))
+    antigos = (datas < pd.Timestamp(limite)).tolist()
+    for posicao in datas.isna().to_numpy().nonzero()[0].tolist():
+        data_registro = _data_registro(registros[posicao])
+        antigos[posicao] = data_registro is not None and data_registro < limite
+    return antigos
+
 def partition_records_by_date(registros: Iterable[Record], dias_historico: int = 7) -> tuple[List[Record], List[Record]]:
     limite = datetime.now().date() - timedelta(days=dias_historico)
+    registros = registros if isinstance(registros, list) else list(registros)
+    if len(registros) >= LIMIAR_VETORIZADO:
+        antigos = _mascara_antigos(registros, limite)
+    else:
+        antigos = []
+        for registro in registros:
+            data_registro = _data_registro(registro)
+            antigos.append(data_registro is not None and data_registro < limite)
     historico, recentes = [], []
+    for registro, antigo in zip(registros, antigos):
+        (historico if antigo else recentes).append(registro)
+    return historico, recentes
+
+def _extrator_chave(key_fields: Sequence[str]) -> Callable[[Record], tuple]:
+    campos = tuple(key_fields)
+    if len(campos) < 2:
+        # itemgetter com um campo devolve o valor solto, não uma tupla.
+        return lambda registro: tuple(registro[c] for c in campos)
+    return itemgetter(*campos)
+
+def _primeiras_ocorrencias(
+    registros: Iterable[Record],
+    key_fields: Sequence[str] = DEFAULT_KEY_FIELDS,
+    vistos: Dict[tuple, Record] | None = None
+) -> Dict[tuple, Record]:
+    """Chave -> primeiro registro, na ordem de inserção; ``vistos`` permite continuar uma deduplicação."""
+    vistos = {} if vistos is None else vistos
+    extrair = _extrator_chave(key_fields)
     for registro in registros:
-        data_str = str(registro.get('data', '')).strip()
         try:
-            data_registro = datetime.strptime(data_str, '%d/%m/%Y').date()
-        except Exception:
-            recentes.append(registro)
-            continue
-        if data_registro < limite:
-            historico.append(registro)
-        else:
-            recentes.append(registro)
-    return historico, recentes
+            chave = extrair(registro)
+        except KeyError:
+            chave = tuple(registro.get(c) for c in key_fields)
+        if chave not in vistos:
+            vistos[chave] = registro
+    return vistos
 
 def deduplicate_records(registros: Iterable[Record], key_fields: Sequence[str] = DEFAULT_KEY_FIELDS) -> List[Record]:
-    vistos = set()
-    saida: List[Record] = []
-    for registro in registros:
-        chave = tuple(registro.get(c) for c in key_fields)
-        if chave in vistos:
-            continue
-        vistos.add(chave)
-        saida.append(registro)
-    return saida
+    return list(_primeiras_ocorrencias(registros, key_fields).values())
 
 def update_memory_and_persist(
     registros_filtrados: Iterable[Record],
@@ -75,10 +150,145 @@ def update_memory_and_persist(
     history_path: str,
     dias_historico: int = 7
 ) -> List[Record]:
-    historico_existente = deduplicate_records(load_history(history_path))
-    novos_historicos, recentes = partition_records_by_date(registros_filtrados, dias_historico)
-    historico_atualizado = deduplicate_records(historico_existente + novos_historicos)
-    recentes_deduplicados = deduplicate_records(recentes)
-    save_history(history_path, historico_atualizado)
-    save_cache(cache_path, recentes_deduplicados)
+    with medir('leitura_historico'):
+        historico_lido = load_history(history_path)
+    with medir('particao'):
+        novos_historicos, recentes = partition_records_by_date(registros_filtrados, dias_historico)
+    with medir('dedup'):
+        # O histórico lido é indexado uma vez e os novos entram no mesmo índice,
+        # em vez de deduplicar de novo a concatenação inteira.
+        historico_atualizado = list(_primeiras_ocorrencias(
+            novos_historicos, vistos=_primeiras_ocorrencias(historico_lido)
+        ).values())
+        recentes_deduplicados = deduplicate_records(recentes)
+    with medir('persistencia'):
+        save_history(history_path, historico_atualizado)
+        save_cache(cache_path, recentes_deduplicados)
     return historico_atualizado + recentes_deduplicados
+
+
+def chave_registro(registro: Record, key_fields: Sequence[str] = DEFAULT_KEY_FIELDS) -> tuple:
+    return tuple(registro.get(c) for c in key_fields)
+
+
+def impressao_registro(registro: Record) -> str:
+    conteudo = {
+        chave: valor for chave, valor in registro.items()
+        if not chave.startswith('_') and chave not in CAMPOS_FORA_DA_IMPRESSAO
+    }
+    serializado = json.dumps(conteudo, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(serializado.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def anotar_impressoes(registros: Iterable[Record]) -> List[Record]:
+    saida: List[Record] = []
+    for registro in registros:
+        registro[CAMPO_IMPRESSAO] = impressao_registro(registro)
+        saida.append(registro)
+    return saida
+
+
+def _impressao(registro: Record) -> str:
+    return registro.get(CAMPO_IMPRESSAO) or impressao_registro(registro)
+
+
+@dataclass
+class DeltaRegistros:
+    adicionados: List[Record] = field(default_factory=list)
+    modificados: List[Record] = field(default_factory=list)
+    removidos: List[Record] = field(default_factory=list)
+
+    @property
+    def vazio(self) -> bool:
+        return not (self.adicionados or self.modificados or self.removidos)
+
+    def resumo(self) -> dict:
+        return {
+            'adicionados': len(self.adicionados),
+            'modificados': len(self.modificados),
+            'removidos': len(self.removidos),
+        }
+
+
+@dataclass
+class ResultadoMescla:
+    registros: List[Record]
+    delta: DeltaRegistros
+    historico_alterado: bool = False
+    cache_alterado: bool = False
+
+
+def mesclar_e_persistir(
+    registros_filtrados: Iterable[Record],
+    cache_path: str,
+    history_path: str,
+    dias_historico: int = 7,
+    key_fields: Sequence[str] = DEFAULT_KEY_FIELDS,
+    persistir: bool = True
+) -> ResultadoMescla:
+    """Mescla uma sincronização com o snapshot anterior e grava só o que mudou.
+
+    Dentro do lote novo a primeira ocorrência de cada chave continua valendo,
+    mas, entre sincronizações, a versão nova substitui a antiga quando a
+    impressão digital do conteúdo muda (ex.: ``status`` alterado na planilha).
+    Registros recentes que sumiram da planilha saem do cache (``removidos``);
+    o histórico nunca perde registros. Com ``persistir=False`` só calcula o
+    delta, sem gravar nada.
+    """
+    with medir('leitura_historico'):
+        historico = deduplicate_records(load_history(history_path), key_fields)
+        cache_anterior = deduplicate_records(load_cache(cache_path), key_fields)
+    with medir('particao'):
+        lote = anotar_impressoes(deduplicate_records(registros_filtrados, key_fields))
+        novos_historicos, recentes = partition_records_by_date(lote, dias_historico)
+
+    with medir('delta'):
+        delta = DeltaRegistros()
+        posicao_historico = {chave_registro(r, key_fields): pos for pos, r in enumerate(historico)}
+        cache_por_chave = {chave_registro(r, key_fields): r for r in cache_anterior}
+        chaves_lote = set()
+        historico_alterado = False
+
+        for registro in novos_historicos:
+            chave = chave_registro(registro, key_fields)
+            chaves_lote.add(chave)
+            posicao = posicao_historico.get(chave)
+            if posicao is not None:
+                if _impressao(historico[posicao]) != registro[CAMPO_IMPRESSAO]:
+                    historico[posicao] = registro
+                    delta.modificados.append(registro)
+                    historico_alterado = True
+                continue
+            posicao_historico[chave] = len(historico)
+            historico.append(registro)
+            historico_alterado = True
+            anterior = cache_por_chave.get(chave)
+            if anterior is None:
+                delta.adicionados.append(registro)
+            elif _impressao(anterior) != registro[CAMPO_IMPRESSAO]:
+                delta.modificados.append(registro)
+
+        for registro in recentes:
+            chave = chave_registro(registro, key_fields)
+            chaves_lote.add(chave)
+            anterior = cache_por_chave.get(chave)
+            if anterior is None:
+                delta.adicionados.append(registro)
+            elif _impressao(anterior) != registro[CAMPO_IMPRESSAO]:
+                delta.modificados.append(registro)
+
+        delta.removidos = [r for chave, r in cache_por_chave.items() if chave not in chaves_lote]
+        cache_alterado = [_impressao(r) for r in cache_anterior] != [r[CAMPO_IMPRESSAO] for r in recentes]
+
+    if persistir:
+        with medir('persistencia'):
+            if historico_alterado:
+                save_history(history_path, historico)
+            if cache_alterado:
+                save_cache(cache_path, recentes)
+    return ResultadoMescla(
+        registros=historico + recentes,
+        delta=delta,
+        historico_alterado=historico_alterado,
+        cache_alterado=cache_alterado,
+    )
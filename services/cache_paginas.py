@@ -0,0 +1,173 @@
+"""Cache de páginas renderizadas, com variante gzip e validadores HTTP.
+
+Entre duas sincronizações as páginas pesadas (mapa, semanal, localização,
+concluídas) dependem só da rota, dos parâmetros e da marca dos dados; a chave
+combina os três. ``CACHE_PAGINAS`` escolhe o backend: ``memoria`` (LRU no
+processo, padrão), ``disco`` (arquivos compartilhados entre workers) ou ``0``
+para desligar.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Iterable, Tuple
+
+NIVEL_GZIP = 6
+
+
+@dataclass(frozen=True)
+class PaginaEmCache:
+    corpo: bytes
+    mimetype: str
+    etag: str
+    ultima_modificacao: float
+    corpo_gzip: bytes | None = None
+
+    def com_gzip(self) -> 'PaginaEmCache':
+        if self.corpo_gzip is not None:
+            return self
+        return replace(self, corpo_gzip=gzip.compress(self.corpo, compresslevel=NIVEL_GZIP, mtime=0))
+
+
+def chave_pagina(rota: str, argumentos: Iterable[Tuple[str, str]], marca: str, *extras: object) -> str:
+    """Chave estável: parâmetros vazios são ignorados e a ordem deles não importa."""
+    normalizados = sorted((nome, valor.strip()) for nome, valor in argumentos if valor and valor.strip())
+    bruto = json.dumps([rota, normalizados, marca, [str(extra) for extra in extras]], ensure_ascii=False)
+    return hashlib.sha1(bruto.encode('utf-8')).hexdigest()
+
+
+class BackendMemoria:
+    """LRU no próprio processo."""
+
+    def __init__(self, max_itens: int = 128) -> None:
+        self.max_itens = max_itens
+        self._itens: OrderedDict[str, PaginaEmCache] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: str) -> PaginaEmCache | None:
+        with self._lock:
+            pagina = self._itens.get(chave)
+            if pagina is not None:
+                self._itens.move_to_end(chave)
+            return pagina
+
+    def guardar(self, chave: str, pagina: PaginaEmCache) -> None:
+        with self._lock:
+            self._itens[chave] = pagina
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+class BackendDisco:
+    """Um arquivo por página (cabeçalho JSON + corpo + gzip), gravado de forma atômica.
+
+    Vários workers podem ler e gravar o mesmo diretório; o acesso renova o
+    mtime do arquivo, e os menos usados são removidos quando o limite passa.
+    """
+
+    def __init__(self, diretorio: str, max_itens: int = 512) -> None:
+        self.diretorio = diretorio
+        self.max_itens = max_itens
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f'{chave}.pagina')
+
+    def obter(self, chave: str) -> PaginaEmCache | None:
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as handler:
+                cabecalho = json.loads(handler.readline())
+                corpo = handler.read(cabecalho['corpo'])
+                corpo_gzip = handler.read(cabecalho['gzip']) if cabecalho['gzip'] is not None else None
+            os.utime(caminho)
+        except (OSError, ValueError, KeyError):
+            return None
+        return PaginaEmCache(
+            corpo=corpo,
+            mimetype=cabecalho['mimetype'],
+            etag=cabecalho['etag'],
+            ultima_modificacao=cabecalho['ultima_modificacao'],
+            corpo_gzip=corpo_gzip,
+        )
+
+    def guardar(self, chave: str, pagina: PaginaEmCache) -> None:
+        cabecalho = {
+            'mimetype': pagina.mimetype,
+            'etag': pagina.etag,
+            'ultima_modificacao': pagina.ultima_modificacao,
+            'corpo': len(pagina.corpo),
+            'gzip': len(pagina.corpo_gzip) if pagina.corpo_gzip is not None else None,
+        }
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+            with os.fdopen(descritor, 'wb') as handler:
+                handler.write(json.dumps(cabecalho).encode('utf-8') + b'\n')
+                handler.write(pagina.corpo)
+                handler.write(pagina.corpo_gzip or b'')
+            os.replace(temporario, self._caminho(chave))
+            self._podar()
+        except OSError as exc:
+            print(f'[AVISO] Falha ao gravar página em cache: {exc}')
+
+    def _arquivos(self) -> list:
+        try:
+            nomes = [nome for nome in os.listdir(self.diretorio) if nome.endswith('.pagina')]
+        except OSError:
+            return []
+        return [os.path.join(self.diretorio, nome) for nome in nomes]
+
+    def _podar(self) -> None:
+        arquivos = self._arquivos()
+        # Folga de 10% para não listar e ordenar o diretório a cada gravação.
+        if len(arquivos) <= self.max_itens * 1.1:
+            return
+        def _mtime(caminho: str) -> float:
+            try:
+                return os.path.getmtime(caminho)
+            except OSError:
+                return 0.0
+        for caminho in sorted(arquivos, key=_mtime)[:len(arquivos) - self.max_itens]:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    def limpar(self) -> None:
+        for caminho in self._arquivos():
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._arquivos())
+
+
+Backend = BackendMemoria | BackendDisco
+
+
+def cache_paginas_do_ambiente(diretorio: str) -> Backend | None:
+    tipo = os.environ.get('CACHE_PAGINAS', 'memoria').strip().lower()
+    if tipo in ('0', 'off', 'desligado', ''):
+        return None
+    max_itens = int(os.environ.get('CACHE_PAGINAS_MAX', '0') or 0)
+    if tipo == 'disco':
+        return BackendDisco(diretorio, max_itens=max_itens or 512)
+    if tipo != 'memoria':
+        print(f"[AVISO] CACHE_PAGINAS={tipo!r} desconhecido; usando o cache em memória.")
+    return BackendMemoria(max_itens=max_itens or 128)
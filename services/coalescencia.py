@@ -0,0 +1,139 @@
+"""Coalescência de requisições (single-flight) para cálculos caros.
+
+Chamadas simultâneas com a mesma chave esperam a que já está em andamento e
+recebem o mesmo resultado (ou a mesma exceção). Com ``entre_processos`` a
+chamada líder também segura uma trava de arquivo (``fcntl``), e quem
+esperou por outro processo pode ler o resultado que ele deixou persistido
+em vez de refazer o trabalho. A trava guarda a chave de quem a segura: só
+reaproveita quem esperou pela mesma chave (as faixas de arquivos são
+compartilhadas entre chaves).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from services.instrumentacao import metricas
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class _Voo:
+    def __init__(self) -> None:
+        self.pronto = threading.Event()
+        self.resultado: Any = None
+        self.erro: BaseException | None = None
+
+
+class Coalescedor:
+    def __init__(self, diretorio_travas: str | None = None, faixas: int = 256, prefixo: str = 'voo') -> None:
+        self.diretorio_travas = diretorio_travas
+        self.faixas = faixas
+        # Coalescedores diferentes no mesmo diretório precisam de prefixos
+        # diferentes: ``flock`` bloqueia até entre descritores do mesmo processo.
+        self.prefixo = prefixo
+        self._voos: Dict[str, _Voo] = {}
+        self._lock = threading.Lock()
+
+    def em_andamento(self) -> int:
+        return len(self._voos)
+
+    def executar(
+        self,
+        chave: str,
+        funcao: Callable[[], Any],
+        entre_processos: bool = False,
+        apos_espera: Callable[[], Any] | None = None,
+        sucesso: Callable[[Any], bool] | None = None,
+    ) -> Any:
+        """Executa ``funcao`` uma vez por chave entre as chamadas simultâneas.
+
+        ``apos_espera`` substitui ``funcao`` quando a trava de arquivo estava
+        com outro processo: o trabalho já foi feito lá e basta aproveitá-lo.
+        ``sucesso(resultado)`` diz se um resultado que não levantou exceção
+        pode ser aproveitado assim (sem ele, qualquer retorno pode).
+        """
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave] = _Voo()
+        if not lider:
+            metricas.incrementar('mapa_coalescencia_total', papel='seguidor')
+            voo.pronto.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado
+        metricas.incrementar('mapa_coalescencia_total', papel='lider')
+        try:
+            if entre_processos and self.diretorio_travas and fcntl is not None:
+                voo.resultado = self._entre_processos(chave, funcao, apos_espera, sucesso)
+            else:
+                voo.resultado = funcao()
+            return voo.resultado
+        except BaseException as exc:
+            voo.erro = exc
+            raise
+        finally:
+            with self._lock:
+                self._voos.pop(chave, None)
+            voo.pronto.set()
+
+    def _caminho_trava(self, chave: str) -> str:
+        # Faixas fixas de arquivos: as travas não se acumulam no diretório.
+        faixa = int(hashlib.sha1(chave.encode('utf-8')).hexdigest(), 16) % self.faixas
+        return os.path.join(self.diretorio_travas, f'{self.prefixo}-{faixa:03d}.lock')
+
+    def _entre_processos(
+        self,
+        chave: str,
+        funcao: Callable[[], Any],
+        apos_espera: Callable[[], Any] | None,
+        sucesso: Callable[[Any], bool] | None,
+    ) -> Any:
+        os.makedirs(self.diretorio_travas, exist_ok=True)
+        with open(self._caminho_trava(chave), 'a+', encoding='utf-8') as trava:
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                esperou = False
+            except BlockingIOError:
+                metricas.incrementar('mapa_coalescencia_total', papel='espera_processo')
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                esperou = True
+            try:
+                trava.seek(0)
+                mesma_chave = esperou and trava.read() == chave
+                _anotar(trava, chave)
+                if mesma_chave and apos_espera is not None:
+                    return apos_espera()
+                try:
+                    resultado = funcao()
+                except BaseException:
+                    # Falhou: quem espera por esta chave não tem o que reaproveitar.
+                    _anotar(trava, '')
+                    raise
+                if sucesso is not None and not sucesso(resultado):
+                    _anotar(trava, '')
+                return resultado
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+
+def _anotar(trava, chave: str) -> None:
+    trava.truncate(0)
+    trava.write(chave)
+    trava.flush()
+
+
+def coalescedor_sincronizacao(diretorio_travas: str | None) -> Coalescedor:
+    """Trava própria da sincronização (app, ``sync_dropbox`` e ``compactar_historico``).
+
+    Fica fora das faixas compartilhadas: uma página sendo renderizada nunca
+    segura a sincronização.
+    """
+    return Coalescedor(diretorio_travas, faixas=1, prefixo='sincronizacao')
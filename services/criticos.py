@@ -0,0 +1,86 @@
+"""Resumo dos status críticos (SEM PEP, ABER/LOG, SEM STATUS) por PEP/NOTA.
+
+Cada fragmento de base guarda o resumo por (mês, semana); a visão sem filtro
+de base mescla os resumos das bases em vez de reagrupar todos os registros.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+CRITICAL_STATUSES = frozenset({'SEM PEP', 'ABER/LOG', 'SEM STATUS'})
+NOMES_BASES = {'BCB': 'BACABAL', 'ITM': 'ITAPECURU MIRIM', 'STI': 'SANTA INES'}
+ORDEM_BASES = ('BCB', 'ITM', 'STI')
+SEM_BASE_NOME = '-'
+
+# chave PEP/NOTA -> (data para ordenação, item exibido)
+Digesto = Dict[str, Tuple[datetime, dict]]
+
+
+def condicao_do_registro(registro: dict) -> str:
+    return str(registro.get('condicao') or '-').strip().upper()
+
+
+def eh_critico(registro: dict) -> bool:
+    return condicao_do_registro(registro) in CRITICAL_STATUSES
+
+
+def _data_ordenacao(data_str: str) -> datetime:
+    base = data_str.replace('T', ' ').split(' ')[0]
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(base, formato)
+        except ValueError:
+            continue
+    return datetime.max
+
+
+def agregar_criticos(registros: Iterable[dict], base: str = '') -> Digesto:
+    """Mantém, para cada PEP (ou NOTA, sem PEP), a ocorrência crítica mais antiga."""
+    agregados: Digesto = {}
+    for registro in registros:
+        condicao = condicao_do_registro(registro)
+        if condicao not in CRITICAL_STATUSES:
+            continue
+        pep = str(registro.get('pep') or '').strip()
+        nota = str(registro.get('nota') or '').strip()
+        chave = pep if pep and pep != '-' else nota
+        if not chave:
+            chave = f"REGISTRO-{registro.get('id', len(agregados) + 1)}"
+        data_str = str(registro.get('data') or '').strip()
+        data_obj = _data_ordenacao(data_str) if data_str else datetime.max
+        existente = agregados.get(chave)
+        if not existente or data_obj < existente[0]:
+            agregados[chave] = (data_obj, {
+                'pep': pep or '-',
+                'nota': nota or '-',
+                'data': data_str or '-',
+                'condicao': condicao,
+                'local': registro.get('local') or '-',
+                'equipe': registro.get('equipe') or '-',
+                'base_nome': NOMES_BASES.get(base or registro.get('_base') or '', SEM_BASE_NOME),
+            })
+    return agregados
+
+
+def ordenar_digesto(digesto: Digesto) -> List[dict]:
+    return [item for _, item in sorted(digesto.values(), key=lambda par: par[0])]
+
+
+def mesclar_digestos(digestos: Iterable[Digesto]) -> Digesto:
+    mesclado: Digesto = {}
+    for digesto in digestos:
+        for chave, par in digesto.items():
+            existente = mesclado.get(chave)
+            if existente is None or par[0] < existente[0]:
+                mesclado[chave] = par
+    return mesclado
+
+
+def agrupar_criticos_por_base(itens: Iterable[dict]) -> List[dict]:
+    """Itens já ordenados, agrupados na ordem fixa das bases e com ``-`` por último."""
+    grupos: Dict[str, List[dict]] = {NOMES_BASES[base]: [] for base in ORDEM_BASES}
+    grupos[SEM_BASE_NOME] = []
+    for item in itens:
+        grupos.setdefault(item['base_nome'], []).append(item)
+    return [{'base': nome, 'itens': lista} for nome, lista in grupos.items() if lista]
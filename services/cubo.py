@@ -0,0 +1,115 @@
+"""Cubo de agregados das concluídas: base × status × semana de início × semana de conclusão × mês.
+
+Montado uma vez por versão dos dados (ver ``services.derivados``). Cada célula
+guarda contagem, somas de valor e andamento, soma/contagem/máximo da duração,
+as pendências e a posição da primeira linha, que permite reproduzir a ordem
+de desempate do cálculo linha a linha. As consultas só percorrem células.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# (base, status, semana de início, semana de conclusão, mês 'AAAA-MM'); textos já sem espaços.
+Chave = Tuple[str, str, Optional[int], Optional[int], Optional[str]]
+DIMENSOES = ('base', 'status', 'inic_sem', 'conc_sem', 'mes')
+
+
+@dataclass
+class Celula:
+    total: int = 0
+    valor: float = 0.0
+    andamento: float = 0.0
+    duracao_soma: int = 0
+    duracao_n: int = 0
+    duracao_max: int = 0
+    primeira: int = -1
+    pendencias: List[Tuple[int, dict]] = field(default_factory=list)
+
+    def somar(self, outra: 'Celula') -> None:
+        self.total += outra.total
+        self.valor += outra.valor
+        self.andamento += outra.andamento
+        self.duracao_soma += outra.duracao_soma
+        self.duracao_n += outra.duracao_n
+        self.duracao_max = max(self.duracao_max, outra.duracao_max)
+        if self.primeira < 0 or 0 <= outra.primeira < self.primeira:
+            self.primeira = outra.primeira
+        self.pendencias.extend(outra.pendencias)
+
+    @property
+    def media_dias(self) -> float:
+        return round(self.duracao_soma / self.duracao_n, 1) if self.duracao_n else 0
+
+
+class CuboConcluidas:
+    def __init__(self) -> None:
+        self.celulas: Dict[Chave, Celula] = {}
+        self.linhas = 0
+
+    def adicionar(
+        self,
+        chave: Chave,
+        valor: float,
+        andamento: float,
+        duracao: int | None = None,
+        pendencia: dict | None = None,
+    ) -> None:
+        """``valor`` já é o total da obra (valor + andamento), como no painel."""
+        celula = self.celulas.get(chave)
+        if celula is None:
+            celula = self.celulas[chave] = Celula(primeira=self.linhas)
+        celula.total += 1
+        celula.valor += valor
+        celula.andamento += andamento
+        if duracao is not None:
+            celula.duracao_soma += duracao
+            celula.duracao_n += 1
+            celula.duracao_max = max(celula.duracao_max, duracao)
+        if pendencia is not None:
+            celula.pendencias.append((self.linhas, pendencia))
+        self.linhas += 1
+
+    def fatiar(
+        self,
+        base: str = '',
+        status: str = '',
+        inic_sem: int | None = None,
+        conc_sem: int | None = None,
+        meses: Tuple[str | None, str | None] | None = None,
+    ) -> Iterator[Tuple[Chave, Celula]]:
+        """Células que passam nos filtros (base/status sem diferenciar maiúsculas).
+
+        ``meses`` é um intervalo fechado ``(primeiro, último)`` em ``AAAA-MM``,
+        com ``None`` para aberto; com ele, células sem mês ficam de fora.
+        """
+        base, status = base.upper(), status.upper()
+        for chave, celula in self.celulas.items():
+            base_chave, status_chave, inic_chave, conc_chave, mes = chave
+            if base and base_chave.upper() != base:
+                continue
+            if status and status_chave.upper() != status:
+                continue
+            if inic_sem and inic_chave != inic_sem:
+                continue
+            if conc_sem and conc_chave != conc_sem:
+                continue
+            if meses is not None:
+                if mes is None or (meses[0] and mes < meses[0]) or (meses[1] and mes > meses[1]):
+                    continue
+            yield chave, celula
+
+    @staticmethod
+    def agrupar(celulas: Iterable[Tuple[Chave, Celula]], por: Callable[[Chave], Hashable]) -> Dict[Hashable, Celula]:
+        grupos: Dict[Hashable, Celula] = {}
+        for chave, celula in celulas:
+            grupo = grupos.get(por(chave))
+            if grupo is None:
+                grupo = grupos[por(chave)] = Celula()
+            grupo.somar(celula)
+        return grupos
+
+    @staticmethod
+    def ordem_das_linhas(grupos: Dict[Hashable, Celula]) -> List[Hashable]:
+        """Grupos na ordem da primeira linha de cada um (a ordem de inserção linha a linha)."""
+        return sorted(grupos, key=lambda grupo: grupos[grupo].primeira)
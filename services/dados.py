@@ -0,0 +1,210 @@
+"""Repositório em memória dos registros de programação e concluídas."""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+from services.fragmentos import (
+    FragmentoBase,
+    agrupar_concluidas_por_base,
+    agrupar_por_base,
+    base_da_obra,
+    base_do_registro,
+    fragmentar,
+)
+
+Carregador = Callable[[], Tuple[List[dict], List[dict]]]
+Marcador = Callable[[], str]
+
+
+class RepositorioDados:
+    """Mantém os registros carregados e a versão dos dados.
+
+    O carregamento é adiado até o primeiro acesso (ou disparado em segundo
+    plano), e cada substituição incrementa ``versao`` para que agregados
+    derivados saibam quando precisam ser recalculados. Os registros também
+    ficam fragmentados por base (ver ``services.fragmentos``).
+
+    ``marca`` identifica o conteúdo entre processos: enquanto os dados em
+    memória corresponderem aos arquivos persistidos, ela vem do ``marcador``
+    (ex.: mtimes dos caches); depois de uma alteração só em memória, passa a
+    ser própria do processo.
+    """
+
+    def __init__(self, carregador: Carregador | None = None, marcador: Marcador | None = None) -> None:
+        self._carregador = carregador
+        self._marcador = marcador
+        self._marca: str | None = None
+        self._lock = threading.RLock()
+        self._carregado = carregador is None
+        self._projetos: List[dict] = []
+        self._concluidas: List[dict] = []
+        self._fragmentos: Dict[str, FragmentoBase] = fragmentar([])
+        self._concluidas_por_base: Dict[str, List[dict]] = {}
+        self._thread: threading.Thread | None = None
+        self.versao = 0
+        self.atualizado_em = 0.0
+
+    @property
+    def carregado(self) -> bool:
+        return self._carregado
+
+    def garantir_carregado(self) -> None:
+        if self._carregado:
+            return
+        with self._lock:
+            if self._carregado:
+                return
+            self._carregar()
+
+    def recarregar(self) -> int:
+        """Relê tudo pelo carregador (ex.: outro processo acabou de persistir dados novos)."""
+        if self._carregador is None:
+            return self.versao
+        with self._lock:
+            self._carregar()
+            return self.versao
+
+    def _carregar(self) -> None:
+        # A marca é lida antes dos arquivos: se eles mudarem durante a
+        # leitura, a marca antiga só causa uma falta de cache a mais.
+        marca = self._marcador() if self._marcador else None
+        projetos, concluidas = self._carregador() if self._carregador else ([], [])
+        self._definir_projetos(projetos)
+        self._definir_concluidas(concluidas)
+        self._carregado = True
+        self._marcar_alteracao()
+        self._marca = marca
+
+    def carregar_em_segundo_plano(self) -> threading.Thread | None:
+        if self._carregado:
+            return None
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._carregar_seguro, name='carregamento-dados', daemon=True
+                )
+                self._thread.start()
+            return self._thread
+
+    def _carregar_seguro(self) -> None:
+        try:
+            self.garantir_carregado()
+        except Exception as exc:  # noqa: BLE001
+            print(f'[ERRO] Falha ao carregar dados em segundo plano: {exc}')
+
+    @property
+    def projetos(self) -> List[dict]:
+        self.garantir_carregado()
+        return self._projetos
+
+    @property
+    def concluidas(self) -> List[dict]:
+        self.garantir_carregado()
+        return self._concluidas
+
+    @property
+    def marca(self) -> str:
+        return self._marca or f'local-{os.getpid()}-{id(self)}-{self.versao}'
+
+    def definir_marca(self, marca: str | None) -> None:
+        """Associa a versão atual a uma marca compartilhada (após persistir os dados)."""
+        self._marca = marca
+
+    def tamanhos(self) -> dict:
+        """Contagem de registros sem forçar o carregamento."""
+        return {'programacao': len(self._projetos), 'concluidas': len(self._concluidas)}
+
+    def substituir(self, projetos: List[dict] | None = None, concluidas: List[dict] | None = None) -> int:
+        with self._lock:
+            if projetos is None or concluidas is None:
+                self.garantir_carregado()
+            if projetos is not None:
+                self._definir_projetos(projetos)
+            if concluidas is not None:
+                self._definir_concluidas(concluidas)
+            self._carregado = True
+            return self._marcar_alteracao()
+
+    def aplicar_delta(
+        self,
+        adicionados: Iterable[dict],
+        modificados: Iterable[dict],
+        removidos: Iterable[dict],
+        chave: Callable[[dict], Hashable],
+    ) -> int:
+        """Aplica um delta de sincronização aos projetos em memória, sem recarregar tudo."""
+        with self._lock:
+            self.garantir_carregado()
+            removidos_lista = list(removidos)
+            remover = {chave(registro) for registro in removidos_lista}
+            substituir = {chave(registro): registro for registro in modificados}
+            novos = list(adicionados)
+            if not (remover or substituir or novos):
+                return self.versao
+            afetadas = {
+                base_do_registro(registro)
+                for grupo in (novos, substituir.values(), removidos_lista)
+                for registro in grupo
+            }
+            projetos: List[dict] = []
+            for registro in self._projetos:
+                atual = chave(registro)
+                if atual in remover:
+                    continue
+                projetos.append(substituir.pop(atual, registro))
+            projetos.extend(substituir.values())
+            projetos.extend(novos)
+            self._projetos = projetos
+            self._refragmentar(afetadas)
+            return self._marcar_alteracao()
+
+    def recarregar_base(self, base: str, registros: Iterable[dict]) -> int:
+        """Troca só os registros de uma base; os fragmentos das outras bases não mudam."""
+        with self._lock:
+            self.garantir_carregado()
+            outros = [registro for registro in self._projetos if base_do_registro(registro) != base]
+            self._projetos = outros + list(registros)
+            self._refragmentar({base})
+            return self._marcar_alteracao()
+
+    def fragmento(self, base: str) -> FragmentoBase:
+        self.garantir_carregado()
+        fragmento = self._fragmentos.get(base)
+        return fragmento if fragmento is not None else FragmentoBase(base, [])
+
+    def fragmentos(self) -> Dict[str, FragmentoBase]:
+        self.garantir_carregado()
+        return dict(self._fragmentos)
+
+    def concluidas_da_base(self, base: str) -> List[dict]:
+        self.garantir_carregado()
+        return self._concluidas_por_base.get(base_da_obra({'base': base}), [])
+
+    def _definir_projetos(self, projetos: List[dict]) -> None:
+        self._projetos = projetos
+        self._fragmentos = fragmentar(projetos)
+
+    def _definir_concluidas(self, concluidas: List[dict]) -> None:
+        self._concluidas = concluidas
+        self._concluidas_por_base = agrupar_concluidas_por_base(concluidas)
+
+    def _refragmentar(self, bases: Iterable[str]) -> None:
+        bases = set(bases)
+        if not bases:
+            return
+        grupos = agrupar_por_base(
+            (registro for registro in self._projetos if base_do_registro(registro) in bases), bases
+        )
+        fragmentos = dict(self._fragmentos)
+        for base in bases:
+            fragmentos[base] = FragmentoBase(base, grupos.get(base, []))
+        self._fragmentos = fragmentos
+
+    def _marcar_alteracao(self) -> int:
+        self.versao += 1
+        self._marca = None
+        self.atualizado_em = time.time()
+        return self.versao
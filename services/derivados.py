@@ -0,0 +1,64 @@
+"""Registro de dados derivados, recalculados só quando a versão dos dados muda.
+
+Cada agregado registra um construtor que recebe o ``RepositorioDados``; o
+valor fica guardado junto com a ``versao`` usada para calculá-lo e só é
+reconstruído depois de uma nova substituição ou delta.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+from services.dados import RepositorioDados
+from services.instrumentacao import medir
+
+Construtor = Callable[[RepositorioDados], Any]
+
+
+class RegistroDerivados:
+    def __init__(self, dados: RepositorioDados) -> None:
+        self.dados = dados
+        self._construtores: Dict[str, Construtor] = {}
+        self._valores: Dict[str, Tuple[int, Any]] = {}
+        self._lock = threading.RLock()
+
+    def registrar(self, nome: str) -> Callable[[Construtor], Construtor]:
+        def decorador(construtor: Construtor) -> Construtor:
+            with self._lock:
+                self._construtores[nome] = construtor
+                self._valores.pop(nome, None)
+            return construtor
+        return decorador
+
+    def obter(self, nome: str) -> Any:
+        self.dados.garantir_carregado()
+        versao = self.dados.versao
+        guardado = self._valores.get(nome)
+        if guardado is not None and guardado[0] == versao:
+            return guardado[1]
+        with self._lock:
+            guardado = self._valores.get(nome)
+            versao = self.dados.versao
+            if guardado is not None and guardado[0] == versao:
+                return guardado[1]
+            with medir('derivado', agregado=nome):
+                valor = self._construtores[nome](self.dados)
+            # Se os dados mudarem durante o cálculo, a versão antiga gravada
+            # aqui força um novo cálculo no próximo acesso.
+            self._valores[nome] = (versao, valor)
+            return valor
+
+    def aquecer(self) -> None:
+        """Recalcula todos os agregados desatualizados (ex.: logo após uma sincronização)."""
+        for nome in list(self._construtores):
+            self.obter(nome)
+
+    def versoes(self) -> Dict[str, int]:
+        return {nome: versao for nome, (versao, _) in self._valores.items()}
+
+    def invalidar(self, nome: str | None = None) -> None:
+        with self._lock:
+            if nome is None:
+                self._valores.clear()
+            else:
+                self._valores.pop(nome, None)
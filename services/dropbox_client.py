@@ -2,13 +2,24 @@
 from __future__ import annotations
 
 import json
+import os
+import tempfile
+import threading
 import time
 from dataclasses import dataclass, field
 from io import BytesIO
-from typing import Dict, Iterable, Iterator, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
 
 import requests
 
+from services.coalescencia import Coalescedor
+
+TOKEN_URL = 'https://api.dropboxapi.com/oauth2/token'
+API_URL = 'https://api.dropboxapi.com/2'
+NOTIFY_URL = 'https://notify.dropboxapi.com/2'
+CONTENT_URL = 'https://content.dropboxapi.com/2'
+
+
 @dataclass
 class DropboxSettings:
     controle_path: str
@@ -19,6 +30,42 @@ class DropboxSettings:
     refresh_token: str | None = None
     app_key: str | None = None
     app_secret: str | None = None
+    token_url: str = TOKEN_URL
+    api_url: str = API_URL
+    notify_url: str = NOTIFY_URL
+    content_url: str = CONTENT_URL
+
+
+DEFAULT_CONTROLE_PATH = '/Controle - Obras.xlsx'
+
+
+def normalize_path(path: str | None) -> str | None:
+    if not path:
+        return None
+    valor = path.strip()
+    if not valor:
+        return None
+    return valor if valor.startswith('/') else f'/{valor}'
+
+
+def settings_from_env(environ=os.environ) -> DropboxSettings:
+    """Configuração lida das mesmas variáveis ``DROPBOX_*`` usadas pelo app.
+
+    ``DROPBOX_*_URL`` apontam o cliente para outro servidor (ex.: o Dropbox
+    falso dos testes de carga).
+    """
+    return DropboxSettings(
+        controle_path=normalize_path(environ.get('DROPBOX_CONTROLE_PATH')) or DEFAULT_CONTROLE_PATH,
+        access_token=environ.get('DROPBOX_ACCESS_TOKEN'),
+        refresh_token=environ.get('DROPBOX_REFRESH_TOKEN'),
+        app_key=environ.get('DROPBOX_APP_KEY'),
+        app_secret=environ.get('DROPBOX_APP_SECRET'),
+        token_url=environ.get('DROPBOX_TOKEN_URL') or TOKEN_URL,
+        api_url=environ.get('DROPBOX_API_URL') or API_URL,
+        notify_url=environ.get('DROPBOX_NOTIFY_URL') or NOTIFY_URL,
+        content_url=environ.get('DROPBOX_CONTENT_URL') or CONTENT_URL,
+    )
+
 
 @dataclass
 class TokenCache:
@@ -29,12 +76,88 @@ class TokenCache:
         return bool(self.token) and self.expires_at > time.time()
 
 
+@dataclass
+class SharedTokenCache(TokenCache):
+    """TokenCache gravado em arquivo e compartilhado por todos os processos.
+
+    A renovação é coalescida entre threads e, com a trava de arquivo, entre
+    processos: quem chega depois relê o arquivo em vez de chamar o OAuth de
+    novo. Quando faltam menos de ``refresh_margin`` segundos para expirar, o
+    token atual continua sendo usado e a renovação acontece em segundo plano.
+    """
+
+    path: str = ''
+    refresh_margin: float = 300.0
+    _coalescedor: Coalescedor = field(init=False, repr=False, compare=False)
+    _background: threading.Thread | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._coalescedor = Coalescedor(os.path.dirname(self.path) or '.', faixas=1, prefixo='dropbox-token')
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as handler:
+                payload = json.load(handler)
+        except (OSError, ValueError):
+            return self.valid()
+        expires_at = float(payload.get('expires_at') or 0)
+        if payload.get('access_token') and expires_at > self.expires_at:
+            self.token = payload['access_token']
+            self.expires_at = expires_at
+        return self.valid()
+
+    def store(self) -> None:
+        diretorio = os.path.dirname(self.path) or '.'
+        os.makedirs(diretorio, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+        with os.fdopen(descritor, 'w', encoding='utf-8') as handler:
+            json.dump({'access_token': self.token, 'expires_at': self.expires_at}, handler)
+        os.chmod(temporario, 0o600)
+        os.replace(temporario, self.path)
+
+    def fresh(self) -> bool:
+        return self.valid() and self.expires_at - time.time() >= self.refresh_margin
+
+    def access_token(self, settings: DropboxSettings) -> str:
+        if not self.valid() and not self.load():
+            return self.refresh(settings)
+        if not self.fresh():
+            self._refresh_in_background(settings)
+        return self.token or ''
+
+    def refresh(self, settings: DropboxSettings) -> str:
+        return self._coalescedor.executar(
+            'dropbox-token', lambda: self._refresh_if_stale(settings), entre_processos=True
+        )
+
+    def _refresh_if_stale(self, settings: DropboxSettings) -> str:
+        if self.load() and self.fresh():
+            return self.token or ''
+        _renew_token(settings, self)
+        self.store()
+        return self.token or ''
+
+    def _refresh_in_background(self, settings: DropboxSettings) -> None:
+        if self._background is not None and self._background.is_alive():
+            return
+        self._background = threading.Thread(
+            target=self._refresh_safely, args=(settings,), name='dropbox-token', daemon=True
+        )
+        self._background.start()
+
+    def _refresh_safely(self, settings: DropboxSettings) -> None:
+        try:
+            self.refresh(settings)
+        except Exception as exc:  # noqa: BLE001
+            print(f'[AVISO] Falha ao renovar o token Dropbox em segundo plano: {exc}')
+
+
 def _renew_token(settings: DropboxSettings, cache: TokenCache) -> str:
     if not (settings.refresh_token and settings.app_key and settings.app_secret):
         raise RuntimeError('Nenhum token Dropbox configurado. Defina refresh token ou access token direto.')
 
     response = requests.post(
-        'https://api.dropboxapi.com/oauth2/token',
+        settings.token_url,
         data={'grant_type': 'refresh_token', 'refresh_token': settings.refresh_token},
         auth=(settings.app_key, settings.app_secret),
         timeout=30
@@ -48,6 +171,8 @@ def _renew_token(settings: DropboxSettings, cache: TokenCache) -> str:
 
 
 def get_access_token(settings: DropboxSettings, cache: TokenCache) -> str:
+    if isinstance(cache, SharedTokenCache) and settings.refresh_token:
+        return cache.access_token(settings)
     if cache.valid():
         return cache.token or ''
     if settings.refresh_token:
@@ -59,8 +184,8 @@ def get_access_token(settings: DropboxSettings, cache: TokenCache) -> str:
     raise RuntimeError('Nenhum token Dropbox configurado. Defina refresh token ou access token direto.')
 
 
-def download_file(path: str, token: str) -> BytesIO:
-    url = 'https://content.dropboxapi.com/2/files/download'
+def download_file(path: str, token: str, content_url: str = CONTENT_URL) -> BytesIO:
+    url = f"{content_url.rstrip('/')}/files/download"
     headers = {
         'Authorization': f'Bearer {token}',
         'Dropbox-API-Arg': json.dumps({'path': path})
@@ -77,4 +202,182 @@ def iter_excel_files(settings: DropboxSettings, cache: TokenCache) -> Iterator[T
         return
     for chave, nome in settings.files.items():
         caminho = f"{settings.folder_path.rstrip('/')}/{nome}"
-        yield chave, download_file(caminho, token)
+        yield chave, download_file(caminho, token, settings.content_url)
+
+
+class CursorReset(RuntimeError):
+    """O Dropbox recusou o cursor (409 ``reset``/expirado): é preciso pedir outro."""
+
+
+def _post_api(settings: DropboxSettings, token: str, endpoint: str, payload: dict) -> dict:
+    response = requests.post(
+        f"{settings.api_url.rstrip('/')}/{endpoint}",
+        headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'},
+        data=json.dumps(payload),
+        timeout=60
+    )
+    if response.status_code == 409 and endpoint == 'files/list_folder/continue':
+        raise CursorReset(f'Cursor recusado em {endpoint}: {response.text}')
+    if response.status_code != 200:
+        raise RuntimeError(f'Falha em {endpoint}: {response.text}')
+    return response.json()
+
+
+def file_metadata(settings: DropboxSettings, token: str, path: str) -> dict:
+    return _post_api(settings, token, 'files/get_metadata', {'path': path})
+
+
+def latest_cursor(settings: DropboxSettings, token: str, folder: str) -> str:
+    payload = _post_api(settings, token, 'files/list_folder/get_latest_cursor', {'path': folder, 'recursive': False})
+    return payload['cursor']
+
+
+def list_changes(settings: DropboxSettings, token: str, cursor: str) -> Tuple[List[dict], str]:
+    """Entradas alteradas desde ``cursor`` (seguindo ``has_more``) e o cursor novo."""
+    entries: List[dict] = []
+    while True:
+        payload = _post_api(settings, token, 'files/list_folder/continue', {'cursor': cursor})
+        entries.extend(payload.get('entries') or [])
+        cursor = payload['cursor']
+        if not payload.get('has_more'):
+            return entries, cursor
+
+
+def longpoll(settings: DropboxSettings, cursor: str, timeout: int = 120) -> Tuple[bool, int]:
+    """Bloqueia até haver mudanças na pasta do ``cursor``; devolve (mudou, backoff em segundos).
+
+    O endpoint de longpoll não usa autenticação.
+    """
+    response = requests.post(
+        f"{settings.notify_url.rstrip('/')}/files/list_folder/longpoll",
+        headers={'Content-Type': 'application/json'},
+        data=json.dumps({'cursor': cursor, 'timeout': timeout}),
+        timeout=timeout + 90
+    )
+    if response.status_code == 409:
+        raise CursorReset(f'Cursor recusado no longpoll: {response.text}')
+    if response.status_code != 200:
+        raise RuntimeError(f'Falha no longpoll: {response.text}')
+    payload = response.json()
+    return bool(payload.get('changes')), int(payload.get('backoff') or 0)
+
+
+def watched_paths(settings: DropboxSettings) -> Dict[str, Set[str]]:
+    """Arquivos observados (em minúsculas, como ``path_lower``) agrupados por pasta."""
+    paths = [settings.controle_path] if settings.controle_path else []
+    if settings.folder_path:
+        paths.extend(f"{settings.folder_path.rstrip('/')}/{nome}" for nome in settings.files.values())
+    folders: Dict[str, Set[str]] = {}
+    for path in paths:
+        lower = path.lower()
+        folder = lower.rsplit('/', 1)[0]
+        folders.setdefault(folder, set()).add(lower)
+    return folders
+
+
+class DropboxWatcher:
+    """Dispara ``on_change`` quando algum arquivo observado muda no Dropbox.
+
+    Uma thread por pasta fica no longpoll com o cursor de ``list_folder``; ao
+    haver mudança, ``list_folder/continue`` diz quais arquivos mudaram e só os
+    observados contam. As mudanças são agrupadas (``debounce`` segundos sem
+    novidade antes de disparar), o ``backoff`` pedido pelo Dropbox é
+    respeitado e erros esperam em progressão exponencial até ``max_backoff``.
+    Se o Dropbox recusar o cursor, um novo é pedido e todos os arquivos da
+    pasta são dados como alterados (as mudanças do intervalo se perderam).
+    """
+
+    def __init__(
+        self,
+        settings: DropboxSettings,
+        cache: TokenCache,
+        on_change: Callable[[List[str]], None],
+        debounce: float = 10.0,
+        longpoll_timeout: int = 120,
+        max_backoff: float = 300.0,
+    ) -> None:
+        self.settings = settings
+        self.cache = cache
+        self.on_change = on_change
+        self.debounce = debounce
+        self.longpoll_timeout = longpoll_timeout
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._pending: Set[str] = set()
+        self._deadline: float | None = None
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self.triggers = 0
+
+    def start(self) -> None:
+        for folder, paths in watched_paths(self.settings).items():
+            thread = threading.Thread(
+                target=self._watch_folder, args=(folder, paths), name=f'dropbox-watch:{folder}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        dispatcher = threading.Thread(target=self._dispatch_loop, name='dropbox-watch-dispatch', daemon=True)
+        dispatcher.start()
+        self._threads.append(dispatcher)
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wait(self) -> None:
+        while not self._stop.wait(1.0):
+            pass
+
+    def _sleep(self, seconds: float) -> None:
+        self._stop.wait(seconds)
+
+    def _watch_folder(self, folder: str, paths: Set[str]) -> None:
+        cursor: str | None = None
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                token = get_access_token(self.settings, self.cache)
+                if cursor is None:
+                    cursor = latest_cursor(self.settings, token, folder or '')
+                changes, backoff = longpoll(self.settings, cursor, self.longpoll_timeout)
+                if changes:
+                    entries, cursor = list_changes(self.settings, token, cursor)
+                    changed = {entry.get('path_lower') for entry in entries} & paths
+                    if changed:
+                        self._schedule(changed)
+                failures = 0
+                if backoff:
+                    self._sleep(backoff)
+            except CursorReset as exc:
+                print(f'[AVISO] Cursor de {folder or "/"} recusado pelo Dropbox ({exc}); sincronizando de novo')
+                cursor = None
+                self._schedule(paths)
+            except Exception as exc:  # noqa: BLE001
+                failures += 1
+                wait = min(self.max_backoff, 2 ** (failures - 1))
+                print(f'[AVISO] Observação de {folder or "/"} falhou ({exc}); nova tentativa em {wait:.0f}s')
+                self._sleep(wait)
+
+    def _schedule(self, paths: Iterable[str]) -> None:
+        with self._condition:
+            self._pending.update(paths)
+            self._deadline = time.monotonic() + self.debounce
+            self._condition.notify_all()
+
+    def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            with self._condition:
+                while not self._stop.is_set() and (self._deadline is None or time.monotonic() < self._deadline):
+                    timeout = None if self._deadline is None else self._deadline - time.monotonic()
+                    self._condition.wait(timeout)
+                if self._stop.is_set():
+                    return
+                changed, self._pending, self._deadline = sorted(self._pending), set(), None
+            self.triggers += 1
+            try:
+                self.on_change(changed)
+            except Exception as exc:  # noqa: BLE001
+                print(f'[AVISO] Falha ao sincronizar após mudança no Dropbox: {exc}')
@@ -1,28 +1,30 @@
 """Funções utilitárias relacionadas a equipes."""
 from __future__ import annotations
 
-from typing import Iterable, List, Sequence
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Sequence
 
+from services.normalizacao import (
+    BASE_PREFIXES,
+    normalizar_codigo_equipe,
+    precomputar_tabela_equipes,
+)
+
+ALLOWED_EQUIPES: List[str] = [
+    'MA-BCB-O001M', 'MA-BCB-O002M', 'MA-BCB-O003M', 'MA-BCB-O004M',
+    'MA-BCB-O005M', 'MA-BCB-O006M', 'MA-BCB-T001M', 'MA-ITM-O001M',
+    'MA-ITM-O002M', 'MA-ITM-O003M', 'MA-ITM-O004M', 'MA-STI-T001M',
+    'MA-STI-O001M', 'MA-STI-O002M', 'MA-STI-O003M', 'MA-STI-O004M'
+]
+
+
+@lru_cache(maxsize=32)
+def _equipes_normalizadas(equipes_permitidas: tuple[str, ...]) -> FrozenSet[str]:
+    return frozenset(precomputar_tabela_equipes(equipes_permitidas).values())
 
-def normalizar_codigo_equipe(equipe: str | None) -> str:
-    if not equipe:
-        return ''
-    codigo = str(equipe).strip().upper().replace(' ', '')
-    if 'MA-STI-000' in codigo:
-        codigo = codigo.replace('MA-STI-000', 'MA-STI-O00')
-    if codigo.startswith('MA-STI-0'):
-        codigo = codigo.replace('0M', 'OM', 1)
-    partes = codigo.split('-')
-    if len(partes) >= 3:
-        prefixo = '-'.join(partes[:2])
-        sufixo = '-'.join(partes[2:])
-        if sufixo and sufixo[0] == '0':
-            sufixo = 'O' + sufixo[1:]
-        codigo = f"{prefixo}-{sufixo}"
-    return codigo
 
 def filtrar_registros_por_equipes(registros: Iterable[dict], equipes_permitidas: Sequence[str]) -> List[dict]:
-    equipes_normalizadas = {normalizar_codigo_equipe(eq): normalizar_codigo_equipe(eq) for eq in equipes_permitidas}
+    equipes_normalizadas = _equipes_normalizadas(tuple(equipes_permitidas))
     saida: List[dict] = []
     for registro in registros:
         equipe = normalizar_codigo_equipe(registro.get('equipe'))
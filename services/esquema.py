@@ -0,0 +1,178 @@
+"""Esquema das colunas das planilhas: nomes canônicos e tipo de cada coluna.
+
+Sem dependência de pandas, para que o app possa tipar registros lidos dos
+caches JSON sem carregar a pilha de planilhas.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Sequence
+
+COLUMN_MAP = {
+    'ID': 'id',
+    'DATA': 'data',
+    'PERÍODO': 'periodo',
+    'PERIODO': 'periodo',
+    'TIPO': 'tipo',
+    'EQUIPE': 'equipe',
+    'BASE': 'base',
+    'OBRA': 'obra',
+    'ENCARREGADO': 'encarregado',
+    'SUPERVISOR': 'supervisor',
+    'COM LV': 'com_lv',
+    'SI/NR': 'si_inc',
+    'SI/INC': 'si_inc',
+    'PEP': 'pep',
+    'NOTA': 'nota',
+    'LOCAL': 'local',
+    'STATUS': 'status',
+    'STATUS2': 'status2',
+    'STATUS 2': 'status2',
+    'QTD PROG': 'qtd_prog',
+    'QTD PROG.': 'qtd_prog',
+    'INIC': 'inic',
+    'CONC': 'conc',
+    'INIC SEM': 'inic_sem',
+    'CONC SEM': 'conc_sem',
+    'PROG': 'prog',
+    'AND': 'andamento',
+    'VALOR': 'valor',
+    'VIZITA': 'vizita',
+    'VISITA': 'vizita',
+    'CONDIÇÃO': 'condicao',
+    'CONDICAO': 'condicao',
+    'OBSERVAÇÃO': 'obs',
+    'OBSERVACAO': 'obs',
+    'OBS': 'obs'
+}
+
+# Vários cabeçalhos apontam para o mesmo nome canônico; a ordem é preservada.
+COLUNAS_VALIDAS = tuple(dict.fromkeys(COLUMN_MAP.values()))
+
+TIPO_DATA = 'data'
+TIPO_DINHEIRO = 'dinheiro'
+TIPO_INTEIRO = 'inteiro'
+TIPO_CATEGORIA = 'categoria'
+TIPO_TEXTO = 'texto'
+
+ESQUEMA_COLUNAS: Dict[str, str] = {
+    'id': TIPO_INTEIRO,
+    'data': TIPO_DATA,
+    'periodo': TIPO_CATEGORIA,
+    'tipo': TIPO_CATEGORIA,
+    'equipe': TIPO_CATEGORIA,
+    'base': TIPO_CATEGORIA,
+    'obra': TIPO_TEXTO,
+    'encarregado': TIPO_TEXTO,
+    'supervisor': TIPO_TEXTO,
+    'com_lv': TIPO_TEXTO,
+    'si_inc': TIPO_TEXTO,
+    'pep': TIPO_TEXTO,
+    'nota': TIPO_TEXTO,
+    'local': TIPO_CATEGORIA,
+    'status': TIPO_CATEGORIA,
+    'status2': TIPO_CATEGORIA,
+    'qtd_prog': TIPO_INTEIRO,
+    'inic': TIPO_DATA,
+    'conc': TIPO_DATA,
+    'inic_sem': TIPO_TEXTO,
+    'conc_sem': TIPO_TEXTO,
+    'prog': TIPO_INTEIRO,
+    'andamento': TIPO_DINHEIRO,
+    'valor': TIPO_DINHEIRO,
+    'vizita': TIPO_DATA,
+    'condicao': TIPO_CATEGORIA,
+    'obs': TIPO_TEXTO,
+}
+
+COLUNAS_CONCLUIDAS = (
+    'base', 'obra', 'status', 'qtd_prog', 'inic', 'conc', 'inic_sem', 'conc_sem',
+    'prog', 'andamento', 'valor', 'vizita'
+)
+ESQUEMA_CONCLUIDAS: Dict[str, str] = {coluna: ESQUEMA_COLUNAS[coluna] for coluna in COLUNAS_CONCLUIDAS}
+
+# Tentados em ordem; o primeiro que reconhecer o texto vence.
+FORMATOS_DATA: Sequence[str] = ('%d/%m/%Y', '%d/%m/%y', '%d-%m-%Y', '%Y-%m-%d')
+TEXTOS_VAZIOS = frozenset({'', '-', 'nan', 'NaN', 'None', 'NaT', 'null'})
+
+
+def texto_data(valor: object) -> str:
+    """Parte da data de um texto, sem hora (``'01/02/2026 00:00:00'`` -> ``'01/02/2026'``)."""
+    return str(valor).strip().replace('T', ' ').split(' ')[0]
+
+
+def converter_data(valor: object) -> date | None:
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = texto_data(valor)
+    if texto in TEXTOS_VAZIOS:
+        return None
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def converter_dinheiro(valor: object) -> float | None:
+    """Aceita números e textos no formato brasileiro (``'R$ 1.234,56'``)."""
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return None if valor != valor else float(valor)
+    texto = str(valor).strip().replace('R$', '').replace(' ', '').replace('\xa0', '')
+    if texto in TEXTOS_VAZIOS:
+        return None
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return float(texto)
+    except ValueError:
+        numeros = ''.join(ch for ch in texto if ch.isdigit() or ch == '.')
+        try:
+            return float(numeros)
+        except ValueError:
+            return None
+
+
+def converter_inteiro(valor: object) -> int | None:
+    numero = converter_dinheiro(valor)
+    return None if numero is None else int(round(numero))
+
+
+def converter_texto(valor: object) -> str | None:
+    if valor is None:
+        return None
+    if isinstance(valor, float):
+        if valor != valor:
+            return None
+        if valor.is_integer():
+            return str(int(valor))
+    texto = str(valor).strip()
+    return None if texto in TEXTOS_VAZIOS else texto
+
+
+CONVERSORES = {
+    TIPO_DATA: converter_data,
+    TIPO_DINHEIRO: converter_dinheiro,
+    TIPO_INTEIRO: converter_inteiro,
+    TIPO_CATEGORIA: converter_texto,
+    TIPO_TEXTO: converter_texto,
+}
+
+
+def tipar_registros(registros: Iterable[dict], esquema: Dict[str, str]) -> List[dict]:
+    """Converte, no lugar, os campos do ``esquema`` (ex.: registros lidos de um cache JSON)."""
+    conversores = [(coluna, CONVERSORES[tipo]) for coluna, tipo in esquema.items()]
+    saida: List[dict] = []
+    for registro in registros:
+        for coluna, converter in conversores:
+            if coluna in registro:
+                registro[coluna] = converter(registro[coluna])
+        saida.append(registro)
+    return saida
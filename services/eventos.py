@@ -0,0 +1,222 @@
+"""Barramento de eventos entre workers, baseado num arquivo JSONL local.
+
+``publicar`` acrescenta uma linha ao arquivo (com trava ``fcntl``); em cada
+processo uma única thread observa o arquivo e repassa as linhas novas para
+os assinantes daquele processo (conexões SSE, recarga dos dados). Cada
+arquivo começa com uma linha de cabeçalho com a sua geração; o id de um
+evento é ``<geração>:<posição>`` da linha, o que permite retomar a partir
+do ``Last-Event-ID``. Passando de ``max_bytes``, o arquivo é rotacionado
+para ``<arquivo>.1`` e o próximo começa uma geração nova.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Iterator, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+Evento = dict
+Ouvinte = Callable[[str, Evento], None]
+
+
+class BarramentoEventos:
+    def __init__(
+        self,
+        caminho: str,
+        intervalo: float = 0.5,
+        max_bytes: int = 2 * 1024 * 1024,
+        memoria: int = 200,
+    ) -> None:
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.max_bytes = max_bytes
+        self._recentes: Deque[Tuple[int, str, Evento]] = deque(maxlen=memoria)
+        self._seq = 0
+        self._posicao: Tuple[int, str, int] | None = None
+        self._condicao = threading.Condition()
+        self._leitura = threading.Lock()
+        self._inicio = threading.Lock()
+        self._ouvintes: List[Ouvinte] = []
+        self._pendentes: List[Tuple[str, Evento]] = []
+        self._thread: threading.Thread | None = None
+        self.assinantes = 0
+
+    def publicar(self, tipo: str, dados: dict) -> str:
+        evento = dict(dados, tipo=tipo, pid=os.getpid(), quando=round(time.time(), 3))
+        linha = (json.dumps(evento, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        while True:
+            with open(self.caminho, 'a+b') as handler:
+                if fcntl is not None:
+                    fcntl.flock(handler, fcntl.LOCK_EX)
+                try:
+                    try:
+                        if os.stat(self.caminho).st_ino != os.fstat(handler.fileno()).st_ino:
+                            continue  # rotacionado enquanto esperava a trava
+                    except FileNotFoundError:
+                        continue
+                    posicao = handler.seek(0, os.SEEK_END)
+                    if posicao == 0:
+                        handler.write(_cabecalho(str(time.time_ns())))
+                        posicao = handler.tell()
+                    handler.seek(0)
+                    cabecalho = handler.readline()
+                    if posicao > len(cabecalho) and posicao + len(linha) > self.max_bytes:
+                        os.replace(self.caminho, self.caminho + '.1')
+                        continue
+                    handler.seek(0, os.SEEK_END)
+                    handler.write(linha)
+                    handler.flush()
+                    return f'{_geracao(cabecalho)}:{posicao}'
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(handler, fcntl.LOCK_UN)
+
+    def ao_receber(self, ouvinte: Ouvinte) -> None:
+        """Chamado na thread observadora para cada evento novo (não para o histórico)."""
+        if ouvinte not in self._ouvintes:
+            self._ouvintes.append(ouvinte)
+        self.iniciar()
+
+    def iniciar(self) -> None:
+        with self._inicio:
+            if self._thread is not None:
+                return
+            self._ler_novos(historico=True)
+            self._thread = threading.Thread(target=self._observar, name='eventos', daemon=True)
+            self._thread.start()
+
+    def ultimo_id(self) -> str:
+        self.iniciar()
+        self._ler_novos()
+        with self._condicao:
+            return self._recentes[-1][1] if self._recentes else ''
+
+    def _observar(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self._ler_novos()
+            except Exception as exc:  # noqa: BLE001
+                print(f'[AVISO] Falha ao ler eventos: {exc}')
+            self._notificar_ouvintes()
+
+    def _notificar_ouvintes(self) -> None:
+        # Só a thread observadora chama os ouvintes, mesmo quando a leitura
+        # aconteceu numa requisição (``ultimo_id``/``assinar``).
+        with self._leitura:
+            pendentes, self._pendentes = self._pendentes, []
+        for evento_id, evento in pendentes:
+            for ouvinte in list(self._ouvintes):
+                try:
+                    ouvinte(evento_id, evento)
+                except Exception as exc:  # noqa: BLE001
+                    print(f'[AVISO] Falha ao tratar evento {evento_id}: {exc}')
+
+    def _ler_novos(self, historico: bool = False) -> None:
+        with self._leitura:
+            try:
+                estado = os.stat(self.caminho)
+            except FileNotFoundError:
+                return
+            inode, geracao, offset = self._posicao or (estado.st_ino, '', 0)
+            if inode != estado.st_ino or estado.st_size < offset:
+                inode, geracao, offset = estado.st_ino, '', 0
+            if estado.st_size <= offset:
+                return
+            with open(self.caminho, 'rb') as handler:
+                cabecalho = handler.readline()
+                if not cabecalho.endswith(b'\n'):
+                    return
+                if _geracao(cabecalho) != geracao:
+                    # Arquivo novo (mesmo que o inode tenha sido reaproveitado).
+                    geracao, offset = _geracao(cabecalho), len(cabecalho)
+                handler.seek(offset)
+                bloco = handler.read(estado.st_size - offset)
+            novos = []
+            for linha in bloco.splitlines(keepends=True):
+                if not linha.endswith(b'\n'):
+                    break  # linha ainda sendo escrita
+                try:
+                    novos.append((f'{geracao}:{offset}', json.loads(linha)))
+                except ValueError:
+                    pass
+                offset += len(linha)
+            self._posicao = (inode, geracao, offset)
+            if not novos:
+                return
+            if not historico and self._ouvintes:
+                self._pendentes.extend(novos)
+            with self._condicao:
+                for evento_id, evento in novos:
+                    self._seq += 1
+                    self._recentes.append((self._seq, evento_id, evento))
+                self._condicao.notify_all()
+
+    def _seq_de(self, desde: str | None) -> int:
+        """``None``: só eventos novos; ``''`` (nenhum evento visto ainda): todos os guardados."""
+        if desde is None:
+            return self._seq
+        for seq, evento_id, _ in self._recentes:
+            if evento_id == desde:
+                return seq
+        # Id desconhecido (antigo demais ou de antes de uma rotação): reenvia o que houver.
+        return self._recentes[0][0] - 1 if self._recentes else self._seq
+
+    def assinar(
+        self,
+        desde: str | None = None,
+        duracao: float = 30.0,
+        intervalo_ping: float = 15.0,
+    ) -> Iterator[Tuple[str, Evento] | None]:
+        """Gera ``(id, evento)`` a partir de ``desde``; ``None`` a cada ``intervalo_ping`` sem eventos.
+
+        Termina após ``duracao`` segundos (o cliente SSE reconecta sozinho).
+        """
+        self.iniciar()
+        self._ler_novos()
+        with self._condicao:
+            posicao = self._seq_de(desde)
+            self.assinantes += 1
+        fim = time.monotonic() + duracao
+        try:
+            while True:
+                restante = fim - time.monotonic()
+                if restante <= 0:
+                    return
+                with self._condicao:
+                    if self._seq <= posicao:
+                        self._condicao.wait(timeout=min(intervalo_ping, restante))
+                    novos = [(seq, evento_id, evento) for seq, evento_id, evento in self._recentes if seq > posicao]
+                if novos:
+                    posicao = novos[-1][0]
+                    for _, evento_id, evento in novos:
+                        yield evento_id, evento
+                elif time.monotonic() < fim:
+                    yield None
+        finally:
+            with self._condicao:
+                self.assinantes -= 1
+
+
+def _cabecalho(geracao: str) -> bytes:
+    return (json.dumps({'_geracao': geracao}) + '\n').encode('utf-8')
+
+
+def _geracao(cabecalho: bytes) -> str:
+    try:
+        return str(json.loads(cabecalho).get('_geracao') or '')
+    except ValueError:
+        return ''
+
+
+def formatar_sse(evento_id: str, evento: Evento) -> str:
+    dados = json.dumps(evento, ensure_ascii=False)
+    return f"id: {evento_id}\nevent: {evento.get('tipo', 'message')}\ndata: {dados}\n\n"
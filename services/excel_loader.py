@@ -2,52 +2,115 @@
 from __future__ import annotations
 
 from io import BytesIO
-from typing import Dict, List
+from typing import Callable, Dict, List, Tuple
 
 import pandas as pd
 import unicodedata
 
-COLUMN_MAP = {
-    'ID': 'id',
-    'DATA': 'data',
-    'PERÍODO': 'periodo',
-    'PERIODO': 'periodo',
-    'TIPO': 'tipo',
-    'EQUIPE': 'equipe',
-    'BASE': 'base',
-    'OBRA': 'obra',
-    'ENCARREGADO': 'encarregado',
-    'SUPERVISOR': 'supervisor',
-    'COM LV': 'com_lv',
-    'SI/NR': 'si_inc',
-    'SI/INC': 'si_inc',
-    'PEP': 'pep',
-    'NOTA': 'nota',
-    'LOCAL': 'local',
-    'STATUS': 'status',
-    'STATUS2': 'status2',
-    'STATUS 2': 'status2',
-    'QTD PROG': 'qtd_prog',
-    'QTD PROG.': 'qtd_prog',
-    'INIC': 'inic',
-    'CONC': 'conc',
-    'INIC SEM': 'inic_sem',
-    'CONC SEM': 'conc_sem',
-    'PROG': 'prog',
-    'AND': 'andamento',
-    'VALOR': 'valor',
-    'VIZITA': 'vizita',
-    'VISITA': 'vizita',
-    'CONDIÇÃO': 'condicao',
-    'CONDICAO': 'condicao',
-    'OBSERVAÇÃO': 'obs',
-    'OBSERVACAO': 'obs',
-    'OBS': 'obs'
+from services.esquema import (
+    COLUMN_MAP,
+    COLUNAS_CONCLUIDAS,
+    COLUNAS_VALIDAS,
+    ESQUEMA_COLUNAS,
+    ESQUEMA_CONCLUIDAS,
+    FORMATOS_DATA,
+    TEXTOS_VAZIOS,
+    TIPO_DATA,
+    TIPO_DINHEIRO,
+    TIPO_INTEIRO,
+)
+from services.instrumentacao import medir
+
+SENTINEL_HEADER_MARKERS = ('BASE', 'PLANILHA', 'AUX', 'R$ PROGRAMACAO')
+# Faixa de números de série de data do Excel (1900-01-01 a 9999-12-31).
+SERIE_EXCEL_MIN, SERIE_EXCEL_MAX = 1, 2_958_465
+
+# (aba, situação, registros): situação é ``processada``, ``ignorada`` ou ``erro``.
+Progresso = Callable[[str, str, int], None]
+
+
+def _vazios(serie: pd.Series) -> pd.Series:
+    return serie.isna() | serie.astype(str).str.strip().isin(TEXTOS_VAZIOS)
+
+def coagir_datas(serie: pd.Series) -> pd.Series:
+    """Datas das células: datetimes nativos, textos em ``FORMATOS_DATA`` (nessa ordem) e séries do Excel."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.normalize()
+    textos = serie.where(serie.notna(), '').astype(str).str.strip()
+    textos = textos.str.replace('T', ' ', regex=False).str.split(' ').str[0]
+    # 'now' e 'today' são aceitos pelo pandas mesmo com formato explícito.
+    textos = textos.mask(textos.isin(('now', 'today')), '')
+    datas = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    for formato in FORMATOS_DATA:
+        faltantes = datas.isna()
+        if not faltantes.any():
+            break
+        datas[faltantes] = pd.to_datetime(textos[faltantes], format=formato, errors='coerce')
+    faltantes = datas.isna()
+    if faltantes.any():
+        numeros = pd.to_numeric(serie[faltantes], errors='coerce')
+        numeros = numeros[numeros.between(SERIE_EXCEL_MIN, SERIE_EXCEL_MAX)]
+        if not numeros.empty:
+            datas[numeros.index] = pd.to_datetime(numeros.round(), unit='D', origin='1899-12-30')
+    return datas.dt.normalize()
+
+def coagir_dinheiro(serie: pd.Series) -> pd.Series:
+    """Valores monetários como float; aceita ``'R$ 1.234,56'`` e números nativos."""
+    numeros = pd.to_numeric(serie, errors='coerce').astype('float64')
+    faltantes = numeros.isna() & ~_vazios(serie)
+    if faltantes.any():
+        textos = serie[faltantes].astype(str).str.replace('R$', '', regex=False).str.replace(r'\s', '', regex=True)
+        com_virgula = textos.str.contains(',', regex=False)
+        textos = textos.where(~com_virgula, textos.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+        convertidos = pd.to_numeric(textos, errors='coerce')
+        resto = convertidos.isna()
+        if resto.any():
+            convertidos[resto] = pd.to_numeric(
+                textos[resto].str.replace(r'[^0-9.]', '', regex=True), errors='coerce'
+            )
+        numeros[faltantes] = convertidos.astype('float64')
+    return numeros
+
+def coagir_inteiros(serie: pd.Series) -> pd.Series:
+    return coagir_dinheiro(serie).round().astype('Int64')
+
+def coagir_textos(serie: pd.Series) -> pd.Series:
+    if pd.api.types.is_float_dtype(serie):
+        inteiros = serie.notna() & (serie == serie.round())
+        textos = serie.astype(object)
+        textos[inteiros] = serie[inteiros].astype('int64').astype(str)
+        serie = textos
+    textos = serie.where(serie.notna(), '').astype(str).str.strip()
+    return textos.astype(object).where(~textos.isin(TEXTOS_VAZIOS), None)
+
+_COERCOES = {
+    TIPO_DATA: coagir_datas,
+    TIPO_DINHEIRO: coagir_dinheiro,
+    TIPO_INTEIRO: coagir_inteiros,
 }
 
-COLUNAS_VALIDAS = tuple(COLUMN_MAP.values())
+def coagir_colunas(df: pd.DataFrame, esquema: Dict[str, str] = ESQUEMA_COLUNAS) -> pd.DataFrame:
+    """Aplica o tipo declarado no esquema a cada coluna presente; ausências viram nulos."""
+    df = df.copy()
+    for coluna, tipo in esquema.items():
+        if coluna in df.columns:
+            df[coluna] = _COERCOES.get(tipo, coagir_textos)(df[coluna])
+    return df
 
-SENTINEL_HEADER_MARKERS = ('BASE', 'PLANILHA', 'AUX', 'R$ PROGRAMACAO')
+def _para_registros(df: pd.DataFrame, colunas: List[str], esquema: Dict[str, str]) -> List[Dict]:
+    """Converte para dicts com tipos Python (``date``, ``float``, ``int``) e ``None`` nos vazios."""
+    saida = pd.DataFrame(index=df.index)
+    for coluna in colunas:
+        serie = df[coluna]
+        tipo = esquema.get(coluna)
+        if tipo == TIPO_DATA:
+            valores = pd.Series(serie.dt.date, index=df.index, dtype=object)
+        elif tipo == TIPO_INTEIRO:
+            valores = pd.Series([None if pd.isna(v) else int(v) for v in serie], index=df.index, dtype=object)
+        else:
+            valores = serie.astype(object)
+        saida[coluna] = valores.where(serie.notna(), None)
+    return saida.to_dict(orient='records')
 
 
 def _normalize_header(df: pd.DataFrame) -> pd.DataFrame:
@@ -105,9 +168,12 @@ def carregar_registros_do_dataframe(df: pd.DataFrame) -> List[Dict]:
     if 'id' not in df.columns:
         df.insert(0, 'id', df.index + 1)
 
-    df['data'] = pd.to_datetime(df['data'], errors='coerce')
+    # Na programação só ``data`` e ``id`` são tipados: os demais campos e o texto
+    # ``dd/mm/aaaa`` da data compõem a chave de deduplicação já gravada no histórico.
+    df = coagir_colunas(df, {coluna: ESQUEMA_COLUNAS[coluna] for coluna in ('id', 'data')})
     df = df.dropna(subset=['data'])
     df['data'] = df['data'].dt.strftime('%d/%m/%Y')
+    df['id'] = df['id'].astype(object)
     df = df.fillna('-')
 
     colunas_disponiveis = [c for c in COLUNAS_VALIDAS if c in df.columns]
@@ -116,25 +182,53 @@ def carregar_registros_do_dataframe(df: pd.DataFrame) -> List[Dict]:
         raise ValueError('Nenhum registro válido encontrado após o processamento do Excel.')
     return registros
 
-def carregar_registros_do_arquivo(excel_buffer: BytesIO | str) -> List[Dict]:
+def ler_planilhas(excel_buffer: BytesIO | str) -> Dict[str, pd.DataFrame]:
+    with medir('leitura_excel'):
+        return pd.read_excel(excel_buffer, sheet_name=None, header=None)
+
+
+def registros_das_planilhas(planilhas: Dict[str, pd.DataFrame], progresso: Progresso | None = None) -> List[Dict]:
     registros: List[Dict] = []
-    planilhas = pd.read_excel(excel_buffer, sheet_name=None, header=None)
     for nome, df in planilhas.items():
         if df.empty:
             continue
         try:
-            registros.extend(carregar_registros_do_dataframe(df))
+            with medir('parse_aba', aba=nome):
+                novos = carregar_registros_do_dataframe(df)
+            registros.extend(novos)
+            if progresso:
+                progresso(nome, 'processada', len(novos))
         except ValueError as ve:
             print(f"[AVISO] Aba '{nome}' ignorada: {ve}")
+            if progresso:
+                progresso(nome, 'ignorada', 0)
         except Exception as exc:
             print(f"[ERRO] Aba '{nome}' ignorada: {exc}")
+            if progresso:
+                progresso(nome, 'erro', 0)
     if not registros:
         raise ValueError('Colunas obrigatórias não foram encontradas em nenhuma aba do arquivo Excel.')
     return registros
 
 
+def carregar_registros_do_arquivo(excel_buffer: BytesIO | str) -> List[Dict]:
+    return registros_das_planilhas(ler_planilhas(excel_buffer))
+
+
 def carregar_concluidas_do_arquivo(excel_buffer: BytesIO | str) -> List[Dict]:
-    planilhas = pd.read_excel(excel_buffer, sheet_name=None, header=None)
+    return concluidas_das_planilhas(ler_planilhas(excel_buffer))
+
+
+def carregar_workbook(excel_buffer: BytesIO | str, progresso: Progresso | None = None) -> Tuple[List[Dict], List[Dict]]:
+    """Programação e concluídas lendo o arquivo uma vez só."""
+    planilhas = ler_planilhas(excel_buffer)
+    registros = registros_das_planilhas(planilhas, progresso)
+    with medir('parse_concluidas'):
+        concluidas = concluidas_das_planilhas(planilhas)
+    return registros, concluidas
+
+
+def concluidas_das_planilhas(planilhas: Dict[str, pd.DataFrame]) -> List[Dict]:
     alvo_df = None
 
     def _normalize_nome(nome: str) -> str:
@@ -163,16 +257,12 @@ def carregar_concluidas_do_arquivo(excel_buffer: BytesIO | str) -> List[Dict]:
     if not all(col in df.columns for col in obrigatorias):
         return []
 
-    desejadas = ['base', 'obra', 'status', 'qtd_prog', 'inic', 'conc', 'inic_sem', 'conc_sem',
-                 'prog', 'andamento', 'valor', 'vizita']
+    desejadas = list(COLUNAS_CONCLUIDAS)
     for coluna in desejadas:
         if coluna not in df.columns:
-            df[coluna] = '-' if coluna not in ('qtd_prog', 'prog') else 0
+            df[coluna] = None
 
-    df = df.fillna('-')
-    df = df[df['base'].astype(str).str.strip().ne('-')]
-    df = df[df['obra'].astype(str).str.strip().ne('-')]
-
-    registros = df[desejadas].to_dict(orient='records')
-    return registros
+    df = coagir_colunas(df[desejadas], ESQUEMA_CONCLUIDAS)
+    df = df.dropna(subset=obrigatorias)
+    return _para_registros(df, desejadas, ESQUEMA_CONCLUIDAS)
 
@@ -0,0 +1,130 @@
+"""Fragmentos dos dados por base (BCB / ITM / STI), cada um com índices próprios.
+
+Os registros são distribuídos na ingestão pela base da equipe, e uma rota
+filtrada por base só percorre o fragmento dela. O fragmento também é a
+unidade de recarga parcial: trocar os registros de uma base reconstrói só o
+índice dessa base.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from services.criticos import Digesto, agregar_criticos, eh_critico
+from services.normalizacao import BASE_PREFIXES, identificar_base_por_equipe
+from utils.dates import data_texto_no_periodo
+
+SEM_BASE = ''
+
+MESES_VALIDOS = frozenset({''} | {f'{mes:02d}' for mes in range(1, 13)})
+SEMANAS_VALIDAS = frozenset({''} | {str(semana) for semana in range(1, 7)})
+
+
+def base_do_registro(registro: dict) -> str:
+    """Base já derivada na normalização (``_base``) ou calculada pela equipe."""
+    base = registro.get('_base')
+    if base is None:
+        base = identificar_base_por_equipe(registro.get('equipe'))
+    return base
+
+
+def base_da_obra(obra: dict) -> str:
+    return str(obra.get('base') or '').strip().upper()
+
+
+def chave_periodo(mes_sel: str | None, semana_sel: str | None) -> Tuple[str, str] | None:
+    """Chave dos memos por período, ou ``None`` se ``mes``/``semana`` não casam com data nenhuma.
+
+    Os filtros comparam o texto exato (``02``, ``3``); qualquer outro valor
+    vindo da query string dá um período vazio e não deve ocupar o memo.
+    """
+    chave = (mes_sel or '', semana_sel or '')
+    if chave[0] not in MESES_VALIDOS or chave[1] not in SEMANAS_VALIDAS:
+        return None
+    return chave
+
+
+class FragmentoBase:
+    """Registros de programação de uma base, indexados por data e por equipe.
+
+    Os índices (e a lista de registros em status crítico) são montados uma vez
+    na construção; o fragmento não é alterado depois disso (uma recarga cria
+    um fragmento novo).
+    """
+
+    def __init__(self, base: str, registros: List[dict]) -> None:
+        self.base = base
+        self.registros = registros
+        self.por_data: Dict[str, List[dict]] = defaultdict(list)
+        self.por_equipe: Dict[str, List[dict]] = defaultdict(list)
+        self.criticos: List[dict] = []
+        for registro in registros:
+            self.por_data[str(registro.get('data', '')).strip()].append(registro)
+            self.por_equipe[registro.get('equipe') or ''].append(registro)
+            if eh_critico(registro):
+                self.criticos.append(registro)
+        self._datas: Dict[Tuple[str, str], frozenset] = {}
+        self._periodos: Dict[Tuple[str, str], List[dict]] = {}
+        self._digestos: Dict[Tuple[str, str], Digesto] = {}
+
+    def __len__(self) -> int:
+        return len(self.registros)
+
+    def do_periodo(self, mes_sel: str, semana_sel: str) -> List[dict]:
+        """Mesmo resultado de ``filtrar_por_mes_e_semana`` sobre o fragmento, memoizado.
+
+        Só as datas distintas do índice são avaliadas; a ordem original dos
+        registros é mantida. A lista devolvida é compartilhada: não altere.
+        Períodos inválidos não são memoizados (o memo fica limitado aos
+        13 × 7 períodos possíveis).
+        """
+        chave = chave_periodo(mes_sel, semana_sel)
+        if chave is None:
+            return []
+        registros = self._periodos.get(chave)
+        if registros is None:
+            datas = self._datas_do_periodo(chave)
+            registros = [r for r in self.registros if str(r.get('data', '')).strip() in datas]
+            self._periodos[chave] = registros
+        return registros
+
+    def digesto_criticos(self, mes_sel: str, semana_sel: str) -> Digesto:
+        """Resumo dos status críticos do período (ver ``services.criticos``), memoizado."""
+        chave = chave_periodo(mes_sel, semana_sel)
+        if chave is None:
+            return {}
+        digesto = self._digestos.get(chave)
+        if digesto is None:
+            datas = self._datas_do_periodo(chave)
+            digesto = agregar_criticos(
+                (r for r in self.criticos if str(r.get('data', '')).strip() in datas), self.base
+            )
+            self._digestos[chave] = digesto
+        return digesto
+
+    def _datas_do_periodo(self, chave: Tuple[str, str]) -> frozenset:
+        datas = self._datas.get(chave)
+        if datas is None:
+            datas = frozenset(data for data in self.por_data if data_texto_no_periodo(data, *chave))
+            self._datas[chave] = datas
+        return datas
+
+
+def agrupar_por_base(registros: Iterable[dict], bases: Iterable[str] = BASE_PREFIXES) -> Dict[str, List[dict]]:
+    """Distribui os registros por base, mantendo a ordem; inclui bases vazias e ``SEM_BASE``."""
+    grupos: Dict[str, List[dict]] = {base: [] for base in bases}
+    grupos.setdefault(SEM_BASE, [])
+    for registro in registros:
+        grupos.setdefault(base_do_registro(registro), []).append(registro)
+    return grupos
+
+
+def fragmentar(registros: Iterable[dict]) -> Dict[str, FragmentoBase]:
+    return {base: FragmentoBase(base, grupo) for base, grupo in agrupar_por_base(registros).items()}
+
+
+def agrupar_concluidas_por_base(obras: Iterable[dict]) -> Dict[str, List[dict]]:
+    grupos: Dict[str, List[dict]] = defaultdict(list)
+    for obra in obras:
+        grupos[base_da_obra(obra)].append(obra)
+    return dict(grupos)
@@ -0,0 +1,301 @@
+"""Pipeline de ingestão comum à sincronização do Dropbox e ao upload de planilhas.
+
+Lê o workbook uma vez (programação e concluídas), filtra as equipes
+permitidas, normaliza e define a condição de cada registro. No app, a
+aplicação do resultado (mescla com o snapshot, delta em memória) fica com
+quem chama; ``ingerir`` faz o ciclo inteiro fora do app (``sync_dropbox.py``),
+lendo vários workbooks num pool de processos e gravando os arquivos que os
+workers web carregam.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import BytesIO
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from services.cache import deduplicate_records, load_cache, mesclar_e_persistir, save_cache, save_summary
+from services.equipes import ALLOWED_EQUIPES, filtrar_registros_por_equipes
+from services.esquema import ESQUEMA_CONCLUIDAS, tipar_registros
+from services.fragmentos import base_do_registro
+from services.instrumentacao import medir, metricas
+from services.normalizacao import normalizar_registros
+
+NOMES_ARQUIVOS = (
+    'programacao_cache.json',
+    'programacao_historico.json',
+    'concluidas_cache.json',
+    'ultima_sincronizacao.json',
+)
+EXTENSOES_WORKBOOK = ('.xlsx', '.xlsm')
+
+
+@dataclass(frozen=True)
+class ArquivosDados:
+    """Arquivos do snapshot servido pelo app."""
+
+    cache: str
+    historico: str
+    concluidas: str
+    resumo: str
+
+    @classmethod
+    def no_diretorio(cls, diretorio: str) -> 'ArquivosDados':
+        return cls(*(os.path.join(diretorio, nome) for nome in NOMES_ARQUIVOS))
+
+    @property
+    def dados(self) -> Tuple[str, str, str]:
+        return self.cache, self.historico, self.concluidas
+
+
+def marca_arquivos(caminhos: Iterable[str]) -> str:
+    """Marca dos dados persistidos (mtimes dos caches), igual em todos os processos."""
+    partes = []
+    for caminho in caminhos:
+        try:
+            partes.append(str(os.stat(caminho).st_mtime_ns))
+        except OSError:
+            partes.append('0')
+    return 'arquivos-' + '-'.join(partes)
+
+
+def bases_e_equipes(grupos: Iterable[Iterable[dict]]) -> Tuple[set, set]:
+    bases, equipes = set(), set()
+    for grupo in grupos:
+        for registro in grupo:
+            bases.add(base_do_registro(registro))
+            equipes.add(registro.get('equipe') or '')
+    return bases, equipes
+
+
+def evento_dados(resumo: dict, bases: set, equipes: set, marca: str, versao: int | None = None) -> dict:
+    """Corpo do evento ``dados`` publicado após uma sincronização que mudou algo."""
+    return {
+        'versao': versao,
+        'marca': marca,
+        'origem': resumo['origem'],
+        'adicionados': resumo['adicionados'],
+        'modificados': resumo['modificados'],
+        'removidos': resumo['removidos'],
+        'concluidas_alteradas': resumo['concluidas_alteradas'],
+        'bases': sorted(base for base in bases if base),
+        'equipes': sorted(equipe for equipe in equipes if equipe),
+    }
+
+
+def definir_condicoes_basicas(registros: List[dict]) -> None:
+    for registro in registros:
+        condicao = str(registro.get('condicao') or registro.get('status') or '').strip()
+        registro['condicao'] = condicao if condicao else '-'
+
+
+def preparar_registros(registros: List[dict]) -> List[dict]:
+    with medir('filtro'):
+        filtrados = normalizar_registros(filtrar_registros_por_equipes(registros, ALLOWED_EQUIPES))
+        definir_condicoes_basicas(filtrados)
+    return filtrados
+
+
+def preparar_carregados(registros: List[dict]) -> List[dict]:
+    """Registros lidos dos caches JSON, preparados como na carga do app."""
+    projetos = normalizar_registros(deduplicate_records(filtrar_registros_por_equipes(registros, ALLOWED_EQUIPES)))
+    definir_condicoes_basicas(projetos)
+    return projetos
+
+
+def processar_workbook(conteudo: BytesIO | str, progresso=None) -> Tuple[List[dict], List[dict]]:
+    """Registros de programação já preparados e concluídas tipadas de um workbook.
+
+    ``progresso`` recebe ``(aba, situação, registros)`` a cada aba lida (ver
+    ``services.excel_loader.Progresso``).
+    """
+    from services.excel_loader import carregar_workbook
+
+    registros, concluidas = carregar_workbook(conteudo, progresso)
+    return preparar_registros(registros), concluidas
+
+
+@dataclass
+class Fonte:
+    """Um workbook a ingerir: arquivo local ou caminho no Dropbox."""
+
+    nome: str
+    caminho: str
+    dropbox: bool = False
+    modificado: datetime | None = None
+
+
+def fontes_do_diretorio(diretorio: str) -> List[Fonte]:
+    fontes = []
+    for nome in sorted(os.listdir(diretorio)):
+        caminho = os.path.join(diretorio, nome)
+        # ``~$`` são os arquivos de trava que o Excel deixa ao lado da planilha aberta.
+        if nome.startswith('~$') or not nome.lower().endswith(EXTENSOES_WORKBOOK) or not os.path.isfile(caminho):
+            continue
+        fontes.append(Fonte(nome, caminho, modificado=datetime.fromtimestamp(os.path.getmtime(caminho))))
+    return fontes
+
+
+def ler_fonte(fonte: Fonte, token: str | None = None) -> dict:
+    """Baixa (se for do Dropbox), lê e prepara um workbook; roda nos processos do pool."""
+    antes = metricas.duracoes()
+    inicio = time.perf_counter()
+    abas: List[dict] = []
+    resultado = {'nome': fonte.nome, 'caminho': fonte.caminho, 'registros': [], 'concluidas': [], 'erro': None}
+    try:
+        if fonte.dropbox:
+            from services.dropbox_client import download_file, settings_from_env
+
+            with medir('download'):
+                conteudo: BytesIO | str = download_file(fonte.caminho, token or '', settings_from_env().content_url)
+        else:
+            conteudo = fonte.caminho
+        registros, concluidas = processar_workbook(
+            conteudo, lambda aba, situacao, total: abas.append({'aba': aba, 'situacao': situacao, 'registros': total})
+        )
+        resultado.update(registros=registros, concluidas=concluidas)
+    except Exception as exc:  # noqa: BLE001
+        resultado['erro'] = str(exc)
+    depois = metricas.duracoes()
+    resultado['abas'] = abas
+    resultado['segundos'] = round(time.perf_counter() - inicio, 4)
+    resultado['etapas'] = {
+        etapa: round(total - antes.get(etapa, 0.0), 4) for etapa, total in depois.items() if total > antes.get(etapa, 0.0)
+    }
+    return resultado
+
+
+def _ler_fontes(fontes: Sequence[Fonte], token: str | None, processos: int) -> List[dict]:
+    if processos <= 1 or len(fontes) <= 1:
+        return [ler_fonte(fonte, token) for fonte in fontes]
+    # ``spawn``: o processo pai pode ter threads (observador do Dropbox) e
+    # ``fork`` com threads ativas copia travas em estado indefinido.
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(processos, len(fontes)), mp_context=contexto) as pool:
+        return list(pool.map(ler_fonte, fontes, [token] * len(fontes)))
+
+
+@dataclass
+class RelatorioIngestao:
+    origem: str
+    dry_run: bool = False
+    situacao: str = 'pendente'
+    fontes: List[dict] = field(default_factory=list)
+    etapas: Dict[str, float] = field(default_factory=dict)
+    resumo: dict = field(default_factory=dict)
+    erros: List[str] = field(default_factory=list)
+
+    def somar_etapas(self, etapas: Dict[str, float]) -> None:
+        for etapa, segundos in etapas.items():
+            self.etapas[etapa] = round(self.etapas.get(etapa, 0.0) + segundos, 4)
+
+    def como_dict(self) -> dict:
+        return {
+            'origem': self.origem,
+            'dry_run': self.dry_run,
+            'situacao': self.situacao,
+            'fontes': self.fontes,
+            'etapas': dict(sorted(self.etapas.items())),
+            'resumo': self.resumo,
+            'erros': self.erros,
+        }
+
+
+def alteradas_desde(fontes: Sequence[Fonte], desde: datetime | None) -> bool:
+    """Alguma fonte mudou depois de ``desde``? Sem data de modificação conta como alterada."""
+    if desde is None:
+        return True
+    return any(fonte.modificado is None or fonte.modificado > desde for fonte in fontes)
+
+
+def ingerir(
+    fontes: Sequence[Fonte],
+    arquivos: ArquivosDados,
+    origem: str,
+    token: str | None = None,
+    processos: int = 1,
+    dry_run: bool = False,
+    desde: datetime | None = None,
+    eventos=None,
+    arquivo=None,
+) -> RelatorioIngestao:
+    """Lê ``fontes`` em paralelo e mescla o lote com o snapshot de ``arquivos``.
+
+    O lote precisa ser completo (quem some dele sai do cache), por isso
+    ``desde`` só decide se a ingestão roda: se nada mudou desde então, nada é
+    lido. Se qualquer fonte falhar, nada é gravado. ``eventos`` é um
+    ``BarramentoEventos`` onde o evento ``dados`` é publicado para os workers
+    web recarregarem; ``arquivo`` é o ``ArquivoHistorico`` cujos meses
+    arquivados (imutáveis) são descartados do lote.
+    """
+    relatorio = RelatorioIngestao(origem=origem, dry_run=dry_run)
+    inicio = time.perf_counter()
+    if not fontes:
+        relatorio.situacao = 'sem_fontes'
+        return relatorio
+    if not alteradas_desde(fontes, desde):
+        relatorio.situacao = 'sem_alteracoes'
+        relatorio.fontes = [{'nome': fonte.nome, 'caminho': fonte.caminho} for fonte in fontes]
+        return relatorio
+
+    lidas = _ler_fontes(fontes, token, processos)
+    relatorio.etapas['leitura_paralela'] = round(time.perf_counter() - inicio, 4)
+    registros: List[dict] = []
+    concluidas: List[dict] = []
+    for fonte, lida in zip(fontes, lidas):
+        relatorio.somar_etapas(lida['etapas'])
+        relatorio.fontes.append({
+            'nome': lida['nome'],
+            'caminho': lida['caminho'],
+            'modificado': fonte.modificado.isoformat(timespec='seconds') if fonte.modificado else None,
+            'registros': len(lida['registros']),
+            'concluidas': len(lida['concluidas']),
+            'abas': lida['abas'],
+            'segundos': lida['segundos'],
+            'erro': lida['erro'],
+        })
+        if lida['erro']:
+            relatorio.erros.append(f"{lida['nome']}: {lida['erro']}")
+        registros.extend(lida['registros'])
+        concluidas.extend(lida['concluidas'])
+    if relatorio.erros:
+        relatorio.situacao = 'erro'
+        return relatorio
+
+    recebidos = len(registros)
+    if arquivo is not None:
+        registros = arquivo.fora_do_arquivo(registros)
+    antes = metricas.duracoes()
+    resultado = mesclar_e_persistir(registros, arquivos.cache, arquivos.historico, persistir=not dry_run)
+    with medir('concluidas'):
+        anteriores = tipar_registros(load_cache(arquivos.concluidas), ESQUEMA_CONCLUIDAS)
+        concluidas_alteradas = concluidas != anteriores
+        if concluidas_alteradas and not dry_run:
+            save_cache(arquivos.concluidas, concluidas)
+    depois = metricas.duracoes()
+    relatorio.somar_etapas({etapa: total - antes.get(etapa, 0.0) for etapa, total in depois.items() if total > antes.get(etapa, 0.0)})
+
+    delta = resultado.delta
+    relatorio.resumo = {
+        'origem': origem,
+        'quando': datetime.now().isoformat(timespec='seconds'),
+        'recebidos': recebidos,
+        **delta.resumo(),
+        'concluidas_alteradas': concluidas_alteradas,
+        'registros': len(resultado.registros),
+    }
+    relatorio.situacao = 'simulada' if dry_run else 'gravada'
+    if not dry_run:
+        save_summary(arquivos.resumo, relatorio.resumo)
+        bases, equipes = bases_e_equipes((delta.adicionados, delta.modificados, delta.removidos))
+        if eventos is not None and (bases or concluidas_alteradas):
+            try:
+                eventos.publicar('dados', evento_dados(relatorio.resumo, bases, equipes, marca_arquivos(arquivos.dados)))
+            except OSError as exc:
+                print(f'[AVISO] Falha ao publicar evento de sincronização: {exc}')
+    relatorio.etapas['total'] = round(time.perf_counter() - inicio, 4)
+    return relatorio
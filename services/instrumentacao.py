@@ -0,0 +1,210 @@
+"""Instrumentação leve: histogramas de latência, contadores e exposição Prometheus.
+
+Controlada por ``METRICAS_ATIVAS`` (padrão ligado) e ``METRICAS_LOG`` (linhas
+JSON no stdout, padrão desligado). Desligada, ``medir`` não mede nada.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+Rotulos = Tuple[Tuple[str, str], ...]
+Amostra = Tuple[str, Dict[str, object], float]
+
+BUCKETS_PADRAO: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+METRICA_ETAPA = 'mapa_etapa_duracao_segundos'
+
+_DESCRICOES: Dict[str, Tuple[str, str]] = {
+    METRICA_ETAPA: ('histogram', 'Duração das etapas internas (sincronização, parse, persistência).'),
+}
+
+
+def _env_ativo(nome: str, padrao: str) -> bool:
+    return os.environ.get(nome, padrao).strip().lower() not in ('0', 'false', 'nao', 'não', '')
+
+
+def _rotulos(rotulos: Dict[str, object]) -> Rotulos:
+    return tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _formatar_rotulos(rotulos: Iterable[Tuple[str, str]]) -> str:
+    itens = [f'{chave}="{_escapar(valor)}"' for chave, valor in rotulos]
+    return '{' + ','.join(itens) + '}' if itens else ''
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Histograma:
+    __slots__ = ('buckets', 'contagens', 'soma', 'total')
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        for indice, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[indice] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+
+class RegistroMetricas:
+    def __init__(self, ativo: bool = True, log_estruturado: bool = False) -> None:
+        self.ativo = ativo
+        self.log_estruturado = log_estruturado
+        self._lock = threading.Lock()
+        self._histogramas: Dict[Tuple[str, Rotulos], _Histograma] = {}
+        self._contadores: Dict[Tuple[str, Rotulos], float] = {}
+        self._medidores: Dict[Tuple[str, Rotulos], float] = {}
+        self._coletores: List[Callable[[], Iterable[Amostra]]] = []
+
+    def descrever(self, nome: str, tipo: str, ajuda: str) -> None:
+        _DESCRICOES[nome] = (tipo, ajuda)
+
+    def observar(self, nome: str, valor: float, buckets: Tuple[float, ...] = BUCKETS_PADRAO, **rotulos) -> None:
+        if not self.ativo:
+            return
+        chave = (nome, _rotulos(rotulos))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = _Histograma(buckets)
+            histograma.observar(valor)
+
+    def incrementar(self, nome: str, valor: float = 1.0, **rotulos) -> None:
+        if not self.ativo:
+            return
+        chave = (nome, _rotulos(rotulos))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0.0) + valor
+
+    def definir(self, nome: str, valor: float, **rotulos) -> None:
+        if not self.ativo:
+            return
+        with self._lock:
+            self._medidores[(nome, _rotulos(rotulos))] = float(valor)
+
+    def registrar_coletor(self, coletor: Callable[[], Iterable[Amostra]]) -> None:
+        """Registra uma função avaliada a cada coleta, devolvendo ``(nome, rotulos, valor)``."""
+        self._coletores.append(coletor)
+
+    def log(self, evento: str, **campos) -> None:
+        if not self.log_estruturado:
+            return
+        linha = {'evento': evento, 'ts': round(time.time(), 3), **campos}
+        print(f'[METRICA] {json.dumps(linha, ensure_ascii=False, default=str)}', flush=True)
+
+    def medir(self, etapa: str, metrica: str = METRICA_ETAPA, **rotulos):
+        if not self.ativo and not self.log_estruturado:
+            return nullcontext()
+        return self._medir(etapa, metrica, rotulos)
+
+    @contextmanager
+    def _medir(self, etapa: str, metrica: str, rotulos: Dict[str, object]) -> Iterator[None]:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.observar(metrica, duracao, etapa=etapa, **rotulos)
+            self.log('etapa', etapa=etapa, duracao_ms=round(duracao * 1000, 3), **rotulos)
+
+    def cronometrado(self, etapa: str, **rotulos) -> Callable:
+        def decorador(funcao: Callable) -> Callable:
+            @wraps(funcao)
+            def envolvida(*args, **kwargs):
+                with self.medir(etapa, **rotulos):
+                    return funcao(*args, **kwargs)
+            return envolvida
+        return decorador
+
+    def instantaneo(self) -> dict:
+        with self._lock:
+            histogramas = {
+                chave: (list(h.buckets), list(h.contagens), h.soma, h.total)
+                for chave, h in self._histogramas.items()
+            }
+            contadores = dict(self._contadores)
+            medidores = dict(self._medidores)
+        for coletor in self._coletores:
+            try:
+                for nome, rotulos, valor in coletor():
+                    medidores[(nome, _rotulos(rotulos))] = float(valor)
+            except Exception as exc:  # noqa: BLE001
+                print(f'[AVISO] Coletor de métricas falhou: {exc}')
+        return {'histogramas': histogramas, 'contadores': contadores, 'medidores': medidores}
+
+    def duracoes(self, metrica: str = METRICA_ETAPA) -> Dict[str, float]:
+        """Soma, em segundos, das durações de cada etapa (outros rótulos agregados)."""
+        somas: Dict[str, float] = {}
+        with self._lock:
+            for (nome, rotulos), histograma in self._histogramas.items():
+                etapa = dict(rotulos).get('etapa')
+                if nome == metrica and etapa:
+                    somas[etapa] = somas.get(etapa, 0.0) + histograma.soma
+        return somas
+
+    def renderizar_prometheus(self) -> str:
+        dados = self.instantaneo()
+        linhas: List[str] = []
+        cabecalhos: set[str] = set()
+
+        def _cabecalho(nome: str, tipo_padrao: str) -> None:
+            if nome in cabecalhos:
+                return
+            cabecalhos.add(nome)
+            tipo, ajuda = _DESCRICOES.get(nome, (tipo_padrao, nome))
+            linhas.append(f'# HELP {nome} {ajuda}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+
+        for (nome, rotulos), (buckets, contagens, soma, total) in sorted(dados['histogramas'].items()):
+            _cabecalho(nome, 'histogram')
+            acumulado = 0
+            for limite, contagem in zip(buckets, contagens):
+                acumulado += contagem
+                rotulos_bucket = rotulos + (('le', _formatar_numero(limite)),)
+                linhas.append(f'{nome}_bucket{_formatar_rotulos(rotulos_bucket)} {acumulado}')
+            linhas.append(f'{nome}_bucket{_formatar_rotulos(rotulos + (("le", "+Inf"),))} {total}')
+            linhas.append(f'{nome}_sum{_formatar_rotulos(rotulos)} {_formatar_numero(soma)}')
+            linhas.append(f'{nome}_count{_formatar_rotulos(rotulos)} {total}')
+        for (nome, rotulos), valor in sorted(dados['contadores'].items()):
+            _cabecalho(nome, 'counter')
+            linhas.append(f'{nome}{_formatar_rotulos(rotulos)} {_formatar_numero(valor)}')
+        for (nome, rotulos), valor in sorted(dados['medidores'].items()):
+            _cabecalho(nome, 'gauge')
+            linhas.append(f'{nome}{_formatar_rotulos(rotulos)} {_formatar_numero(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+            self._medidores.clear()
+
+
+metricas = RegistroMetricas(
+    ativo=_env_ativo('METRICAS_ATIVAS', '1'),
+    log_estruturado=_env_ativo('METRICAS_LOG', '0'),
+)
+medir = metricas.medir
+cronometrado = metricas.cronometrado
@@ -0,0 +1,128 @@
+"""Normalização memoizada (caches LRU limitados) de equipes, textos e status."""
+from __future__ import annotations
+
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+TAMANHO_CACHE_EQUIPES = 1024
+TAMANHO_CACHE_TEXTOS = 16384
+
+BASE_PREFIXES = {
+    'BCB': 'MA-BCB',
+    'ITM': 'MA-ITM',
+    'STI': 'MA-STI'
+}
+
+
+def _normalizar_codigo_equipe_bruto(codigo: str) -> str:
+    codigo = codigo.strip().upper().replace(' ', '')
+    if 'MA-STI-000' in codigo:
+        codigo = codigo.replace('MA-STI-000', 'MA-STI-O00')
+    if codigo.startswith('MA-STI-0'):
+        codigo = codigo.replace('0M', 'OM', 1)
+    partes = codigo.split('-')
+    if len(partes) >= 3:
+        prefixo = '-'.join(partes[:2])
+        sufixo = '-'.join(partes[2:])
+        if sufixo and sufixo[0] == '0':
+            sufixo = 'O' + sufixo[1:]
+        codigo = f"{prefixo}-{sufixo}"
+    return codigo
+
+
+def _normalizar_texto_bruto(texto: str) -> str:
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', texto)
+        if unicodedata.category(c) != 'Mn'
+    ).upper().strip()
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_EQUIPES)
+def _codigo_equipe_memo(codigo: str) -> str:
+    return sys.intern(_normalizar_codigo_equipe_bruto(codigo))
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_TEXTOS)
+def _texto_memo(texto: str) -> str:
+    return sys.intern(_normalizar_texto_bruto(texto))
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_TEXTOS)
+def _status_programado_memo(status: str) -> bool:
+    return _texto_memo(status).startswith('PROGRAMAD')
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_EQUIPES)
+def _base_por_codigo_memo(codigo: str) -> str:
+    for base, prefixo in BASE_PREFIXES.items():
+        if prefixo in codigo:
+            return base
+    return ''
+
+
+def normalizar_codigo_equipe(equipe: str | None) -> str:
+    if not equipe:
+        return ''
+    return _codigo_equipe_memo(str(equipe))
+
+
+def normalizar_texto(texto: str | None) -> str:
+    if not texto:
+        return ''
+    return _texto_memo(str(texto))
+
+
+def status_programado(status: str | None) -> bool:
+    if not status:
+        return False
+    return _status_programado_memo(str(status))
+
+
+def identificar_base_por_equipe(equipe: str | None) -> str:
+    return _base_por_codigo_memo(normalizar_codigo_equipe(equipe))
+
+
+def precomputar_tabela_equipes(equipes: Iterable[str]) -> Dict[str, str]:
+    """Aquece os caches com as equipes conhecidas e devolve a tabela bruto → normalizado."""
+    tabela: Dict[str, str] = {}
+    for equipe in equipes:
+        normalizado = normalizar_codigo_equipe(equipe)
+        tabela[str(equipe)] = normalizado
+        tabela[normalizado] = normalizado
+        identificar_base_por_equipe(normalizado)
+    return tabela
+
+
+def normalizar_registros(registros: Iterable[dict]) -> List[dict]:
+    """Grava nos registros os valores normalizados usados pelas rotas.
+
+    ``equipe`` e ``data`` são reescritos na forma canônica e os campos
+    derivados ``_base`` e ``_programado`` evitam recalcular a base da equipe e
+    o status programado a cada requisição.
+    """
+    saida: List[dict] = []
+    for registro in registros:
+        equipe = normalizar_codigo_equipe(registro.get('equipe'))
+        registro['equipe'] = equipe
+        registro['data'] = str(registro.get('data', '')).strip()
+        registro['_base'] = _base_por_codigo_memo(equipe)
+        registro['_programado'] = status_programado(registro.get('status'))
+        saida.append(registro)
+    return saida
+
+
+def estatisticas_caches() -> Dict[str, dict]:
+    caches = {
+        'equipes': _codigo_equipe_memo,
+        'textos': _texto_memo,
+        'status_programado': _status_programado_memo,
+        'bases': _base_por_codigo_memo,
+    }
+    return {nome: cache.cache_info()._asdict() for nome, cache in caches.items()}
+
+
+def limpar_caches() -> None:
+    for cache in (_codigo_equipe_memo, _texto_memo, _status_programado_memo, _base_por_codigo_memo):
+        cache.cache_clear()
@@ -0,0 +1,296 @@
+"""Fila persistente de notificações para webhooks, enviada em segundo plano.
+
+Cada alerta vira ``<diretorio>/pendentes/<id>.json``, com ``id`` derivado do
+destino e do texto: um alerta idêntico ainda na fila não é duplicado, e um
+idêntico enviado há menos de ``janela_dedup`` segundos é descartado (ficam
+marcas em ``enviadas/``). Assim vários workers podem enfileirar o mesmo
+alerta (ex.: todos recarregaram a mesma sincronização) e ele sai uma vez.
+
+Uma thread por processo (``iniciar``) percorre a fila: os alertas vencidos para o mesmo
+destino são juntados numa mensagem só (até ``limite_conteudo`` caracteres).
+Cada arquivo é reservado com ``flock`` durante o envio, então dois workers
+nunca mandam o mesmo alerta. Falhas são repetidas com espera exponencial
+(respeitando ``Retry-After``) e, esgotadas as tentativas, o alerta vai para
+``falhas/``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import requests
+
+from services.instrumentacao import metricas
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+ENFILEIRADA = 'enfileirada'
+DUPLICADA = 'duplicada'
+ENVIADA_RECENTEMENTE = 'enviada_recentemente'
+
+SEPARADOR_LOTE = '\n\n'
+
+Enviador = Callable[[str, dict, float], requests.Response]
+
+
+class FalhaEnvio(Exception):
+    def __init__(self, mensagem: str, repetir_em: float | None = None) -> None:
+        super().__init__(mensagem)
+        self.repetir_em = repetir_em
+
+
+def _enviar_http(url: str, payload: dict, timeout: float) -> requests.Response:
+    return requests.post(url, json=payload, timeout=timeout)
+
+
+def _retry_after(resposta: requests.Response) -> float | None:
+    valor = (resposta.headers.get('Retry-After') or '').strip()
+    return float(valor) if valor.replace('.', '', 1).isdigit() else None
+
+
+def id_alerta(url: str, conteudo: str) -> str:
+    return hashlib.sha256(f'{url}\n{conteudo}'.encode('utf-8')).hexdigest()[:32]
+
+
+class FilaNotificacoes:
+    def __init__(
+        self,
+        diretorio: str,
+        enviar: Enviador | None = None,
+        max_tentativas: int = 8,
+        espera_base: float = 5.0,
+        espera_maxima: float = 300.0,
+        janela_dedup: float = 600.0,
+        limite_conteudo: int = 1900,
+        timeout: float = 10.0,
+        intervalo: float = 1.0,
+    ) -> None:
+        self.diretorio = diretorio
+        self.enviar = enviar or _enviar_http
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.janela_dedup = janela_dedup
+        self.limite_conteudo = limite_conteudo
+        self.timeout = timeout
+        self.intervalo = intervalo
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._inicio = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def _pasta(self, nome: str) -> str:
+        return os.path.join(self.diretorio, nome)
+
+    def _caminho(self, alerta_id: str) -> str:
+        return os.path.join(self._pasta('pendentes'), f'{alerta_id}.json')
+
+    def enfileirar(self, url: str, conteudo: str, origem: str = 'manual') -> Tuple[str, str]:
+        """Grava o alerta na fila e acorda o despachante; devolve ``(id, situação)``."""
+        alerta_id = id_alerta(url, conteudo)
+        try:
+            enviada_em = os.path.getmtime(os.path.join(self._pasta('enviadas'), alerta_id))
+        except OSError:
+            enviada_em = None
+        if enviada_em is not None and time.time() - enviada_em < self.janela_dedup:
+            metricas.incrementar('mapa_notificacoes_total', resultado='deduplicada')
+            return alerta_id, ENVIADA_RECENTEMENTE
+        alerta = {
+            'id': alerta_id,
+            'url': url,
+            'conteudo': conteudo,
+            'origem': origem,
+            'criado_em': datetime.now().isoformat(timespec='microseconds'),
+            'tentativas': 0,
+            'proxima_tentativa': 0,
+            'ultimo_erro': None,
+        }
+        os.makedirs(self._pasta('pendentes'), exist_ok=True)
+        try:
+            descritor = os.open(self._caminho(alerta_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            metricas.incrementar('mapa_notificacoes_total', resultado='deduplicada')
+            return alerta_id, DUPLICADA
+        with os.fdopen(descritor, 'w', encoding='utf-8') as handler:
+            handler.write(json.dumps(alerta, ensure_ascii=False))
+        metricas.incrementar('mapa_notificacoes_total', resultado='enfileirada')
+        self._acordar.set()
+        return alerta_id, ENFILEIRADA
+
+    def pendentes(self) -> List[dict]:
+        alertas = []
+        try:
+            nomes = sorted(os.listdir(self._pasta('pendentes')))
+        except OSError:
+            return []
+        for nome in nomes:
+            if not nome.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self._pasta('pendentes'), nome), 'r', encoding='utf-8') as handler:
+                    alertas.append(json.load(handler))
+            except (OSError, ValueError):
+                continue
+        return alertas
+
+    def _contar(self, pasta: str) -> int:
+        try:
+            return sum(1 for nome in os.listdir(self._pasta(pasta)) if nome.endswith('.json'))
+        except OSError:
+            return 0
+
+    def resumo(self) -> Dict[str, int]:
+        return {'pendentes': self._contar('pendentes'), 'falhas': self._contar('falhas')}
+
+    def _reservar(self, pilha: ExitStack, alerta_id: str, agora: float) -> dict | None:
+        """Abre e trava o arquivo do alerta; ``None`` se outro processo já o tem, enviou ou adiou."""
+        caminho = self._caminho(alerta_id)
+        try:
+            handler = pilha.enter_context(open(caminho, 'r', encoding='utf-8'))
+        except OSError:
+            return None
+        if fcntl is not None:
+            try:
+                fcntl.flock(handler, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+        try:
+            # Enviado e apagado (ou regravado) por outro worker enquanto abríamos.
+            if os.stat(caminho).st_ino != os.fstat(handler.fileno()).st_ino:
+                return None
+            alerta = json.loads(handler.read())
+        except (OSError, ValueError):
+            return None
+        return alerta if alerta.get('proxima_tentativa', 0) <= agora else None
+
+    def _lotes(self, alertas: List[dict]) -> List[List[dict]]:
+        lotes: List[List[dict]] = []
+        por_destino: Dict[str, List[dict]] = {}
+        for alerta in sorted(alertas, key=lambda item: item['criado_em']):
+            por_destino.setdefault(alerta['url'], []).append(alerta)
+        for grupo in por_destino.values():
+            lote: List[dict] = []
+            tamanho = 0
+            for alerta in grupo:
+                extra = len(alerta['conteudo']) + (len(SEPARADOR_LOTE) if lote else 0)
+                if lote and tamanho + extra > self.limite_conteudo:
+                    lotes.append(lote)
+                    lote, tamanho, extra = [], 0, len(alerta['conteudo'])
+                lote.append(alerta)
+                tamanho += extra
+            if lote:
+                lotes.append(lote)
+        return lotes
+
+    def _enviar_lote(self, lote: List[dict]) -> None:
+        payload = {'content': SEPARADOR_LOTE.join(alerta['conteudo'] for alerta in lote)[:self.limite_conteudo]}
+        try:
+            resposta = self.enviar(lote[0]['url'], payload, self.timeout)
+        except requests.RequestException as exc:
+            raise FalhaEnvio(str(exc)) from exc
+        if resposta.status_code >= 400:
+            repetir_em = _retry_after(resposta) if resposta.status_code in (429, 503) else None
+            raise FalhaEnvio(f'Webhook respondeu {resposta.status_code}', repetir_em)
+
+    def processar(self, agora: float | None = None) -> Dict[str, int]:
+        """Uma passada pela fila: envia os alertas vencidos, em lotes por destino."""
+        agora = time.time() if agora is None else agora
+        contagem = {'enviadas': 0, 'lotes': 0, 'adiadas': 0, 'descartadas': 0}
+        vencidos = [alerta for alerta in self.pendentes() if alerta.get('proxima_tentativa', 0) <= agora]
+        if not vencidos:
+            return contagem
+        with ExitStack() as pilha:
+            reservados = [alerta for alerta in (self._reservar(pilha, item['id'], agora) for item in vencidos) if alerta]
+            for lote in self._lotes(reservados):
+                try:
+                    with metricas.medir('notificacao_envio'):
+                        self._enviar_lote(lote)
+                except FalhaEnvio as exc:
+                    for alerta in lote:
+                        contagem['descartadas' if self._registrar_falha(alerta, exc, agora) else 'adiadas'] += 1
+                    continue
+                os.makedirs(self._pasta('enviadas'), exist_ok=True)
+                for alerta in lote:
+                    with open(os.path.join(self._pasta('enviadas'), alerta['id']), 'w'):
+                        pass
+                    try:
+                        os.remove(self._caminho(alerta['id']))
+                    except FileNotFoundError:
+                        pass
+                contagem['enviadas'] += len(lote)
+                contagem['lotes'] += 1
+                metricas.incrementar('mapa_notificacoes_total', len(lote), resultado='enviada')
+        self._limpar_marcas(agora)
+        return contagem
+
+    def _registrar_falha(self, alerta: dict, erro: FalhaEnvio, agora: float) -> bool:
+        """Agenda a próxima tentativa; devolve ``True`` se o alerta foi desistido."""
+        alerta['tentativas'] = alerta.get('tentativas', 0) + 1
+        alerta['ultimo_erro'] = str(erro)
+        if alerta['tentativas'] >= self.max_tentativas:
+            print(f"[AVISO] Notificação {alerta['id']} desistida após {alerta['tentativas']} tentativas: {erro}")
+            os.makedirs(self._pasta('falhas'), exist_ok=True)
+            self._gravar(os.path.join(self._pasta('falhas'), f"{alerta['id']}.json"), alerta)
+            os.remove(self._caminho(alerta['id']))
+            metricas.incrementar('mapa_notificacoes_total', resultado='desistida')
+            return True
+        espera = min(self.espera_maxima, self.espera_base * 2 ** (alerta['tentativas'] - 1))
+        if erro.repetir_em is not None:
+            espera = max(espera, erro.repetir_em)
+        alerta['proxima_tentativa'] = agora + espera
+        self._gravar(self._caminho(alerta['id']), alerta)
+        metricas.incrementar('mapa_notificacoes_total', resultado='falha')
+        return False
+
+    def _gravar(self, caminho: str, alerta: dict) -> None:
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+        with os.fdopen(descritor, 'w', encoding='utf-8') as handler:
+            handler.write(json.dumps(alerta, ensure_ascii=False))
+        os.replace(temporario, caminho)
+
+    def _limpar_marcas(self, agora: float) -> None:
+        pasta = self._pasta('enviadas')
+        try:
+            nomes = os.listdir(pasta)
+        except OSError:
+            return
+        for nome in nomes:
+            caminho = os.path.join(pasta, nome)
+            try:
+                if agora - os.path.getmtime(caminho) > self.janela_dedup:
+                    os.remove(caminho)
+            except OSError:
+                continue
+
+    def iniciar(self) -> None:
+        with self._inicio:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._despachar, name='notificacoes', daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout: float | None = None) -> None:
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _despachar(self) -> None:
+        while not self._parar.is_set():
+            try:
+                self.processar()
+            except Exception as exc:  # noqa: BLE001
+                print(f'[AVISO] Falha ao despachar notificações: {exc}')
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
@@ -0,0 +1,158 @@
+"""Perfilamento opcional (cProfile) de requisições e sincronizações lentas.
+
+Ligado para tudo com ``PERFIL_ATIVO=1`` ou por requisição com o cabeçalho
+``X-Perfil-Token`` igual a ``PERFIL_ADMIN_SECRET``. Só são gravados os perfis
+que passam de ``PERFIL_LIMIAR_MS``.
+"""
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from functools import wraps
+from typing import Iterator, List
+
+CABECALHO_TOKEN = 'X-Perfil-Token'
+
+
+@dataclass
+class SessaoPerfil:
+    rotulo: str
+    perfil: cProfile.Profile
+    inicio: float
+
+
+def _rotulo_seguro(rotulo: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', rotulo).strip('_')[:60] or 'perfil'
+
+
+class Perfilador:
+    def __init__(
+        self,
+        diretorio: str,
+        ativo: bool = False,
+        segredo: str = '',
+        limiar_ms: float = 1000.0,
+        max_arquivos: int = 50,
+    ) -> None:
+        self.diretorio = diretorio
+        self.ativo = ativo
+        self.segredo = segredo
+        self.limiar_ms = limiar_ms
+        self.max_arquivos = max_arquivos
+        # cProfile não admite dois perfis ativos ao mesmo tempo no mesmo processo.
+        self._exclusivo = threading.Lock()
+
+    def token_valido(self, token: str | None) -> bool:
+        if not (self.segredo and token):
+            return False
+        # Em bytes: com ``str`` o compare_digest recusa caracteres fora do ASCII.
+        return hmac.compare_digest(self.segredo.encode('utf-8'), token.encode('utf-8'))
+
+    def deve_perfilar(self, token: str | None = None) -> bool:
+        return self.ativo or self.token_valido(token)
+
+    def iniciar(self, rotulo: str) -> SessaoPerfil | None:
+        if not self._exclusivo.acquire(blocking=False):
+            return None
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            self._exclusivo.release()
+            return None
+        return SessaoPerfil(rotulo=rotulo, perfil=perfil, inicio=time.perf_counter())
+
+    def finalizar(self, sessao: SessaoPerfil | None) -> str | None:
+        if sessao is None:
+            return None
+        try:
+            sessao.perfil.disable()
+        finally:
+            self._exclusivo.release()
+        duracao_ms = (time.perf_counter() - sessao.inicio) * 1000
+        if duracao_ms < self.limiar_ms:
+            return None
+        return self._salvar(sessao, duracao_ms)
+
+    @contextmanager
+    def perfilar(self, rotulo: str, forcar: bool = False) -> Iterator[None]:
+        sessao = self.iniciar(rotulo) if (forcar or self.ativo) else None
+        try:
+            yield
+        finally:
+            self.finalizar(sessao)
+
+    def perfilado(self, rotulo: str):
+        def decorador(funcao):
+            @wraps(funcao)
+            def envolvida(*args, **kwargs):
+                with self.perfilar(rotulo):
+                    return funcao(*args, **kwargs)
+            return envolvida
+        return decorador
+
+    def _salvar(self, sessao: SessaoPerfil, duracao_ms: float) -> str | None:
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            carimbo = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            nome = f'{carimbo}-{_rotulo_seguro(sessao.rotulo)}-{int(duracao_ms)}ms'
+            caminho = os.path.join(self.diretorio, f'{nome}.prof')
+            sessao.perfil.dump_stats(caminho)
+            resumo = io.StringIO()
+            pstats.Stats(sessao.perfil, stream=resumo).sort_stats('cumulative').print_stats(40)
+            with open(os.path.join(self.diretorio, f'{nome}.txt'), 'w', encoding='utf-8') as handler:
+                handler.write(f'{sessao.rotulo} — {duracao_ms:.1f} ms\n\n{resumo.getvalue()}')
+            self._rotacionar()
+            print(f'[PERFIL] {sessao.rotulo} levou {duracao_ms:.0f} ms; perfil salvo em {caminho}')
+            return caminho
+        except Exception as exc:  # noqa: BLE001
+            print(f'[AVISO] Falha ao salvar perfil de {sessao.rotulo}: {exc}')
+            return None
+
+    def _rotacionar(self) -> None:
+        perfis = self.listar()
+        for antigo in perfis[self.max_arquivos:]:
+            for extensao in ('.prof', '.txt'):
+                caminho = os.path.join(self.diretorio, antigo['nome'] + extensao)
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+
+    def listar(self) -> List[dict]:
+        if not os.path.isdir(self.diretorio):
+            return []
+        perfis = []
+        for arquivo in os.listdir(self.diretorio):
+            if not arquivo.endswith('.prof'):
+                continue
+            caminho = os.path.join(self.diretorio, arquivo)
+            perfis.append({
+                'nome': arquivo[:-len('.prof')],
+                'bytes': os.path.getsize(caminho),
+                'criado_em': datetime.fromtimestamp(os.path.getmtime(caminho)).isoformat(timespec='seconds'),
+            })
+        return sorted(perfis, key=lambda item: item['nome'], reverse=True)
+
+    def caminho_arquivo(self, nome_arquivo: str) -> str | None:
+        if os.path.basename(nome_arquivo) != nome_arquivo or not nome_arquivo.endswith(('.prof', '.txt')):
+            return None
+        caminho = os.path.join(self.diretorio, nome_arquivo)
+        return caminho if os.path.isfile(caminho) else None
+
+
+def perfilador_do_ambiente(diretorio: str) -> Perfilador:
+    return Perfilador(
+        diretorio=diretorio,
+        ativo=os.environ.get('PERFIL_ATIVO', '').strip() == '1',
+        segredo=os.environ.get('PERFIL_ADMIN_SECRET', '').strip(),
+        limiar_ms=float(os.environ.get('PERFIL_LIMIAR_MS', '1000') or 1000),
+        max_arquivos=int(os.environ.get('PERFIL_MAX_ARQUIVOS', '50') or 50),
+    )
@@ -0,0 +1,266 @@
+"""Retenção do histórico: janela quente em memória, meses antigos em segmentos frios.
+
+A compactação tira do ``programacao_historico.json`` os meses anteriores à
+janela quente e grava cada um num segmento imutável
+``historico-AAAA-MM-<hash>.json.gz``, com um resumo (contagens por base,
+equipe e condição) guardado no ``indice.json`` do diretório. As rotas que
+pedem um mês antigo leem os segmentos sob demanda, mantendo só os últimos
+decodificados num LRU pequeno. Meses arquivados são imutáveis: registros
+desses meses que voltem numa sincronização são ignorados.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from services.cache import deduplicate_records
+from services.fragmentos import FragmentoBase, base_do_registro, fragmentar
+from services.instrumentacao import medir
+from utils.dates import filtrar_por_mes_e_semana
+
+MESES_QUENTES_PADRAO = 3
+INDICE = 'indice.json'
+
+Preparador = Callable[[List[dict]], List[dict]]
+
+
+def mes_do_registro(registro: dict) -> str | None:
+    """``AAAA-MM`` da data ``dd/mm/aaaa`` do registro (``None`` se não der para ler)."""
+    partes = str(registro.get('data', '')).strip().split('/')
+    if len(partes) != 3 or not all(parte.isdigit() for parte in partes):
+        return None
+    return f'{int(partes[2]):04d}-{int(partes[1]):02d}'
+
+
+def inicio_janela(meses_quentes: int, hoje: date | None = None) -> str:
+    """Primeiro mês (``AAAA-MM``) mantido em memória."""
+    hoje = hoje or date.today()
+    indice = hoje.year * 12 + (hoje.month - 1) - max(meses_quentes - 1, 0)
+    return f'{indice // 12:04d}-{indice % 12 + 1:02d}'
+
+
+def meses_quentes_do_ambiente() -> int:
+    return int(os.environ.get('HISTORICO_MESES_QUENTES', MESES_QUENTES_PADRAO) or MESES_QUENTES_PADRAO)
+
+
+def resumir(registros: Iterable[dict]) -> dict:
+    por_base: Counter = Counter()
+    por_equipe: Counter = Counter()
+    por_condicao: Counter = Counter()
+    total = 0
+    for registro in registros:
+        total += 1
+        por_base[base_do_registro(registro) or '-'] += 1
+        por_equipe[registro.get('equipe') or '-'] += 1
+        por_condicao[str(registro.get('condicao') or registro.get('status') or '-').strip() or '-'] += 1
+    return {
+        'registros': total,
+        'por_base': dict(sorted(por_base.items())),
+        'por_equipe': dict(sorted(por_equipe.items())),
+        'por_condicao': dict(sorted(por_condicao.items())),
+    }
+
+
+@dataclass(frozen=True)
+class Segmento:
+    """Um mês arquivado, já preparado como os dados em memória."""
+
+    mes: str
+    registros: List[dict]
+    fragmentos: Dict[str, FragmentoBase]
+
+    def do_periodo(self, mes_sel: str, semana_sel: str) -> List[dict]:
+        return filtrar_por_mes_e_semana(self.registros, mes_sel, semana_sel)
+
+
+class ArquivoHistorico:
+    def __init__(self, diretorio: str, max_segmentos: int = 4, preparar: Preparador | None = None) -> None:
+        self.diretorio = diretorio
+        self.max_segmentos = max_segmentos
+        self.preparar = preparar or (lambda registros: registros)
+        self._lock = threading.Lock()
+        self._indice: Dict[str, dict] = {}
+        self._versao_indice: Tuple[int, int] | None = None
+        self._segmentos: OrderedDict[str, Segmento] = OrderedDict()
+        self._arquivados: Tuple[Tuple[int, int] | None, List[dict]] | None = None
+
+    @property
+    def caminho_indice(self) -> str:
+        return os.path.join(self.diretorio, INDICE)
+
+    def indice(self) -> Dict[str, dict]:
+        """Meses arquivados -> metadados (arquivo, hash, resumo); relido se outro processo compactou."""
+        try:
+            estado = os.stat(self.caminho_indice)
+            versao = (estado.st_mtime_ns, estado.st_size)
+        except OSError:
+            versao = None
+        with self._lock:
+            if versao != self._versao_indice:
+                self._indice = self._ler_indice() if versao else {}
+                self._versao_indice = versao
+            return self._indice
+
+    def versao(self) -> Tuple[int, int] | None:
+        """Versão do ``indice.json`` (muda a cada compactação, em qualquer processo)."""
+        self.indice()
+        with self._lock:
+            return self._versao_indice
+
+    def registros_arquivados(self) -> List[dict]:
+        """Registros de todos os meses arquivados (para a busca), relidos só quando o índice muda.
+
+        Não passa pelo LRU de segmentos: a leitura completa não deve expulsar
+        os meses que as rotas estão usando.
+        """
+        indice = self.indice()
+        versao = self.versao()
+        with self._lock:
+            if self._arquivados is not None and self._arquivados[0] == versao:
+                return self._arquivados[1]
+        registros: List[dict] = []
+        with medir('leitura_segmento'):
+            for mes in sorted(indice):
+                registros.extend(self.preparar(self._ler_segmento(indice[mes]['arquivo'])))
+        with self._lock:
+            self._arquivados = (versao, registros)
+        return registros
+
+    def _ler_indice(self) -> Dict[str, dict]:
+        try:
+            with open(self.caminho_indice, 'r', encoding='utf-8') as handler:
+                dados = json.load(handler)
+            return dados if isinstance(dados, dict) else {}
+        except (OSError, ValueError) as exc:
+            print(f'[AVISO] Falha ao ler {self.caminho_indice}: {exc}')
+            return {}
+
+    def meses(self) -> List[str]:
+        return sorted(self.indice())
+
+    def fora_do_arquivo(self, registros: Iterable[dict]) -> List[dict]:
+        """Registros de meses ainda não arquivados (os arquivados são imutáveis)."""
+        indice = self.indice()
+        if not indice:
+            return list(registros)
+        return [registro for registro in registros if mes_do_registro(registro) not in indice]
+
+    def resumo(self, mes: str) -> dict | None:
+        meta = self.indice().get(mes)
+        return meta['resumo'] if meta else None
+
+    def segmento(self, mes: str) -> Segmento | None:
+        meta = self.indice().get(mes)
+        if meta is None:
+            return None
+        # O nome do arquivo inclui o hash do conteúdo: um segmento regravado
+        # tem chave nova e o decodificado antigo só sai do LRU pelo uso.
+        arquivo = meta['arquivo']
+        with self._lock:
+            segmento = self._segmentos.get(arquivo)
+            if segmento is not None:
+                self._segmentos.move_to_end(arquivo)
+                return segmento
+        with medir('leitura_segmento'):
+            registros = self.preparar(self._ler_segmento(arquivo))
+        segmento = Segmento(mes, registros, fragmentar(registros))
+        with self._lock:
+            self._segmentos[arquivo] = segmento
+            while len(self._segmentos) > self.max_segmentos:
+                self._segmentos.popitem(last=False)
+        return segmento
+
+    def segmentos_do_mes(self, mes_sel: str) -> List[Segmento]:
+        """Segmentos que podem ter datas do mês ``mes_sel`` (``MM``), em ordem cronológica.
+
+        O filtro de mês não tem ano, então vale o mesmo mês de todos os anos; o
+        mês anterior entra porque a semana 1 de fevereiro começa em janeiro.
+        """
+        if not mes_sel or not mes_sel.isdigit():
+            return []
+        numero = int(mes_sel)
+        alvos = {f'{numero:02d}', f'{(numero - 2) % 12 + 1:02d}'}
+        segmentos = [self.segmento(mes) for mes in self.meses() if mes[5:] in alvos]
+        return [segmento for segmento in segmentos if segmento is not None]
+
+    def _ler_segmento(self, arquivo: str) -> List[dict]:
+        with gzip.open(os.path.join(self.diretorio, arquivo), 'rb') as handler:
+            return json.loads(handler.read())['registros']
+
+    def compactar(self, historico: List[dict], meses_quentes: int, hoje: date | None = None) -> Tuple[List[dict], dict]:
+        """Arquiva os meses anteriores à janela; devolve o histórico quente e um relatório.
+
+        Um mês que já tinha segmento é regravado com os registros antigos mais
+        os que estavam no histórico (a primeira ocorrência de cada chave vale).
+        Segmentos são gravados com nome novo e só depois o índice é trocado, de
+        modo que leitores nunca veem um segmento pela metade.
+        """
+        limite = inicio_janela(meses_quentes, hoje)
+        quentes: List[dict] = []
+        frios: Dict[str, List[dict]] = {}
+        for registro in historico:
+            mes = mes_do_registro(registro)
+            if mes is not None and mes < limite:
+                frios.setdefault(mes, []).append(registro)
+            else:
+                quentes.append(registro)
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        indice = {mes: dict(meta) for mes, meta in self.indice().items()}
+        substituidos = []
+        for mes, registros in sorted(frios.items()):
+            anterior = indice.get(mes)
+            if anterior:
+                registros = deduplicate_records(self._ler_segmento(anterior['arquivo']) + registros)
+                substituidos.append(anterior['arquivo'])
+            indice[mes] = self._gravar_segmento(mes, registros)
+        _gravar_json_atomico(self.caminho_indice, indice)
+        for arquivo in substituidos:
+            if arquivo not in {meta['arquivo'] for meta in indice.values()}:
+                try:
+                    os.remove(os.path.join(self.diretorio, arquivo))
+                except OSError:
+                    pass
+        relatorio = {
+            'inicio_janela': limite,
+            'meses_arquivados': sorted(frios),
+            'registros_arquivados': sum(len(registros) for registros in frios.values()),
+            'registros_quentes': len(quentes),
+            'segmentos': len(indice),
+        }
+        return quentes, relatorio
+
+    def _gravar_segmento(self, mes: str, registros: List[dict]) -> dict:
+        conteudo = json.dumps({'mes': mes, 'registros': registros}, ensure_ascii=False, default=str)
+        bruto = conteudo.encode('utf-8')
+        sha = hashlib.sha256(bruto).hexdigest()
+        arquivo = f'historico-{mes}-{sha[:12]}.json.gz'
+        caminho = os.path.join(self.diretorio, arquivo)
+        if not os.path.exists(caminho):
+            descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+            with os.fdopen(descritor, 'wb') as handler:
+                # mtime fixo: o mesmo conteúdo gera sempre os mesmos bytes.
+                handler.write(gzip.compress(bruto, compresslevel=6, mtime=0))
+            os.replace(temporario, caminho)
+        return {
+            'arquivo': arquivo,
+            'sha256': sha,
+            'bytes': os.path.getsize(caminho),
+            'resumo': resumir(self.preparar([dict(registro) for registro in registros])),
+        }
+
+
+def _gravar_json_atomico(caminho: str, dados: dict) -> None:
+    diretorio = os.path.dirname(caminho) or '.'
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    with os.fdopen(descritor, 'w', encoding='utf-8') as handler:
+        json.dump(dados, handler, ensure_ascii=False, sort_keys=True)
+    os.replace(temporario, caminho)
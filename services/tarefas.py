@@ -0,0 +1,186 @@
+"""Execução de tarefas em segundo plano com status persistido em JSON.
+
+O status de cada tarefa fica em ``<diretorio>/<id>.json``, então qualquer
+worker consegue responder à consulta, não só o que está executando. Um id
+já existente (ex.: derivado do hash do arquivo enviado) não é executado de
+novo enquanto a tentativa anterior estiver em andamento ou, se concluída,
+ainda valer (``vigente``). Tentativas que falharam ou ficaram abandonadas
+(processo dono morto, ou sem atualização há ``tempo_maximo`` segundos)
+podem ser refeitas.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Set, Tuple
+
+NA_FILA = 'na_fila'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+
+_ID_VALIDO = re.compile(r'^[A-Za-z0-9_-]{1,80}$')
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class Tarefa:
+    """Alça entregue à função executada para registrar o andamento."""
+
+    def __init__(self, executor: 'ExecutorTarefas', tarefa_id: str) -> None:
+        self.executor = executor
+        self.id = tarefa_id
+
+    def atualizar(self, **campos: Any) -> None:
+        self.executor.atualizar(self.id, **campos)
+
+    def progresso(self, aba: str, situacao: str, registros: int) -> None:
+        self.executor.registrar_aba(self.id, aba, situacao, registros)
+
+
+def _processo_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Sem permissão para sinalizar: o processo existe.
+        return True
+    return True
+
+
+class ExecutorTarefas:
+    def __init__(self, diretorio: str, max_paralelas: int = 1, tempo_maximo: float = 1800.0) -> None:
+        self.diretorio = diretorio
+        self.max_paralelas = max_paralelas
+        self.tempo_maximo = tempo_maximo
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.RLock()
+        self._ativas: Set[str] = set()
+
+    def _caminho(self, tarefa_id: str) -> str:
+        return os.path.join(self.diretorio, f'{tarefa_id}.json')
+
+    def status(self, tarefa_id: str) -> Dict[str, Any] | None:
+        if not _ID_VALIDO.match(tarefa_id or ''):
+            return None
+        try:
+            with open(self._caminho(tarefa_id), 'r', encoding='utf-8') as handler:
+                return json.load(handler)
+        except (OSError, ValueError):
+            return None
+
+    def atualizar(self, tarefa_id: str, **campos: Any) -> None:
+        with self._lock:
+            status = self.status(tarefa_id) or {'id': tarefa_id}
+            status.update(campos, atualizado_em=_agora())
+            self._gravar(tarefa_id, status)
+
+    def registrar_aba(self, tarefa_id: str, aba: str, situacao: str, registros: int) -> None:
+        with self._lock:
+            status = self.status(tarefa_id) or {'id': tarefa_id}
+            abas = status.get('abas') or []
+            abas.append({'aba': aba, 'situacao': situacao, 'registros': registros})
+            status.update(abas=abas, atualizado_em=_agora())
+            self._gravar(tarefa_id, status)
+
+    def _gravar(self, tarefa_id: str, status: Dict[str, Any]) -> None:
+        os.makedirs(self.diretorio, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(descritor, 'w', encoding='utf-8') as handler:
+            handler.write(json.dumps(status, ensure_ascii=False, default=str))
+        os.replace(temporario, self._caminho(tarefa_id))
+
+    def _abandonada(self, status: Dict[str, Any]) -> bool:
+        """Tarefa na fila/executando cujo dono morreu ou que parou de dar notícia."""
+        pid = status.get('pid')
+        if pid and status.get('host') == socket.gethostname():
+            if pid == os.getpid():
+                return status.get('id') not in self._ativas
+            if not _processo_vivo(pid):
+                return True
+        try:
+            atualizado = datetime.fromisoformat(status.get('atualizado_em') or '')
+        except ValueError:
+            return True
+        return (datetime.now() - atualizado).total_seconds() > self.tempo_maximo
+
+    def _refazer(self, anterior: Dict[str, Any] | None, vigente: Callable[[Dict[str, Any]], bool] | None) -> bool:
+        if anterior is None or anterior.get('status') == FALHOU:
+            return True
+        if anterior.get('status') == CONCLUIDA:
+            return vigente is not None and not vigente(anterior)
+        return self._abandonada(anterior)
+
+    def _reservar(
+        self,
+        tarefa_id: str,
+        inicial: Dict[str, Any],
+        vigente: Callable[[Dict[str, Any]], bool] | None = None,
+    ) -> bool:
+        """Cria o status de forma exclusiva; falha se outra tentativa válida já existe."""
+        os.makedirs(self.diretorio, exist_ok=True)
+        try:
+            descritor = os.open(self._caminho(tarefa_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self._refazer(self.status(tarefa_id), vigente):
+                return False
+            self._gravar(tarefa_id, inicial)
+            return True
+        with os.fdopen(descritor, 'w', encoding='utf-8') as handler:
+            handler.write(json.dumps(inicial, ensure_ascii=False, default=str))
+        return True
+
+    def submeter(
+        self,
+        tarefa_id: str,
+        tipo: str,
+        funcao: Callable[[Tarefa], Dict[str, Any]],
+        vigente: Callable[[Dict[str, Any]], bool] | None = None,
+        **extras: Any,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Agenda ``funcao``; devolve o status atual e se a tarefa é nova.
+
+        O dicionário devolvido por ``funcao`` é gravado em ``resultado``. Uma
+        tentativa concluída só impede a nova se ``vigente(status)`` disser que
+        o resultado dela ainda vale (sem ``vigente``, vale para sempre).
+        """
+        if not _ID_VALIDO.match(tarefa_id):
+            raise ValueError(f'Identificador de tarefa inválido: {tarefa_id!r}')
+        agora = _agora()
+        inicial = dict(
+            extras, id=tarefa_id, tipo=tipo, status=NA_FILA, abas=[], criado_em=agora, atualizado_em=agora,
+            pid=os.getpid(), host=socket.gethostname(),
+        )
+        with self._lock:
+            if not self._reservar(tarefa_id, inicial, vigente):
+                return self.status(tarefa_id) or inicial, False
+            self._ativas.add(tarefa_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_paralelas, thread_name_prefix='tarefas')
+            self._executor.submit(self._executar, tarefa_id, funcao)
+        return inicial, True
+
+    def _executar(self, tarefa_id: str, funcao: Callable[[Tarefa], Dict[str, Any]]) -> None:
+        try:
+            self.atualizar(tarefa_id, status=EXECUTANDO)
+            try:
+                resultado = funcao(Tarefa(self, tarefa_id))
+            except Exception as exc:  # noqa: BLE001
+                print(f'[ERRO] Tarefa {tarefa_id} falhou: {exc}')
+                self.atualizar(tarefa_id, status=FALHOU, mensagem=str(exc))
+                return
+            self.atualizar(
+                tarefa_id, status=CONCLUIDA, resultado=resultado, mensagem=(resultado or {}).get('mensagem', '')
+            )
+        finally:
+            with self._lock:
+                self._ativas.discard(tarefa_id)
@@ -1,14 +1,189 @@
-"""Script utilitário para agendar a sincronização do Dropbox sem subir o servidor Flask."""
+"""Ingestão das planilhas sem subir o servidor Flask.
+
+Usa só a camada ``services``: lê os workbooks (Dropbox ou um diretório local)
+num pool de processos, mescla com o snapshot em ``--destino`` e publica o
+evento que faz os workers web recarregarem. Pode rodar em outra máquina,
+desde que ``--destino`` seja o diretório de dados servido pelo app.
+
+Com ``--watch`` o processo fica observando o Dropbox (longpoll) e ingere
+apenas quando a planilha de controle ou um dos arquivos configurados muda.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
 from datetime import datetime
-from app import sincronizar_programacao_dropbox
-
-if __name__ == "__main__":
-    print(f"[SYNC] Iniciando sincronização às {datetime.now():%Y-%m-%d %H:%M:%S}")
-    resultado = sincronizar_programacao_dropbox()
-    status = "SUCESSO" if resultado["sucesso"] else "FALHA"
-    print(f"[SYNC] Status: {status}")
-    print(f"[SYNC] Mensagem: {resultado['mensagem']}")
-    if resultado["erros"]:
-        for erro in resultado["erros"]:
-            print(f"[SYNC][ERRO] {erro}")
-    print(f"[SYNC] Total de registros carregados: {len(resultado['registros'])}")
+
+from dotenv import load_dotenv
+
+from services.cache import load_summary
+from services.coalescencia import coalescedor_sincronizacao
+from services.dropbox_client import (
+    DropboxWatcher,
+    SharedTokenCache,
+    file_metadata,
+    get_access_token,
+    settings_from_env,
+)
+from services.eventos import BarramentoEventos
+from services.ingestao import ArquivosDados, Fonte, RelatorioIngestao, fontes_do_diretorio, ingerir
+from services.retencao import ArquivoHistorico
+
+DESTINO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+
+
+def _data_iso(texto: str) -> datetime:
+    data = datetime.fromisoformat(texto.replace('Z', '+00:00'))
+    return data.astimezone().replace(tzinfo=None) if data.tzinfo else data
+
+
+def _desde(valor: str | None, arquivos: ArquivosDados) -> datetime | None:
+    """``--since``: data ISO ou ``ultima`` (momento da última sincronização gravada)."""
+    if not valor:
+        return None
+    if valor == 'ultima':
+        quando = load_summary(arquivos.resumo).get('quando')
+        return _data_iso(quando) if quando else None
+    return _data_iso(valor)
+
+
+def _fontes_dropbox(settings, token: str) -> list:
+    caminhos = [('controle', settings.controle_path)]
+    if settings.folder_path:
+        caminhos += [(chave, f"{settings.folder_path.rstrip('/')}/{nome}") for chave, nome in settings.files.items()]
+    fontes = []
+    for nome, caminho in caminhos:
+        metadados = file_metadata(settings, token, caminho)
+        modificado = metadados.get('server_modified')
+        fontes.append(Fonte(nome, caminho, dropbox=True, modificado=_data_iso(modificado) if modificado else None))
+    return fontes
+
+
+def executar(args) -> RelatorioIngestao:
+    os.makedirs(args.destino, exist_ok=True)
+    arquivos = ArquivosDados.no_diretorio(args.destino)
+    token = None
+    if args.diretorio:
+        origem, fontes = 'diretorio', fontes_do_diretorio(args.diretorio)
+    else:
+        settings = settings_from_env()
+        cache = SharedTokenCache(
+            path=os.environ.get('DROPBOX_TOKEN_CACHE_PATH') or os.path.join(args.destino, 'dropbox_token.json')
+        )
+        token = get_access_token(settings, cache)
+        origem, fontes = 'dropbox', _fontes_dropbox(settings, token)
+    eventos = None
+    if os.environ.get('EVENTOS_ATIVOS', '1').strip() != '0':
+        eventos = BarramentoEventos(os.path.join(args.destino, 'eventos.jsonl'))
+
+    def _ingerir() -> RelatorioIngestao:
+        return ingerir(
+            fontes, arquivos, origem,
+            token=token,
+            processos=args.processos,
+            dry_run=args.dry_run,
+            desde=_desde(args.since, arquivos),
+            eventos=eventos,
+            arquivo=ArquivoHistorico(os.path.join(args.destino, 'arquivo')),
+        )
+
+    if args.dry_run:
+        return _ingerir()
+
+    def _coalescida() -> RelatorioIngestao:
+        relatorio = RelatorioIngestao(origem=origem, situacao='coalescida')
+        relatorio.resumo = load_summary(arquivos.resumo)
+        return relatorio
+
+    # Mesma trava da sincronização disparada pelo app: nunca duas gravações ao mesmo tempo.
+    coalescedor = coalescedor_sincronizacao(os.path.join(args.destino, 'travas'))
+    return coalescedor.executar(
+        'sincronizacao', _ingerir, entre_processos=True, apos_espera=_coalescida,
+        sucesso=lambda relatorio: relatorio.situacao != 'erro' and not relatorio.erros,
+    )
+
+
+def _imprimir(relatorio: RelatorioIngestao) -> None:
+    print(f"[SYNC] Situação: {relatorio.situacao} ({len(relatorio.fontes)} fontes)")
+    for fonte in relatorio.fontes:
+        if 'registros' in fonte:
+            print(f"[SYNC] {fonte['nome']}: {fonte['registros']} registros, {fonte['concluidas']} concluídas em {fonte['segundos']}s")
+    for erro in relatorio.erros:
+        print(f"[SYNC][ERRO] {erro}")
+    resumo = relatorio.resumo
+    if resumo:
+        print(
+            f"[SYNC] Total de registros: {resumo.get('registros', 0)} "
+            f"({resumo.get('adicionados', 0)} novos, {resumo.get('modificados', 0)} alterados, "
+            f"{resumo.get('removidos', 0)} removidos)"
+        )
+
+
+def sincronizar(args, motivo: str = '') -> RelatorioIngestao:
+    # Com o relatório no stdout as mensagens vão para o stderr e o JSON sai limpo (``| jq``).
+    with contextlib.redirect_stdout(sys.stderr if args.json_report == '-' else sys.stdout):
+        print(f"[SYNC] Iniciando sincronização às {datetime.now():%Y-%m-%d %H:%M:%S}{motivo}")
+        try:
+            relatorio = executar(args)
+        except Exception as exc:  # noqa: BLE001
+            relatorio = RelatorioIngestao(origem='diretorio' if args.diretorio else 'dropbox', situacao='erro')
+            relatorio.erros.append(str(exc))
+        _imprimir(relatorio)
+    if args.json_report:
+        conteudo = json.dumps(relatorio.como_dict(), ensure_ascii=False, indent=2, default=str)
+        if args.json_report == '-':
+            print(conteudo)
+        else:
+            with open(args.json_report, 'w', encoding='utf-8') as handler:
+                handler.write(conteudo)
+    return relatorio
+
+
+def observar(args) -> None:
+    settings = settings_from_env()
+    cache = SharedTokenCache(
+        path=os.environ.get('DROPBOX_TOKEN_CACHE_PATH') or os.path.join(args.destino, 'dropbox_token.json')
+    )
+    watcher = DropboxWatcher(
+        settings,
+        cache,
+        on_change=lambda caminhos: sincronizar(args, f" (alterados: {', '.join(caminhos)})"),
+        debounce=float(os.environ.get('DROPBOX_WATCH_DEBOUNCE_S', '10')),
+    )
+    # Cobre o que mudou enquanto o processo estava parado.
+    sincronizar(args)
+    watcher.start()
+    print('[SYNC] Observando alterações no Dropbox (Ctrl+C para sair)')
+    try:
+        watcher.wait()
+    except KeyboardInterrupt:
+        watcher.stop(timeout=1)
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--diretorio', help='lê os workbooks (.xlsx/.xlsm) deste diretório em vez do Dropbox')
+    parser.add_argument('--destino', default=DESTINO_PADRAO, help='diretório de dados servido pelo app (padrão: uploads/)')
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1, help='processos para ler os workbooks')
+    parser.add_argument('--dry-run', action='store_true', help='lê e calcula o delta sem gravar nada')
+    parser.add_argument('--since', help="só ingere se alguma fonte mudou depois desta data ISO ou de 'ultima' sincronização")
+    parser.add_argument('--json-report', help="grava o relatório (com tempos por etapa) neste arquivo; '-' para stdout")
+    parser.add_argument('--watch', action='store_true', help='observa o Dropbox e sincroniza a cada alteração')
+    return parser
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    args = criar_parser().parse_args(argv)
+    if args.watch:
+        if args.diretorio:
+            print('[SYNC][ERRO] --watch só funciona com o Dropbox')
+            return 2
+        observar(args)
+        return 0
+    return 1 if sincronizar(args).situacao == 'erro' else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from services.admissao import FILA_CHEIA, TEMPO_ESGOTADO, ControleAdmissao, Orcamento, Rejeitada
+from services.instrumentacao import metricas
+
+
+def _ocupar(controle, rota):
+    """Segura uma vaga de ``rota`` numa thread até ``liberar.set()``."""
+    dentro, liberar = threading.Event(), threading.Event()
+
+    def _executar():
+        with controle.admitir(rota):
+            dentro.set()
+            liberar.wait(5)
+
+    thread = threading.Thread(target=_executar, daemon=True)
+    thread.start()
+    assert dentro.wait(2)
+    return liberar, thread
+
+
+@pytest.mark.parametrize('entre_processos', [False, True])
+def test_fila_espera_vaga_e_recusa_quando_cheia(tmp_path, entre_processos):
+    diretorio = str(tmp_path) if entre_processos else None
+    controle = ControleAdmissao({'pdf': Orcamento(simultaneas=1, fila=1, espera=2, tentar_em=9)}, diretorio)
+    liberar, ocupante = _ocupar(controle, 'pdf')
+
+    resultado = {}
+
+    def _na_fila():
+        inicio = time.monotonic()
+        with controle.admitir('pdf'):
+            resultado['esperou'] = time.monotonic() - inicio
+
+    fila = threading.Thread(target=_na_fila)
+    fila.start()
+    time.sleep(0.2)
+    assert controle.resumo()['pdf']['esperando'] == 1
+
+    with pytest.raises(Rejeitada) as recusa:
+        with controle.admitir('pdf'):
+            pass
+    assert (recusa.value.status, recusa.value.motivo, recusa.value.tentar_em) == (429, FILA_CHEIA, 9)
+
+    liberar.set()
+    ocupante.join(2)
+    fila.join(2)
+    assert 0.15 < resultado['esperou'] < 2
+    assert controle.resumo()['pdf'] == {'simultaneas': 1, 'fila': 1, 'executando': 0, 'esperando': 0}
+    # Rotas sem orçamento não são limitadas.
+    with controle.admitir('mapa'):
+        pass
+
+
+def test_espera_esgotada_e_vagas_entre_processos(tmp_path):
+    orcamentos = {'sync': Orcamento(simultaneas=1, fila=2, espera=0.2)}
+    # Dois controles no mesmo diretório fazem o papel de dois workers.
+    worker_a = ControleAdmissao(orcamentos, str(tmp_path))
+    worker_b = ControleAdmissao(orcamentos, str(tmp_path))
+    liberar, ocupante = _ocupar(worker_a, 'sync')
+    chave = ('mapa_admissao_rejeicoes_total', (('motivo', TEMPO_ESGOTADO), ('rota', 'sync')))
+    antes = metricas.instantaneo()['contadores'].get(chave, 0)
+
+    inicio = time.monotonic()
+    with pytest.raises(Rejeitada) as recusa:
+        with worker_b.admitir('sync'):
+            pass
+    assert recusa.value.status == 503 and recusa.value.motivo == TEMPO_ESGOTADO
+    assert recusa.value.tentar_em == 1 and time.monotonic() - inicio >= 0.2
+    if metricas.ativo:
+        assert metricas.instantaneo()['contadores'][chave] == antes + 1
+
+    liberar.set()
+    ocupante.join(2)
+    with worker_b.admitir('sync'):
+        pass
+
+
+def test_rotas_pesadas_no_limite_respondem_com_retry_after(monkeypatch, tmp_path):
+    import app as modulo
+
+    controle = ControleAdmissao({
+        'atualizar_programacao': Orcamento(simultaneas=1, tentar_em=30),
+        'exportar_concluidas_pdf': Orcamento(simultaneas=1, fila=1, espera=0.1),
+    })
+    monkeypatch.setattr(modulo, 'ADMISSAO', controle)
+    monkeypatch.setattr(modulo, 'SYNC_SUMMARY_FILE_PATH', str(tmp_path / 'resumo.json'))
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', False)
+    cliente = modulo.app.test_client()
+    liberar_sync, sync = _ocupar(controle, 'atualizar_programacao')
+    liberar_pdf, pdf = _ocupar(controle, 'exportar_concluidas_pdf')
+    try:
+        resposta = cliente.post('/atualizar_programacao', headers={'Accept': 'application/json'})
+        assert resposta.status_code == 429 and resposta.headers['Retry-After'] == '30'
+        assert resposta.get_json()['motivo'] == FILA_CHEIA
+
+        resposta = cliente.get('/concluidas/export/pdf')
+        assert resposta.status_code == 503 and resposta.headers['Retry-After'] == '1'
+        assert resposta.mimetype == 'text/plain'
+
+        # As leituras seguem atendidas com as rotas pesadas lotadas.
+        assert cliente.get('/api/sincronizacao/resumo').status_code == 200
+    finally:
+        liberar_sync.set()
+        liberar_pdf.set()
+        sync.join(2)
+        pdf.join(2)
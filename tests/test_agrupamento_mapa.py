@@ -0,0 +1,118 @@
+from collections import Counter
+
+import pytest
+
+from benchmarks.geradores import gerar_registros_programacao
+from services.agrupamento import CacheCoordenadas, MapaSemana, ler_limites
+from services.ingestao import preparar_carregados
+from utils.dates import filtrar_por_mes_e_semana, obter_mes_semana_atual
+
+# Parte dos locais do gerador; os demais ficam sem coordenadas.
+COORDENADAS = {
+    'BACABAL': (-4.2247, -44.7800),
+    'LAGO VERDE': (-3.9461, -44.8261),
+    'VITÓRIA DO MEARIM': (-3.4628, -44.8708),
+    'SÃO LUÍS GONZAGA': (-4.3797, -44.6703),
+    'ITAPECURU MIRIM': (-3.3928, -44.3592),
+    'SANTA INÊS': (-3.6669, -45.3800),
+    'ZÉ DOCA': (-3.2706, -45.6553),
+}
+
+
+@pytest.fixture
+def projetos():
+    return preparar_carregados(gerar_registros_programacao(6000, semente=5, dias=21))
+
+
+@pytest.fixture
+def coordenadas(tmp_path):
+    cache = CacheCoordenadas(str(tmp_path / 'coordenadas.json'))
+    for local, (lat, lon) in COORDENADAS.items():
+        cache.definir(local, lat, lon)
+    return cache
+
+
+def _semana(projetos):
+    mes, semana = obter_mes_semana_atual()
+    return filtrar_por_mes_e_semana(projetos, mes, semana), mes, semana
+
+
+def test_agrupamentos_somam_os_projetos_da_semana(projetos, coordenadas):
+    semana, mes, numero = _semana(projetos)
+    mapa = MapaSemana.montar(semana, mes, numero, coordenadas)
+    programados = [p for p in semana if p['_programado'] and p['equipe'] and (p.get('local') or '-').strip() not in ('', '-')]
+    assert programados
+
+    for zoom in (3, 8, 16):
+        resposta = mapa.consultar(zoom)
+        com_coordenadas = [p for p in programados if p['local'] in COORDENADAS]
+        assert sum(a['projetos'] for a in resposta['agrupamentos']) == len(com_coordenadas)
+        equipes = Counter()
+        for agrupamento in resposta['agrupamentos']:
+            equipes.update(agrupamento['equipes'])
+        assert equipes == Counter(p['equipe'] for p in com_coordenadas)
+        assert set(resposta['sem_coordenadas']) == {p['local'] for p in programados} - set(COORDENADAS)
+        assert resposta['locais_total'] == len({p['local'] for p in programados})
+
+    # Longe, tudo vira um agrupamento (a grade é fixa: em zoom 1 e 2 o meridiano
+    # 45° O, que passa entre os locais, é borda de célula); de perto, cada local é um marcador.
+    assert len(mapa.consultar(0)['agrupamentos']) == 1
+    perto = mapa.consultar(16)['agrupamentos']
+    assert all(a['locais'] == 1 and a['local'] for a in perto)
+
+    # Só o que toca a área visível (arredores de Bacabal).
+    visiveis = mapa.consultar(16, ler_limites('-44.9,-4.5,-44.6,-4.1'))['agrupamentos']
+    assert {a['local'] for a in visiveis} == {'BACABAL', 'SÃO LUÍS GONZAGA'}
+
+    base = mapa.consultar(10, base='BCB')['agrupamentos']
+    assert {e[3:6] for a in base for e in a['equipes']} <= {'BCB'}
+
+
+def test_detalhe_e_grade_acompanham_coordenadas(projetos, coordenadas, tmp_path):
+    semana, mes, numero = _semana(projetos)
+    mapa = MapaSemana.montar(semana, mes, numero, coordenadas)
+    faltando = mapa.consultar(12)['sem_coordenadas']
+    assert faltando
+
+    # Outro worker grava a coordenada: a grade memorizada é refeita.
+    CacheCoordenadas(coordenadas.caminho).definir(faltando[0].lower(), -3.5, -44.0)
+    assert faltando[0] not in mapa.consultar(12)['sem_coordenadas']
+
+    detalhe = mapa.detalhe(faltando[0])
+    assert detalhe['lat'] == -3.5 and detalhe['projetos']
+    assert mapa.detalhe('LUGAR NENHUM') is None
+    with pytest.raises(ValueError):
+        coordenadas.definir('BACABAL', 120, 0)
+    with pytest.raises(ValueError):
+        ler_limites('1,2,3')
+
+
+def test_api_localizacoes_com_zoom_e_detalhe(monkeypatch, tmp_path, projetos):
+    import app as modulo
+
+    monkeypatch.setattr(modulo, 'COORDENADAS', CacheCoordenadas(str(tmp_path / 'coordenadas.json')))
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', False)
+    monkeypatch.setattr(modulo, 'CACHE_PAGINAS', None)
+    modulo.dados.substituir(projetos=projetos, concluidas=[])
+    cliente = modulo.app.test_client()
+
+    lista = cliente.get('/api/localizacoes_atual').get_json()
+    assert lista and {'local', 'projetos'} <= set(lista[0])
+
+    vazio = cliente.get('/api/localizacoes_atual?zoom=8').get_json()
+    assert vazio['agrupamentos'] == [] and set(vazio['sem_coordenadas']) == {item['local'] for item in lista}
+
+    for local, (lat, lon) in COORDENADAS.items():
+        resposta = cliente.post('/api/localizacoes/coordenadas', json={'local': local, 'lat': lat, 'lon': lon})
+        assert resposta.status_code == 200
+    assert cliente.post('/api/localizacoes/coordenadas', json={'local': 'X', 'lat': 'a'}).status_code == 400
+
+    corpo = cliente.get('/api/localizacoes_atual?zoom=16&bbox=-44.9,-4.5,-44.6,-4.1&base=BCB').get_json()
+    assert {a['local'] for a in corpo['agrupamentos']} <= {'BACABAL', 'SÃO LUÍS GONZAGA'}
+    assert corpo['datas'] and corpo['versao_dados'] == modulo.dados.versao
+    assert cliente.get('/api/localizacoes_atual?zoom=x').status_code == 400
+
+    detalhe = cliente.get('/api/localizacoes_atual/detalhe?local=BACABAL').get_json()
+    esperado = next(item['projetos'] for item in lista if item['local'] == 'BACABAL')
+    assert detalhe['projetos'] == esperado
+    assert cliente.get('/api/localizacoes_atual/detalhe?local=NADA').status_code == 404
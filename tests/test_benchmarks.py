@@ -0,0 +1,39 @@
+import json
+
+from benchmarks.executar import comparar, executar
+from benchmarks.geradores import gerar_caches_json, gerar_workbook
+from services.cache import load_cache, load_history
+from services.excel_loader import carregar_concluidas_do_arquivo, carregar_registros_do_arquivo
+
+
+def test_workbook_sintetico_e_lido_pelo_carregador():
+    conteudo = gerar_workbook(linhas=60, abas=3, deslocamento_cabecalho=3, abas_auxiliares=1, linhas_concluidas=15)
+
+    registros = carregar_registros_do_arquivo(conteudo)
+    conteudo.seek(0)
+    concluidas = carregar_concluidas_do_arquivo(conteudo)
+
+    assert len(registros) == 60
+    assert {'data', 'equipe', 'pep', 'nota', 'local', 'status'} <= set(registros[0])
+    assert len(concluidas) == 15
+
+
+def test_caches_json_sinteticos(tmp_path):
+    caminhos = gerar_caches_json(str(tmp_path), historico=300, recentes=50, concluidas=20)
+
+    assert load_history(caminhos['historico'])
+    assert load_cache(caminhos['cache'])
+    assert len(load_cache(caminhos['concluidas'])) == 20
+
+
+def test_executar_gera_json_comparavel():
+    escala = {'linhas_excel': 20, 'abas': 1, 'concluidas': 30, 'registros': 100, 'historico': 100}
+    resultado = executar(escala, repeticoes=2, filtro='metricas_concluidas')
+
+    json.dumps(resultado)
+    medicao = resultado['resultados']['metricas_concluidas']
+    assert medicao['repeticoes'] == 2
+    assert medicao['min_s'] <= medicao['mediana_s'] <= medicao['max_s']
+
+    anterior = {'resultados': {'metricas_concluidas': {'mediana_s': medicao['mediana_s'] / 10}}}
+    assert comparar(resultado, anterior)['metricas_concluidas']['regressao'] is True
@@ -0,0 +1,121 @@
+import re
+
+import pytest
+
+from benchmarks.geradores import gerar_caches_json, gerar_registros_programacao
+from services.busca import IndiceBusca, palavras
+from services.cache import anotar_impressoes
+from services.retencao import ArquivoHistorico
+
+
+def _compacto(texto):
+    return ''.join(palavras(texto))
+
+
+def _casa(registro, termo):
+    partes = palavras(termo)
+    compacto = ''.join(partes)
+    if any(_compacto(registro.get(campo)).startswith(compacto) for campo in ('pep', 'nota')):
+        return True
+    contidas = set(palavras(registro.get('local'))) | set(palavras(registro.get('obs')))
+    return all(parte in contidas for parte in partes)
+
+
+def _esperado(registros, consulta):
+    return {id(r) for r in registros if all(_casa(r, termo) for termo in consulta.split())}
+
+
+def _data(registro):
+    dia, mes, ano = registro['data'].split('/')
+    return ano, mes, dia
+
+
+@pytest.fixture
+def registros():
+    return anotar_impressoes(gerar_registros_programacao(3000, semente=11))
+
+
+@pytest.mark.parametrize('consulta', ['vitoria', 'Olho d\'água', 'sao luis', 'aguardando', 'ma12', 'pep', 'nota', 'bacabal chuva'])
+def test_busca_igual_a_varredura(registros, consulta):
+    if consulta in ('pep', 'nota'):
+        # Prefixo de um valor existente, com a pontuação original.
+        consulta = next(r[consulta] for r in registros if r[consulta] != '-')[:7]
+    indice = IndiceBusca()
+    indice.atualizar(registros)
+
+    resultado = indice.buscar(consulta, por_pagina=200)
+    esperado = _esperado(registros, consulta)
+
+    assert resultado.total == len(esperado) > 0
+    assert {id(r) for r in resultado.registros} <= esperado
+    datas = [_data(r) for r in resultado.registros]
+    assert datas == sorted(datas, reverse=True)
+
+
+def test_paginacao_e_campo(registros):
+    indice = IndiceBusca()
+    indice.atualizar(registros)
+
+    paginas = [indice.buscar('chuva', pagina=pagina, por_pagina=25) for pagina in (1, 2)]
+    assert paginas[0].total == paginas[1].total and paginas[0].paginas > 2
+    assert not {id(r) for r in paginas[0].registros} & {id(r) for r in paginas[1].registros}
+
+    # "CHUVA" só aparece em OBS.
+    assert indice.buscar('chuva', campo='local').total == 0
+    with pytest.raises(ValueError):
+        indice.buscar('chuva', campo='equipe')
+    como_dict = paginas[0].como_dict()
+    assert {'equipe', 'data', 'status', 'base'} <= set(como_dict['resultados'][0])
+
+
+def test_atualizacao_incremental_igual_a_reconstrucao(registros):
+    indice = IndiceBusca()
+    assert indice.atualizar(registros) == {'adicionados': len(registros), 'removidos': 0}
+
+    alterados = anotar_impressoes([dict(r, obs='POSTE TOMBADO') for r in registros[:40]])
+    novos = anotar_impressoes(gerar_registros_programacao(30, semente=99))
+    atuais = alterados + registros[40:2900] + novos
+    # Recarga de outro worker: mesmos conteúdos em objetos novos.
+    atuais = [dict(r) for r in atuais]
+
+    assert indice.atualizar(atuais) == {'adicionados': 70, 'removidos': 140}
+    reconstruido = IndiceBusca()
+    reconstruido.atualizar(atuais)
+    for consulta in ('poste tombado', 'santa', 'ma2', 'ok'):
+        incremental = indice.buscar(consulta, por_pagina=200)
+        completo = reconstruido.buscar(consulta, por_pagina=200)
+        assert incremental.total == completo.total == len(_esperado(atuais, consulta))
+        # Empates na mesma data podem vir em outra ordem; as datas da página não.
+        assert [_data(r) for r in incremental.registros] == [_data(r) for r in completo.registros]
+    assert len(indice) == len(atuais)
+
+
+def test_api_busca_acompanha_sincronizacao(monkeypatch, tmp_path):
+    import app as modulo
+
+    caminhos = gerar_caches_json(str(tmp_path), historico=500, recentes=100, concluidas=5)
+    monkeypatch.setattr(modulo, 'CACHE_FILE_PATH', caminhos['cache'])
+    monkeypatch.setattr(modulo, 'HISTORY_FILE_PATH', caminhos['historico'])
+    monkeypatch.setattr(modulo, 'CONCLUIDAS_FILE_PATH', caminhos['concluidas'])
+    monkeypatch.setattr(modulo, 'SYNC_SUMMARY_FILE_PATH', str(tmp_path / 'resumo.json'))
+    monkeypatch.setattr(modulo, 'ARQUIVOS_DADOS', (caminhos['cache'], caminhos['historico'], caminhos['concluidas']))
+    monkeypatch.setattr(modulo, 'ARQUIVO_HISTORICO', ArquivoHistorico(str(tmp_path / 'arquivo')))
+    monkeypatch.setattr(modulo, 'INDICE_BUSCA', IndiceBusca())
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', False)
+    modulo.dados.recarregar()
+    cliente = modulo.app.test_client()
+
+    assert cliente.get('/api/busca').status_code == 400
+    assert cliente.get('/api/busca?q=x&campo=equipe').status_code == 400
+    assert cliente.get('/api/busca?q=Transformador').get_json()['total'] == 0
+
+    alterado = dict(modulo.dados.projetos[-1], obs='Transformador avariado')
+    alterado.pop('_impressao', None)
+    modulo._aplicar_sincronizacao(modulo.dados.projetos[:-1] + [alterado], None, 'teste')
+
+    corpo = cliente.get('/api/busca?q=transformador&por_pagina=5').get_json()
+    assert corpo['total'] == 1
+    assert corpo['resultados'][0]['equipe'] == alterado['equipe']
+    assert corpo['resultados'][0]['data'] == alterado['data']
+    nota = re.sub(r'\D', '', str(alterado['nota']))[:5]
+    assert cliente.get(f'/api/busca?q={nota}&campo=nota').get_json()['total'] >= 1
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+import pytest
+
+from services.cache import chave_registro, load_history, mesclar_e_persistir
+from services.dados import RepositorioDados
+
+
+def _registro(dias_atras: int, nota: str, status: str = 'PROGRAMADO') -> dict:
+    data = (date.today() - timedelta(days=dias_atras)).strftime('%d/%m/%Y')
+    return {
+        'id': 1, 'data': data, 'equipe': 'MA-BCB-O001M', 'pep': '-', 'nota': nota,
+        'local': 'BACABAL', 'periodo': 'MANHÃ', 'status': status
+    }
+
+
+@pytest.fixture
+def caminhos(tmp_path):
+    return str(tmp_path / 'cache.json'), str(tmp_path / 'historico.json')
+
+
+def test_primeira_sincronizacao_adiciona_tudo(caminhos):
+    resultado = mesclar_e_persistir([_registro(30, '1'), _registro(1, '2'), _registro(1, '2')], *caminhos)
+
+    assert resultado.delta.resumo() == {'adicionados': 2, 'modificados': 0, 'removidos': 0}
+    assert resultado.historico_alterado and resultado.cache_alterado
+    assert len(resultado.registros) == 2
+
+
+def test_sincronizacao_identica_nao_regrava(caminhos):
+    mesclar_e_persistir([_registro(30, '1'), _registro(1, '2')], *caminhos)
+    repetido = [_registro(30, '1'), _registro(1, '2')]
+    repetido[0]['id'] = 99
+
+    resultado = mesclar_e_persistir(repetido, *caminhos)
+
+    assert resultado.delta.vazio
+    assert not resultado.historico_alterado
+    assert not resultado.cache_alterado
+
+
+def test_status_alterado_substitui_registro_do_historico(caminhos):
+    mesclar_e_persistir([_registro(30, '1', 'PROGRAMADO')], *caminhos)
+
+    resultado = mesclar_e_persistir([_registro(30, '1', 'CONCLUÍDO')], *caminhos)
+
+    assert resultado.delta.resumo() == {'adicionados': 0, 'modificados': 1, 'removidos': 0}
+    assert [r['status'] for r in load_history(caminhos[1])] == ['CONCLUÍDO']
+
+
+def test_registro_recente_removido_da_planilha(caminhos):
+    mesclar_e_persistir([_registro(1, '1'), _registro(2, '2')], *caminhos)
+
+    resultado = mesclar_e_persistir([_registro(1, '1')], *caminhos)
+
+    assert resultado.delta.resumo() == {'adicionados': 0, 'modificados': 0, 'removidos': 1}
+    assert resultado.delta.removidos[0]['nota'] == '2'
+
+
+def test_repositorio_aplica_delta_sem_recarregar():
+    repositorio = RepositorioDados(lambda: ([_registro(1, '1'), _registro(2, '2')], []))
+    versao = repositorio.versao
+    repositorio.projetos
+
+    assert repositorio.aplicar_delta([], [], [], chave_registro) == repositorio.versao
+
+    alterado = _registro(1, '1', 'SEM PEP')
+    repositorio.aplicar_delta([_registro(3, '3')], [alterado], [_registro(2, '2')], chave_registro)
+
+    assert repositorio.versao > versao
+    assert [(r['nota'], r['status']) for r in repositorio.projetos] == [('1', 'SEM PEP'), ('3', 'PROGRAMADO')]
+
+
+def test_resumo_da_sincronizacao_exposto_na_api(tmp_path, monkeypatch):
+    import app as modulo
+
+    monkeypatch.setattr(modulo, 'CACHE_FILE_PATH', str(tmp_path / 'cache.json'))
+    monkeypatch.setattr(modulo, 'HISTORY_FILE_PATH', str(tmp_path / 'historico.json'))
+    monkeypatch.setattr(modulo, 'CONCLUIDAS_FILE_PATH', str(tmp_path / 'concluidas.json'))
+    monkeypatch.setattr(modulo, 'SYNC_SUMMARY_FILE_PATH', str(tmp_path / 'resumo.json'))
+    monkeypatch.setattr(modulo, 'dados', RepositorioDados(lambda: ([], [])))
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', False)
+
+    modulo._aplicar_sincronizacao([_registro(1, '1'), _registro(40, '2')], [{'base': 'BCB', 'obra': 'X'}], 'teste')
+    corpo = modulo.app.test_client().get('/api/sincronizacao/resumo').get_json()
+
+    resumo = corpo['ultima_sincronizacao']
+    assert resumo['origem'] == 'teste'
+    assert resumo['adicionados'] == 2
+    assert resumo['concluidas_alteradas'] is True
+    assert corpo['versao_dados'] == resumo['versao']
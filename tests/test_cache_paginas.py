@@ -0,0 +1,62 @@
+import gzip
+
+from services.cache_paginas import BackendDisco, BackendMemoria, PaginaEmCache, chave_pagina
+
+
+def test_chave_ignora_ordem_e_parametros_vazios():
+    base = chave_pagina('/mapa', [('mes', '02'), ('semana', '7')], 'arquivos-1')
+    assert chave_pagina('/mapa', [('semana', '7 '), ('base', ''), ('mes', '02')], 'arquivos-1') == base
+    assert chave_pagina('/mapa', [('mes', '02'), ('semana', '7')], 'arquivos-2') != base
+    assert chave_pagina('/semanal', [('mes', '02'), ('semana', '7')], 'arquivos-1') != base
+
+
+def test_backends_guardam_pagina_e_variante_gzip(tmp_path):
+    pagina = PaginaEmCache(corpo=b'<html>mapa</html>' * 50, mimetype='text/html', etag='abc', ultima_modificacao=1.0)
+    comprimida = pagina.com_gzip()
+    assert gzip.decompress(comprimida.corpo_gzip) == pagina.corpo
+    assert comprimida.com_gzip() is comprimida
+
+    memoria = BackendMemoria(max_itens=2)
+    for chave in ('a', 'b'):
+        memoria.guardar(chave, pagina)
+    memoria.obter('a')
+    memoria.guardar('c', pagina)
+    assert memoria.obter('b') is None and memoria.obter('a') is pagina
+
+    disco = BackendDisco(str(tmp_path), max_itens=2)
+    disco.guardar('x', comprimida)
+    outro_worker = BackendDisco(str(tmp_path))
+    assert outro_worker.obter('x') == comprimida
+    for chave in 'abcd':
+        disco.guardar(chave, pagina)
+    assert len(disco) == 2
+
+
+def test_rota_servida_do_cache_com_304(monkeypatch):
+    import app as modulo
+
+    monkeypatch.setattr(modulo, 'CACHE_PAGINAS', BackendMemoria())
+    renderizacoes = []
+    original = modulo.render_template
+
+    def _contar(*args, **kwargs):
+        renderizacoes.append(args[0])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(modulo, 'render_template', _contar)
+    modulo.dados.substituir(projetos=[], concluidas=[])
+    cliente = modulo.create_app().test_client()
+
+    primeira = cliente.get('/semanal?mes=02', headers={'Accept-Encoding': 'gzip'})
+    assert primeira.status_code == 200 and primeira.headers['Content-Encoding'] == 'gzip'
+    etag = primeira.headers['ETag']
+    assert primeira.headers['Last-Modified']
+
+    segunda = cliente.get('/semanal?mes=02&semana=')
+    assert segunda.status_code == 200 and b'<html' in segunda.data.lower()
+    assert cliente.get('/semanal?mes=02', headers={'If-None-Match': etag}).status_code == 304
+    assert renderizacoes == ['mapa.html']
+
+    modulo.dados.substituir(projetos=[])
+    assert cliente.get('/semanal?mes=02', headers={'If-None-Match': etag}).status_code == 200
+    assert renderizacoes == ['mapa.html', 'mapa.html']
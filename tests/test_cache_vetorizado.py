@@ -0,0 +1,82 @@
+from datetime import date, datetime, timedelta
+
+from benchmarks.geradores import gerar_registros_programacao
+from services import cache
+
+
+def _particao_referencia(registros, dias_historico=7):
+    limite = datetime.now().date() - timedelta(days=dias_historico)
+    historico, recentes = [], []
+    for registro in registros:
+        try:
+            data_registro = datetime.strptime(str(registro.get('data', '')).strip(), '%d/%m/%Y').date()
+        except Exception:
+            recentes.append(registro)
+            continue
+        (historico if data_registro < limite else recentes).append(registro)
+    return historico, recentes
+
+
+def _dedup_referencia(registros, key_fields=cache.DEFAULT_KEY_FIELDS):
+    vistos, saida = set(), []
+    for registro in registros:
+        chave = tuple(registro.get(c) for c in key_fields)
+        if chave not in vistos:
+            vistos.add(chave)
+            saida.append(registro)
+    return saida
+
+
+def _amostra():
+    registros = gerar_registros_programacao(3_000, inicio=date.today() - timedelta(days=30), dias=40)
+    hoje = date.today()
+    estranhos = [
+        '', '-', None, 'now', 'today', '31/02/2024', ' 01/01/2020 ', '1/2/2020', '2020-01-05',
+        (hoje - timedelta(days=7)).strftime('%d/%m/%Y'),
+        (hoje - timedelta(days=8)).strftime('%d/%m/%Y'), '01/01/0001',
+    ]
+    for posicao, valor in enumerate(estranhos):
+        registros[posicao * 7]['data'] = valor
+    del registros[5]['data']
+    return registros
+
+
+def test_particao_vetorizada_identica_ao_laco(monkeypatch):
+    registros = _amostra()
+    esperado = _particao_referencia(registros)
+
+    monkeypatch.setattr(cache, 'LIMIAR_VETORIZADO', 1)
+    vetorizado = cache.partition_records_by_date(registros)
+    monkeypatch.setattr(cache, 'LIMIAR_VETORIZADO', float('inf'))
+    em_laco = cache.partition_records_by_date(iter(registros))
+
+    assert vetorizado == esperado
+    assert em_laco == esperado
+    assert [id(r) for r in vetorizado[0]] == [id(r) for r in esperado[0]]
+
+
+def test_dedup_mantem_primeira_ocorrencia_e_ordem():
+    registros = _amostra()
+    registros = registros + [dict(r, status='OUTRO') for r in registros[::3]]
+    del registros[10]['pep']
+
+    saida = cache.deduplicate_records(registros)
+
+    assert [id(r) for r in saida] == [id(r) for r in _dedup_referencia(registros)]
+    assert cache.deduplicate_records(registros, ('nota',)) == _dedup_referencia(registros, ('nota',))
+    assert cache.deduplicate_records(registros, ()) == registros[:1]
+
+
+def test_update_memory_and_persist_igual_ao_fluxo_antigo(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'LIMIAR_VETORIZADO', 1)
+    historico = _particao_referencia(_amostra())[0]
+    cache.save_history(str(tmp_path / 'historico.json'), historico + historico[:50])
+    lote = _amostra()[::2] + historico[:20]
+
+    saida = cache.update_memory_and_persist(lote, str(tmp_path / 'cache.json'), str(tmp_path / 'historico.json'))
+
+    antigos, recentes = _particao_referencia(lote)
+    lido = cache.load_history(str(tmp_path / 'historico.json'))
+    assert lido == _dedup_referencia(_dedup_referencia(historico + historico[:50]) + antigos)
+    assert cache.load_cache(str(tmp_path / 'cache.json')) == _dedup_referencia(recentes)
+    assert saida == lido + _dedup_referencia(recentes)
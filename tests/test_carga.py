@@ -0,0 +1,33 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.carga import Configuracao, executar, percentil
+
+
+def test_percentil_interpola():
+    valores = [float(valor) for valor in range(1, 101)]
+
+    assert percentil(valores, 0.50) == pytest.approx(50.5)
+    assert percentil(valores, 0.99) == pytest.approx(99.01)
+    assert percentil([], 0.95) == 0.0
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason='RSS dos workers é lido do /proc')
+def test_carga_curta_contra_gunicorn():
+    pytest.importorskip('gunicorn')
+    escala = {'linhas_excel': 60, 'abas': 1, 'concluidas': 40, 'registros': 300, 'historico': 300}
+    resultado = executar(Configuracao(
+        workers=2, threads=2, usuarios=3, duracao=3, aquecimento=1, pausa=0.05,
+        intervalo_sincronizacao=1, parametros=escala,
+    ))
+
+    json.dumps(resultado)
+    assert resultado['total']['erros'] == 0, resultado['exemplos_erro']
+    assert resultado['total']['requisicoes'] > 10
+    assert resultado['total']['p50_ms'] <= resultado['total']['p95_ms'] <= resultado['total']['p99_ms']
+    assert {'mapa', 'localizacoes_polling', 'concluidas_filtros'} <= set(resultado['operacoes'])
+    assert resultado['sincronizacoes'] >= 1 and 'atualizar_programacao' in resultado['operacoes']
+    assert len(resultado['memoria']['por_worker']) >= 2
+    assert resultado['memoria']['pico_rss_mb_max'] > 0
@@ -0,0 +1,194 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from services.coalescencia import Coalescedor, coalescedor_sincronizacao
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _em_paralelo(total, alvo):
+    resultados, erros = [], []
+
+    def _rodar():
+        try:
+            resultados.append(alvo())
+        except Exception as exc:  # noqa: BLE001
+            erros.append(exc)
+
+    threads = [threading.Thread(target=_rodar) for _ in range(total)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return resultados, erros
+
+
+def test_chamadas_simultaneas_compartilham_uma_execucao():
+    coalescedor = Coalescedor()
+    chamadas = []
+
+    def _caro():
+        chamadas.append(1)
+        time.sleep(0.2)
+        return {'pdf': b'%PDF'}
+
+    resultados, erros = _em_paralelo(12, lambda: coalescedor.executar('pdf:x', _caro))
+
+    assert not erros and len(chamadas) == 1
+    assert len(resultados) == 12 and all(r is resultados[0] for r in resultados)
+    assert coalescedor.em_andamento() == 0
+    coalescedor.executar('pdf:x', _caro)
+    assert len(chamadas) == 2
+
+
+def test_erro_do_lider_chega_aos_seguidores():
+    coalescedor = Coalescedor()
+
+    def _falha():
+        time.sleep(0.1)
+        raise ValueError('dropbox fora do ar')
+
+    resultados, erros = _em_paralelo(5, lambda: coalescedor.executar('sync', _falha))
+
+    assert not resultados and len(erros) == 5
+    assert all(isinstance(erro, ValueError) for erro in erros)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='trava de arquivo usa fcntl')
+def test_outro_processo_com_a_trava_reaproveita_o_resultado(tmp_path):
+    iniciado = tmp_path / 'iniciado'
+    codigo = (
+        'import sys, time; from pathlib import Path; from services.coalescencia import Coalescedor\n'
+        f'c = Coalescedor({str(tmp_path)!r})\n'
+        f'c.executar("sincronizacao", lambda: (Path({str(iniciado)!r}).touch(), time.sleep(1)), entre_processos=True)\n'
+    )
+    processo = subprocess.Popen([sys.executable, '-c', codigo], cwd=RAIZ)
+    try:
+        limite = time.monotonic() + 10
+        while not iniciado.exists() and time.monotonic() < limite:
+            time.sleep(0.02)
+        assert iniciado.exists()
+        resultado = Coalescedor(str(tmp_path)).executar(
+            'sincronizacao', lambda: 'sincronizou de novo', entre_processos=True, apos_espera=lambda: 'reaproveitou'
+        )
+    finally:
+        processo.wait(timeout=10)
+    assert resultado == 'reaproveitou'
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='trava de arquivo usa fcntl')
+def test_chave_diferente_na_mesma_faixa_nao_e_reaproveitada(tmp_path):
+    # Uma faixa só: a página e a sincronização disputam o mesmo arquivo.
+    coalescedor = Coalescedor(str(tmp_path), faixas=1)
+    dentro, liberar = threading.Event(), threading.Event()
+
+    def _renderizar():
+        dentro.set()
+        liberar.wait(5)
+        return b'<html>'
+
+    pagina = threading.Thread(target=lambda: coalescedor.executar('pagina:2', _renderizar, entre_processos=True))
+    pagina.start()
+    assert dentro.wait(2)
+    threading.Timer(0.2, liberar.set).start()
+    resultado = coalescedor.executar(
+        'sincronizacao', lambda: 'sincronizou', entre_processos=True, apos_espera=lambda: 'reaproveitou'
+    )
+    pagina.join(2)
+    assert resultado == 'sincronizou'
+
+    # A sincronização do app tem arquivo próprio, fora das faixas das páginas.
+    sincronizacao = coalescedor_sincronizacao(str(tmp_path))
+    faixas = {Coalescedor(str(tmp_path))._caminho_trava(f'pagina:{n}') for n in range(2000)}
+    assert sincronizacao._caminho_trava('sincronizacao') not in faixas
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='trava de arquivo usa fcntl')
+def test_quem_espera_sincronizacao_que_falhou_sincroniza_de_novo(monkeypatch, tmp_path):
+    import app as modulo
+
+    # Dois coalescedores no mesmo diretório fazem o papel de dois workers.
+    outro_worker = coalescedor_sincronizacao(str(tmp_path))
+    monkeypatch.setattr(modulo, 'SINCRONIZACAO', coalescedor_sincronizacao(str(tmp_path)))
+    dentro, liberar = threading.Event(), threading.Event()
+
+    def _falhou():
+        dentro.set()
+        liberar.wait(5)
+        return {'sucesso': False, 'mensagem': 'Dropbox fora do ar', 'erros': ['timeout'], 'registros': [], 'delta': {}}
+
+    primeira = threading.Thread(target=lambda: outro_worker.executar(
+        'sincronizacao', _falhou, entre_processos=True, apos_espera=lambda: 'reaproveitou',
+        sucesso=lambda resultado: resultado['sucesso'],
+    ))
+    primeira.start()
+    assert dentro.wait(2)
+    sincronizacoes = []
+
+    def _sincronizar():
+        sincronizacoes.append(1)
+        return {'sucesso': True, 'mensagem': 'ok', 'erros': [], 'registros': [], 'delta': {}}
+
+    monkeypatch.setattr(modulo, 'sincronizar_programacao_dropbox', _sincronizar)
+    threading.Timer(0.2, liberar.set).start()
+    resultado = modulo.sincronizar_uma_vez()
+    primeira.join(2)
+
+    assert sincronizacoes == [1]
+    assert resultado['mensagem'] == 'ok'
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='trava de arquivo usa fcntl')
+def test_sincronizacao_que_esperou_compactacao_baixa_de_novo(monkeypatch, tmp_path):
+    import app as modulo
+    import compactar_historico
+
+    dentro, liberar = threading.Event(), threading.Event()
+
+    def _compactar(destino, meses):
+        dentro.set()
+        liberar.wait(5)
+        return {'registros_arquivados': 0}
+
+    monkeypatch.setattr(compactar_historico, 'compactar', _compactar)
+    compactacao = threading.Thread(target=compactar_historico.main, args=(['--destino', str(tmp_path)],))
+    compactacao.start()
+    assert dentro.wait(2)
+    monkeypatch.setattr(modulo, 'SINCRONIZACAO', coalescedor_sincronizacao(str(tmp_path / 'travas')))
+    sincronizacoes = []
+
+    def _sincronizar():
+        # A compactação ainda segura a trava quando a sincronização entra.
+        assert liberar.is_set()
+        sincronizacoes.append(1)
+        return {'sucesso': True, 'mensagem': 'ok', 'erros': [], 'registros': [], 'delta': {}}
+
+    monkeypatch.setattr(modulo, 'sincronizar_programacao_dropbox', _sincronizar)
+    threading.Timer(0.2, liberar.set).start()
+    resultado = modulo.sincronizar_uma_vez()
+    compactacao.join(2)
+
+    assert sincronizacoes == [1] and resultado['mensagem'] == 'ok'
+
+
+def test_cliques_simultaneos_em_atualizar_disparam_uma_sincronizacao(monkeypatch, tmp_path):
+    import app as modulo
+
+    monkeypatch.setattr(modulo, 'SINCRONIZACAO', coalescedor_sincronizacao(str(tmp_path)))
+    sincronizacoes = []
+
+    def _sincronizar():
+        sincronizacoes.append(1)
+        time.sleep(0.2)
+        return {'sucesso': True, 'mensagem': 'ok', 'erros': [], 'registros': [], 'delta': {}}
+
+    monkeypatch.setattr(modulo, 'sincronizar_programacao_dropbox', _sincronizar)
+    resultados, erros = _em_paralelo(8, modulo.sincronizar_uma_vez)
+
+    assert not erros and len(resultados) == 8
+    assert len(sincronizacoes) == 1
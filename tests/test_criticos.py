@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+from benchmarks.geradores import gerar_registros_programacao
+from services.criticos import agregar_criticos, agrupar_criticos_por_base, ordenar_digesto
+from services.equipes import ALLOWED_EQUIPES, filtrar_registros_por_equipes
+from services.fragmentos import fragmentar
+from services.normalizacao import normalizar_registros
+from utils.dates import filtrar_por_mes_e_semana, obter_mes_semana_atual
+
+
+def _registros():
+    brutos = gerar_registros_programacao(3_000, inicio=date.today() - timedelta(days=20), dias=30)
+    registros = normalizar_registros(filtrar_registros_por_equipes(brutos, ALLOWED_EQUIPES))
+    for posicao, registro in enumerate(registros):
+        registro['condicao'] = registro['status']
+        if posicao % 5 == 0:
+            registro['pep'] = '-'
+    return registros
+
+
+def _ordem_antiga(itens):
+    """Reproduz o agrupamento que o template fazia: base a base, na ordem global por data."""
+    return [item for base in ('BACABAL', 'ITAPECURU MIRIM', 'SANTA INES', '-') for item in itens if item['base_nome'] == base]
+
+
+def test_digesto_por_fragmento_igual_ao_agrupamento_completo():
+    import app as modulo
+
+    registros = _registros()
+    mes, semana = obter_mes_semana_atual()
+    fragmentos = fragmentar(registros)
+
+    esperado = _ordem_antiga(ordenar_digesto(agregar_criticos(filtrar_por_mes_e_semana(registros, mes, semana))))
+    grupos = modulo._criticos_por_base(fragmentos.values(), mes, semana)
+    assert esperado
+    assert [item for grupo in grupos for item in grupo['itens']] == esperado
+    assert [grupo['base'] for grupo in grupos] == ['BACABAL', 'ITAPECURU MIRIM', 'SANTA INES']
+
+    bcb = [r for r in registros if r['_base'] == 'BCB']
+    esperado_bcb = ordenar_digesto(agregar_criticos(filtrar_por_mes_e_semana(bcb, mes, '')))
+    assert agrupar_criticos_por_base(ordenar_digesto(fragmentos['BCB'].digesto_criticos(mes, ''))) == [
+        {'base': 'BACABAL', 'itens': esperado_bcb}
+    ]
+
+
+def test_rota_mapa_exibe_resumo_critico_por_base():
+    import app as modulo
+
+    registros = _registros()[:300]
+    modulo.dados.substituir(projetos=registros, concluidas=[])
+    mes, semana = obter_mes_semana_atual()
+
+    resposta = modulo.app.test_client().get(f'/mapa?base=BACABAL&mes={mes}&semana={semana}')
+
+    assert resposta.status_code == 200
+    assert b'STATUS DE LIBERA' in resposta.data
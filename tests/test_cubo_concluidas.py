@@ -0,0 +1,63 @@
+from datetime import date
+
+import pytest
+
+from benchmarks.geradores import gerar_concluidas
+
+
+@pytest.fixture
+def modulo(monkeypatch):
+    import app as modulo
+
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', False)
+    concluidas = gerar_concluidas(800, inicio=date(2026, 1, 10), dias=150)
+    concluidas[3]['base'] = ''
+    modulo.dados.substituir(concluidas=concluidas)
+    return modulo
+
+
+def _comparar(cubo, linhas):
+    for chave in ('total', 'media_dias', 'maior_duracao', 'base_top', 'bases', 'status', 'faltantes'):
+        assert cubo[chave] == linhas[chave], chave
+    assert cubo['total_valor'] == pytest.approx(linhas['total_valor'])
+    assert cubo['total_andamento'] == pytest.approx(linhas['total_andamento'])
+    assert [item['nome'] for item in cubo['bases_valor']] == [item['nome'] for item in linhas['bases_valor']]
+    assert [item['valor'] for item in cubo['bases_valor']] == pytest.approx([item['valor'] for item in linhas['bases_valor']])
+
+
+@pytest.mark.parametrize('argumentos', [
+    {},
+    {'base': 'bcb'},
+    {'status': 'energizada', 'semana_fim': '2'},
+    {'semana_inicio': 'SEM 1', 'base': 'ITM'},
+    {'inicio': '01/03/2026', 'fim': '30/04/2026'},
+    {'inicio': '2026-02-01'},
+    {'fim': '31/03/2026', 'status': 'SEM PEP'},
+])
+def test_metricas_do_cubo_iguais_as_das_linhas(modulo, argumentos):
+    filtros = modulo._coletar_filtros(argumentos)
+    obras = modulo._filtrar_obras_por_filtros(modulo._obras_concluidas_por_mes('', filtros['base']), filtros)
+
+    assert obras and modulo._fatia_do_cubo(filtros) is not None
+    _comparar(modulo._metricas_concluidas(obras, filtros), modulo._metricas_concluidas(obras))
+
+
+def test_datas_fora_dos_meses_inteiros_caem_nas_linhas(modulo):
+    filtros = modulo._coletar_filtros({'inicio': '15/03/2026'})
+    obras = modulo._filtrar_obras_por_filtros(modulo._obras_concluidas_por_mes(''), filtros)
+
+    assert modulo._fatia_do_cubo(filtros) is None
+    assert modulo._metricas_concluidas(obras, filtros)['total'] == len(obras)
+
+
+def test_api_de_tendencias(modulo):
+    cliente = modulo.app.test_client()
+    por_mes = cliente.get('/api/concluidas/tendencias?por=mes').get_json()['serie']
+    por_semana = cliente.get('/api/concluidas/tendencias?base=STI').get_json()['serie']
+
+    assert [ponto['mes'] for ponto in por_mes] == sorted(ponto['mes'] for ponto in por_mes)
+    datadas = [o for o in modulo.dados.concluidas if o.get('conc') or o.get('inic')]
+    assert sum(ponto['total'] for ponto in por_mes) == len(datadas)
+    assert por_mes[0]['variacao_total'] is None and por_mes[1]['variacao_total'] is not None
+    assert all(ponto['semana'] for ponto in por_semana)
+    assert sum(p['total'] for p in por_semana) < sum(p['total'] for p in por_mes)
@@ -0,0 +1,37 @@
+from services.dados import RepositorioDados
+from services.derivados import RegistroDerivados
+
+
+def test_construtor_roda_uma_vez_por_versao():
+    dados = RepositorioDados()
+    dados.substituir(projetos=[], concluidas=[{'valor': 1}, {'valor': 0}])
+    derivados = RegistroDerivados(dados)
+    chamadas = []
+
+    @derivados.registrar('zerados')
+    def _zerados(repositorio):
+        chamadas.append(repositorio.versao)
+        return [obra for obra in repositorio.concluidas if not obra['valor']]
+
+    assert len(derivados.obter('zerados')) == 1
+    assert len(derivados.obter('zerados')) == 1
+    assert len(chamadas) == 1
+
+    dados.substituir(concluidas=[{'valor': 0}, {'valor': 0}])
+    derivados.aquecer()
+    assert len(derivados.obter('zerados')) == 2
+    assert chamadas == [1, 2]
+
+
+def test_contador_de_pendencias_do_app_segue_a_versao():
+    import app as modulo
+
+    modulo.dados.substituir(concluidas=[
+        {'base': 'BCB', 'obra': 'MA-1', 'valor': 10.0, 'andamento': 5.0},
+        {'base': 'ITM', 'obra': 'MA-2', 'valor': None, 'andamento': 5.0},
+    ])
+    assert modulo.inject_global_counts() == {'pendencias_alerta': 1}
+    assert modulo.derivados.obter('pendencias') is modulo.derivados.obter('pendencias')
+
+    modulo.dados.substituir(concluidas=[])
+    assert modulo.inject_global_counts() == {'pendencias_alerta': 0}
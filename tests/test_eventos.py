@@ -0,0 +1,82 @@
+import threading
+
+from benchmarks.geradores import gerar_registros_programacao
+from services.eventos import BarramentoEventos
+
+
+def test_muitos_assinantes_recebem_evento_de_outro_worker(tmp_path):
+    caminho = str(tmp_path / 'eventos.jsonl')
+    assinante = BarramentoEventos(caminho, intervalo=0.02)
+    publicador = BarramentoEventos(caminho)
+    # Como na página: o último id conhecido na renderização é o ponto de partida.
+    desde = assinante.ultimo_id()
+    recebidos = []
+    prontos = threading.Barrier(201)
+
+    def _assinar():
+        prontos.wait()
+        for item in assinante.assinar(desde=desde, duracao=10, intervalo_ping=0.05):
+            if item is not None:
+                recebidos.append(item)
+                return
+
+    threads = [threading.Thread(target=_assinar) for _ in range(200)]
+    for thread in threads:
+        thread.start()
+    prontos.wait()
+    evento_id = publicador.publicar('dados', {'versao': 7, 'bases': ['BCB']})
+    for thread in threads:
+        thread.join(timeout=15)
+
+    assert len(recebidos) == 200
+    assert {item[0] for item in recebidos} == {evento_id}
+    assert all(item[1]['bases'] == ['BCB'] and item[1]['tipo'] == 'dados' for item in recebidos)
+    assert assinante.assinantes == 0
+
+    segundo = publicador.publicar('dados', {'versao': 8, 'bases': ['ITM']})
+    retomado = next(item for item in assinante.assinar(desde=evento_id, duracao=5) if item)
+    assert retomado[0] == segundo
+
+
+def test_rotacao_mantem_ids_unicos(tmp_path):
+    barramento = BarramentoEventos(str(tmp_path / 'eventos.jsonl'), max_bytes=400)
+    ids = [barramento.publicar('dados', {'n': n, 'texto': 'x' * 50}) for n in range(20)]
+
+    assert len(set(ids)) == 20
+    assert (tmp_path / 'eventos.jsonl.1').exists()
+    assert barramento.ultimo_id() == ids[-1]
+
+
+def test_sincronizacao_publica_bases_alteradas_no_stream(monkeypatch, tmp_path):
+    import app as modulo
+    from services.ingestao import preparar_registros
+
+    for nome in ('CACHE_FILE_PATH', 'HISTORY_FILE_PATH', 'CONCLUIDAS_FILE_PATH', 'SYNC_SUMMARY_FILE_PATH'):
+        monkeypatch.setattr(modulo, nome, str(tmp_path / f'{nome.lower()}.json'))
+    barramento = BarramentoEventos(str(tmp_path / 'eventos.jsonl'), intervalo=0.02)
+    monkeypatch.setattr(modulo, 'EVENTOS', barramento)
+    monkeypatch.setattr(modulo, 'EVENTOS_DURACAO_S', 0.3)
+    modulo.dados.substituir(projetos=[], concluidas=[])
+    desde = barramento.ultimo_id()
+
+    registros = [r for r in preparar_registros(gerar_registros_programacao(200)) if r['_base'] == 'ITM']
+    modulo._aplicar_sincronizacao(registros, None, 'upload')
+
+    corpo = modulo.app.test_client().get(f'/events?desde={desde}').get_data(as_text=True)
+    assert corpo.startswith('retry: 3000')
+    assert 'event: dados' in corpo
+    assert '"bases": ["ITM"]' in corpo
+
+
+def test_sse_fica_abaixo_das_threads_do_worker(monkeypatch, tmp_path):
+    import app as modulo
+
+    monkeypatch.setattr(modulo, 'EVENTOS', BarramentoEventos(str(tmp_path / 'eventos.jsonl')))
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', True)
+    assert 0 < modulo.EVENTOS_MAX_ASSINANTES < modulo.WORKER_THREADS
+
+    # Worker de uma thread só (gunicorn sync): nem o script nem o stream.
+    monkeypatch.setattr(modulo, 'EVENTOS_MAX_ASSINANTES', 0)
+    with modulo.app.test_request_context('/'):
+        assert modulo.inject_ultimo_evento() == {'ultimo_evento': None}
+    assert modulo.app.test_client().get('/events').status_code == 204
@@ -31,3 +31,48 @@ def test_carregar_concluidas_do_arquivo_minimo():
     assert registro['status'] == 'LIB/ATEC'
     assert registro['valor'] == 1000
     assert registro['andamento'] == 500
+
+
+def test_coercao_vetorizada_segue_o_esquema():
+    from datetime import date
+
+    from services.excel_loader import coagir_datas, coagir_dinheiro, coagir_inteiros, coagir_textos
+
+    datas = pd.Series(
+        [pd.Timestamp('2026-02-01 10:00'), date(2026, 2, 3), '05/02/2026', '6/2/26', '2026-02-07', '-', None, 'now'],
+        dtype=object,
+    )
+    assert [d.date() if pd.notna(d) else None for d in coagir_datas(datas)] == [
+        date(2026, 2, 1), date(2026, 2, 3), date(2026, 2, 5), date(2026, 2, 6), date(2026, 2, 7), None, None, None
+    ]
+
+    valores = pd.Series(['R$ 1.234,56', 1000, '12,5', '-', None, ' 7 '], dtype=object)
+    assert coagir_dinheiro(valores).fillna(-1).tolist() == [1234.56, 1000.0, 12.5, -1, -1, 7.0]
+    assert coagir_inteiros(pd.Series(['3', 2.0, '-'], dtype=object)).tolist() == [3, 2, pd.NA]
+    assert coagir_textos(pd.Series([' BCB ', '-', None, 3], dtype=object)).tolist() == ['BCB', None, None, '3']
+
+
+def test_concluidas_tipadas_sobrevivem_ao_cache_json(tmp_path):
+    from datetime import date
+
+    from services.cache import load_cache, save_cache
+    from services.esquema import ESQUEMA_CONCLUIDAS, tipar_registros
+
+    df = pd.DataFrame({
+        'BASE': ['BCB', 'ITM'], 'OBRA': ['MA-1', 'MA-2'], 'VALOR': ['1.500,25', '-'],
+        'INIC': ['01/02/2026', None], 'QTD PROG': [2, None],
+    })
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='CONCLUÍDAS')
+    buffer.seek(0)
+
+    registros = carregar_concluidas_do_arquivo(buffer)
+
+    assert registros[0]['valor'] == 1500.25 and registros[0]['inic'] == date(2026, 2, 1)
+    assert registros[0]['qtd_prog'] == 2 and isinstance(registros[0]['qtd_prog'], int)
+    assert registros[1]['valor'] is None and registros[1]['inic'] is None and registros[1]['status'] is None
+
+    caminho = str(tmp_path / 'concluidas.json')
+    save_cache(caminho, registros)
+    assert tipar_registros(load_cache(caminho), ESQUEMA_CONCLUIDAS) == registros
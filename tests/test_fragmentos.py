@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+from benchmarks.geradores import gerar_registros_programacao
+from services.cache import chave_registro
+from services.dados import RepositorioDados
+from services.equipes import ALLOWED_EQUIPES, filtrar_registros_por_equipes
+from services.fragmentos import fragmentar
+from services.normalizacao import normalizar_registros
+from utils.dates import filtrar_por_mes_e_semana, obter_mes_semana_atual
+
+
+def _registros(total=2_000):
+    brutos = gerar_registros_programacao(total, inicio=date.today() - timedelta(days=20), dias=30)
+    return normalizar_registros(filtrar_registros_por_equipes(brutos, ALLOWED_EQUIPES))
+
+
+def test_fragmento_do_periodo_igual_ao_filtro_completo():
+    registros = _registros()
+    mes, semana = obter_mes_semana_atual()
+    fragmentos = fragmentar(registros)
+
+    assert sum(len(f) for f in fragmentos.values()) == len(registros)
+    for base in ('BCB', 'ITM', 'STI'):
+        esperado = [r for r in filtrar_por_mes_e_semana(registros, mes, semana) if base in r['equipe']]
+        assert fragmentos[base].do_periodo(mes, semana) == esperado
+        assert fragmentos[base].do_periodo(mes, '') == [
+            r for r in filtrar_por_mes_e_semana(registros, mes, '') if base in r['equipe']
+        ]
+    assert set(fragmentos['BCB'].por_equipe) <= {e for e in ALLOWED_EQUIPES if 'BCB' in e}
+
+
+def test_delta_e_recarga_reconstroem_so_as_bases_afetadas():
+    registros = _registros(600)
+    dados = RepositorioDados()
+    dados.substituir(projetos=list(registros), concluidas=[{'base': 'bcb ', 'obra': 'MA-1'}])
+    itm_antes = dados.fragmento('ITM')
+
+    novo = dict(next(r for r in registros if r['_base'] == 'BCB'), nota='NOVA')
+    dados.aplicar_delta([novo], [], [], chave_registro)
+
+    assert dados.fragmento('ITM') is itm_antes
+    assert dados.fragmento('BCB').registros[-1] is novo
+
+    stis = [r for r in registros if r['_base'] == 'STI'][:3]
+    dados.recarregar_base('STI', stis)
+
+    assert dados.fragmento('STI').registros == stis
+    assert dados.fragmento('ITM') is itm_antes
+    assert len(dados.projetos) == len(registros) + 1 - len([r for r in registros if r['_base'] == 'STI']) + 3
+    assert dados.concluidas_da_base('BCB') == [{'base': 'bcb ', 'obra': 'MA-1'}]
+
+
+def test_periodo_invalido_nao_ocupa_o_memo():
+    registros = _registros(300)
+    fragmento = fragmentar(registros)['BCB']
+    mes, semana = obter_mes_semana_atual()
+    fragmento.do_periodo(mes, semana)
+    fragmento.digesto_criticos(mes, semana)
+    memoizados = len(fragmento._periodos), len(fragmento._datas), len(fragmento._digestos)
+
+    for indice in range(50):
+        assert fragmento.do_periodo(f'x{indice}', semana) == []
+        assert fragmento.digesto_criticos(f'x{indice}', semana) == {}
+        assert fragmento.do_periodo(mes, str(100 + indice)) == filtrar_por_mes_e_semana(
+            fragmento.registros, mes, str(100 + indice)
+        )
+    assert (len(fragmento._periodos), len(fragmento._datas), len(fragmento._digestos)) == memoizados
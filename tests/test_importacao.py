@@ -0,0 +1,146 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.geradores import gerar_workbook
+from services.admissao import ControleAdmissao, Orcamento
+from services.coalescencia import coalescedor_sincronizacao
+from services.tarefas import CONCLUIDA, EXECUTANDO, ExecutorTarefas
+
+
+@pytest.fixture
+def modulo(monkeypatch, tmp_path):
+    import app as modulo
+
+    for nome in ('CACHE_FILE_PATH', 'HISTORY_FILE_PATH', 'CONCLUIDAS_FILE_PATH', 'SYNC_SUMMARY_FILE_PATH'):
+        monkeypatch.setattr(modulo, nome, str(tmp_path / f'{nome.lower()}.json'))
+    monkeypatch.setattr(modulo, 'ARQUIVOS_DADOS', (modulo.CACHE_FILE_PATH, modulo.HISTORY_FILE_PATH, modulo.CONCLUIDAS_FILE_PATH))
+    monkeypatch.setattr(modulo, 'TAREFAS', ExecutorTarefas(str(tmp_path / 'tarefas')))
+    monkeypatch.setattr(modulo, 'IMPORTACOES_DIR', str(tmp_path / 'importacoes'))
+    monkeypatch.setattr(modulo, 'ADMISSAO', ControleAdmissao({'importar_excel': Orcamento(1, 1, 10)}, str(tmp_path / 'travas')))
+    monkeypatch.setattr(modulo, 'SINCRONIZACAO', coalescedor_sincronizacao(str(tmp_path / 'travas')))
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', False)
+    modulo.dados.substituir(projetos=[], concluidas=[])
+    return modulo
+
+
+def _enviar(cliente, conteudo: bytes):
+    from io import BytesIO
+
+    return cliente.post(
+        '/importar_excel',
+        data={'file': (BytesIO(conteudo), 'Controle - Obras.xlsx')},
+        headers={'Accept': 'application/json'},
+    )
+
+
+def _aguardar(cliente, url):
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        status = cliente.get(url).get_json()
+        if status['status'] not in ('na_fila', 'executando'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError('importação não terminou')
+
+
+def test_upload_vira_tarefa_com_progresso_por_aba_e_ignora_duplicado(modulo, tmp_path):
+    conteudo = gerar_workbook(linhas=80, abas=2, abas_auxiliares=1, linhas_concluidas=10).getvalue()
+    cliente = modulo.app.test_client()
+
+    resposta = _enviar(cliente, conteudo)
+    assert resposta.status_code == 202
+    corpo = resposta.get_json()
+    status = _aguardar(cliente, corpo['status_url'])
+
+    assert status['status'] == CONCLUIDA, status.get('mensagem')
+    assert [aba['situacao'] for aba in status['abas']].count('processada') == 2
+    assert status['resultado']['resumo']['recebidos'] == len(modulo.dados.projetos) > 0
+    assert len(modulo.dados.concluidas) == 10
+    assert not list((tmp_path / 'importacoes').iterdir())
+
+    repetida = _enviar(cliente, conteudo)
+    assert repetida.status_code == 200
+    assert repetida.get_json()['tarefa']['duplicada'] is True
+    assert repetida.get_json()['tarefa']['id'] == corpo['tarefa']['id']
+
+    # Depois de limpar a tabela o mesmo arquivo volta a ser importado.
+    cliente.get('/limpar_dados')
+    assert modulo.dados.projetos == []
+    reenviada = _enviar(cliente, conteudo)
+    assert reenviada.status_code == 202
+    assert _aguardar(cliente, reenviada.get_json()['status_url'])['status'] == CONCLUIDA
+    assert len(modulo.dados.projetos) == status['resultado']['resumo']['recebidos']
+
+
+def test_importacao_espera_a_sincronizacao_de_outro_worker(modulo, tmp_path):
+    import threading
+
+    conteudo = gerar_workbook(linhas=40, abas=1, semente=5).getvalue()
+    cliente = modulo.app.test_client()
+    # Outro worker no meio de uma sincronização (mesma trava de arquivo).
+    outro_worker = coalescedor_sincronizacao(str(tmp_path / 'travas'))
+    dentro, liberar = threading.Event(), threading.Event()
+
+    def _sincronizar():
+        dentro.set()
+        liberar.wait(10)
+        return {'sucesso': True}
+
+    sincronizacao = threading.Thread(
+        target=lambda: outro_worker.executar('sincronizacao', _sincronizar, entre_processos=True)
+    )
+    sincronizacao.start()
+    assert dentro.wait(2)
+    try:
+        url = _enviar(cliente, conteudo).get_json()['status_url']
+        limite = time.monotonic() + 10
+        while not cliente.get(url).get_json()['abas'] and time.monotonic() < limite:
+            time.sleep(0.05)
+        time.sleep(0.3)
+        # Planilha lida, mas nada gravado enquanto a trava está com o outro worker.
+        assert cliente.get(url).get_json()['status'] == EXECUTANDO
+        assert modulo.dados.projetos == []
+    finally:
+        liberar.set()
+        sincronizacao.join(2)
+    assert _aguardar(cliente, url)['status'] == CONCLUIDA
+    assert modulo.dados.projetos
+
+
+def test_upload_acima_do_limite_e_recusado(modulo, monkeypatch):
+    monkeypatch.setattr(modulo, 'UPLOAD_MAX_BYTES', 1024)
+    resposta = _enviar(modulo.app.test_client(), b'x' * 4096)
+
+    assert resposta.status_code == 413
+    assert 'limite' in resposta.get_json()['message']
+
+
+def test_tarefa_abandonada_pode_ser_refeita(tmp_path):
+    executor = ExecutorTarefas(str(tmp_path), tempo_maximo=60)
+    morto = subprocess.Popen([sys.executable, '-c', 'pass'])
+    morto.wait()
+    recente = datetime.now().isoformat(timespec='seconds')
+    antigo = (datetime.now() - timedelta(minutes=5)).isoformat(timespec='seconds')
+    situacoes = {
+        # Worker reiniciado no meio da importação.
+        'dono-morto': {'status': EXECUTANDO, 'pid': morto.pid, 'host': socket.gethostname(), 'atualizado_em': recente},
+        # Outra máquina, sem notícia há mais de ``tempo_maximo``.
+        'sem-noticia': {'status': 'na_fila', 'pid': 1, 'host': 'outra-maquina', 'atualizado_em': antigo},
+        'em-andamento': {'status': EXECUTANDO, 'pid': 1, 'host': 'outra-maquina', 'atualizado_em': recente},
+    }
+    for tarefa_id, status in situacoes.items():
+        (tmp_path / f'{tarefa_id}.json').write_text(json.dumps(dict(status, id=tarefa_id)))
+
+    novas = {
+        tarefa_id: executor.submeter(tarefa_id, 'teste', lambda tarefa: {'mensagem': 'ok'})[1]
+        for tarefa_id in situacoes
+    }
+
+    assert novas == {'dono-morto': True, 'sem-noticia': True, 'em-andamento': False}
@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.geradores import gerar_workbook
+from services.cache import load_cache, load_summary
+from services.eventos import BarramentoEventos
+from services.ingestao import ArquivosDados, fontes_do_diretorio, ingerir
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _planilhas(diretorio, quantidade=3):
+    diretorio.mkdir()
+    for indice in range(quantidade):
+        conteudo = gerar_workbook(linhas=60, abas=2, linhas_concluidas=5 if indice == 0 else 0, semente=indice)
+        (diretorio / f'obras-{indice}.xlsx').write_bytes(conteudo.getvalue())
+    (diretorio / '~$obras-0.xlsx').write_bytes(b'trava do excel')
+    return str(diretorio)
+
+
+def test_ingere_diretorio_em_paralelo_e_publica_evento(tmp_path):
+    fontes = fontes_do_diretorio(_planilhas(tmp_path / 'planilhas'))
+    arquivos = ArquivosDados.no_diretorio(str(tmp_path / 'dados'))
+    os.makedirs(tmp_path / 'dados')
+    eventos = BarramentoEventos(str(tmp_path / 'dados' / 'eventos.jsonl'))
+    desde = eventos.ultimo_id()
+
+    simulado = ingerir(fontes, arquivos, 'diretorio', processos=2, dry_run=True)
+    assert simulado.situacao == 'simulada'
+    assert simulado.resumo['adicionados'] > 0
+    assert not os.path.exists(arquivos.resumo) and not os.path.exists(arquivos.cache)
+
+    relatorio = ingerir(fontes, arquivos, 'diretorio', processos=2, eventos=eventos)
+    assert [fonte['nome'] for fonte in relatorio.fontes] == ['obras-0.xlsx', 'obras-1.xlsx', 'obras-2.xlsx']
+    assert relatorio.situacao == 'gravada'
+    assert relatorio.resumo == dict(simulado.resumo, quando=relatorio.resumo['quando'])
+    assert {'leitura_excel', 'parse_aba', 'filtro', 'delta', 'persistencia', 'total'} <= set(relatorio.etapas)
+    assert load_summary(arquivos.resumo)['registros'] == relatorio.resumo['registros']
+    assert len(load_cache(arquivos.concluidas)) == 5
+    evento = next(item for item in eventos.assinar(desde=desde, duracao=2) if item)[1]
+    assert evento['origem'] == 'diretorio' and evento['bases']
+
+    repetido = ingerir(fontes, arquivos, 'diretorio', processos=2)
+    assert (repetido.resumo['adicionados'], repetido.resumo['concluidas_alteradas']) == (0, False)
+
+    nada = ingerir(fontes, arquivos, 'diretorio', desde=datetime.now() + timedelta(minutes=1))
+    assert nada.situacao == 'sem_alteracoes'
+
+
+def test_cli_nao_importa_o_app(tmp_path):
+    planilhas = _planilhas(tmp_path / 'planilhas', quantidade=1)
+    destino = tmp_path / 'dados'
+    codigo = (
+        'import sys, runpy\n'
+        f'sys.argv = ["sync_dropbox.py", "--diretorio", {planilhas!r}, "--destino", {str(destino)!r},'
+        ' "--processos", "1", "--json-report", "-"]\n'
+        'try:\n'
+        '    runpy.run_path("sync_dropbox.py", run_name="__main__")\n'
+        'except SystemExit as saida:\n'
+        '    assert saida.code == 0, saida.code\n'
+        'assert "app" not in sys.modules and "flask" not in sys.modules\n'
+    )
+    saida = subprocess.run(
+        [sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, timeout=120,
+        env=dict(os.environ, EVENTOS_ATIVOS='0'),
+    )
+    assert saida.returncode == 0, saida.stderr
+    relatorio = json.loads(saida.stdout)
+    assert '[SYNC] Situação: gravada' in saida.stderr
+    assert relatorio['situacao'] == 'gravada'
+    assert relatorio['etapas']['total'] > 0
+    assert (destino / 'programacao_cache.json').exists() or (destino / 'programacao_historico.json').exists()
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+from benchmarks.bench_inicializacao import RAIZ, medir_importacao
+
+ORCAMENTO_IMPORTACAO_MS = float(os.environ.get('MAPA_ORCAMENTO_IMPORTACAO_MS', '1000'))
+
+
+def test_importar_app_nao_carrega_dependencias_pesadas():
+    medicao = medir_importacao('app')
+    assert medicao['pesados_importados'] == []
+
+
+def test_importar_app_respeita_orcamento_de_tempo():
+    medicoes = [medir_importacao('app')['cumulativo_ms'] for _ in range(3)]
+    assert min(medicoes) < ORCAMENTO_IMPORTACAO_MS
+
+
+def test_dados_sao_carregados_apenas_no_primeiro_uso():
+    codigo = 'import app; print(app.dados.carregado); app.dados.projetos; print(app.dados.carregado)'
+    processo = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    assert processo.stdout.split() == ['False', 'True']
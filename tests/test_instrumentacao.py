@@ -0,0 +1,50 @@
+from services.instrumentacao import METRICA_ETAPA, RegistroMetricas
+
+
+def test_medir_registra_histograma_e_renderiza_prometheus():
+    registro = RegistroMetricas(ativo=True)
+    with registro.medir('parse_aba', aba='SEMANA 1'):
+        pass
+    registro.incrementar('mapa_sincronizacoes_total', resultado='sucesso')
+    registro.registrar_coletor(lambda: [('mapa_versao_dados', {}, 3)])
+
+    texto = registro.renderizar_prometheus()
+
+    assert f'# TYPE {METRICA_ETAPA} histogram' in texto
+    assert f'{METRICA_ETAPA}_count{{aba="SEMANA 1",etapa="parse_aba"}} 1' in texto
+    assert f'{METRICA_ETAPA}_bucket{{aba="SEMANA 1",etapa="parse_aba",le="+Inf"}} 1' in texto
+    assert 'mapa_sincronizacoes_total{resultado="sucesso"} 1' in texto
+    assert 'mapa_versao_dados 3' in texto
+
+
+def test_registro_desligado_nao_coleta(capsys):
+    registro = RegistroMetricas(ativo=False, log_estruturado=False)
+    with registro.medir('download'):
+        pass
+    registro.incrementar('x_total')
+    assert registro.instantaneo()['histogramas'] == {}
+    assert registro.instantaneo()['contadores'] == {}
+    assert capsys.readouterr().out == ''
+
+
+def test_log_estruturado_emite_json(capsys):
+    registro = RegistroMetricas(ativo=False, log_estruturado=True)
+    with registro.medir('persistencia'):
+        pass
+    saida = capsys.readouterr().out
+    assert saida.startswith('[METRICA] {"evento": "etapa"')
+    assert '"etapa": "persistencia"' in saida
+
+
+def test_endpoint_metrics_expoe_latencia_por_rota():
+    from app import app
+
+    cliente = app.test_client()
+    cliente.get('/')
+    resposta = cliente.get('/metrics')
+
+    assert resposta.status_code == 200
+    assert resposta.content_type.startswith('text/plain')
+    corpo = resposta.get_data(as_text=True)
+    assert 'mapa_http_requisicao_duracao_segundos_count{metodo="GET",rota="/"}' in corpo
+    assert 'mapa_versao_dados' in corpo
@@ -0,0 +1,36 @@
+from services import normalizacao
+from services.equipes import ALLOWED_EQUIPES, filtrar_registros_por_equipes
+
+
+def test_normalizacao_memoizada_equivale_a_original():
+    amostras = ['ma-sti-000 1m', ' MA-BCB-0001M ', 'MA-STI-0001M', 'MA-ITM-O002M', 'XYZ', '']
+    for valor in amostras:
+        esperado = normalizacao._normalizar_codigo_equipe_bruto(valor) if valor else ''
+        assert normalizacao.normalizar_codigo_equipe(valor) == esperado
+    assert normalizacao.normalizar_texto(' Santa Inês ') == 'SANTA INES'
+    assert normalizacao.status_programado('Programada') is True
+    assert normalizacao.status_programado(None) is False
+
+
+def test_caches_sao_limitados_e_tabela_precomputada():
+    normalizacao.limpar_caches()
+    tabela = normalizacao.precomputar_tabela_equipes(ALLOWED_EQUIPES)
+    assert set(tabela.values()) == set(ALLOWED_EQUIPES)
+    info = normalizacao.estatisticas_caches()['equipes']
+    assert info['maxsize'] == normalizacao.TAMANHO_CACHE_EQUIPES
+    assert info['currsize'] == len(ALLOWED_EQUIPES)
+
+
+def test_normalizar_registros_grava_campos_derivados():
+    registros = filtrar_registros_por_equipes(
+        [{'equipe': 'ma-sti-0001m', 'data': ' 02/02/2026 ', 'status': 'PROGRAMADO'},
+         {'equipe': 'MA-XXX-O001M', 'data': '02/02/2026', 'status': 'PROGRAMADO'}],
+        ALLOWED_EQUIPES
+    )
+    normalizados = normalizacao.normalizar_registros(registros)
+    assert len(normalizados) == 1
+    registro = normalizados[0]
+    assert registro['equipe'] == 'MA-STI-O001M'
+    assert registro['data'] == '02/02/2026'
+    assert registro['_base'] == 'STI'
+    assert registro['_programado'] is True
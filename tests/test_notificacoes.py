@@ -0,0 +1,104 @@
+import time
+
+from benchmarks.geradores import gerar_caches_json
+from benchmarks.servidores_falsos import WebhookFalso
+from services.notificacoes import DUPLICADA, ENFILEIRADA, ENVIADA_RECENTEMENTE, FilaNotificacoes
+from services.retencao import ArquivoHistorico
+
+
+def _esperar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.02)
+    return condicao()
+
+
+def test_lote_e_deduplicacao(tmp_path):
+    with WebhookFalso() as webhook:
+        fila = FilaNotificacoes(str(tmp_path), limite_conteudo=40)
+        assert fila.enfileirar(webhook.url('/hook'), 'alerta A')[1] == ENFILEIRADA
+        assert fila.enfileirar(webhook.url('/hook'), 'alerta A')[1] == DUPLICADA
+        fila.enfileirar(webhook.url('/hook'), 'alerta B')
+        fila.enfileirar(webhook.url('/hook'), 'x' * 30)
+        fila.enfileirar(webhook.url('/outro'), 'alerta A')
+        assert fila.resumo() == {'pendentes': 4, 'falhas': 0}
+
+        contagem = fila.processar()
+
+        assert contagem['enviadas'] == 4 and contagem['lotes'] == 3
+        assert sorted(webhook.mensagens) == sorted(['alerta A', 'alerta A\n\nalerta B', 'x' * 30])
+        assert fila.resumo()['pendentes'] == 0
+        # Reenvio do mesmo alerta dentro da janela é descartado.
+        assert fila.enfileirar(webhook.url('/hook'), 'alerta A')[1] == ENVIADA_RECENTEMENTE
+
+
+def test_repeticao_com_espera_e_desistencia(tmp_path):
+    with WebhookFalso() as webhook:
+        fila = FilaNotificacoes(str(tmp_path), max_tentativas=3, espera_base=10, espera_maxima=15)
+        webhook.falhar(500)
+        webhook.falhar(429, retry_after='60')
+        fila.enfileirar(webhook.url('/hook'), 'alerta')
+        agora = time.time()
+
+        assert fila.processar(agora)['adiadas'] == 1
+        assert fila.pendentes()[0]['proxima_tentativa'] == agora + 10
+        # Antes da hora, nada sai.
+        assert fila.processar(agora + 5)['adiadas'] == 0 and webhook.total() == 1
+
+        assert fila.processar(agora + 10)['adiadas'] == 1
+        # Retry-After maior que a espera exponencial (limitada a 15 s) prevalece.
+        assert fila.pendentes()[0]['proxima_tentativa'] == agora + 70
+        assert fila.processar(agora + 70)['enviadas'] == 1
+        assert webhook.mensagens == ['alerta']
+
+        webhook.falhar(500, vezes=3)
+        fila.enfileirar(webhook.url('/hook'), 'outro')
+        for passo in range(3):
+            fila.processar(agora + 1000 * (passo + 1))
+        assert fila.resumo() == {'pendentes': 0, 'falhas': 1}
+
+
+def test_endpoint_enfileira_sem_esperar_webhook_lento(monkeypatch, tmp_path):
+    import app as modulo
+
+    caminhos = gerar_caches_json(str(tmp_path), historico=50, recentes=20, concluidas=40)
+    monkeypatch.setattr(modulo, 'CACHE_FILE_PATH', caminhos['cache'])
+    monkeypatch.setattr(modulo, 'HISTORY_FILE_PATH', caminhos['historico'])
+    monkeypatch.setattr(modulo, 'CONCLUIDAS_FILE_PATH', caminhos['concluidas'])
+    monkeypatch.setattr(modulo, 'SYNC_SUMMARY_FILE_PATH', str(tmp_path / 'resumo.json'))
+    monkeypatch.setattr(modulo, 'ARQUIVOS_DADOS', (caminhos['cache'], caminhos['historico'], caminhos['concluidas']))
+    monkeypatch.setattr(modulo, 'ARQUIVO_HISTORICO', ArquivoHistorico(str(tmp_path / 'arquivo')))
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', False)
+    monkeypatch.setattr(modulo, 'CACHE_PAGINAS', None)
+    fila = FilaNotificacoes(str(tmp_path / 'notificacoes'), intervalo=0.05)
+    monkeypatch.setattr(modulo, 'NOTIFICACOES', fila)
+    modulo.dados.recarregar()
+    cliente = modulo.app.test_client()
+
+    with WebhookFalso(atraso=1.0) as webhook:
+        monkeypatch.setattr(modulo, 'PENDENTES_WEBHOOK_URL', webhook.url('/hook'))
+        monkeypatch.setattr(modulo, 'PENDENTES_NOTIFICAR_AUTOMATICO', True)
+        try:
+            assert modulo.derivados.obter('pendencias')
+            inicio = time.monotonic()
+            resposta = cliente.post('/concluidas/notificar')
+            assert resposta.status_code == 202 and time.monotonic() - inicio < 0.5
+            assert resposta.get_json()['situacao'] == ENFILEIRADA
+            assert _esperar(lambda: len(webhook.mensagens) == 1)
+            assert webhook.mensagens[0].startswith('**Pendências detectadas no painel Concluídas**')
+            assert cliente.post('/concluidas/notificar').get_json()['situacao'] == ENVIADA_RECENTEMENTE
+
+            # Sincronização que resolve uma pendência e mantém as outras: aviso automático.
+            concluidas = [dict(obra) for obra in modulo.dados.concluidas]
+            pendente = modulo.derivados.obter('pendencias')[0]
+            concluidas = [obra for obra in concluidas if obra.get('obra') != pendente['obra']]
+            modulo._aplicar_sincronizacao([], concluidas, 'teste')
+            assert _esperar(lambda: len(webhook.mensagens) == 2)
+            assert '0 novas, ' in webhook.mensagens[1] and 'resolvidas' in webhook.mensagens[1]
+
+            # Mesmas pendências: nada a avisar.
+            modulo._aplicar_sincronizacao([], [dict(obra) for obra in concluidas], 'teste')
+            time.sleep(0.2)
+            assert fila.resumo()['pendentes'] == 0 and len(webhook.mensagens) == 2
+        finally:
+            fila.parar(timeout=2)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from benchmarks.servidores_falsos import DropboxFalso, ServidorFalso
+from services.dropbox_client import DropboxSettings, DropboxWatcher, TokenCache, watched_paths
+
+
+def _settings(dropbox):
+    return DropboxSettings(
+        controle_path='/Obras/Controle - Obras.xlsx',
+        folder_path='/Obras/Semanais',
+        files={'semana': 'Semana.xlsx'},
+        access_token='token',
+        api_url=dropbox.url('/2'),
+        notify_url=dropbox.url('/2'),
+    )
+
+
+def _aguardar(condicao, limite=10.0):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.02)
+    return condicao()
+
+
+def test_pastas_observadas_agrupam_arquivos():
+    settings = DropboxSettings(
+        controle_path='/Obras/Controle - Obras.xlsx', folder_path='/Obras', files={'a': 'A.xlsx'}
+    )
+    assert watched_paths(settings) == {'/obras': {'/obras/controle - obras.xlsx', '/obras/a.xlsx'}}
+
+
+def test_sincroniza_so_quando_arquivo_observado_muda_com_debounce():
+    with DropboxFalso(longpoll_max=0.3) as dropbox:
+        disparos = []
+        disparou = threading.Event()
+
+        def _ao_mudar(caminhos):
+            disparos.append(caminhos)
+            disparou.set()
+
+        watcher = DropboxWatcher(_settings(dropbox), TokenCache(), _ao_mudar, debounce=0.3, longpoll_timeout=30)
+        watcher.start()
+        try:
+            assert _aguardar(lambda: dropbox.total('/2/files/list_folder/longpoll') >= 2)
+            dropbox.alterar('/Obras/Rascunho.docx')
+            time.sleep(0.6)
+            assert disparos == []
+
+            # Várias gravações seguidas viram uma sincronização só.
+            for _ in range(3):
+                dropbox.alterar('/Obras/Controle - Obras.xlsx')
+                time.sleep(0.05)
+            dropbox.alterar('/Obras/Semanais/Semana.xlsx')
+            assert disparou.wait(5)
+            time.sleep(0.5)
+            assert disparos == [['/obras/controle - obras.xlsx', '/obras/semanais/semana.xlsx']]
+        finally:
+            watcher.stop(timeout=2)
+
+
+def test_erros_e_backoff_espacam_as_tentativas():
+    with DropboxFalso(longpoll_max=0.05, backoff=1) as dropbox:
+        watcher = DropboxWatcher(_settings(dropbox), TokenCache(), lambda _: None, debounce=0.1)
+        watcher.start()
+        time.sleep(0.5)
+        watcher.stop(timeout=2)
+        # Uma chamada por pasta: o backoff de 1s impede a segunda.
+        assert dropbox.total('/2/files/list_folder/longpoll') == 2
+
+    # Falhas esperam 1s, 2s, 4s...: em 1,5s só duas tentativas por pasta.
+    with ServidorFalso() as quebrado:
+        settings = _settings(quebrado)
+        watcher = DropboxWatcher(settings, TokenCache(), lambda _: None, max_backoff=60)
+        watcher.start()
+        time.sleep(1.5)
+        inicio = time.monotonic()
+        watcher.stop(timeout=2)
+        assert time.monotonic() - inicio < 1
+        assert quebrado.total('/2/files/list_folder/get_latest_cursor') == 4
+
+
+def test_cursor_recusado_pede_outro_e_sincroniza():
+    with DropboxFalso(longpoll_max=0.2) as dropbox:
+        dropbox.expirar_cursores(1)
+        disparos = []
+        watcher = DropboxWatcher(_settings(dropbox), TokenCache(), disparos.append, debounce=0.1)
+        watcher.start()
+        try:
+            # As mudanças do intervalo se perderam: a pasta inteira conta como alterada.
+            assert _aguardar(lambda: len(disparos) == 1)
+            assert set(disparos[0]) <= {'/obras/controle - obras.xlsx', '/obras/semanais/semana.xlsx'}
+            assert dropbox.total('/2/files/list_folder/get_latest_cursor') == 3
+
+            # O cursor novo segue funcionando.
+            dropbox.alterar('/Obras/Semanais/Semana.xlsx')
+            assert _aguardar(lambda: disparos[-1] == ['/obras/semanais/semana.xlsx'])
+        finally:
+            watcher.stop(timeout=2)
@@ -0,0 +1,57 @@
+import pytest
+
+from services.perfilador import CABECALHO_TOKEN, Perfilador
+
+
+def test_perfil_salvo_apenas_acima_do_limiar(tmp_path):
+    lento = Perfilador(str(tmp_path), ativo=True, limiar_ms=0)
+    with lento.perfilar('sincronizacao'):
+        sum(range(1000))
+    rapido = Perfilador(str(tmp_path / 'rapido'), ativo=True, limiar_ms=60_000)
+    with rapido.perfilar('sincronizacao'):
+        pass
+
+    perfis = lento.listar()
+    assert len(perfis) == 1
+    assert 'sincronizacao' in perfis[0]['nome']
+    assert (tmp_path / f"{perfis[0]['nome']}.txt").exists()
+    assert rapido.listar() == []
+
+
+def test_perfil_desligado_sem_token_valido(tmp_path):
+    perfilador = Perfilador(str(tmp_path), segredo='s3gredo')
+    assert not perfilador.deve_perfilar(None)
+    assert not perfilador.deve_perfilar('errado')
+    assert perfilador.deve_perfilar('s3gredo')
+    assert not perfilador.deve_perfilar('sêgredo')
+    assert Perfilador(str(tmp_path), segredo='sêgredo').token_valido('sêgredo')
+    assert perfilador.caminho_arquivo('../app.py') is None
+
+
+@pytest.fixture
+def perfilador_app(tmp_path, monkeypatch):
+    import app as modulo
+
+    monkeypatch.setattr(modulo.PERFILADOR, 'diretorio', str(tmp_path))
+    monkeypatch.setattr(modulo.PERFILADOR, 'segredo', 's3gredo')
+    monkeypatch.setattr(modulo.PERFILADOR, 'limiar_ms', 0)
+    return modulo.app.test_client()
+
+
+def test_requisicao_com_cabecalho_gera_perfil_e_rota_admin_lista(perfilador_app):
+    assert perfilador_app.get('/', headers={CABECALHO_TOKEN: 's3gredo'}).status_code == 200
+    assert perfilador_app.get('/admin/perfis').status_code == 403
+
+    listagem = perfilador_app.get('/admin/perfis', headers={CABECALHO_TOKEN: 's3gredo'}).get_json()
+    assert len(listagem['perfis']) == 1
+    nome = listagem['perfis'][0]['nome']
+    assert 'GET' in nome
+
+    download = perfilador_app.get(f'/admin/perfis/{nome}.prof?token=s3gredo')
+    assert download.status_code == 200
+    assert download.data
+
+
+def test_token_fora_do_ascii_nao_derruba_a_requisicao(perfilador_app):
+    assert perfilador_app.get('/', headers={CABECALHO_TOKEN: 'é'}).status_code == 200
+    assert perfilador_app.get('/admin/perfis?token=%C3%A9').status_code == 403
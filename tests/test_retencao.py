@@ -0,0 +1,119 @@
+import json
+import os
+from datetime import date, timedelta
+
+import pytest
+from flask import template_rendered
+
+from benchmarks.geradores import gerar_caches_json
+from services.busca import IndiceBusca
+from services.cache import load_history
+from services.ingestao import preparar_carregados
+from services.retencao import ArquivoHistorico, inicio_janela, mes_do_registro
+
+
+@pytest.fixture
+def modulo(monkeypatch, tmp_path):
+    import app as modulo
+
+    caminhos = gerar_caches_json(str(tmp_path), historico=4000, recentes=300, concluidas=10)
+    # Histórico em ordem cronológica, como fica quando é acumulado sincronização a sincronização.
+    historico = sorted(load_history(caminhos['historico']), key=lambda r: r['data'].split('/')[::-1])
+    with open(caminhos['historico'], 'w', encoding='utf-8') as handler:
+        json.dump(historico, handler, ensure_ascii=False)
+    monkeypatch.setattr(modulo, 'CACHE_FILE_PATH', caminhos['cache'])
+    monkeypatch.setattr(modulo, 'HISTORY_FILE_PATH', caminhos['historico'])
+    monkeypatch.setattr(modulo, 'CONCLUIDAS_FILE_PATH', caminhos['concluidas'])
+    monkeypatch.setattr(modulo, 'SYNC_SUMMARY_FILE_PATH', str(tmp_path / 'resumo.json'))
+    monkeypatch.setattr(modulo, 'ARQUIVOS_DADOS', (caminhos['cache'], caminhos['historico'], caminhos['concluidas']))
+    monkeypatch.setattr(modulo, 'ARQUIVO_HISTORICO', ArquivoHistorico(
+        str(tmp_path / 'arquivo'), max_segmentos=2, preparar=preparar_carregados
+    ))
+    monkeypatch.setattr(modulo, 'CACHE_PAGINAS', None)
+    monkeypatch.setattr(modulo, 'EVENTOS_ATIVOS', False)
+    modulo.dados.recarregar()
+    return modulo
+
+
+def _contextos(modulo, urls):
+    capturados = []
+
+    def _capturar(_app, template, context, **_extra):
+        capturados.append({chave: context.get(chave) for chave in ('projetos', 'equipes', 'datas_colunas', 'criticos_por_base')})
+
+    cliente = modulo.app.test_client()
+    with template_rendered.connected_to(_capturar, modulo.app):
+        for url in urls:
+            assert cliente.get(url).status_code == 200
+    return capturados
+
+
+def test_compactacao_nao_muda_resultados_das_rotas(modulo, tmp_path):
+    from compactar_historico import compactar
+
+    hoje = date.today()
+    antigo = (hoje - timedelta(days=200)).strftime('%m')
+    urls = [
+        f'/mapa?mes={antigo}',
+        f'/mapa?mes={antigo}&base=BACABAL',
+        f'/mapa?mes={hoje:%m}&base=ITAPECURU',
+        f'/semanal?mes={antigo}&semana=2',
+        '/mapa?mes=02&semana=1',
+    ]
+    antes = _contextos(modulo, urls)
+    total_antes = len(modulo.dados.projetos)
+
+    relatorio = compactar(str(tmp_path), meses_quentes=3)
+    modulo.dados.recarregar()
+
+    limite = inicio_janela(3)
+    assert relatorio['meses_arquivados'] and all(mes < limite for mes in relatorio['meses_arquivados'])
+    assert all(mes_do_registro(r) >= limite for r in load_history(modulo.HISTORY_FILE_PATH))
+    assert len(modulo.dados.projetos) == total_antes - relatorio['registros_arquivados']
+    assert any(antes_rota['projetos'] for antes_rota in antes)
+    assert _contextos(modulo, urls) == antes
+    assert len(modulo.ARQUIVO_HISTORICO._segmentos) <= 2
+
+    # Compactar de novo não muda nada e os segmentos continuam os mesmos arquivos.
+    arquivos = sorted(os.listdir(tmp_path / 'arquivo'))
+    assert compactar(str(tmp_path), meses_quentes=3)['registros_arquivados'] == 0
+    assert sorted(os.listdir(tmp_path / 'arquivo')) == arquivos
+
+    resumo = modulo.app.test_client().get('/api/historico/arquivo').get_json()
+    assert set(resumo['meses']) == set(relatorio['meses_arquivados'])
+    assert sum(mes['registros'] for mes in resumo['meses'].values()) == relatorio['registros_arquivados']
+
+
+def test_sincronizacao_ignora_meses_arquivados(modulo, tmp_path):
+    from compactar_historico import compactar
+
+    relatorio = compactar(str(tmp_path), meses_quentes=3)
+    modulo.dados.recarregar()
+    mes = relatorio['meses_arquivados'][0]
+    arquivado = dict(modulo.ARQUIVO_HISTORICO.segmento(mes).registros[0], status='ALTERADO NA PLANILHA')
+
+    resumo = modulo._aplicar_sincronizacao([arquivado], None, 'upload')
+
+    assert (resumo['recebidos'], resumo['adicionados'], resumo['modificados']) == (1, 0, 0)
+    assert all(mes_do_registro(r) != mes for r in load_history(modulo.HISTORY_FILE_PATH))
+
+
+def test_busca_encontra_meses_arquivados(modulo, monkeypatch, tmp_path):
+    from compactar_historico import compactar
+
+    monkeypatch.setattr(modulo, 'INDICE_BUSCA', IndiceBusca())
+    modulo.derivados.invalidar('indice_busca')
+    limite = inicio_janela(3)
+    antigo = next(r for r in modulo.dados.projetos if mes_do_registro(r) < limite and str(r.get('nota') or '').strip('-'))
+    url = f"/api/busca?q={antigo['nota']}&campo=nota&por_pagina=200"
+    cliente = modulo.app.test_client()
+    antes = cliente.get(url).get_json()
+    assert antes['total'] >= 1
+
+    # Compactado por outro processo: o índice acompanha o indice.json mesmo sem recarga.
+    relatorio = compactar(str(tmp_path), meses_quentes=3)
+    assert cliente.get(url).get_json() == antes
+
+    modulo.dados.recarregar()
+    assert cliente.get(url).get_json()['resultados'] == antes['resultados']
+    assert len(modulo.INDICE_BUSCA) == len(modulo.dados.projetos) + relatorio['registros_arquivados']
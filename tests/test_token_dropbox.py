@@ -0,0 +1,54 @@
+import threading
+import time
+
+from benchmarks.servidores_falsos import OAuthFalso
+from services.dropbox_client import DropboxSettings, SharedTokenCache, get_access_token
+
+
+def _settings(oauth):
+    return DropboxSettings(
+        controle_path='/Controle - Obras.xlsx',
+        refresh_token='refresh',
+        app_key='chave',
+        app_secret='segredo',
+        token_url=oauth.url('/oauth2/token'),
+    )
+
+
+def test_processos_compartilham_o_token_do_arquivo(tmp_path):
+    caminho = str(tmp_path / 'dropbox_token.json')
+    with OAuthFalso(atraso=0.2) as oauth:
+        settings = _settings(oauth)
+        # Cada instância faz o papel de um worker diferente: só o arquivo é comum.
+        tokens = []
+        threads = [
+            threading.Thread(target=lambda: tokens.append(get_access_token(settings, SharedTokenCache(path=caminho))))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        assert tokens == ['token-1'] * 8
+        assert oauth.total('/oauth2/token') == 1
+        assert get_access_token(settings, SharedTokenCache(path=caminho)) == 'token-1'
+        assert oauth.total('/oauth2/token') == 1
+
+
+def test_renovacao_antecipada_em_segundo_plano(tmp_path):
+    caminho = str(tmp_path / 'dropbox_token.json')
+    with OAuthFalso(expires_in=200) as oauth:
+        settings = _settings(oauth)
+        cache = SharedTokenCache(path=caminho, refresh_margin=300)
+
+        assert get_access_token(settings, cache) == 'token-1'
+        # Ainda válido, mas dentro da margem: devolve o atual e renova em paralelo.
+        assert get_access_token(settings, cache) == 'token-1'
+        limite = time.monotonic() + 5
+        while oauth.total() < 2 and time.monotonic() < limite:
+            time.sleep(0.01)
+        cache._background.join(timeout=5)
+
+        assert oauth.total() == 2
+        assert SharedTokenCache(path=caminho).load() and cache.token == 'token-2'
@@ -46,29 +46,31 @@ def semana_customizada(dt: datetime) -> int:
             return 5
     return ((d - 1) // 7) + 1
 
+def data_no_periodo(data_dt: datetime, mes_sel: str, semana_sel: str) -> bool:
+    if mes_sel == '02' and semana_sel == '1':
+        return (data_dt.month == 2 and semana_customizada(data_dt) == 1) or (data_dt.month == 1 and data_dt.day >= 26)
+    if mes_sel and data_dt.strftime('%m') != mes_sel:
+        return False
+    if semana_sel and str(semana_customizada(data_dt)) != semana_sel:
+        return False
+    return True
+
+def data_texto_no_periodo(data_str: str, mes_sel: str, semana_sel: str) -> bool:
+    try:
+        data_dt = datetime.strptime(str(data_str).strip(), '%d/%m/%Y')
+    except Exception:
+        return False
+    return data_no_periodo(data_dt, mes_sel, semana_sel)
+
 def filtrar_por_mes_e_semana(
     projetos: Iterable[Projeto],
     mes_sel: str,
     semana_sel: str
 ) -> List[Projeto]:
-    resultado: List[Projeto] = []
-    for projeto in projetos:
-        data_str = str(projeto.get('data', '')).strip()
-        try:
-            data_dt = datetime.strptime(data_str, '%d/%m/%Y')
-        except Exception:
-            continue
-        if mes_sel == '02' and semana_sel == '1':
-            if (data_dt.month == 2 and semana_customizada(data_dt) == 1) or (data_dt.month == 1 and data_dt.day >= 26):
-                resultado.append(projeto)
-            continue
-        if mes_sel and data_dt.strftime('%m') != mes_sel:
-            continue
-        if semana_sel:
-            if str(semana_customizada(data_dt)) != semana_sel:
-                continue
-        resultado.append(projeto)
-    return resultado
+    return [
+        projeto for projeto in projetos
+        if data_texto_no_periodo(projeto.get('data', ''), mes_sel, semana_sel)
+    ]
 
 def gerar_intervalo_datas(projetos: Iterable[Projeto], base_norm: str = '') -> List[str]:
     datas = [p.get('data') for p in projetos if p.get('data') not in (None, '-', '')]